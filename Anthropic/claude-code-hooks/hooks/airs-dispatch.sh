@@ -0,0 +1,152 @@
+#!/bin/bash
+# Prisma AIRS hook dispatcher — one process per hook event, shared by every vendor.
+#
+# The per-event scripts (scan-user-input.sh, pre_mcp_execution.sh, ...) source this file
+# with their vendor and event:
+#
+#   source "$HOOKS_DIR/airs-dispatch.sh" claude user-input
+#
+# Everything the old scripts did with a dozen jq, date, cat and touch processes now takes
+# two jq runs of the event's row in airs-routes.jq and one curl:
+#
+#   1. plan     reads the hook input once, checks the configuration, extracts the content
+#               and builds the AIRS payload from the route's row in the table;
+#   2. curl     sends it (skipped when the plan already decided);
+#   3. verdict  parses the AIRS response and renders exit code, stdout, stderr and log.
+#
+# Stop rows also keep a watermark of the answer text AIRS already cleared in the session
+# (STOP_WATERMARK_PATH, one line: "v1 <session> <bytes> <sha256>"). A later answer that starts
+# with that text is scanned from just before where it ends; the same answer again is not
+# scanned at all. Set STOP_WATERMARK_PATH= (empty) to turn this off.
+#
+# Adding or changing an event means adding or editing a row in airs-routes.jq.
+# tests/run-parity.sh checks the decisions against those the per-event scripts made.
+# Compatible with bash 3.2 (macOS).
+
+AIRS_VENDOR="$1"
+AIRS_EVENT="$2"
+: "${HOOKS_DIR:=${BASH_SOURCE[0]%/*}}"
+AIRS_ROUTE="${AIRS_VENDOR}_${AIRS_EVENT//-/_}"
+
+case "$AIRS_VENDOR" in
+    claude|codex)
+        if [[ "$AIRS_VENDOR" == "claude" ]]; then
+            LOG_FILE="${SECURITY_LOG_PATH:-.claude/hooks/prisma-airs.log}"
+            APP_NAME="Claude Code${CLAUDE_CODE_APP_SUFFIX:+-$CLAUDE_CODE_APP_SUFFIX}"
+        else
+            LOG_FILE="${SECURITY_LOG_PATH:-.codex/hooks/prisma-airs.log}"
+            APP_NAME="Codex CLI${CODEX_APP_SUFFIX:+-$CODEX_APP_SUFFIX}"
+        fi
+        PRISMA_AIRS_API_URL="${PRISMA_AIRS_URL:-https://service.api.aisecurity.paloaltonetworks.com}/v1/scan/sync/request"
+        WATERMARK_FILE="${STOP_WATERMARK_PATH-.$AIRS_VENDOR/hooks/stop-watermark}"
+        CURL_OPTS=(--max-time 10 --retry 1)
+        ;;
+    cursor|windsurf)
+        # Load .env from the project root (<project>/.<vendor>/hooks/airs-dispatch.sh)
+        if [[ -f "$HOOKS_DIR/../../.env" ]]; then
+            set -a
+            source "$HOOKS_DIR/../../.env"
+            set +a
+        fi
+        LOG_FILE="$HOOKS_DIR/prisma-airs.log"
+        WATERMARK_FILE="${STOP_WATERMARK_PATH-$HOOKS_DIR/stop-watermark}"
+        if [[ "$AIRS_VENDOR" == "cursor" ]]; then
+            PRISMA_AIRS_API_URL="${PRISMA_AIRS_API_URL:-https://service.api.aisecurity.paloaltonetworks.com/v1/scan/sync/request}"
+            APP_NAME="cursor-hooks"
+            # Cursor kills hooks after 5s (hooks.json); answer well within that.
+            CURL_OPTS=(--max-time 3 --connect-timeout 1)
+        else
+            PRISMA_AIRS_API_URL="https://service.api.aisecurity.paloaltonetworks.com/v1/scan/sync/request"
+            APP_NAME="Windsurf Cascade"
+            CURL_OPTS=(--max-time 10 --retry 1)
+        fi
+        ;;
+    *)
+        echo "airs-dispatch.sh: unknown vendor '$AIRS_VENDOR'" >&2
+        exit 1
+        ;;
+esac
+
+[[ -d "${LOG_FILE%/*}" || "$LOG_FILE" != */* ]] || mkdir -p "${LOG_FILE%/*}"
+
+# airs_routes <phase> [fallback-id] — run this event's row of airs-routes.jq; stdin is the
+# hook input (plan) or the AIRS response (verdict).
+airs_routes() {
+    jq -Rsr -L "$HOOKS_DIR" "include \"airs-routes\"; $AIRS_ROUTE" \
+        --arg phase "$1" \
+        --arg route "$AIRS_VENDOR:$AIRS_EVENT" \
+        --arg key "${PRISMA_AIRS_API_KEY:+1}" \
+        --arg profile_id "${PRISMA_AIRS_PROFILE_ID:-}" \
+        --arg profile_name "${PRISMA_AIRS_PROFILE_NAME:-}" \
+        --arg app_name "$APP_NAME" \
+        --arg pwd "$PWD" \
+        --arg fallback "${2:-}" \
+        --arg ctx "${CTX:-null}" \
+        --arg curl_exit "${CURL_EXIT:-0}" \
+        --arg watermark "$WATERMARK" \
+        --arg mark "$MARK"
+}
+
+# airs_mark_sum <bytes> <text> — the watermark hash: sha256 of the profile and the first
+# <bytes> bytes of the text, so a profile change also starts the answer over.
+airs_mark_sum() {
+    { printf 'airs-stop-watermark/v1\n%s\n' "${PRISMA_AIRS_PROFILE_ID:-$PRISMA_AIRS_PROFILE_NAME}"
+      printf '%s' "$2" | head -c "$1"; } | { sha256sum || shasum -a 256; } 2>/dev/null | cut -c1-64
+}
+
+# Write the log lines, stderr and stdout the table rendered, and exit with its code.
+airs_finish() {
+    [[ -n "$LOG" ]] && printf '%s\n' "$LOG" >> "$LOG_FILE"
+    [[ -n "$ERR" ]] && printf '%s' "$ERR" >&2
+    [[ -n "$OUT" ]] && printf '%s' "$OUT"
+    exit "${EXIT:-0}"
+}
+
+STEP="" EXIT=0 OUT="" ERR="" LOG="" PAYLOAD="" CTX="" NEED_SID="" INPUT_JSON="" FALLBACK_ID=""
+WATERMARK="" MARK="" MARK_TAG="" MARK_TEXT="" MARK_BYTES="" MARK_SUM="" MARK_OK=""
+[[ -n "$WATERMARK_FILE" && -f "$WATERMARK_FILE" ]] && read -r WATERMARK < "$WATERMARK_FILE"
+eval "$(airs_routes plan)"
+
+if [[ "$STEP" == "need" ]]; then
+    # No session id in the input: fall back to a hash of the project (or transcript)
+    # path, or a timestamp, and plan again from the input the first run handed back.
+    if [[ "$NEED_SID" == "stamp" ]]; then
+        FALLBACK_ID="$(date +%s)-$$"
+    else
+        FALLBACK_ID=$(printf '%s\n' "${NEED_SID#md5:}" | { md5 || md5sum; } 2>/dev/null | cut -c1-32)
+    fi
+    FALLBACK_ID="${FALLBACK_ID:-unknown}"
+    eval "$(airs_routes plan "$FALLBACK_ID" <<< "$INPUT_JSON")"
+fi
+
+if [[ "$STEP" == "mark" ]]; then
+    # This session has a cleared answer on file: plan again with its length if this answer
+    # starts with it (only the rest gets scanned), or with 0 if it does not.
+    MARK=0
+    [[ "$MARK_BYTES" =~ ^[0-9]+$ && "$(airs_mark_sum "$MARK_BYTES" "$MARK_TEXT")" == "$MARK_SUM" ]] && MARK="$MARK_BYTES"
+    eval "$(airs_routes plan "$FALLBACK_ID" <<< "$INPUT_JSON")"
+fi
+
+if [[ "$STEP" != "scan" ]]; then
+    [[ -n "$STEP" ]] || LOG="[$(date)] ERROR: airs-dispatch.sh: could not route $AIRS_VENDOR:$AIRS_EVENT"
+    airs_finish
+fi
+
+[[ -n "$LOG" ]] && printf '%s\n' "$LOG" >> "$LOG_FILE"
+
+SCAN_RESULT=$(curl -s -L "${CURL_OPTS[@]}" "$PRISMA_AIRS_API_URL" \
+    -H "Content-Type: application/json" \
+    -H "Accept: application/json" \
+    -H "x-pan-token: $PRISMA_AIRS_API_KEY" \
+    -d @- <<< "$PAYLOAD")
+CURL_EXIT=$?
+
+STEP="" EXIT=0 OUT="" ERR="" LOG=""
+eval "$(airs_routes verdict <<< "$SCAN_RESULT")"
+
+# AIRS allowed the answer: record how far it is now cleared.
+if [[ "$MARK_OK" == 1 && -n "$MARK_TAG" && -n "$WATERMARK_FILE" ]]; then
+    printf 'v1 %s %s %s\n' "$MARK_TAG" "$MARK_BYTES" "$(airs_mark_sum "$MARK_BYTES" "$MARK_TEXT")" \
+        > "$WATERMARK_FILE.$$" 2>/dev/null && mv -f "$WATERMARK_FILE.$$" "$WATERMARK_FILE" 2>/dev/null
+fi
+airs_finish
@@ -25,6 +25,109 @@ has_profile() {
     [[ -n "$PRISMA_AIRS_PROFILE_ID" || -n "$PRISMA_AIRS_PROFILE_NAME" ]]
 }
 
+# Optional local URL verdict cache (off by default; see README "URL verdict cache")
+case "$(printf '%s' "${PRISMA_AIRS_URL_CACHE:-}" | tr '[:upper:]' '[:lower:]')" in
+    1|true|yes) URL_CACHE_ON=1 ;; *) URL_CACHE_ON=0 ;;
+esac
+URL_CACHE_DIR="${PRISMA_AIRS_URL_CACHE_DIR:-$(dirname "$LOG_FILE")/url-cache}"
+URL_CACHE_ALLOW_TTL="${PRISMA_AIRS_URL_CACHE_ALLOW_TTL_S:-3600}"
+URL_CACHE_BLOCK_TTL="${PRISMA_AIRS_URL_CACHE_BLOCK_TTL_S:-86400}"
+URL_CACHE_MAX="${PRISMA_AIRS_URL_CACHE_MAX:-1000}"
+URL_CACHE_HOST_ALLOW="${PRISMA_AIRS_URL_CACHE_HOST_ALLOW:-0}"
+case "$URL_CACHE_ALLOW_TTL" in ''|*[!0-9]*) URL_CACHE_ALLOW_TTL=3600 ;; esac
+case "$URL_CACHE_BLOCK_TTL" in ''|*[!0-9]*) URL_CACHE_BLOCK_TTL=86400 ;; esac
+case "$URL_CACHE_MAX" in ''|*[!0-9]*|0) URL_CACHE_MAX=1000 ;; esac
+case "$URL_CACHE_HOST_ALLOW" in ''|*[!0-9]*) URL_CACHE_HOST_ALLOW=0 ;; esac
+
+# Normalise a URL into "<cache key>\t<host>": scheme and host case-folded, userinfo,
+# default ports, fragments and tracking query parameters dropped, empty path -> "/".
+# Input that is not a URL is keyed as-is with no host.
+URL_NORM_JQ='
+def untracked: split("&") | map(select(length > 0 and
+    ((split("=")[0] | ascii_downcase)
+     | test("^(utm_[a-z0-9_]+|gclid|dclid|fbclid|msclkid|yclid|igshid|mc_cid|mc_eid|_ga|_gl|ref_src)$") | not)))
+  | join("&");
+(capture("^(?<s>[A-Za-z][A-Za-z0-9+.-]*)://(?<a>[^/?#]*)(?<p>[^?#]*)(?:[?](?<q>[^#]*))?") // null) as $u
+| if $u == null then [., ""]
+  else ($u.s | ascii_downcase) as $s
+  | ($u.a | sub("^.*@"; "") | ascii_downcase) as $a
+  | (if ($s == "http" and ($a | endswith(":80"))) or ($s == "https" and ($a | endswith(":443")))
+     then ($a | sub(":[0-9]+$"; "")) else $a end) as $h
+  | (($u.q // "") | untracked) as $q
+  | ["\($s)://\($h)\(if $u.p == "" then "/" else $u.p end)\(if $q == "" then "" else "?" + $q end)", $h]
+  end
+| @tsv'
+
+# Trim one extracted URL per line: trailing sentence punctuation (.,:;!?*) and closing ) or ]
+# without a matching opener ("(see https://x/a)." and "[doc](https://x/a)" keep https://x/a,
+# while https://en.wikipedia.org/wiki/Bash_(Unix_shell) stays whole); prints each URL once.
+URL_TRIM_AWK='
+function count(s, ch,   n, i) { n = 0; for (i = 1; i <= length(s); i++) if (substr(s, i, 1) == ch) n++; return n }
+{
+    u = $0
+    for (;;) {
+        c = substr(u, length(u), 1)
+        if (c != "" && index(".,:;!?*", c)) u = substr(u, 1, length(u) - 1)
+        else if (c == ")" && count(u, "(") < count(u, ")")) u = substr(u, 1, length(u) - 1)
+        else if (c == "]" && count(u, "[") < count(u, "]")) u = substr(u, 1, length(u) - 1)
+        else break
+    }
+    if (u != "" && !seen[u]++) print u
+}'
+
+# URL verdict cache — one file per key, "v1 <allow|block|host> <expires-epoch-s> <origin|clean-count>",
+# where origin is the scan_id of the verdict, "<scan_id>@<i>/<n>" for item i of a batch of n.
+# Only AIRS allow/block verdicts are stored (never warnings or failed scans). Host-level allow
+# entries are built solely from clean verdicts and are dropped as soon as any URL on the host blocks.
+# Writes go to a dot-temp file and are renamed into place, so concurrent hooks never see a torn entry.
+sha256_hex() { { command -v sha256sum >/dev/null 2>&1 && sha256sum || shasum -a 256; } 2>/dev/null | cut -c1-64; }
+url_cache_key() {
+    printf 'airs-url-cache/v1\n%s\n%s\n%s' "${PRISMA_AIRS_PROFILE_ID:-name=$PRISMA_AIRS_PROFILE_NAME}" "$1" "$2" | sha256_hex
+}
+# url_cache_get <key> -> sets CACHED_ACTION / CACHED_VALUE; fails when absent or expired
+url_cache_get() {
+    local f="$URL_CACHE_DIR/$1" ver act exp val
+    [[ -f "$f" ]] || return 1
+    read -r ver act exp val < "$f" 2>/dev/null
+    [[ "$exp" =~ ^[0-9]+$ ]] || exp=0
+    if [[ "$ver" == "v1" && "$exp" -gt "$(date +%s)" ]]; then
+        CACHED_ACTION="$act"; CACHED_VALUE="${val:-unknown}"; return 0
+    fi
+    rm -f "$f" 2>/dev/null
+    return 1
+}
+# url_cache_put <key> <action> <ttl-s> <value>
+url_cache_put() {
+    local tmp="$URL_CACHE_DIR/.$1.$$" n
+    mkdir -p "$URL_CACHE_DIR" 2>/dev/null || return 0
+    if printf 'v1 %s %s %s\n' "$2" "$(( $(date +%s) + $3 ))" "${4// /_}" > "$tmp" 2>/dev/null; then
+        mv -f "$tmp" "$URL_CACHE_DIR/$1" 2>/dev/null || rm -f "$tmp" 2>/dev/null
+    fi
+    # size cap: past URL_CACHE_MAX entries, evict the oldest down to 90% (dot-temp files are not counted)
+    n=$(ls -1 "$URL_CACHE_DIR" 2>/dev/null | wc -l | tr -d ' ')
+    if [[ "${n:-0}" -gt "$URL_CACHE_MAX" ]]; then
+        ( cd "$URL_CACHE_DIR" 2>/dev/null && ls -1t | tail -n +$(( URL_CACHE_MAX * 9 / 10 + 1 )) | xargs rm -f 2>/dev/null )
+    fi
+    return 0
+}
+# url_cache_record <action> <scan_id> <url-key> <host-key> — store a verdict and maintain the host entry
+url_cache_record() {
+    [[ -n "$3" ]] || return 0
+    if [[ "$1" == "block" ]]; then
+        url_cache_put "$3" block "$URL_CACHE_BLOCK_TTL" "$2"
+        [[ -n "$4" ]] && rm -f "${URL_CACHE_DIR:?}/$4" 2>/dev/null
+    elif [[ "$1" == "allow" ]]; then
+        url_cache_put "$3" allow "$URL_CACHE_ALLOW_TTL" "$2"
+        if [[ -n "$4" && "$URL_CACHE_HOST_ALLOW" -gt 0 ]]; then
+            local clean=0
+            url_cache_get "$4" && [[ "$CACHED_ACTION" == "host" ]] && clean="$CACHED_VALUE"
+            [[ "$clean" =~ ^[0-9]+$ ]] || clean=0
+            url_cache_put "$4" host "$URL_CACHE_ALLOW_TTL" "$(( clean + 1 ))"
+        fi
+    fi
+    return 0
+}
+
 # Create log file if it doesn't exist
 mkdir -p "$(dirname "$LOG_FILE")"
 touch "$LOG_FILE"
@@ -64,29 +167,46 @@ INPUT_JSON=$(cat)
 #   Bash           -> .tool_input.command (a shell command; URLs are embedded as
 #                                          arguments to curl/wget/etc.)
 #   mcp__<server>  -> arbitrary, handled by scan-mcp-request.sh
+#
+# Every URL in the input is scanned, not just the first: all pending items go to
+# AIRS in one request, and only a block is followed up per URL to attribute it.
 TOOL_NAME=$(echo "$INPUT_JSON" | jq -r '.tool_name // "unknown"')
 
+URL_RE='https?://[^[:space:]"'"'"';|`<>]+'
+QUERY=""
 case "$TOOL_NAME" in
     Bash)
-        # Bash commands can contain a URL as an argument to curl, wget, http, etc.
-        # Extract the first URL found in the command line. If none, exit allow
-        # (other Bash-specific checks belong in a separate hook).
-        COMMAND=$(echo "$INPUT_JSON" | jq -r '.tool_input.command // empty')
-        URL=$(printf '%s' "$COMMAND" | grep -oE 'https?://[^[:space:]"'"'"';|`<>]+' | head -1)
+        # Bash commands can contain URLs as arguments to curl, wget, http, etc. —
+        # several of them in chained commands and install scripts. If none, exit
+        # allow (other Bash-specific checks belong in a separate hook).
+        RAW_URLS=$(echo "$INPUT_JSON" | jq -r '.tool_input.command // empty' | grep -oE "$URL_RE")
         ;;
     WebSearch)
         # WebSearch passes a query string, not a URL. Scan the whole query for
-        # prompt-injection / malicious-URL signals using AIRS's prompt detectors.
-        URL=$(echo "$INPUT_JSON" | jq -r '.tool_input.query // empty')
+        # prompt-injection / malicious-URL signals using AIRS's prompt detectors;
+        # URLs inside the query are also tracked individually.
+        QUERY=$(echo "$INPUT_JSON" | jq -r '.tool_input.query // empty')
+        RAW_URLS=$(printf '%s' "$QUERY" | grep -oE "$URL_RE")
         ;;
     *)
-        # WebFetch and any other URL-carrying tool: read `.tool_input.url`.
-        URL=$(echo "$INPUT_JSON" | jq -r '.tool_input.url // .tool_input.URL // empty')
+        # WebFetch and any other URL-carrying tool: `.tool_input.url`, plus any URL
+        # embedded in its other string arguments (e.g. the WebFetch prompt).
+        RAW_URLS=$(echo "$INPUT_JSON" | jq -r '.tool_input.url // .tool_input.URL // empty'
+                   echo "$INPUT_JSON" | jq -r '.tool_input | [.. | strings] | .[]' 2>/dev/null | grep -oE "$URL_RE")
         ;;
 esac
 
+# De-duplicate on the normalised form ("<raw>\t<normalised>\t<host>" per line), after
+# trimming what the extraction regex picks up from prose and markdown around a URL.
+RAW_URLS=$(printf '%s\n' "$RAW_URLS" | awk "$URL_TRIM_AWK")
+URL_ITEMS=""
+if [[ -n "$RAW_URLS" ]]; then
+    URL_ITEMS=$(paste <(printf '%s\n' "$RAW_URLS") <(printf '%s\n' "$RAW_URLS" | jq -Rr "$URL_NORM_JQ" 2>/dev/null) \
+        | awk -F'\t' '!seen[$2]++')
+fi
+
 # If no URL or scannable content found, exit (nothing to scan)
-if [[ -z "$URL" ]]; then
+if [[ -z "$QUERY" && -z "$URL_ITEMS" ]]; then
     exit 0  # Allow if nothing to scan
 fi
 
@@ -97,70 +217,152 @@ if [[ -z "$SESSION_ID" ]]; then
 fi
 TRANSACTION_ID="$SESSION_ID"
 
-echo "[$(date)] 🌐 $TOOL_NAME: $URL" >> "$LOG_FILE"
+# Resolve what the URL verdict cache already knows: an exact (normalised) verdict first,
+# then a host-level allow once PRISMA_AIRS_URL_CACHE_HOST_ALLOW clean verdicts have built
+# it up. A cached block ends the hook; everything not answered here is scanned.
+PENDING=()
+PENDING_KEY=()
+PENDING_HOST_KEY=()
+# consider <item> <cache-kind> <normalised> <host>
+consider() {
+    local url_key="" host_key=""
+    if [[ "$URL_CACHE_ON" == "1" ]]; then
+        url_key=$(url_cache_key "$2" "${3:-$1}")
+        [[ -n "$4" ]] && host_key=$(url_cache_key host "$4")
+        [[ ${#url_key} -eq 64 ]] || { url_key=""; host_key=""; }
+        if [[ -n "$url_key" ]] && url_cache_get "$url_key"; then
+            if [[ "$CACHED_ACTION" == "block" ]]; then
+                echo "[$(date)] 🚫 BLOCKED: $1 (cached) [scan:$CACHED_VALUE]" >> "$LOG_FILE"
+                echo "🚫 BLOCKED: URL previously flagged as malicious: $1" >&2
+                exit 2
+            elif [[ "$CACHED_ACTION" == "allow" ]]; then
+                echo "[$(date)] ✅ ALLOWED: $1 (cached) [scan:$CACHED_VALUE]" >> "$LOG_FILE"
+                return 0
+            fi
+        fi
+        if [[ -n "$host_key" && "$URL_CACHE_HOST_ALLOW" -gt 0 ]] && url_cache_get "$host_key" \
+            && [[ "$CACHED_ACTION" == "host" && "$CACHED_VALUE" =~ ^[0-9]+$ && "$CACHED_VALUE" -ge "$URL_CACHE_HOST_ALLOW" ]]; then
+            echo "[$(date)] ✅ ALLOWED: $1 (cached host $4, $CACHED_VALUE clean)" >> "$LOG_FILE"
+            return 0
+        fi
+    fi
+    PENDING+=("$1")
+    PENDING_KEY+=("$url_key")
+    PENDING_HOST_KEY+=("$host_key")
+}
+
+[[ -n "$QUERY" ]] && consider "$QUERY" query "$QUERY" ""
+while IFS=$'\t' read -r RAW NORM HOST; do
+    [[ -n "$RAW" ]] && consider "$RAW" url "$NORM" "$HOST"
+done <<< "$URL_ITEMS"
+
+if [[ ${#PENDING[@]} -eq 0 ]]; then
+    exit 0  # Everything answered from the cache
+fi
+
+if [[ ${#PENDING[@]} -eq 1 ]]; then
+    SUBJECT="${PENDING[0]}"
+    echo "[$(date)] 🌐 $TOOL_NAME: $SUBJECT" >> "$LOG_FILE"
+else
+    SUBJECT="${#PENDING[@]} URLs"
+    [[ -n "$QUERY" ]] && SUBJECT="${#PENDING[@]} items"
+    echo "[$(date)] 🌐 $TOOL_NAME: $SUBJECT: ${PENDING[*]}" >> "$LOG_FILE"
+fi
 
 AI_PROFILE=$(build_ai_profile)
 
-# Create JSON payload for URL scanning
-PAYLOAD=$(jq -n \
-  --arg session_id "$SESSION_ID" \
-  --arg transaction_id "$TRANSACTION_ID" \
-  --argjson ai_profile "$AI_PROFILE" \
-  --arg app_user "claude-code-user" \
-  --arg app_name "$APP_NAME" \
-  --arg tool_name "$TOOL_NAME" \
-  --arg source "pre-tool-use" \
-  --arg url "$URL" \
-  '{
-    session_id: $session_id,
-    transaction_id: $transaction_id,
-    ai_profile: $ai_profile,
-    metadata: {app_user: $app_user, app_name: $app_name, tool_name: $tool_name, source: $source},
-    contents: [{prompt: $url}]
-  }')
-
-# Call Prisma AIRS API
-SCAN_RESULT=$(curl -s -L "$PRISMA_AIRS_API_URL" \
-  -H "Content-Type: application/json" \
-  -H "x-pan-token: $PRISMA_AIRS_API_KEY" \
-  -d "$PAYLOAD")
+# airs_scan <text> — scan text as a prompt; prints the AIRS response JSON
+airs_scan() {
+    local payload
+    payload=$(jq -n \
+      --arg session_id "$SESSION_ID" \
+      --arg transaction_id "$TRANSACTION_ID" \
+      --argjson ai_profile "$AI_PROFILE" \
+      --arg app_user "claude-code-user" \
+      --arg app_name "$APP_NAME" \
+      --arg tool_name "$TOOL_NAME" \
+      --arg source "pre-tool-use" \
+      --arg url "$1" \
+      '{
+        session_id: $session_id,
+        transaction_id: $transaction_id,
+        ai_profile: $ai_profile,
+        metadata: {app_user: $app_user, app_name: $app_name, tool_name: $tool_name, source: $source},
+        contents: [{prompt: $url}]
+      }')
+    curl -s -L "$PRISMA_AIRS_API_URL" \
+      -H "Content-Type: application/json" \
+      -H "x-pan-token: $PRISMA_AIRS_API_KEY" \
+      -d "$payload"
+}
+
+# detections_of <scan-result> — comma-joined prompt detectors that fired
+detections_of() {
+    echo "$1" | jq -r '.prompt_detected | to_entries | map(select(.value == true)) | map(.key) | join(",")' 2>/dev/null
+}
+
+# Call Prisma AIRS API once for all pending items, one per line
+SCAN_RESULT=$(airs_scan "$(printf '%s\n' "${PENDING[@]}")")
 
 ACTION=$(echo "$SCAN_RESULT" | jq -r '.action // "unknown"')
 CATEGORY=$(echo "$SCAN_RESULT" | jq -r '.category // "unknown"')
 SCAN_ID=$(echo "$SCAN_RESULT" | jq -r '.scan_id // "unknown"')
-
-# Extract ALL detection details dynamically
-URL_DETECTIONS=""
-DETECTED_CATEGORIES=$(echo "$SCAN_RESULT" | jq -r '.prompt_detected | to_entries | map(select(.value == true)) | map(.key) | .[]' 2>/dev/null)
-
-while IFS= read -r category; do
-    [[ -z "$category" ]] && continue
-    URL_DETECTIONS="${URL_DETECTIONS}$category,"
-done <<< "$DETECTED_CATEGORIES"
-
-URL_DETECTIONS=$(echo "$URL_DETECTIONS" | sed 's/,$//')
+URL_DETECTIONS=$(detections_of "$SCAN_RESULT")
+DETAIL=""
+[[ -n "$URL_DETECTIONS" ]] && DETAIL=" - detected: [$URL_DETECTIONS]"
 
 # Handle the scan result
 if [[ "$ACTION" == "block" ]]; then
-    if [[ -n "$URL_DETECTIONS" ]]; then
-        echo "[$(date)] 🚫 BLOCKED: $URL ($CATEGORY) - detected: [$URL_DETECTIONS] [scan:$SCAN_ID]" >> "$LOG_FILE"
+    BLOCKED=()
+    if [[ ${#PENDING[@]} -eq 1 ]]; then
+        url_cache_record block "$SCAN_ID" "${PENDING_KEY[0]}" "${PENDING_HOST_KEY[0]}"
+        BLOCKED=("${PENDING[0]}")
     else
-        echo "[$(date)] 🚫 BLOCKED: $URL ($CATEGORY) [scan:$SCAN_ID]" >> "$LOG_FILE"
+        # Attribute the block: rescan each item on its own, 8 at a time, and log and cache
+        # the per-URL verdicts. If none blocks alone, the combination still blocks.
+        SCAN_DIR=$(mktemp -d 2>/dev/null || mktemp -d -t airs-url)
+        for i in "${!PENDING[@]}"; do
+            airs_scan "${PENDING[$i]}" > "$SCAN_DIR/$i" &
+            (( (i + 1) % 8 == 0 )) && wait
+        done
+        wait
+        for i in "${!PENDING[@]}"; do
+            ITEM_RESULT=$(cat "$SCAN_DIR/$i" 2>/dev/null)
+            ITEM_ACTION=$(echo "$ITEM_RESULT" | jq -r '.action // "unknown"' 2>/dev/null)
+            ITEM_SCAN_ID=$(echo "$ITEM_RESULT" | jq -r '.scan_id // "unknown"' 2>/dev/null)
+            ITEM_DETECTIONS=$(detections_of "$ITEM_RESULT")
+            url_cache_record "$ITEM_ACTION" "$ITEM_SCAN_ID" "${PENDING_KEY[$i]}" "${PENDING_HOST_KEY[$i]}"
+            if [[ "$ITEM_ACTION" == "block" ]]; then
+                BLOCKED+=("${PENDING[$i]}")
+                echo "[$(date)]   🚫 ${PENDING[$i]}${ITEM_DETECTIONS:+ - detected: [$ITEM_DETECTIONS]} [scan:$ITEM_SCAN_ID]" >> "$LOG_FILE"
+            else
+                echo "[$(date)]   $ITEM_ACTION: ${PENDING[$i]} [scan:$ITEM_SCAN_ID]" >> "$LOG_FILE"
+            fi
+        done
+        rm -rf "${SCAN_DIR:?}"
     fi
-    echo "🚫 BLOCKED: URL contains malicious content ($CATEGORY)" >&2
-    exit 2  # Block the tool execution
-elif [[ "$ACTION" != "allow" && "$ACTION" != "unknown" ]]; then
-    if [[ -n "$URL_DETECTIONS" ]]; then
-        echo "[$(date)] ⚠️  WARNING: $URL - $ACTION/$CATEGORY - detected: [$URL_DETECTIONS] [scan:$SCAN_ID]" >> "$LOG_FILE"
+    echo "[$(date)] 🚫 BLOCKED: $SUBJECT ($CATEGORY)$DETAIL [scan:$SCAN_ID]" >> "$LOG_FILE"
+    if [[ ${#BLOCKED[@]} -gt 0 ]]; then
+        echo "🚫 BLOCKED: URL contains malicious content ($CATEGORY): ${BLOCKED[*]}" >&2
     else
-        echo "[$(date)] ⚠️  WARNING: $URL - $ACTION/$CATEGORY [scan:$SCAN_ID]" >> "$LOG_FILE"
+        echo "🚫 BLOCKED: URLs are malicious in combination ($CATEGORY)" >&2
     fi
+    exit 2  # Block the tool execution
+elif [[ "$ACTION" != "allow" && "$ACTION" != "unknown" ]]; then
+    echo "[$(date)] ⚠️  WARNING: $SUBJECT - $ACTION/$CATEGORY$DETAIL [scan:$SCAN_ID]" >> "$LOG_FILE"
 else
-    if [[ -n "$URL_DETECTIONS" ]]; then
-        echo "[$(date)] ✅ ALLOWED: $URL - detected: [$URL_DETECTIONS] [scan:$SCAN_ID]" >> "$LOG_FILE"
-    else
-        echo "[$(date)] ✅ ALLOWED: $URL [scan:$SCAN_ID]" >> "$LOG_FILE"
+    if [[ "$ACTION" == "allow" ]]; then
+        # One verdict covers the batch: log and cache each item with its place in it.
+        for i in "${!PENDING[@]}"; do
+            ORIGIN="$SCAN_ID"
+            if [[ ${#PENDING[@]} -gt 1 ]]; then
+                ORIGIN="$SCAN_ID@$(( i + 1 ))/${#PENDING[@]}"
+                echo "[$(date)]   allow: ${PENDING[$i]} [scan:$ORIGIN]" >> "$LOG_FILE"
+            fi
+            url_cache_record allow "$ORIGIN" "${PENDING_KEY[$i]}" "${PENDING_HOST_KEY[$i]}"
+        done
     fi
+    echo "[$(date)] ✅ ALLOWED: $SUBJECT$DETAIL [scan:$SCAN_ID]" >> "$LOG_FILE"
 fi
 
 exit 0
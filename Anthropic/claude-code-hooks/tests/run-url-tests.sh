@@ -0,0 +1,117 @@
+#!/usr/bin/env bash
+# URL handling checks for hooks/scan-url.sh.
+#
+# url-norm-cases.tsv pins the URL verdict cache key: each row is a URL, the key it must
+# normalise to, and its host. The normaliser is read out of scan-url.sh itself (URL_NORM_JQ),
+# so a change to it that merges two different URLs into one key, or splits one URL into
+# two, fails here before it can answer a fetch from the wrong cache entry.
+#
+# url-trim-cases.tsv pins extraction: each row is tool-input text and the URLs scan-url.sh
+# must take from it once the punctuation around them (".", ",", unbalanced ")" and "]") is
+# trimmed. The batch checks then run the hook against a fake `curl` that blocks any request
+# mentioning evil.example: several URLs go to AIRS in one request, a block is attributed to
+# the URL that caused it, and an allowed batch caches each URL with its place in the batch.
+#
+#   ./run-url-tests.sh         run every check (exit 1 on any failure)
+set -u
+HERE="$(cd "$(dirname "$0")" && pwd)"
+HOOK="$HERE/../hooks/scan-url.sh"
+
+command -v jq >/dev/null || { echo "jq is required"; exit 2; }
+
+eval "$(sed -n "/^URL_NORM_JQ='/,/^| @tsv'\$/p; /^URL_TRIM_AWK='/,/^}'\$/p; /^URL_RE=/p" "$HOOK")"
+[ -n "${URL_NORM_JQ:-}" ] && [ -n "${URL_TRIM_AWK:-}" ] && [ -n "${URL_RE:-}" ] \
+  || { echo "URL_NORM_JQ, URL_TRIM_AWK or URL_RE not found in $HOOK"; exit 2; }
+
+FAILED=0
+n=0
+while IFS=$'\t' read -r url key host; do
+  case "$url" in ''|\#*) continue ;; esac
+  n=$((n + 1))
+  got=$(printf '%s\n' "$url" | jq -Rr "$URL_NORM_JQ")
+  if [ "$got" = "$key"$'\t'"$host" ]; then
+    printf '  ok   norm %s\n' "$url"
+  else
+    printf '  FAIL norm %s\n         want: %s\n         got:  %s\n' "$url" "$key	$host" "$got"; FAILED=1
+  fi
+done < "$HERE/url-norm-cases.tsv"
+
+while IFS=$'\t' read -r text urls; do
+  case "$text" in ''|\#*) continue ;; esac
+  n=$((n + 1))
+  got=$(printf '%s\n' "$text" | grep -oE "$URL_RE" | awk "$URL_TRIM_AWK" | paste -sd' ' -)
+  if [ "$got" = "$urls" ]; then
+    printf '  ok   trim %s\n' "$text"
+  else
+    printf '  FAIL trim %s\n         want: %s\n         got:  %s\n' "$text" "$urls" "$got"; FAILED=1
+  fi
+done < "$HERE/url-trim-cases.tsv"
+
+WORK="$(mktemp -d 2>/dev/null || mktemp -d -t airs-url-tests)"
+trap 'rm -rf "${WORK:?}"' EXIT
+mkdir -p "$WORK/bin"
+cat > "$WORK/bin/curl" <<'FAKE'
+#!/usr/bin/env bash
+# Fake curl: keep the request body; block it if it mentions evil.example, else allow. The
+# per-URL rescans run in parallel, so the scan_id names what was scanned rather than when:
+# "scan-batch" for several lines, else the URL with its punctuation turned into "-".
+body=""
+while [ $# -gt 0 ]; do
+  case "$1" in -d|--data|--data-raw|--data-binary) body="$2"; shift ;; esac
+  shift
+done
+printf '%s' "$body" > "$(mktemp "$URL_TEST_CAPTURE/req.XXXXXX")"
+id=$(printf '%s' "$body" | jq -r '.contents[0].prompt | rtrimstr("\n") | split("\n")
+  | if length > 1 then "batch" else .[0] | sub("^https?://"; "") | gsub("[^A-Za-z0-9]+"; "-") end')
+case "$body" in
+  *evil.example*) printf '{"action":"block","category":"malicious","scan_id":"scan-%s","prompt_detected":{"url_cats":true}}' "$id" ;;
+  *) printf '{"action":"allow","category":"benign","scan_id":"scan-%s","prompt_detected":{"url_cats":false}}' "$id" ;;
+esac
+FAKE
+chmod +x "$WORK/bin/curl"
+
+# hook <command> [cache] — run scan-url.sh on a Bash tool call; sets RC, ERR, and REQS: the
+# prompt of every AIRS request as a JSON string, one per line, sorted
+hook() {
+  rm -rf "${WORK:?}/cap"; mkdir -p "$WORK/cap"
+  jq -n --arg c "$1" '{session_id: "sess-url", hook_event_name: "PreToolUse", tool_name: "Bash", tool_input: {command: $c}}' \
+    | PATH="$WORK/bin:$PATH" URL_TEST_CAPTURE="$WORK/cap" SECURITY_LOG_PATH="$WORK/hook.log" \
+      PRISMA_AIRS_API_KEY=url-key PRISMA_AIRS_PROFILE_NAME=url-profile PRISMA_AIRS_PROFILE_ID= \
+      PRISMA_AIRS_URL_CACHE="${2:-0}" PRISMA_AIRS_URL_CACHE_DIR="$WORK/cache" \
+      bash "$HOOK" >/dev/null 2>"$WORK/err"
+  RC=$?
+  ERR=$(cat "$WORK/err")
+  REQS=$(for f in "$WORK"/cap/req.*; do [ -f "$f" ] && jq -c '.contents[0].prompt' "$f"; done | sort)
+}
+check() { # name condition...
+  local name="$1"; shift
+  n=$((n + 1))
+  if "$@"; then printf '  ok   batch %s\n' "$name"; else printf '  FAIL batch %s\n' "$name"; FAILED=1; fi
+}
+
+: > "$WORK/hook.log"
+hook "curl -sL https://a.example/x && wget https://evil.example/p; curl https://b.example/y."
+check "block: exit 2" [ "$RC" = 2 ]
+check "block: one batch request, then one per URL" \
+  [ "$REQS" = '"https://a.example/x"'$'\n''"https://a.example/x\nhttps://evil.example/p\nhttps://b.example/y"'$'\n''"https://b.example/y"'$'\n''"https://evil.example/p"' ]
+check "block: message names only the URL that blocked" \
+  [ "$ERR" = "🚫 BLOCKED: URL contains malicious content (malicious): https://evil.example/p" ]
+check "block: log has a verdict per URL" \
+  grep -q "allow: https://a.example/x \[scan:scan-a-example-x\]" "$WORK/hook.log"
+check "block: log attributes the block" \
+  grep -q "🚫 https://evil.example/p - detected: \[url_cats\] \[scan:scan-evil-example-p\]" "$WORK/hook.log"
+
+: > "$WORK/hook.log"
+hook "curl https://a.example/x https://b.example/y" 1
+check "allow: exit 0, one request" [ "$RC:$(printf '%s' "$REQS" | grep -c .)" = "0:1" ]
+check "allow: each URL logged with its place in the batch" \
+  grep -q "allow: https://b.example/y \[scan:scan-batch@2/2\]" "$WORK/hook.log"
+check "allow: each URL cached with its place in the batch" \
+  [ "$(cat "$WORK"/cache/* | awk '{ print $2, $4 }' | sort | paste -sd, -)" = "allow scan-batch@1/2,allow scan-batch@2/2" ]
+: > "$WORK/hook.log"
+hook "curl https://b.example/y" 1
+check "allow: cache hit keeps the origin" \
+  [ "$RC:$REQS" = "0:" ] && grep -q "ALLOWED: https://b.example/y (cached) \[scan:scan-batch@2/2\]" "$WORK/hook.log"
+
+[ "$FAILED" = 0 ] && echo "PASS ($n cases)" || echo "FAILED"
+exit "$FAILED"
@@ -7,7 +7,9 @@ Palo Alto Networks Prisma AI Runtime Security (AIRS) API.
 
 Environment Variables:
     PRISMA_AIRS_API_KEY: Required - API key from Strata Cloud Manager
-    PRISMA_AIRS_PROFILE_NAME: Required - Security profile name
+    PRISMA_AIRS_PROFILE_NAME: Required - Security profile name (or a comma-separated list)
+    PRISMA_AIRS_PROFILE_NAME_<TYPE>: Optional - Profiles for one scan type (PROMPT, RESPONSE,
+        CODE or CONVERSATION), comma-separated; overrides PRISMA_AIRS_PROFILE_NAME
     PRISMA_AIRS_URL: Optional - API base URL (defaults to US region)
 
 Usage:
@@ -24,23 +26,49 @@ Usage:
 
     # Conversation (prompt + response):
     python scan.py --type conversation --prompt "user" --response "ai"
+
+    # Watch a directory, rescanning files as they change (JSONL events on stdout):
+    python scan.py --watch path/to/workspace
+
+    # Several profiles at once (scanned concurrently, most severe action wins):
+    python scan.py --type code --file app.py --profile code-security --profile dlp
 """
 
 import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import http.client
 import json
 import os
+import queue
+import re
+import select
+import struct
 import sys
+import threading
+import time
+import urllib.parse
 import urllib.request
 import urllib.error
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 
 DEFAULT_ENDPOINT = "https://service.api.aisecurity.paloaltonetworks.com"
 SCAN_PATH = "/v1/scan/sync/request"
 
+# Synchronous scans take at most 2MB; larger files are reported as skipped in watch mode.
+MAX_SCAN_BYTES = 2 * 1024 * 1024
+
 
-def get_config() -> tuple[str, str, str]:
-    """Load configuration from environment variables."""
+def get_config(scan_type: str = "prompt", profiles: Optional[list] = None) -> tuple[str, list, str]:
+    """Load configuration from environment variables.
+
+    The profiles are ``profiles`` (repeated ``--profile`` flags) if given, else
+    PRISMA_AIRS_PROFILE_NAME_<TYPE>, else PRISMA_AIRS_PROFILE_NAME; each may list several
+    profiles separated by commas.
+    """
     api_key = os.environ.get("PRISMA_AIRS_API_KEY")
     if not api_key:
         print(json.dumps({
@@ -50,8 +78,11 @@ def get_config() -> tuple[str, str, str]:
         }))
         sys.exit(1)
 
-    profile = os.environ.get("PRISMA_AIRS_PROFILE_NAME")
-    if not profile:
+    configured = (os.environ.get(f"PRISMA_AIRS_PROFILE_NAME_{scan_type.upper()}")
+                  or os.environ.get("PRISMA_AIRS_PROFILE_NAME", ""))
+    names = [name for value in (profiles or [configured]) for name in value.split(",")]
+    profiles = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+    if not profiles:
         print(json.dumps({
             "status": "error",
             "error": "PRISMA_AIRS_PROFILE_NAME environment variable not set",
@@ -60,7 +91,7 @@ def get_config() -> tuple[str, str, str]:
         sys.exit(1)
 
     endpoint = os.environ.get("PRISMA_AIRS_URL", DEFAULT_ENDPOINT)
-    return api_key, profile, endpoint
+    return api_key, profiles, endpoint
 
 
 def read_file(file_path: str) -> str:
@@ -136,6 +167,56 @@ def build_scan_request(
     return request_payload
 
 
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections, shared by every thread that scans.
+
+    A connection is taken from the pool for one request and put back once its response
+    has been read, so concurrent scans each get their own connection and later scans reuse
+    them instead of paying for a new TLS handshake. A request on a reused connection that
+    the server has meanwhile closed is retried once on a fresh one.
+    """
+
+    def __init__(self, size: int = 8):
+        self.size = size
+        self.idle: dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def post(self, url: str, body: bytes, headers: dict, timeout: float) -> tuple[int, bytes]:
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        for attempt in (0, 1):
+            with self.lock:
+                conn = self.idle.get(key, []).pop() if self.idle.get(key) else None
+            reused = conn is not None
+            if conn is None:
+                cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+                conn = cls(parts.hostname, parts.port, timeout=timeout)
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                with self.lock:
+                    idle = self.idle.setdefault(key, [])
+                    if len(idle) < self.size:
+                        idle.append(conn)
+                        conn = None
+                if conn is not None:
+                    conn.close()
+            return resp.status, data
+
+
+POOL = ConnectionPool()
+
+
 def perform_scan(api_key: str, endpoint: str, payload: dict) -> dict:
     """Send scan request to AIRS API."""
     url = f"{endpoint.rstrip('/')}{SCAN_PATH}"
@@ -147,11 +228,23 @@ def perform_scan(api_key: str, endpoint: str, payload: dict) -> dict:
 
     data = json.dumps(payload).encode("utf-8")
 
+    # Through a configured HTTP(S) proxy, leave the connection handling to urllib.
+    host = urllib.parse.urlsplit(url).hostname or ""
+    proxied = urllib.parse.urlsplit(url).scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(host)
+
     try:
-        request = urllib.request.Request(url, data=data, headers=headers, method="POST")
-        with urllib.request.urlopen(request, timeout=30) as resp:
-            response_data = json.loads(resp.read().decode("utf-8"))
-            return response_data
+        if proxied:
+            request = urllib.request.Request(url, data=data, headers=headers, method="POST")
+            with urllib.request.urlopen(request, timeout=30) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        status, body = POOL.post(url, data, headers, timeout=30)
+        if status >= 400:
+            return {
+                "status": "error",
+                "error": f"API request failed: {status} - {body.decode('utf-8', 'replace')}",
+                "action": "block"
+            }
+        return json.loads(body.decode("utf-8"))
     except urllib.error.HTTPError as e:
         error_body = e.read().decode("utf-8") if e.fp else str(e)
         return {
@@ -165,6 +258,12 @@ def perform_scan(api_key: str, endpoint: str, payload: dict) -> dict:
             "error": f"Network error: {str(e.reason)}",
             "action": "block"
         }
+    except (http.client.HTTPException, OSError) as e:
+        return {
+            "status": "error",
+            "error": f"Network error: {str(e) or type(e).__name__}",
+            "action": "block"
+        }
     except Exception as e:
         return {
             "status": "error",
@@ -208,6 +307,377 @@ def parse_response(api_response: dict) -> dict:
     return result
 
 
+# Most severe first: an AIRS block, a failed scan (fails closed), a detection, a clean allow.
+STATUS_SEVERITY = {"blocked": 3, "error": 2, "threat_detected": 1, "safe": 0}
+
+
+def scan_profiles(api_key: str, endpoint: str, payload: dict, profiles: list, verbose: bool = False) -> dict:
+    """Scan ``payload`` against every profile at once and merge the verdicts.
+
+    With one profile this is ``parse_response(perform_scan(...))``. With several, the scans
+    run concurrently (same ``tr_id``) and the most severe result decides: blocked, then
+    error, then threat_detected, then safe. ``prompt_detected``/``response_detected`` are
+    the union over profiles, and ``profiles`` lists each profile's own verdict and scan_id.
+    """
+    def scan_one(profile: str) -> tuple[dict, dict]:
+        raw = perform_scan(api_key, endpoint, {**payload, "ai_profile": {"profile_name": profile}})
+        return parse_response(raw), raw
+
+    if len(profiles) == 1:
+        result, raw = scan_one(profiles[0])
+        if verbose:
+            result["raw_response"] = raw
+        return result
+
+    with ThreadPoolExecutor(max_workers=len(profiles)) as pool:
+        scans = list(pool.map(scan_one, profiles))
+    results = [result for result, _raw in scans]
+    worst = max(results, key=lambda r: STATUS_SEVERITY.get(r.get("status"), 2))
+    merged = {k: worst[k] for k in ("action", "category", "scan_id", "error") if k in worst}
+    merged["status"] = worst.get("status", "error")
+    for field in ("prompt_detected", "response_detected"):
+        merged[field] = list(dict.fromkeys(d for r in results for d in r.get(field, [])))
+    merged["profiles"] = [
+        {"profile": profile, **{k: r[k] for k in
+                                ("status", "action", "category", "scan_id", "prompt_detected", "response_detected", "error")
+                                if k in r}}
+        for profile, r in zip(profiles, results)
+    ]
+    if verbose:
+        merged["raw_response"] = {profile: raw for profile, (_result, raw) in zip(profiles, scans)}
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# Watch mode
+# ---------------------------------------------------------------------------
+
+class GitIgnore:
+    """The .gitignore rules under a watched directory, nested .gitignore files included.
+
+    Supports the usual syntax: comments, ``!`` negation, trailing ``/`` for directories,
+    anchored patterns (containing ``/``), ``*``, ``?``, ``[...]`` and ``**``. As in git, a
+    file under an ignored directory is ignored whatever later rules say.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.rules: dict[str, list] = {}
+        self._cache: dict[tuple[str, bool], bool] = {}
+
+    def load(self, rel_dir: str) -> None:
+        """(Re)read the .gitignore in ``rel_dir`` ("" for the root)."""
+        self._cache.clear()
+        self.rules.pop(rel_dir, None)
+        try:
+            with open(os.path.join(self.root, rel_dir, ".gitignore"), "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            return
+        compiled = [rule for rule in map(self._compile, lines) if rule]
+        if compiled:
+            self.rules[rel_dir] = compiled
+
+    @staticmethod
+    def _compile(line: str):
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            return None
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+        anchored = "/" in line
+        line = line.lstrip("/")
+        out, i = [], 0
+        while i < len(line):
+            if line.startswith("**/", i):
+                out.append("(?:.*/)?")
+                i += 3
+            elif line.startswith("**", i):
+                out.append(".*")
+                i += 2
+            elif line[i] == "*":
+                out.append("[^/]*")
+                i += 1
+            elif line[i] == "?":
+                out.append("[^/]")
+                i += 1
+            elif line[i] == "[" and "]" in line[i + 1:]:
+                j = line.index("]", i + 2 if line[i + 1:i + 2] in ("!", "]") else i + 1)
+                body = line[i + 1:j]
+                out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+                i = j + 1
+            else:
+                out.append(re.escape(line[i]))
+                i += 1
+        prefix = "" if anchored else "(?:.*/)?"
+        return re.compile(prefix + "".join(out) + "$"), negate, dir_only
+
+    def _match(self, rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        parts = rel_path.split("/")
+        for depth in range(len(parts)):
+            base = "/".join(parts[:depth])
+            for pattern, negate, dir_only in self.rules.get(base, ()):
+                if dir_only and not is_dir:
+                    continue
+                if pattern.match("/".join(parts[depth:])):
+                    ignored = not negate
+        return ignored
+
+    def ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Whether ``rel_path`` (relative to the root, "/"-separated) is ignored."""
+        key = (rel_path, is_dir)
+        if key not in self._cache:
+            parts = rel_path.split("/")
+            if ".git" in parts:
+                result = True
+            else:
+                result = any(self._match("/".join(parts[:n]), True) for n in range(1, len(parts)))
+                result = result or self._match(rel_path, is_dir)
+            self._cache[key] = result
+        return self._cache[key]
+
+
+class Inotify:
+    """Recursive directory watch on Linux inotify, through libc (no third-party modules)."""
+
+    IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x2, 0x8, 0x40, 0x80
+    IN_CREATE, IN_DELETE, IN_DELETE_SELF, IN_MOVE_SELF = 0x100, 0x200, 0x400, 0x800
+    IN_Q_OVERFLOW, IN_IGNORED, IN_ISDIR = 0x4000, 0x8000, 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    HEADER = struct.Struct("iIII")
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: dict[int, str] = {}
+
+    def add(self, abs_dir: str, rel_dir: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(abs_dir), self.MASK)
+        if wd >= 0:
+            self.dirs[wd] = rel_dir
+
+    def drop(self, rel_dir: str) -> None:
+        """Stop watching ``rel_dir`` and everything under it."""
+        for wd, path in list(self.dirs.items()):
+            if path == rel_dir or path.startswith(rel_dir + "/"):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                self.dirs.pop(wd, None)
+
+    def read(self, timeout: float):
+        """Yield (mask, rel_path) for the events that arrive within ``timeout`` seconds."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return
+        buf = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _cookie, length = self.HEADER.unpack_from(buf, offset)
+            offset += self.HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                yield mask, None
+                continue
+            base = self.dirs.get(wd)
+            if base is None:
+                continue
+            if mask & self.IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            yield mask, (f"{base}/{name}" if base and name else base or name)
+
+
+class Watcher:
+    """Watch mode: scan the tree once, then rescan files as they change.
+
+    Events are debounced per file (a burst of writes is one scan), files whose content hash
+    did not change are not rescanned, and at most ``workers`` scans run at once. The last
+    verdict of every file is kept in memory; a JSONL event is written to stdout only when a
+    file's verdict changes (or it is removed).
+    """
+
+    def __init__(self, root: str, scan_type: str, api_key: str, profiles: list, endpoint: str,
+                 debounce: float, workers: int, poll: float):
+        self.root = os.path.abspath(root)
+        self.scan_type, self.api_key, self.profiles, self.endpoint = scan_type, api_key, profiles, endpoint
+        self.debounce, self.poll = debounce, poll
+        self.ignore = GitIgnore(self.root)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.results: "queue.Queue[tuple]" = queue.Queue()
+        self.index: dict[str, dict] = {}
+        self.pending: dict[str, float] = {}
+        self.in_flight: set[str] = set()
+        self.dirty: set[str] = set()
+        self.inotify: Optional[Inotify] = None
+        self.snapshot: dict[str, tuple] = {}
+
+    # -- output -------------------------------------------------------------
+    @staticmethod
+    def emit(event: dict) -> None:
+        print(json.dumps(event, separators=(",", ":")), flush=True)
+
+    # -- tree walking -------------------------------------------------------
+    def walk(self, rel_dir: str = ""):
+        """Yield the non-ignored files under ``rel_dir``, watching each directory on the way."""
+        for abs_dir, dirs, files in os.walk(os.path.join(self.root, rel_dir)):
+            rel = os.path.relpath(abs_dir, self.root).replace(os.sep, "/")
+            rel = "" if rel == "." else rel
+            self.ignore.load(rel)
+            if self.inotify:
+                self.inotify.add(abs_dir, rel)
+            dirs[:] = [d for d in dirs if not self.ignore.ignored(f"{rel}/{d}" if rel else d, True)]
+            for name in files:
+                path = f"{rel}/{name}" if rel else name
+                if not self.ignore.ignored(path):
+                    yield path
+
+    # -- scanning -----------------------------------------------------------
+    def scan_file(self, path: str) -> tuple:
+        """Worker: hash the file and scan it unless its content is already indexed."""
+        try:
+            with open(os.path.join(self.root, path), "rb") as f:
+                data = f.read(MAX_SCAN_BYTES + 1)
+        except OSError:
+            return path, None, None
+        digest = hashlib.sha256(data).hexdigest()
+        if self.index.get(path, {}).get("sha256") == digest:
+            return path, digest, None
+        if len(data) > MAX_SCAN_BYTES:
+            return path, digest, {"status": "skipped", "reason": f"larger than {MAX_SCAN_BYTES} bytes"}
+        try:
+            content = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return path, digest, {"status": "skipped", "reason": "not UTF-8 text"}
+        payload = build_scan_request(scan_type=self.scan_type, profile=self.profiles[0], content=content)
+        return path, digest, scan_profiles(self.api_key, self.endpoint, payload, self.profiles)
+
+    def submit(self, path: str) -> None:
+        if path in self.in_flight:
+            self.dirty.add(path)
+            return
+        self.in_flight.add(path)
+        future = self.pool.submit(self.scan_file, path)
+        future.add_done_callback(lambda f: self.results.put(f.result()))
+
+    def drain(self) -> None:
+        """Record finished scans and emit the verdicts that changed."""
+        while True:
+            try:
+                path, digest, result = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.in_flight.discard(path)
+            if digest is None:
+                self.remove(path)
+            elif result is not None:
+                previous = self.index.get(path)
+                verdict = {k: result.get(k) for k in
+                           ("status", "action", "category", "prompt_detected", "response_detected", "reason", "error")
+                           if result.get(k) not in (None, [])}
+                # A failed scan is not indexed by content, so the next change (or touch) retries it.
+                self.index[path] = {**verdict, "sha256": digest if result.get("status") != "error" else None}
+                if previous is None or {k: v for k, v in previous.items() if k != "sha256"} != verdict:
+                    self.emit({"event": "verdict", "path": path, **verdict, "scan_id": result.get("scan_id"),
+                               "previous": previous.get("status") if previous else None})
+            if path in self.dirty:
+                self.dirty.discard(path)
+                self.submit(path)
+
+    def remove(self, prefix: str) -> None:
+        """Forget a removed file, or every file under a removed directory."""
+        for path in [p for p in self.index if p == prefix or p.startswith(prefix + "/")]:
+            self.emit({"event": "removed", "path": path, "previous": self.index.pop(path).get("status")})
+
+    # -- change detection ---------------------------------------------------
+    def changed(self, path: str) -> None:
+        self.pending[path] = time.monotonic() + self.debounce
+
+    def on_inotify(self, mask: int, path: Optional[str]) -> None:
+        ino = self.inotify
+        if path is None:
+            # Kernel queue overflowed: events were lost, so re-check every file (unchanged
+            # content is caught by the hash and not rescanned).
+            for p in self.walk():
+                self.changed(p)
+            return
+        is_dir = bool(mask & ino.IN_ISDIR)
+        if mask & (ino.IN_DELETE_SELF | ino.IN_MOVE_SELF):
+            return
+        if mask & (ino.IN_DELETE | ino.IN_MOVED_FROM):
+            if is_dir:
+                ino.drop(path)
+            self.pending.pop(path, None)
+            self.remove(path)
+            return
+        if self.ignore.ignored(path, is_dir):
+            return
+        if is_dir:
+            if mask & (ino.IN_CREATE | ino.IN_MOVED_TO):
+                for p in self.walk(path):
+                    self.changed(p)
+        elif mask & (ino.IN_CLOSE_WRITE | ino.IN_MOVED_TO):
+            if path.endswith(".gitignore"):
+                self.ignore.load(path.rpartition("/")[0])
+            self.changed(path)
+
+    def poll_tree(self) -> None:
+        """Fallback where inotify is unavailable: compare (mtime, size) against the last walk."""
+        seen = {}
+        for path in self.walk():
+            try:
+                st = os.stat(os.path.join(self.root, path))
+            except OSError:
+                continue
+            seen[path] = (st.st_mtime_ns, st.st_size)
+            if self.snapshot.get(path) != seen[path]:
+                self.changed(path)
+        for path in set(self.snapshot) - set(seen):
+            self.pending.pop(path, None)
+            self.remove(path)
+        self.snapshot = seen
+
+    # -- main loop ----------------------------------------------------------
+    def run(self) -> None:
+        try:
+            self.inotify = Inotify() if sys.platform.startswith("linux") and self.poll <= 0 else None
+        except (OSError, AttributeError):
+            self.inotify = None
+        files = list(self.walk())
+        if not self.inotify:
+            self.poll_tree()
+            self.pending.clear()
+        self.emit({"event": "watching", "root": self.root, "files": len(files),
+                   "mode": "inotify" if self.inotify else "poll"})
+        for path in files:
+            self.submit(path)
+        next_poll = time.monotonic() + (self.poll or 1.0)
+        while True:
+            now = time.monotonic()
+            wait = min([t for t in self.pending.values()] + [now + 0.25]) - now
+            if self.inotify:
+                for mask, path in self.inotify.read(max(wait, 0)):
+                    self.on_inotify(mask, path)
+            else:
+                time.sleep(max(min(wait, next_poll - now), 0))
+                if time.monotonic() >= next_poll:
+                    self.poll_tree()
+                    next_poll = time.monotonic() + (self.poll or 1.0)
+            now = time.monotonic()
+            for path in [p for p, t in self.pending.items() if t <= now]:
+                del self.pending[path]
+                self.submit(path)
+            self.drain()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Scan content for security threats using Prisma AIRS"
@@ -215,8 +685,7 @@ def main():
     parser.add_argument(
         "--type",
         choices=["prompt", "response", "code", "conversation"],
-        default="prompt",
-        help="Type of content to scan"
+        help="Type of content to scan (default: prompt, or code with --watch)"
     )
     parser.add_argument(
         "--content",
@@ -234,14 +703,63 @@ def main():
         "--response",
         help="AI response (for conversation type)"
     )
+    parser.add_argument(
+        "--profile",
+        action="append",
+        metavar="NAME",
+        help="Security profile to scan against; repeat to scan several at once (default: from the environment)"
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
         help="Include raw API response in output"
     )
+    parser.add_argument(
+        "--watch",
+        metavar="DIR",
+        help="Watch a directory and rescan files as they change, printing JSONL verdict changes"
+    )
+    parser.add_argument(
+        "--debounce-ms",
+        type=int,
+        default=300,
+        help="Watch mode: quiet time after a file's last write before it is scanned"
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=4,
+        help="Watch mode: maximum scans in flight"
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=0,
+        help="Watch mode: poll every N seconds instead of using inotify (default: inotify on Linux, else 1s)"
+    )
 
     args = parser.parse_args()
 
+    if args.watch:
+        if not os.path.isdir(args.watch) or args.type == "conversation":
+            print(json.dumps({
+                "status": "error",
+                "error": "--watch needs an existing directory and a prompt, response or code scan type",
+                "action": "block"
+            }))
+            sys.exit(1)
+        api_key, profiles, endpoint = get_config(args.type or "code", args.profile)
+        watcher = Watcher(args.watch, args.type or "code", api_key, profiles, endpoint,
+                          debounce=max(args.debounce_ms, 0) / 1000, workers=max(args.max_concurrent, 1),
+                          poll=max(args.poll, 0))
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    args.type = args.type or "prompt"
+
     # Validate arguments and handle stdin
     if args.type == "conversation":
         if not args.prompt or not args.response:
@@ -264,27 +782,21 @@ def main():
             sys.exit(1)
 
     # Load configuration
-    api_key, profile, endpoint = get_config()
+    api_key, profiles, endpoint = get_config(args.type, args.profile)
 
     # Build request
     payload = build_scan_request(
         scan_type=args.type,
-        profile=profile,
+        profile=profiles[0],
         content=args.content,
         prompt=args.prompt,
         response=args.response,
         file_path=args.file
     )
 
-    # Perform scan
-    api_response = perform_scan(api_key, endpoint, payload)
-
-    # Parse and format response
-    result = parse_response(api_response)
-
-    # Include raw response if verbose
-    if args.verbose:
-        result["raw_response"] = api_response
+    # Perform scan (every profile at once) and merge the verdicts; --verbose adds the raw
+    # API response (one per profile when there are several)
+    result = scan_profiles(api_key, endpoint, payload, profiles, verbose=args.verbose)
 
     # Output result
     print(json.dumps(result, indent=2))
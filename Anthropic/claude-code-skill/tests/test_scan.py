@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Unit tests for scripts/scan.py: profile selection, the multi-profile verdict merge and
+exit codes, the keep-alive connection pool, and the watch mode (.gitignore semantics and
+the debounce/rescan loop). AIRS is replaced by a fake perform_scan / scan_profiles or a
+local http.server, so no network or API key is needed.
+
+Usage:
+    python -m unittest discover -s tests
+"""
+
+import contextlib
+import http.server
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import scan  # noqa: E402
+
+
+def write(root: str, rel_path: str, text: str) -> None:
+    path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def run_main(argv: list) -> tuple[int, dict]:
+    """Run scan.main() with ``argv``; return its exit code and the JSON it printed."""
+    out = io.StringIO()
+    with mock.patch.object(sys, "argv", ["scan.py", *argv]), contextlib.redirect_stdout(out):
+        try:
+            scan.main()
+        except SystemExit as e:
+            code = e.code
+    return code, json.loads(out.getvalue())
+
+
+class ProfileConfigTest(unittest.TestCase):
+    def config(self, env: dict, scan_type: str = "prompt", profiles=None):
+        with mock.patch.dict(os.environ, {"PRISMA_AIRS_API_KEY": "key", **env}, clear=True):
+            return scan.get_config(scan_type, profiles)
+
+    def test_repeated_flags_and_comma_lists_keep_order_without_duplicates(self):
+        _key, profiles, _endpoint = self.config({"PRISMA_AIRS_PROFILE_NAME": "env"}, "code", ["a", "b, c", "a", " "])
+        self.assertEqual(profiles, ["a", "b", "c"])
+
+    def test_type_specific_variable_overrides_the_default(self):
+        env = {"PRISMA_AIRS_PROFILE_NAME": "base", "PRISMA_AIRS_PROFILE_NAME_CODE": "code-sec, dlp"}
+        self.assertEqual(self.config(env, "code")[1], ["code-sec", "dlp"])
+        self.assertEqual(self.config(env, "prompt")[1], ["base"])
+        self.assertEqual(self.config({"PRISMA_AIRS_PROFILE_NAME": "a,b,a"}, "response")[1], ["a", "b"])
+
+    def test_flags_override_the_environment(self):
+        env = {"PRISMA_AIRS_PROFILE_NAME": "base", "PRISMA_AIRS_PROFILE_NAME_PROMPT": "typed"}
+        self.assertEqual(self.config(env, "prompt", ["flag"])[1], ["flag"])
+
+    def test_no_profile_is_a_config_error(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), self.assertRaises(SystemExit) as exited:
+            self.config({"PRISMA_AIRS_PROFILE_NAME": " , "})
+        self.assertEqual(exited.exception.code, 1)
+        self.assertEqual(json.loads(out.getvalue())["action"], "block")
+
+
+# Raw AIRS answers by profile name; "broken" is what perform_scan returns for a failed request.
+RAW = {
+    "allow": {"action": "allow", "category": "benign", "scan_id": "s-allow"},
+    "alert": {"action": "alert", "category": "suspicious", "scan_id": "s-alert",
+              "response_detected": {"dlp": True, "url_cats": False}},
+    "block": {"action": "block", "category": "malicious", "scan_id": "s-block",
+              "prompt_detected": {"injection": True}},
+    "broken": {"status": "error", "error": "API request failed: 500 - boom", "action": "block"},
+}
+
+
+class ScanProfilesTest(unittest.TestCase):
+    def setUp(self):
+        self.payloads = []
+        self.lock = threading.Lock()
+        patcher = mock.patch.object(scan, "perform_scan", self.fake_perform)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_perform(self, api_key, endpoint, payload):
+        with self.lock:
+            self.payloads.append(payload)
+        return dict(RAW[payload["ai_profile"]["profile_name"]])
+
+    def merged(self, profiles: list, verbose: bool = False) -> dict:
+        payload = scan.build_scan_request(scan_type="prompt", profile=profiles[0], content="text")
+        return scan.scan_profiles("key", "http://127.0.0.1:9", payload, profiles, verbose=verbose)
+
+    def test_most_severe_status_wins_in_any_order(self):
+        cases = [
+            (["allow", "allow"], "safe"),
+            (["allow", "alert"], "threat_detected"),
+            (["alert", "broken"], "error"),
+            (["broken", "block"], "blocked"),
+            (["allow", "alert", "broken", "block"], "blocked"),
+        ]
+        for profiles, status in cases:
+            for order in (profiles, profiles[::-1]):
+                with self.subTest(profiles=order):
+                    self.assertEqual(self.merged(order)["status"], status)
+
+    def test_merged_verdict_takes_the_worst_profile_fields(self):
+        merged = self.merged(["alert", "block", "allow"])
+        self.assertEqual((merged["action"], merged["category"], merged["scan_id"]), ("block", "malicious", "s-block"))
+        self.assertEqual(merged["prompt_detected"], ["injection"])
+        self.assertEqual(merged["response_detected"], ["dlp"])
+        merged = self.merged(["allow", "broken"])
+        self.assertEqual((merged["status"], merged["action"], merged["error"]),
+                         ("error", "block", "API request failed: 500 - boom"))
+
+    def test_per_profile_breakdown(self):
+        merged = self.merged(["allow", "alert", "broken"], verbose=True)
+        self.assertEqual(merged["profiles"], [
+            {"profile": "allow", "status": "safe", "action": "allow", "category": "benign", "scan_id": "s-allow",
+             "prompt_detected": [], "response_detected": []},
+            {"profile": "alert", "status": "threat_detected", "action": "alert", "category": "suspicious",
+             "scan_id": "s-alert", "prompt_detected": [], "response_detected": ["dlp"]},
+            {"profile": "broken", "status": "error", "action": "block", "error": "API request failed: 500 - boom"},
+        ])
+        self.assertEqual(sorted(merged["raw_response"]), ["alert", "allow", "broken"])
+
+    def test_each_profile_is_scanned_once_under_one_transaction(self):
+        self.merged(["allow", "alert", "block"])
+        self.assertEqual(sorted(p["ai_profile"]["profile_name"] for p in self.payloads), ["alert", "allow", "block"])
+        self.assertEqual(len({p["tr_id"] for p in self.payloads}), 1)
+
+    def test_one_profile_is_passed_through_without_a_breakdown(self):
+        merged = self.merged(["alert"])
+        self.assertEqual(merged["status"], "threat_detected")
+        self.assertNotIn("profiles", merged)
+
+    def test_exit_codes_follow_the_merged_verdict(self):
+        cases = [
+            (["allow"], 0, "safe"),
+            (["allow", "alert"], 0, "threat_detected"),
+            (["alert", "block"], 2, "blocked"),
+            (["block", "broken"], 2, "blocked"),
+            (["allow", "broken"], 1, "error"),
+        ]
+        for profiles, exit_code, status in cases:
+            with self.subTest(profiles=profiles):
+                argv = ["--type", "code", "--content", "x = 1"]
+                for profile in profiles:
+                    argv += ["--profile", profile]
+                with mock.patch.dict(os.environ, {"PRISMA_AIRS_API_KEY": "key"}, clear=True):
+                    code, result = run_main(argv)
+                self.assertEqual((code, result["status"]), (exit_code, status))
+                self.assertEqual(len(result.get("profiles", [None])), len(profiles))
+
+    def test_environment_profiles_reach_main(self):
+        env = {"PRISMA_AIRS_API_KEY": "key", "PRISMA_AIRS_PROFILE_NAME": "allow",
+               "PRISMA_AIRS_PROFILE_NAME_CODE": "allow,block"}
+        with mock.patch.dict(os.environ, env, clear=True):
+            code, result = run_main(["--type", "code", "--content", "x = 1"])
+        self.assertEqual(code, 2)
+        self.assertEqual([p["profile"] for p in result["profiles"]], ["allow", "block"])
+
+
+class _AirsHandler(http.server.BaseHTTPRequestHandler):
+    """Answers every POST with 200 over HTTP/1.1 keep-alive; ``server.drop`` closes the
+    connection after the reply without saying so, as an idle timeout on the server would."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections.append(self.client_address)
+
+    def do_POST(self):
+        self.server.requests.append(self.rfile.read(int(self.headers["Content-Length"])))
+        body = b'{"action": "allow"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = self.server.drop
+
+    def log_message(self, *args):
+        pass
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _AirsHandler)
+        self.server.daemon_threads = True
+        self.server.connections, self.server.requests, self.server.drop = [], [], False
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}{scan.SCAN_PATH}"
+        self.pool = scan.ConnectionPool()
+        self.addCleanup(lambda: [conn.close() for idle in self.pool.idle.values() for conn in idle])
+
+    def post(self, body: bytes) -> tuple[int, bytes]:
+        return self.pool.post(self.url, body, {"Content-Type": "application/json"}, timeout=5)
+
+    def test_sequential_requests_reuse_one_connection(self):
+        for i in range(3):
+            self.assertEqual(self.post(b'{"n": %d}' % i), (200, b'{"action": "allow"}'))
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.server.requests, [b'{"n": 0}', b'{"n": 1}', b'{"n": 2}'])
+
+    def test_server_closed_keep_alive_is_retried_once_on_a_fresh_connection(self):
+        self.server.drop = True
+        self.assertEqual(self.post(b"first")[0], 200)
+        self.assertEqual(sum(len(idle) for idle in self.pool.idle.values()), 1)
+        self.assertEqual(self.post(b"second")[0], 200)
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertEqual(self.server.requests, [b"first", b"second"])
+
+    def test_a_fresh_connection_that_fails_is_not_retried(self):
+        with mock.patch.object(scan.http.client.HTTPConnection, "connect",
+                               side_effect=ConnectionRefusedError, autospec=True) as connect:
+            with self.assertRaises(ConnectionRefusedError):
+                self.post(b"x")
+        self.assertEqual(connect.call_count, 1)
+
+
+class GitIgnoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.addCleanup(self.tmp.cleanup)
+
+    def rules(self, text: str, rel_dir: str = "") -> scan.GitIgnore:
+        write(self.root, os.path.join(rel_dir, ".gitignore"), text)
+        ignore = scan.GitIgnore(self.root)
+        ignore.load("")
+        if rel_dir:
+            ignore.load(rel_dir)
+        return ignore
+
+    def test_negation_reincludes_a_file(self):
+        ignore = self.rules("*.log\n!keep.log\n")
+        self.assertTrue(ignore.ignored("debug.log"))
+        self.assertTrue(ignore.ignored("sub/debug.log"))
+        self.assertFalse(ignore.ignored("keep.log"))
+        self.assertFalse(ignore.ignored("sub/keep.log"))
+
+    def test_later_rule_wins(self):
+        ignore = self.rules("!keep.log\n*.log\n")
+        self.assertTrue(ignore.ignored("keep.log"))
+
+    def test_negation_cannot_reinclude_under_an_ignored_directory(self):
+        ignore = self.rules("out/\n!out/keep.txt\n")
+        self.assertTrue(ignore.ignored("out", True))
+        self.assertTrue(ignore.ignored("out/keep.txt"))
+
+    def test_trailing_slash_matches_directories_only(self):
+        ignore = self.rules("build/\n")
+        self.assertTrue(ignore.ignored("build", True))
+        self.assertTrue(ignore.ignored("src/build", True))
+        self.assertTrue(ignore.ignored("build/app.js"))
+        self.assertFalse(ignore.ignored("build"))
+        self.assertFalse(ignore.ignored("src/build"))
+
+    def test_leading_slash_anchors_to_the_gitignore_directory(self):
+        ignore = self.rules("/todo.txt\n")
+        self.assertTrue(ignore.ignored("todo.txt"))
+        self.assertFalse(ignore.ignored("sub/todo.txt"))
+
+    def test_inner_slash_anchors_and_star_stays_in_one_segment(self):
+        ignore = self.rules("docs/*.md\n")
+        self.assertTrue(ignore.ignored("docs/a.md"))
+        self.assertFalse(ignore.ignored("docs/api/a.md"))
+        self.assertFalse(ignore.ignored("pkg/docs/a.md"))
+
+    def test_unanchored_pattern_matches_at_any_depth(self):
+        ignore = self.rules("*.md\n")
+        self.assertTrue(ignore.ignored("a.md"))
+        self.assertTrue(ignore.ignored("docs/api/a.md"))
+        self.assertFalse(ignore.ignored("a.mdx"))
+
+    def test_double_star_spans_directories(self):
+        ignore = self.rules("a/**/b\n")
+        self.assertTrue(ignore.ignored("a/b"))
+        self.assertTrue(ignore.ignored("a/x/y/b"))
+        self.assertFalse(ignore.ignored("c/a/b"))
+
+    def test_question_mark_and_character_class(self):
+        ignore = self.rules("file?.txt\nlog[0-9].txt\nx[!a].txt\n")
+        self.assertTrue(ignore.ignored("file1.txt"))
+        self.assertFalse(ignore.ignored("file10.txt"))
+        self.assertTrue(ignore.ignored("log7.txt"))
+        self.assertFalse(ignore.ignored("logx.txt"))
+        self.assertTrue(ignore.ignored("xb.txt"))
+        self.assertFalse(ignore.ignored("xa.txt"))
+
+    def test_comments_blanks_and_escapes(self):
+        ignore = self.rules("# not a rule\n\n\\#hash\n\\!bang\n")
+        self.assertFalse(ignore.ignored("# not a rule"))
+        self.assertTrue(ignore.ignored("#hash"))
+        self.assertTrue(ignore.ignored("!bang"))
+
+    def test_nested_gitignore_is_relative_to_its_directory(self):
+        write(self.root, ".gitignore", "")
+        ignore = self.rules("/gen.py\n*.tmp\n", "pkg")
+        self.assertTrue(ignore.ignored("pkg/gen.py"))
+        self.assertTrue(ignore.ignored("pkg/sub/a.tmp"))
+        self.assertFalse(ignore.ignored("gen.py"))
+        self.assertFalse(ignore.ignored("a.tmp"))
+        self.assertFalse(ignore.ignored("pkg/sub/gen.py"))
+
+    def test_git_directory_is_always_ignored(self):
+        ignore = self.rules("")
+        self.assertTrue(ignore.ignored(".git", True))
+        self.assertTrue(ignore.ignored("sub/.git/config"))
+
+    def test_reload_picks_up_a_changed_gitignore(self):
+        ignore = self.rules("*.log\n")
+        self.assertTrue(ignore.ignored("a.log"))
+        write(self.root, ".gitignore", "*.tmp\n")
+        ignore.load("")
+        self.assertFalse(ignore.ignored("a.log"))
+        self.assertTrue(ignore.ignored("a.tmp"))
+
+
+class _Stop(Exception):
+    pass
+
+
+class WatcherTest(unittest.TestCase):
+    """Run the watch loop on a temp dir in a thread, in poll mode and (on Linux) inotify mode."""
+
+    DEBOUNCE = 0.3
+
+    def fresh(self):
+        """A new temp dir and fake AIRS for one mode; doCleanups() tears both down."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.addCleanup(self.tmp.cleanup)
+        self.scans = []
+        self.lock = threading.Lock()
+        patcher = mock.patch.object(scan, "scan_profiles", self.fake_scan)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_scan(self, api_key, endpoint, payload, profiles, verbose=False):
+        content = payload["contents"][0]["response"]
+        with self.lock:
+            self.scans.append(content)
+        if "evil" in content:
+            return {"status": "blocked", "action": "block", "category": "malicious", "scan_id": "s-block"}
+        return {"status": "safe", "action": "allow", "category": "benign", "scan_id": "s-allow"}
+
+    def start(self, poll: float) -> list:
+        watcher = scan.Watcher(self.root, "code", "key", ["profile"], "http://127.0.0.1:9",
+                               debounce=self.DEBOUNCE, workers=2, poll=poll)
+        events, stop = [], threading.Event()
+        watcher.emit = events.append
+        drain = watcher.drain
+
+        def drain_or_stop():
+            if stop.is_set():
+                raise _Stop
+            drain()
+
+        watcher.drain = drain_or_stop
+
+        def run():
+            try:
+                watcher.run()
+            except _Stop:
+                pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        def shutdown():
+            stop.set()
+            thread.join(5)
+            watcher.pool.shutdown(wait=True)
+
+        self.addCleanup(shutdown)
+        self.wait_for(lambda: any(e["event"] == "watching" for e in events))
+        return events
+
+    def wait_for(self, predicate, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return
+            time.sleep(0.02)
+        self.fail("timed out waiting for the watcher")
+
+    def modes(self):
+        yield "poll", 0.05
+        if sys.platform.startswith("linux"):
+            yield "inotify", 0
+
+    def test_initial_scan_skips_ignored_files(self):
+        for mode, poll in self.modes():
+            with self.subTest(mode=mode):
+                self.fresh()
+                write(self.root, ".gitignore", "*.log\nvendor/\n")
+                write(self.root, "app.py", "print('hi')\n")
+                write(self.root, "debug.log", "evil\n")
+                write(self.root, "vendor/lib.py", "evil\n")
+                events = self.start(poll)
+                self.wait_for(lambda: any(e["event"] == "verdict" for e in events))
+                watching = events[0]
+                self.assertEqual((watching["files"], watching["mode"]), (2, mode))
+                time.sleep(self.DEBOUNCE)
+                self.assertEqual(sorted(self.scans), ["*.log\nvendor/\n", "print('hi')\n"])
+                self.doCleanups()
+
+    def test_burst_of_writes_is_one_rescan_of_the_final_content(self):
+        for mode, poll in self.modes():
+            with self.subTest(mode=mode):
+                self.fresh()
+                write(self.root, "app.py", "v0\n")
+                events = self.start(poll)
+                self.wait_for(lambda: len(self.scans) == 1 and any(e["event"] == "verdict" for e in events))
+                for i in range(1, 6):
+                    write(self.root, "app.py", f"v{i}\n")
+                    time.sleep(0.02)
+                write(self.root, "app.py", "evil\n")
+                self.wait_for(lambda: len([e for e in events if e["event"] == "verdict"]) == 2)
+                time.sleep(self.DEBOUNCE * 2)
+                self.assertEqual(self.scans, ["v0\n", "evil\n"])
+                verdict = [e for e in events if e["event"] == "verdict"][-1]
+                self.assertEqual((verdict["path"], verdict["status"], verdict["previous"]),
+                                 ("app.py", "blocked", "safe"))
+                self.doCleanups()
+
+    def test_unchanged_content_is_not_rescanned_and_removal_is_reported(self):
+        for mode, poll in self.modes():
+            with self.subTest(mode=mode):
+                self.fresh()
+                write(self.root, "app.py", "same\n")
+                events = self.start(poll)
+                self.wait_for(lambda: any(e["event"] == "verdict" for e in events))
+                time.sleep(0.05)
+                write(self.root, "app.py", "same\n")
+                time.sleep(self.DEBOUNCE * 3)
+                self.assertEqual(self.scans, ["same\n"])
+                os.remove(os.path.join(self.root, "app.py"))
+                self.wait_for(lambda: any(e["event"] == "removed" for e in events))
+                self.assertEqual(events[-1], {"event": "removed", "path": "app.py", "previous": "safe"})
+                self.doCleanups()
+
+    def test_gitignore_change_applies_to_new_files(self):
+        for mode, poll in self.modes():
+            with self.subTest(mode=mode):
+                self.fresh()
+                write(self.root, "app.py", "ok\n")
+                events = self.start(poll)
+                self.wait_for(lambda: len(self.scans) == 1)
+                write(self.root, ".gitignore", "*.tmp\n")
+                self.wait_for(lambda: len(self.scans) == 2)
+                time.sleep(0.05)
+                write(self.root, "scratch.tmp", "evil\n")
+                write(self.root, "new.py", "fine\n")
+                self.wait_for(lambda: "fine\n" in self.scans)
+                time.sleep(self.DEBOUNCE * 2)
+                self.assertNotIn("evil\n", self.scans)
+                self.assertFalse(any(e.get("path") == "scratch.tmp" for e in events))
+                self.doCleanups()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,6 +27,68 @@ function airsStringify(obj) {
     try { return JSON.stringify(obj); } catch (e) { return ''; }
 }
 
+/* ------------------------------------------------------------------ *
+ * Parse-once cache
+ *
+ * Most policies in this flow need the parsed request body (and, on the
+ * response leg, the response body). Re-parsing a large chat body with tool
+ * definitions in every policy, and again on the response leg, is where most
+ * of the flow's CPU goes. airsMemo() keeps a computed value in a flow
+ * variable (airs.memo.<name>) tagged with a fingerprint of the source string
+ * it was computed from (its length and SHA-256, never the text itself — the
+ * body is not held twice, and no prompt lands in a trace session), so later
+ * policies — in this leg or the next — get it back without recomputing while
+ * the source is unchanged. A rewritten body (DLP masking) misses the tag and
+ * is recomputed. If a runtime ever hands the stored object back as something
+ * other than an object, that is a miss too, and without the crypto object
+ * nothing is memoized: the cache can only save work, never change a result.
+ *
+ * Cached trees are SHARED: treat them as read-only, or re-tag them with
+ * airsRemember() after writing the edited body back (apply-masking does).
+ * ------------------------------------------------------------------ */
+function airsMemo(name, src, compute) {
+    if (src === null || src === undefined) { return compute(); }
+    var fp = airsFingerprint(src);
+    if (!fp) { return compute(); }
+    var tag = context.getVariable('airs.memo.' + name + '.src');
+    if (tag !== null && tag !== undefined && String(tag) === fp) {
+        var hit = context.getVariable('airs.memo.' + name);
+        if (hit !== null && typeof hit === 'object' && 'v' in hit) { return hit.v; }
+    }
+    var value = compute();
+    airsStoreMemo(name, fp, value);
+    return value;
+}
+
+// Store value as the memo for src (used after a policy rewrites the source).
+function airsRemember(name, src, value) {
+    var fp = airsFingerprint(src);
+    if (fp) { airsStoreMemo(name, fp, value); }
+}
+
+function airsStoreMemo(name, fp, value) {
+    context.setVariable('airs.memo.' + name, { v: value });
+    context.setVariable('airs.memo.' + name + '.src', fp);
+}
+
+// "<length>:<sha256 hex>" of a source string; '' when the crypto object is
+// unavailable (then nothing is memoized).
+function airsFingerprint(src) {
+    src = String(src);
+    try {
+        var sha = crypto.getSHA256();      // Apigee crypto object
+        sha.update(src);
+        return src.length + ':' + String(sha.digest('hex')).toLowerCase();
+    } catch (e) { return ''; }
+}
+
+// Parsed request/response body (which = 'request' | 'response'), parsed at most
+// once per distinct body across all policies. null when absent or not JSON.
+function airsBody(which) {
+    var raw = context.getVariable(which + '.content');
+    return airsMemo('body.' + which, raw, function () { return airsParse(raw); });
+}
+
 /* ------------------------------------------------------------------ *
  * Value collection (the el-cacheo "clean values" extractor)
  *
@@ -20,7 +20,7 @@ var phase   = context.getVariable('airs.cfg.phase');
  * REQUEST leg — prompt masking (before the model)
  * ================================================================== */
 function maskRequest(masked) {
-    var body = airsParse(context.getVariable('request.content'));
+    var body = airsBody('request');   // edited in place, then re-tagged below
     if (!body) { return; }
 
     if (apiType === 'gemini') {
@@ -48,7 +48,9 @@ function maskRequest(masked) {
             }
         }
     }
-    context.setVariable('request.content', JSON.stringify(body));
+    var out = JSON.stringify(body);
+    context.setVariable('request.content', out);
+    airsRemember('body.request', out, body);
     context.setVariable('airs.mask.applied', 'request');
 }
 
@@ -63,12 +65,14 @@ function maskResponse(masked) {
     if (apiType === 'mcp') {
         var ct = String(context.getVariable('response.header.Content-Type') || '');
         var isSSE = ct.indexOf('text/event-stream') !== -1;
-        var obj = isSSE ? sseFirstJson(raw) : airsParse(raw);
+        var obj = isSSE ? sseFirstJson(raw) : airsBody('response');
         if (obj && obj.result && obj.result.content) {
             for (var i = 0; i < obj.result.content.length; i++) {
                 if (obj.result.content[i] && obj.result.content[i].type === 'text') { obj.result.content[i].text = masked; break; }
             }
-            context.setVariable('response.content', isSSE ? ('event: message\ndata: ' + JSON.stringify(obj) + '\n\n') : JSON.stringify(obj));
+            var mout = isSSE ? ('event: message\ndata: ' + JSON.stringify(obj) + '\n\n') : JSON.stringify(obj);
+            context.setVariable('response.content', mout);
+            if (!isSSE) { airsRemember('body.response', mout, obj); }
             context.setVariable('airs.mask.applied', 'tool-output');
         }
         return;
@@ -81,8 +85,8 @@ function maskResponse(masked) {
         return;
     }
 
-    // Non-streaming JSON
-    var body = airsParse(raw);
+    // Non-streaming JSON (the cached tree, edited in place and re-tagged below)
+    var body = airsBody('response');
     if (!body) { return; }
     if (apiType === 'gemini') {
         if (body.candidates) { setFirstGeminiText(body.candidates, masked); }
@@ -99,7 +103,9 @@ function maskResponse(masked) {
             }
         }
     }
-    context.setVariable('response.content', JSON.stringify(body));
+    var out = JSON.stringify(body);
+    context.setVariable('response.content', out);
+    airsRemember('body.response', out, body);
     context.setVariable('airs.mask.applied', 'response');
 }
 
@@ -21,7 +21,7 @@ var phase   = context.getVariable('airs.cfg.phase');
 function resolveAppUser() {
     var h = airsHeader('x-user-id');
     if (!airsIsBlank(h)) { return h; }
-    var reqBody = airsParse(context.getVariable('request.content'));
+    var reqBody = airsBody('request');
     if (reqBody && reqBody.metadata && reqBody.metadata.user_id) {
         var uid = airsParse(reqBody.metadata.user_id);   // JSON-encoded string
         if (uid) { return String(uid.account_uuid || uid.device_id || reqBody.metadata.user_id); }
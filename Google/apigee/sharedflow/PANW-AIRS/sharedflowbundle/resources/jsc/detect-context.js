@@ -14,8 +14,7 @@
  */
 
 var phase   = context.getVariable('airs.cfg.phase');
-var reqRaw  = context.getVariable('request.content');
-var reqBody = airsParse(reqRaw);
+var reqBody = airsBody('request');
 
 /* ---- API type ------------------------------------------------------------ */
 function detectApiType() {
@@ -30,7 +30,8 @@ var apiType   = context.getVariable('airs.apiType');
 var isCC      = context.getVariable('airs.isCC') === 'true';
 var scanTools = context.getVariable('airs.cfg.scanTools') === 'true';
 
-var reqBody = airsParse(context.getVariable('request.content'));
+var reqRaw  = context.getVariable('request.content');
+var reqBody = airsBody('request');
 var respRaw = context.getVariable('response.content');   // null on request leg
 
 var promptText = '';
@@ -88,7 +89,7 @@ function buildMcpToolEvent() {
             for (var i = 0; i < lines.length; i++) {
                 if (String(lines[i]).indexOf('data:') === 0) { body = airsParse(airsStripDataPrefix(lines[i])); if (body) { break; } }
             }
-        } else { body = airsParse(respRaw); }
+        } else { body = airsBody('response'); }
 
         if (body && body.result && body.result.content && body.result.content.length) {
             var out = '';
@@ -151,7 +152,7 @@ function extractGeminiResponseText(raw) {
     }
 
     if (trimmed.charAt(0) === '[') {                       // streamed JSON array
-        var arr = airsParse(trimmed);
+        var arr = airsBody('response');
         if (arr) { for (var a = 0; a < arr.length; a++) { harvest(arr[a] && arr[a].candidates); } }
     } else if (String(raw).indexOf('data:') !== -1) {      // SSE
         var lines = airsSplitLines(raw);
@@ -162,7 +163,7 @@ function extractGeminiResponseText(raw) {
             if (chunk) { harvest(chunk.candidates); }
         }
     } else {                                               // single JSON object
-        var obj = airsParse(raw);
+        var obj = airsBody('response');
         if (obj) { harvest(obj.candidates); }
     }
     return sb.join('');
@@ -212,7 +213,7 @@ function llmResponse() {
     if (!respRaw) { return; }
     if (String(respRaw).indexOf('data:') !== -1) { responseText = llmResponseSSE(respRaw); return; }
 
-    var body = airsParse(respRaw);
+    var body = airsBody('response');
     if (!body) { return; }
     var sb = [];
 
@@ -301,7 +302,14 @@ if (apiType === 'mcp') {
     toolEventJson = buildMcpToolEvent();
 } else {
     if (phase === 'prompt' || phase === 'both') {
-        if (apiType === 'gemini') { geminiPrompt(); } else { llmPrompt(); }
+        // Same request body + same extraction knobs => same prompt text; the
+        // request and response legs of one call share the result.
+        var pm = airsMemo('prompt.' + apiType + (isCC ? '.cc' : '') + (scanTools ? '.tools' : ''), reqRaw, function () {
+            if (apiType === 'gemini') { geminiPrompt(); } else { llmPrompt(); }
+            return { text: promptText, toolResult: usedToolResult };
+        });
+        promptText = pm.text;
+        usedToolResult = pm.toolResult;
     }
     if (phase === 'response' || phase === 'both') {
         if (apiType === 'gemini') { geminiResponse(); } else { llmResponse(); }
@@ -29,7 +29,7 @@ var scanId  = context.getVariable('airs.scan_id') || '';
 var trId    = context.getVariable('airs.transaction_id') || context.getVariable('airs.txnId') || '';
 var descriptions = airsParse(context.getVariable('airs.cfg.descriptions')) || {};
 
-var reqBody = airsParse(context.getVariable('request.content'));
+var reqBody = airsBody('request');
 var _spath = String(context.getVariable('proxy.pathsuffix') || context.getVariable('request.uri') || '').toLowerCase();
 // Streaming callers must get an SSE refusal, not JSON. Detect from the request
 // body flag (OpenAI/Anthropic native set stream:true) OR the endpoint itself:
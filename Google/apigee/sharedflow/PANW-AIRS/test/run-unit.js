@@ -38,10 +38,19 @@ var cryptoShim = {
     }; }
 };
 // Run one policy: fresh scope, lib + resource, sharing the persistent store.
+// When parseLog is an array, every JSON.parse of a body-sized string (>= 4 KB)
+// is recorded as "<policy>:<length>" — the parse-once checks read it.
+var parseLog = null;
+var SRC = {};
 function runPolicy(resource, store) {
     var sandbox = { context: makeContext(store), crypto: cryptoShim, print: function () {} };
     vm.createContext(sandbox);
-    vm.runInContext(LIB + '\n' + fs.readFileSync(path.join(JSC, resource), 'utf8'), sandbox, { filename: resource });
+    if (parseLog) {
+        sandbox.__logParse = function (s) { if (typeof s === 'string' && s.length >= 4096) { parseLog.push(resource + ':' + s.length); } };
+        vm.runInContext('JSON.parse = (function (p) { return function (s, r) { __logParse(s); return p.call(JSON, s, r); }; })(JSON.parse);', sandbox);
+    }
+    if (!SRC[resource]) { SRC[resource] = new vm.Script(LIB + '\n' + fs.readFileSync(path.join(JSC, resource), 'utf8'), { filename: resource }); }
+    SRC[resource].runInContext(sandbox);
 }
 
 // Emulate EV-ParseAIRSVerdict (JSONPath → airs.* strings).
@@ -370,6 +379,92 @@ console.log('\n=== IMPROVEMENTS (re-look) ===');
     ok('blockStatus ignored for streaming (SSE stays 200)', s2['airs.block.status'] === '200', s2['airs.block.status']);
 })();
 
+console.log('\n=== PARSE-ONCE + CPU BENCHMARK ===');
+
+// Large synthetic agent turn: a full tool catalogue plus a long history, and a
+// large tool-calling answer. Both legs of one call run against the same store
+// (flow variables persist from the request flow into the response flow).
+function bigRequest(turns, tools) {
+    var t = [], m = [];
+    for (var i = 0; i < tools; i++) {
+        t.push({ name: 'tool_' + i, description: 'Tool number ' + i + ' does something useful with the workspace. '.repeat(6),
+            input_schema: { type: 'object', properties: { path: { type: 'string', description: 'file path '.repeat(10) }, depth: { type: 'integer' } } } });
+    }
+    for (var j = 0; j < turns; j++) {
+        m.push({ role: 'user', content: [{ type: 'text', text: 'Question ' + j + ': ' + 'please look at the build logs again. '.repeat(20) }] });
+        m.push({ role: 'assistant', content: [{ type: 'text', text: 'Answer ' + j + ': ' + 'the build failed in the linker step. '.repeat(30) }] });
+    }
+    return { model: 'claude-sonnet-4', max_tokens: 32000, tools: t, messages: m };
+}
+function bigResponse() {
+    return { content: [{ type: 'text', text: 'Here is the summary. '.repeat(2000) },
+        { type: 'tool_use', name: 'tool_1', input: { path: '/src/main.c', note: 'x'.repeat(5000) } }] };
+}
+// Run request + response legs; memo=false drops airs.memo.* before every policy
+// (the pre-cache behaviour). Returns { cpu: {policy: µs}, parses: [...] }.
+var LEG_POLICIES = ['init-config.js', 'detect-context.js', 'extract-content.js', 'build-airs-scan-body.js', 'process-verdict.js'];
+function runCall(req, resp, memo) {
+    var store = baseStore({});
+    store['proxy.pathsuffix'] = '/v1/messages';
+    store['request.content'] = req;
+    var cpu = {};
+    function leg(type) {
+        store['type'] = type;
+        store['airsScanResponse.status.code'] = 200;
+        store['airsScanResponse.content'] = JSON.stringify({ action: 'allow', category: 'benign' });
+        evShim(store);
+        for (var i = 0; i < LEG_POLICIES.length; i++) {
+            if (!memo) { for (var k in store) { if (k.indexOf('airs.memo.') === 0) { delete store[k]; } } }
+            var name = LEG_POLICIES[i], t0 = process.cpuUsage();
+            runPolicy(name, store);
+            var d = process.cpuUsage(t0);
+            cpu[type + ' ' + name] = (cpu[type + ' ' + name] || 0) + d.user + d.system;
+        }
+    }
+    parseLog = [];
+    leg('user-prompt');
+    store['response.content'] = resp; store['response.status.code'] = 200;
+    store['response.header.Content-Type'] = 'application/json';
+    leg('response-prompt');
+    var parses = parseLog;
+    parseLog = null;
+    return { cpu: cpu, parses: parses, store: store };
+}
+
+(function () {
+    var req = JSON.stringify(bigRequest(150, 60)), resp = JSON.stringify(bigResponse());
+    var warm = runCall(req, resp, true), cold = runCall(req, resp, false);
+    function count(r, len) { return r.parses.filter(function (p) { return p.split(':')[1] === String(len); }).length; }
+    ok('request body parsed once across both legs (was ' + count(cold, req.length) + 'x)', count(warm, req.length) === 1, warm.parses.join(', '));
+    ok('response body parsed once', count(warm, resp.length) === 1, warm.parses.join(', '));
+    ok('cached run publishes the same scan body', warm.store['airsScanRequestBody'] === cold.store['airsScanRequestBody']);
+
+    // masked bodies are re-tagged, so the rewritten body is not parsed again
+    var s = verdict({ type: 'user-prompt', pathsuffix: '/v1/chat/completions',
+        request: { model: 'gpt-4o', messages: [{ role: 'user', content: 'my ssn is 123-45-6789' }] },
+        airsReply: { action: 'allow', category: 'benign', prompt_masked_data: { data: 'my ssn is XXX' } } });
+    var fp = s['request.content'].length + ':' + nodeCrypto.createHash('sha256').update(s['request.content']).digest('hex');
+    ok('masked request re-tagged in the cache', s['airs.memo.body.request.src'] === fp &&
+        s['airs.memo.body.request'].v.messages[0].content === 'my ssn is XXX');
+    ok('memo tag is a fingerprint, not the body', Object.keys(warm.store).every(function (k) {
+        return k.indexOf('airs.memo.') !== 0 || k.slice(-4) !== '.src' || /^\d+:[0-9a-f]{64}$/.test(warm.store[k]); }));
+
+    // CPU per policy on a large body (informational; not asserted — CI noise).
+    var N = 5, tw = {}, tc = {};
+    for (var n = 0; n < N; n++) {
+        var w = runCall(req, resp, true).cpu, c = runCall(req, resp, false).cpu;
+        for (var k in w) { tw[k] = (tw[k] || 0) + w[k]; tc[k] = (tc[k] || 0) + c[k]; }
+    }
+    console.log('  request ' + Math.round(req.length / 1024) + ' KB, response ' + Math.round(resp.length / 1024) + ' KB; mean CPU µs over ' + N + ' calls:');
+    console.log('  ' + 'policy'.padEnd(44) + 'parse-each'.padStart(12) + 'parse-once'.padStart(12));
+    var sw = 0, sc = 0;
+    for (var p in tw) {
+        sw += tw[p]; sc += tc[p];
+        console.log('  ' + p.padEnd(44) + String(Math.round(tc[p] / N)).padStart(12) + String(Math.round(tw[p] / N)).padStart(12));
+    }
+    console.log('  ' + 'total'.padEnd(44) + String(Math.round(sc / N)).padStart(12) + String(Math.round(sw / N)).padStart(12));
+})();
+
 /* ---- summary ------------------------------------------------------------- */
 console.log('\n' + (fail === 0 ? '✓ ALL PASS' : '✗ FAILURES') + ':  ' + pass + ' passed, ' + fail + ' failed');
 if (fail) { console.log('\nFailed:'); failures.forEach(function (f) { console.log('  - ' + f); }); process.exit(1); }
@@ -42,6 +42,9 @@ API_KEY="${PRISMA_AIRS_API_KEY:-}"
 PROFILE_ID="${PRISMA_AIRS_PROFILE_ID:-}"
 PROFILE_NAME="${PRISMA_AIRS_PROFILE_NAME:-}"
 LOG_FILE="${SECURITY_LOG_PATH:-}"   # default set per-agent below (under this agent's config dir)
+LOG_MAX_BYTES="${AIRS_LOG_MAX_BYTES:-5000000}"; LOG_KEEP="${AIRS_LOG_KEEP:-3}"
+case "$LOG_MAX_BYTES" in ''|*[!0-9]*) LOG_MAX_BYTES=5000000 ;; esac
+case "$LOG_KEEP" in ''|*[!0-9]*|0) LOG_KEEP=3 ;; esac
 TIMEOUT_MS="${AIRS_TIMEOUT_MS:-10000}"
 RETRIES="${AIRS_RETRIES:-1}"
 FAIL_MODE="${AIRS_FAIL_MODE:-closed}"   # default fail-CLOSED on the input side (block on scan failure)
@@ -69,9 +72,69 @@ case "$MAX_CHARS"  in ''|*[!0-9]*) MAX_CHARS=20000 ;; esac
 case "$MAX_CHUNKS" in ''|*[!0-9]*) MAX_CHUNKS=6 ;; esac
 MAX_BUDGET=$(( MAX_CHARS * MAX_CHUNKS ))
 case "${AIRS_CODE_AWARE:-1}" in 1|true|yes) CODE_AWARE=1 ;; *) CODE_AWARE=0 ;; esac
+# compact tool output (opt-in): each distinct object key once per result, every string value
+# in order — the same text the node and PowerShell engines build (format: Hooks/README.md)
+case "${AIRS_COMPACT_OUTPUT:-0}" in 1|true|yes) COMPACT_OUTPUT=1 ;; *) COMPACT_OUTPUT=0 ;; esac
 case "$TIMEOUT_MS" in ''|*[!0-9]*) TIMEOUT_MS=10000 ;; esac
 TIMEOUT_S=$(( (TIMEOUT_MS + 999) / 1000 )); [ "$TIMEOUT_S" -lt 1 ] && TIMEOUT_S=1
 case "$RETRIES" in ''|*[!0-9]*) RETRIES=1 ;; esac
+# shared AIRS health, one file per AIRS URL for every hook on the machine (format: Hooks/README.md):
+# a circuit breaker applies the fail mode at once after BREAKER_FAILURES failures in a row, and with
+# AIRS_ADAPTIVE_TIMEOUT a first attempt's timeout follows a latency estimate (TIMEOUT_MS is the ceiling)
+case "$(printf '%s' "${AIRS_HEALTH:-1}" | tr '[:upper:]' '[:lower:]' | tr -d '[:space:]')" in
+  1|true|yes) HEALTH_ON=1 ;; *) HEALTH_ON=0 ;;
+esac
+case "$(printf '%s' "${AIRS_ADAPTIVE_TIMEOUT:-}" | tr '[:upper:]' '[:lower:]' | tr -d '[:space:]')" in
+  1|true|yes) ADAPTIVE_ON=1 ;; *) ADAPTIVE_ON=0 ;;
+esac
+HEALTH_DIR="${AIRS_HEALTH_DIR:-$HOME/.prisma-airs/health}"
+TIMEOUT_MIN_MS="${AIRS_TIMEOUT_MIN_MS:-5000}"; BREAKER_FAILURES="${AIRS_BREAKER_FAILURES:-3}"; BREAKER_COOLDOWN_S="${AIRS_BREAKER_COOLDOWN_S:-30}"
+case "$TIMEOUT_MIN_MS" in ''|*[!0-9]*) TIMEOUT_MIN_MS=5000 ;; esac
+case "$BREAKER_FAILURES" in ''|*[!0-9]*|0) BREAKER_FAILURES=3 ;; esac
+case "$BREAKER_COOLDOWN_S" in ''|*[!0-9]*) BREAKER_COOLDOWN_S=30 ;; esac
+# machine-local admission control per API key, shared by every hook (format: Hooks/README.md): at most
+# MAX_INFLIGHT AIRS calls at once and, when RATE_PER_S is set, that many a second; a hook queues up to
+# QUEUE_MAX_MS for its turn and the wait comes out of its timeout
+case "$(printf '%s' "${AIRS_LIMIT:-1}" | tr '[:upper:]' '[:lower:]' | tr -d '[:space:]')" in
+  1|true|yes) LIMIT_ON=1 ;; *) LIMIT_ON=0 ;;
+esac
+LIMIT_DIR="${AIRS_LIMIT_DIR:-$HOME/.prisma-airs/limits}"
+MAX_INFLIGHT="${AIRS_MAX_INFLIGHT:-8}"; RATE_PER_S="${AIRS_RATE_PER_S:-0}"; QUEUE_MAX_MS="${AIRS_QUEUE_MAX_MS:-$(( TIMEOUT_MS / 2 ))}"
+case "$MAX_INFLIGHT" in ''|*[!0-9]*|0) MAX_INFLIGHT=8 ;; esac
+case "$RATE_PER_S" in ''|*[!0-9]*) RATE_PER_S=0 ;; esac
+case "$QUEUE_MAX_MS" in ''|*[!0-9]*) QUEUE_MAX_MS=$(( TIMEOUT_MS / 2 )) ;; esac
+# opt-in on-disk allow-verdict cache, shared with the node/powershell engines (format: Hooks/README.md)
+case "$(printf '%s' "${AIRS_VERDICT_CACHE:-}" | tr '[:upper:]' '[:lower:]' | tr -d '[:space:]')" in
+  1|true|yes) CACHE_ON=1 ;; *) CACHE_ON=0 ;;
+esac
+CACHE_DIR="${AIRS_VERDICT_CACHE_DIR:-}"   # default set per-agent below, next to the log
+CACHE_TTL="${AIRS_VERDICT_CACHE_TTL_S:-300}"; CACHE_MAX="${AIRS_VERDICT_CACHE_MAX:-1000}"
+case "$CACHE_TTL" in ''|*[!0-9]*) CACHE_TTL=300 ;; esac
+{ [ "${#CACHE_TTL}" -gt 9 ] || [ "$CACHE_TTL" -gt 86400 ]; } && CACHE_TTL=86400   # a cleared verdict lives a day at most
+case "$CACHE_MAX" in ''|*[!0-9]*|0) CACHE_MAX=1000 ;; esac
+# Stop watermark (default on): answer text already cleared in the session is not scanned again
+case "$(printf '%s' "${AIRS_STOP_WATERMARK:-1}" | tr '[:upper:]' '[:lower:]' | tr -d '[:space:]')" in
+  1|true|yes) WM_ON=1 ;; *) WM_ON=0 ;;
+esac
+WM_FILE="${AIRS_STOP_WATERMARK_PATH:-}"   # default set per-agent below, next to the log
+WM_OVERLAP="${AIRS_STOP_WATERMARK_OVERLAP:-1024}"
+case "$WM_OVERLAP" in ''|*[!0-9]*) WM_OVERLAP=1024 ;; esac
+# deferred output scanning (opt-in): PostToolUse returns at once and a detached worker — this script
+# again, with AIRS_DEFERRED=<job> — scans; the verdict reaches the agent at the next checkpoint
+case "$(printf '%s' "${AIRS_DEFER_OUTPUT:-}" | tr '[:upper:]' '[:lower:]' | tr -d '[:space:]')" in
+  1|true|yes) DEFER_ON=1 ;; *) DEFER_ON=0 ;;
+esac
+DEFER_DIR="${AIRS_DEFER_DIR:-}"   # default set per-agent below, next to the log
+DEFERRED="${AIRS_DEFERRED:-}"     # set only in a deferred worker, which never defers again
+[ -n "$DEFERRED" ] && DEFER_ON=0
+# delta scan (opt-in): a Write / NotebookEdit over an existing file scans only the lines that differ
+# from the file on disk, plus DELTA_CONTEXT lines around each change
+case "$(printf '%s' "${AIRS_DELTA_SCAN:-}" | tr '[:upper:]' '[:lower:]' | tr -d '[:space:]')" in
+  1|true|yes) DELTA_ON=1 ;; *) DELTA_ON=0 ;;
+esac
+DELTA_MAX_BYTES="${AIRS_DELTA_MAX_FILE_BYTES:-1000000}"; DELTA_CONTEXT="${AIRS_DELTA_CONTEXT_LINES:-3}"
+case "$DELTA_MAX_BYTES" in ''|*[!0-9]*) DELTA_MAX_BYTES=1000000 ;; esac
+case "$DELTA_CONTEXT" in ''|*[!0-9]*) DELTA_CONTEXT=3 ;; esac
 
 # vendor -> app_name + config dir for AIRS metadata / default log path
 case "$VENDOR" in
@@ -97,6 +160,9 @@ esac
 APP_USER="${AIRS_APP_USER:-${VENDOR}-user}"
 # log defaults under THIS agent's config dir, not always .claude/
 [ -z "$LOG_FILE" ] && LOG_FILE="$CFGDIR/hooks/prisma-airs.log"
+[ -z "$CACHE_DIR" ] && CACHE_DIR="$CFGDIR/hooks/verdict-cache"
+[ -z "$WM_FILE" ] && WM_FILE="$CFGDIR/hooks/stop-watermark"
+[ -z "$DEFER_DIR" ] && DEFER_DIR="$CFGDIR/hooks/deferred"
 
 dbg() { [ "$DEBUG" = "1" ] || [ "$DEBUG" = "true" ] && printf '[airs-hooks] %s\n' "$1" >&2; return 0; }
 
@@ -104,6 +170,7 @@ dbg() { [ "$DEBUG" = "1" ] || [ "$DEBUG" = "true" ] && printf '[airs-hooks] %s\n
 # read stdin once
 # ----------------------------------------------------------------------------
 INPUT="$(cat)"
+[ -n "$DEFERRED" ] && rm -f "$DEFERRED.job" 2>/dev/null
 j()  { jq -r  "$1" <<<"$INPUT" 2>/dev/null; }   # raw string
 jc() { jq -c  "$1" <<<"$INPUT" 2>/dev/null; }   # compact JSON
 
@@ -164,12 +231,55 @@ case "$IEVENT" in
   *) SIDE="output" ;;
 esac
 
+# ----------------------------------------------------------------------------
+# deferred output verdicts — a worker leaves "<job>.done", one JSON line {"v":1,"label","kind","text"},
+# in <DEFER_DIR>/<sha256(session):32>/ for a block or warn; the session's next checkpoint claims it
+# (rename, so two hooks never both deliver it) and renders it through the usual block/warn channel.
+# ----------------------------------------------------------------------------
+DEFER_BLOCK=""; DEFER_WARN=""; DEFER_SDIR=""
+defer_finish() {
+  jq -nc --arg l "$LABEL" --arg k "$1" --arg t "$2" '{v:1, label:$l, kind:$k, text:$t}' >"$DEFERRED.tmp" 2>/dev/null \
+    && mv -f "$DEFERRED.tmp" "$DEFERRED.done" 2>/dev/null || rm -f "$DEFERRED.tmp" 2>/dev/null
+  return 0
+}
+defer_collect() {
+  local f c kind label text
+  for f in "$DEFER_SDIR"/*.done; do
+    [ -f "$f" ] || continue
+    c="$f.$$"; mv "$f" "$c" 2>/dev/null || continue
+    IFS=$'\t' read -r kind label text < <(jq -r 'select(.v == 1) | [.kind, .label, .text] | @tsv' "$c" 2>/dev/null)
+    rm -f "$c" 2>/dev/null
+    text="Prisma AIRS deferred scan of $label: $text"
+    case "$kind" in
+      block) DEFER_BLOCK="${DEFER_BLOCK:+$DEFER_BLOCK; }$text" ;;
+      warn)  DEFER_WARN="${DEFER_WARN:+$DEFER_WARN; }$text" ;;
+    esac
+  done
+  return 0
+}
+# defer_sweep — at most once an hour (mtime of <DEFER_DIR>/.swept), drop files left for over a day
+# (findings of ended sessions, jobs whose worker never ran) and session dirs idle and empty for an hour
+defer_sweep() {
+  local mark="$DEFER_DIR/.swept"
+  [ -f "$mark" ] && [ -z "$(find "$mark" -mmin +60 2>/dev/null)" ] && return 0
+  [ -d "$DEFER_DIR" ] && : 2>/dev/null >|"$mark" || return 0
+  find "$DEFER_DIR" -mindepth 2 -maxdepth 2 -type f -mmin +1440 -exec rm -f {} + 2>/dev/null
+  find "$DEFER_DIR" -mindepth 1 -maxdepth 1 -type d -empty -mmin +60 -exec rmdir {} + 2>/dev/null
+  return 0
+}
+
 # ----------------------------------------------------------------------------
 # render — turn a neutral decision into this vendor's wire format, then EXIT.
 #   render <allow|warn|block> <text>
 # ----------------------------------------------------------------------------
 render() {
   local kind="$1" text="$2" out="" err="" code=0
+  # a deferred worker hands its verdict to the next checkpoint instead of to the agent
+  if [ -n "$DEFERRED" ]; then [ "$kind" = "allow" ] || defer_finish "$kind" "$text"; exit 0; fi
+  # a claimed deferred warning rides on whatever this checkpoint decides (a clean one becomes a warn)
+  if [ -n "$DEFER_WARN" ]; then
+    if [ "$kind" = "allow" ]; then kind="warn"; text="$DEFER_WARN"; else text="${text:+$text; }$DEFER_WARN"; fi
+  fi
   case "$kind" in
     warn)  err="[Prisma AIRS] $text"$'\n' ;;
     block) err=$'\n🚫 '"$text"$'\n\n' ;;
@@ -287,15 +397,72 @@ emit_nojq_block() {
 # ----------------------------------------------------------------------------
 # logging
 # ----------------------------------------------------------------------------
-log_line() {
-  local label="$1" tag="$2" ts
-  # strip CR/LF so an attacker-influenced tool_name / session_id can't forge extra log records
-  label="$(printf '%s' "$label" | tr -d '\r\n')"; tag="$(printf '%s' "$tag" | tr -d '\r\n')"
-  ts="$(date -u +%Y-%m-%dT%H:%M:%S.000Z 2>/dev/null)"
-  mkdir -p "$(dirname "$LOG_FILE")" 2>/dev/null
-  printf '[%s] %s %s: %s\n' "$ts" "$IEVENT" "$label" "$tag" >>"$LOG_FILE" 2>/dev/null
+# One JSONL audit record per verdict, same schema as the node/powershell engines (Hooks/README.md
+# "Audit log"). Records are built in pure bash (no tr/date/dirname forks) into LOG_BUF and written with
+# one append when the script exits; the log rolls to <log>.1 … <log>.$LOG_KEEP past LOG_MAX_BYTES.
+LOG_BUF=""
+mark_ms() { local t="${EPOCHREALTIME:-}"; t="${t/[.,]/}"; printf -v "$1" '%s' "${t:+${t:0:${#t}-3}}"; }
+mark_ms T_START
+json_str() {   # JSON string literal of $1 -> $_J; control chars can't forge extra records
+  local s=$1   # unquoted expansions: portable backslash handling back to bash 3.2
+  s=${s//\\/\\\\}; s=${s//\"/\\\"}; s=${s//$'\n'/\\n}; s=${s//$'\r'/\\r}; s=${s//$'\t'/\\t}
+  _J="\"${s//[[:cntrl:]]/ }\""
+}
+log_ts() {
+  if [ -n "$T_NOW" ] && TZ=UTC0 printf -v _TS '%(%Y-%m-%dT%H:%M:%S)T' "${T_NOW:0:${#T_NOW}-3}" 2>/dev/null; then
+    _TS="$_TS.${T_NOW:${#T_NOW}-3}Z"
+  else
+    _TS="$(date -u +%Y-%m-%dT%H:%M:%S.000Z 2>/dev/null)"
+  fi
+}
+# log_record <verdict> <msg> [<category> <scan_id> <detections ", "-joined> <cache 0|1>]
+log_record() {
+  local rec d lat="" T_NOW
+  mark_ms T_NOW; log_ts
+  rec="{\"ts\":\"$_TS\",\"runtime\":\"bash\""
+  json_str "$VENDOR"; rec="$rec,\"vendor\":$_J"
+  json_str "$IEVENT"; rec="$rec,\"event\":$_J"
+  json_str "${LABEL:-input}"; rec="$rec,\"label\":$_J,\"verdict\":\"$1\""
+  if [ $# -gt 2 ]; then
+    json_str "$3"; rec="$rec,\"category\":$_J"
+    json_str "$4"; rec="$rec,\"scan_id\":$_J,\"detections\":["
+    if [ -n "$5" ]; then
+      local IFS=','; for d in $5; do json_str "${d# }"; rec="$rec$_J,"; done; rec="${rec%,}"
+    fi
+    if [ "$6" = "1" ]; then rec="$rec],\"chunks\":0,\"cache\":true"; else rec="$rec],\"chunks\":1,\"cache\":false"; fi
+  fi
+  [ -n "$WM_SKIP" ] && rec="$rec,\"watermark\":$WM_SKIP"
+  [ -n "$DELTA_SKIP" ] && rec="$rec,\"delta\":$DELTA_SKIP"
+  [ -n "$BREAKER" ] && rec="$rec,\"breaker\":\"$BREAKER\""
+  [ -n "$DEFERRED$DEFER_BLOCK" ] && rec="$rec,\"deferred\":true"
+  if [ -n "$T_START" ] && [ -n "$T_NOW" ]; then
+    [ -n "$T_EXTRACT" ] && lat="\"extract\":$(( T_EXTRACT - T_START )),"
+    [ -n "$T_SCAN" ] && lat="$lat\"scan\":$(( T_NOW - T_SCAN )),"
+    [ -n "$QUEUE_MS" ] && lat="$lat\"queue\":$QUEUE_MS,"
+    rec="$rec,\"latency_ms\":{$lat\"total\":$(( T_NOW - T_START ))}"
+  fi
+  json_str "$2"; rec="$rec,\"msg\":$_J}"
+  LOG_BUF="$LOG_BUF$rec"$'\n'
+  return 0
+}
+log_flush() {
+  [ -n "$LOG_BUF" ] || return 0
+  local dir="${LOG_FILE%/*}" size i
+  [ "$dir" != "$LOG_FILE" ] && [ ! -d "$dir" ] && mkdir -p "$dir" 2>/dev/null
+  if [ "$LOG_MAX_BYTES" -gt 0 ] && [ -s "$LOG_FILE" ]; then
+    size="$(wc -c <"$LOG_FILE" 2>/dev/null)"
+    if [ $(( ${size:-0} + ${#LOG_BUF} )) -gt "$LOG_MAX_BYTES" ]; then
+      for (( i = LOG_KEEP - 1; i >= 1; i-- )); do
+        [ -f "$LOG_FILE.$i" ] && mv -f "$LOG_FILE.$i" "$LOG_FILE.$(( i + 1 ))" 2>/dev/null
+      done
+      mv -f "$LOG_FILE" "$LOG_FILE.1" 2>/dev/null
+    fi
+  fi
+  printf '%s' "$LOG_BUF" >>"$LOG_FILE" 2>/dev/null
+  LOG_BUF=""
   return 0
 }
+trap log_flush EXIT
 
 # ----------------------------------------------------------------------------
 # dependency + input-integrity gate — fail-CLOSED on input, warn on output.
@@ -308,25 +475,25 @@ DEP_ERR=""
 command -v jq   >/dev/null 2>&1 || DEP_ERR="required dependency 'jq' is not installed"
 command -v curl >/dev/null 2>&1 || DEP_ERR="${DEP_ERR:+$DEP_ERR; }required dependency 'curl' is not installed"
 if [ -z "$DEP_ERR" ] && [ -n "$(printf '%s' "$INPUT" | tr -d '[:space:]')" ]; then
-  if printf '%s' "$INPUT" | jq -e . >/dev/null 2>&1; then
-    # valid JSON, but a hook payload is always a top-level object; a bare string/number/array/bool
-    # would extract to empty and fail open, so treat a non-object as unscannable.
-    if ! printf '%s' "$INPUT" | jq -e 'type=="object"' >/dev/null 2>&1; then
-      DEP_ERR="hook input is not a JSON object (primitive/array)"
-    elif ! printf '%s' "$INPUT" | jq -e 'def d: if (type=="object" or type=="array") then ([.[]|d]|max // -1)+1 else 0 end; d < 200' >/dev/null 2>&1; then
-      # jq's ENCODER truncates its OUTPUT past ~256 nesting depth (while its parser tolerates ~5000).
-      # A value nested that deep re-serializes (jc '.tool_input') to INVALID JSON at rc=0, then the
-      # extractor errors to empty and falls through to a silent allow. Reject past a generous bound
-      # (200, safely below the 256 encoder limit) as unscannable — closes the ~257..4999 band without
-      # over-blocking realistic deep-but-benign input (aligns with the pwsh collector cap).
-      DEP_ERR="hook input nesting exceeds scan depth (>=200)"
-    fi
-  else
-    DEP_ERR="hook input is not valid JSON (truncated / malformed / over-nested)"
-  fi
+  # One jq pass (a large tool result is parsed once here, not once per check):
+  #  - a hook payload is always a top-level object; a bare string/number/array/bool would extract
+  #    to empty and fail open, so treat a non-object as unscannable.
+  #  - jq's ENCODER truncates its OUTPUT past ~256 nesting depth (while its parser tolerates ~5000).
+  #    A value nested that deep re-serializes (jc '.tool_input') to INVALID JSON at rc=0, then the
+  #    extractor errors to empty and falls through to a silent allow. Reject past a generous bound
+  #    (200, safely below the 256 encoder limit) as unscannable — closes the ~257..4999 band without
+  #    over-blocking realistic deep-but-benign input (aligns with the pwsh collector cap).
+  #  - no output at all = jq could not parse it.
+  case "$(printf '%s' "$INPUT" | jq -r 'def d: if (type=="object" or type=="array") then ([.[]|d]|max // -1)+1 else 0 end;
+            if type != "object" then "type" elif d < 200 then "ok" else "depth" end' 2>/dev/null)" in
+    ok)    : ;;
+    type)  DEP_ERR="hook input is not a JSON object (primitive/array)" ;;
+    depth) DEP_ERR="hook input nesting exceeds scan depth (>=200)" ;;
+    *)     DEP_ERR="hook input is not valid JSON (truncated / malformed / over-nested)" ;;
+  esac
 fi
 if [ -n "$DEP_ERR" ]; then
-  log_line "${LABEL:-input}" "unscannable ($DEP_ERR)"
+  log_record unscannable "$DEP_ERR"
   case "$IEVENT" in
     PostToolUse|Stop)            render warn  "Prisma AIRS could not scan ($DEP_ERR) — content NOT scanned" ;;
     UserPromptSubmit|PreToolUse)
@@ -344,6 +511,34 @@ fi
 # ----------------------------------------------------------------------------
 [ -z "$IEVENT" ] && { dbg "unhandled event '$RAW_EVENT' for vendor '$VENDOR'"; render allow ""; }
 
+# ----------------------------------------------------------------------------
+# local scan sidecar (optional) — `node hooks.mjs --serve` holds warm AIRS connections and owns
+# retries / timeouts / chunking. When its socket exists and is ours, forward the raw event and render
+# the decision it returns; anything short of a clean 200 falls through to the direct path below. The
+# config tag (sha256 of the profile, fail mode and require-config — never the key, format as in
+# hooks-engine.mjs) makes a sidecar started with other settings, or none, answer non-200.
+# ----------------------------------------------------------------------------
+SIDECAR_SOCK="${AIRS_SIDECAR_SOCKET:-$HOME/.prisma-airs/sidecar.sock}"
+case "$(printf '%s' "${AIRS_SIDECAR:-1}" | tr '[:upper:]' '[:lower:]')" in 0|false|no) SIDECAR_SOCK="" ;; esac
+[ -n "$DEFERRED" ] && SIDECAR_SOCK=""
+if [ -n "$SIDECAR_SOCK" ] && [ -S "$SIDECAR_SOCK" ] && [ -O "$SIDECAR_SOCK" ]; then
+  if [ -n "$PROFILE_ID" ]; then SC_TAG="profile_id=$PROFILE_ID"; else SC_TAG="profile_name=$PROFILE_NAME"; fi
+  SC_TAG="$(printf 'airs-sidecar-config/v1\n%s\n%s\n%s' "$SC_TAG" "$FAIL_MODE" "$REQUIRE_CONFIG" | { sha256sum || shasum -a 256; } 2>/dev/null | cut -c1-16)"
+  SC_EVENT="$(jq -rn --arg e "$RAW_EVENT" '$e|@uri')"
+  # rewrite=0: this engine can't apply DLP masks, so the sidecar must return plain allow/warn/block
+  SC_RESP="$(printf '%s' "$INPUT" | curl -s --unix-socket "$SIDECAR_SOCK" --max-time $(( TIMEOUT_S * (RETRIES + 1) * 2 + 1 )) \
+    -H "Content-Type: application/json" -w $'\n%{http_code}' --data-binary @- \
+    "http://localhost/v1/hook?vendor=$VENDOR&event=$SC_EVENT&rewrite=0&config=$SC_TAG" 2>/dev/null)"
+  if [ "${SC_RESP##*$'\n'}" = "200" ]; then
+    SC_OUT="$(jq -r '.decision.kind, (.decision.reason // .decision.message // "")' <<<"${SC_RESP%$'\n'*}" 2>/dev/null)"
+    SC_KIND="${SC_OUT%%$'\n'*}"; SC_TEXT="${SC_OUT#*$'\n'}"
+    case "$SC_KIND" in
+      allow|warn|block) dbg "decision from sidecar $SIDECAR_SOCK"; render "$SC_KIND" "$SC_TEXT" ;;
+    esac
+  fi
+  dbg "sidecar unavailable — scanning directly"
+fi
+
 # ----------------------------------------------------------------------------
 # jq helpers shared across content extraction
 # ----------------------------------------------------------------------------
@@ -396,14 +591,103 @@ tool_input_text() {
   esac
 }
 
+# delta_text — with DELTA_ON, replace TEXT for a Write / NotebookEdit (replace) over an existing file
+# (at most DELTA_MAX_BYTES, no NUL) with its path plus the new lines from the first to the last that
+# differ from the file on disk, DELTA_CONTEXT lines either side: the same single span node and
+# PowerShell take. A new file, or a change covering more than half the content, keeps TEXT whole.
+delta_text() {
+  local path new id old dir cwd region after size
+  case "$TOOL_NAME" in
+    Write)        path="$(jq -r '.file_path // empty' <<<"$TI" 2>/dev/null)"; new='.content' ;;
+    NotebookEdit) path="$(jq -r '.notebook_path // empty' <<<"$TI" 2>/dev/null)"; new='.new_source'
+                  id="$(jq -r 'if (.edit_mode // "replace") == "replace" then .cell_id // empty else empty end' <<<"$TI" 2>/dev/null)"
+                  [ -n "$id" ] || return 0 ;;
+    *)            return 0 ;;
+  esac
+  [ -n "$path" ] || return 0
+  old="$path"
+  if [ "${path#/}" = "$path" ]; then cwd="$(j '.cwd // empty')"; old="${cwd:-$PWD}/$path"; fi
+  [ -f "$old" ] || return 0
+  size="$(wc -c <"$old" 2>/dev/null | tr -d ' ')"
+  [ "${size:-0}" -le "$DELTA_MAX_BYTES" ] || return 0
+  dir="$(mktemp -d 2>/dev/null)" || return 0
+  if ! jq -j "$new"' | if type == "string" and length > 0 then . else error end' <<<"$TI" >"$dir/new" 2>/dev/null; then
+    rm -rf "$dir"; return 0
+  fi
+  if [ -n "$id" ]; then
+    jq -ej --arg id "$id" 'first(.cells[]? | select(.id == $id) | .source | if type == "array" then join("") else . end)' \
+      "$old" >"$dir/old" 2>/dev/null
+  else
+    cp "$old" "$dir/old" 2>/dev/null
+  fi
+  if [ $? -ne 0 ] || [ "$(tr -d '\000' <"$dir/old" | wc -c)" -ne "$(wc -c <"$dir/old")" ]; then
+    rm -rf "$dir"; return 0
+  fi
+  # a newline after each side makes awk's records the content split on "\n" (a trailing newline
+  # leaves an empty last line); the span runs from the common prefix to the common suffix, widened
+  # by DELTA_CONTEXT, and ends in "." so $( ) keeps its trailing empty lines (lines compare as
+  # strings: `"" ==` keeps "1.0" and "1" apart)
+  after="$(cat "$dir/new"; printf .)"; after="${after%.}"
+  printf '\n' >>"$dir/old"; printf '\n' >>"$dir/new"
+  region="$(awk -v c="$DELTA_CONTEXT" '
+    NR == FNR { a[++n] = $0; next }
+    { b[++m] = $0 }
+    END {
+      pre = 0; while (pre < n && pre < m && a[pre + 1] "" == b[pre + 1] "") pre++
+      suf = 0; while (suf < n - pre && suf < m - pre && a[n - suf] "" == b[m - suf] "") suf++
+      if (pre < n || pre < m) {
+        f = pre - c; if (f < 0) f = 0
+        t = m - suf + c; if (t > m) t = m
+        for (i = f + 1; i <= t; i++) printf "%s%s", (i > f + 1 ? "\n" : ""), b[i]
+      }
+      printf "."
+    }
+  ' "$dir/old" "$dir/new")"
+  region="${region%.}"
+  rm -rf "$dir"
+  if [ $(( ${#region} * 2 )) -le "${#after}" ]; then
+    DELTA_SKIP=$(( ${#after} - ${#region} )); TEXT="$path${region:+$'\n'$region}"
+  fi
+  return 0
+}
+
 # extract EVERY string from a tool result, recursively (mirrors collectStrings) — string
 # VALUES plus object KEYS, so an injection hidden in a key (not a value) is still scanned.
-tool_output_text() { jq -r '([.. | strings] + [.. | objects | keys_unsorted[]]) | join("\n")' <<<"$1" 2>/dev/null; }
+# $1 is a jq path into the hook input, walked in place (no re-serialized copy of the result).
+# Budget-aware: strings are emitted one by one and the walk stops as soon as the text passes
+# MAX_BUDGET, so a huge result costs what is scanned, not its full size; the overflow check
+# below still sees more than MAX_BUDGET chars and fails over exactly as before.
+# With COMPACT_OUTPUT the walk is in document order and a key is emitted only the first time
+# it is seen, so the rows of a record array cost their values, not their schema, each time.
+# Integer-like keys come first in ascending order, as they do in a JavaScript object.
+COMPACT_JQ='
+  def airs_idx: test("\\A(0|[1-9][0-9]{0,9})\\z") and tonumber < 4294967295;
+  def airs_keys: keys_unsorted as $k
+    | if any($k[]; .[0:1] | . >= "0" and . <= "9") then ([$k[] | select(airs_idx)] | sort_by(tonumber)) + [$k[] | select(airs_idx | not)]
+      else $k end;
+  def airs_items: if type == "string" then select(length > 0)
+    elif type == "array" then .[] | airs_items
+    elif type == "object" then . as $o | airs_keys[] | (select(length > 0) | {k: .}), ($o[.] | airs_items)
+    else empty end;
+  def airs_compact: foreach airs_items as $i ({};
+      if ($i | type) == "string" then . elif has($i.k) then .[$i.k] = 1 else .[$i.k] = 0 end;
+      if ($i | type) == "string" then $i elif .[$i.k] == 0 then $i.k else empty end);'
+tool_output_text() {
+  if [ "$COMPACT_OUTPUT" = "1" ]; then
+    jq -r --argjson max "$MAX_BUDGET" "$COMPACT_JQ ($1)"' as $r | label $cap
+      | foreach ($r | airs_compact) as $s (0; . + ($s | length) + 1;
+          $s, (if . > $max + 1 then break $cap else empty end))' <<<"$INPUT" 2>/dev/null
+    return
+  fi
+  jq -r --argjson max "$MAX_BUDGET" "($1)"' as $r | label $cap
+    | foreach (($r | .. | strings), ($r | .. | objects | keys_unsorted[])) as $s (0; . + ($s | length) + 1;
+        $s, (if . > $max + 1 then break $cap else empty end))' <<<"$INPUT" 2>/dev/null
+}
 
 # ----------------------------------------------------------------------------
 # normalize per vendor + build the ScanPlan (KIND, TEXT, SERVER, TOOL, INTEXT)
 # ----------------------------------------------------------------------------
-KIND=""; TEXT=""; SERVER=""; TOOL=""; INTEXT=""; TOOL_NAME=""; STOP_ACTIVE="false"
+KIND=""; TEXT=""; SERVER=""; TOOL=""; INTEXT=""; TOOL_NAME=""; STOP_ACTIVE="false"; DELTA_SKIP=""
 SESSION=""; LABEL=""
 
 norm_tool_name() { # cursor: "MCP:server:tool" -> "mcp__server__tool" (colons only)
@@ -436,20 +720,23 @@ case "$IEVENT" in
     [ -z "$TI" ] && TI="{}"
     LABEL="${TOOL_NAME:-tool} input"
     TEXT="$(tool_input_text "$TOOL_NAME" "$TI")"
+    [ "$DELTA_ON" = "1" ] && delta_text
     tool_identity "$TOOL_NAME" "$TI" ;;
 
   PostToolUse)
     KIND="toolOutput"
     case "$VENDOR" in
-      cline)    TOOL_NAME="$(j '.postToolUse.toolName // empty')"; TI="$(jc '.postToolUse.parameters // {}')"; TR="$(jc '.postToolUse.result // null')" ;;
-      cursor)   TOOL_NAME="$(norm_tool_name "$(j '.tool_name // empty')")"; TI="$(jc '.tool_input // {}')"; TR="$(jc '.tool_response // .tool_output // null')" ;;
-      antigravity|gemini) TOOL_NAME="$(j '.tool_name // .toolCall.name // empty')"; TI="$(jc '.tool_input // .toolCall.args // {}')"; TR="$(jc '.tool_response // .tool_result // null')" ;;
-      *)        TOOL_NAME="$(j '.tool_name // empty')"; TI="$(jc '.tool_input // {}')"; TR="$(jc '.tool_response // .tool_result // null')" ;;
+      cline)    TOOL_NAME="$(j '.postToolUse.toolName // empty')"; TI="$(jc '.postToolUse.parameters // {}')"; TR='.postToolUse.result' ;;
+      cursor)   TOOL_NAME="$(norm_tool_name "$(j '.tool_name // empty')")"; TI="$(jc '.tool_input // {}')"; TR='.tool_response // .tool_output' ;;
+      antigravity|gemini) TOOL_NAME="$(j '.tool_name // .toolCall.name // empty')"; TI="$(jc '.tool_input // .toolCall.args // {}')"; TR='.tool_response // .tool_result' ;;
+      *)        TOOL_NAME="$(j '.tool_name // empty')"; TI="$(jc '.tool_input // {}')"; TR='.tool_response // .tool_result' ;;
     esac
-    [ -z "$TI" ] && TI="{}"; [ -z "$TR" ] && TR="null"
+    [ -z "$TI" ] && TI="{}"
     LABEL="${TOOL_NAME:-tool} output"
     TEXT="$(tool_output_text "$TR")"
     INTEXT="$(tool_input_text "$TOOL_NAME" "$TI")"
+    # the tool input is context for the output scan: clipped to one chunk, as in node (and in the cache key)
+    [ "${#INTEXT}" -gt "$MAX_CHARS" ] && INTEXT="${INTEXT:0:MAX_CHARS}"
     tool_identity "$TOOL_NAME" "$TI" ;;
 
   Stop)
@@ -477,7 +764,7 @@ CFG_ERR=""; UNCONFIGURED=0
 [ -z "$API_KEY" ] && { CFG_ERR="PRISMA_AIRS_API_KEY not set"; UNCONFIGURED=1; }
 [ -z "$CFG_ERR" ] && [ -z "$PROFILE_ID" ] && [ -z "$PROFILE_NAME" ] && CFG_ERR="PRISMA_AIRS_PROFILE_NAME or PRISMA_AIRS_PROFILE_ID not set"
 if [ -n "$CFG_ERR" ]; then
-  log_line "$LABEL" "config_error ($CFG_ERR)"
+  log_record config_error "$CFG_ERR"
   # Genuinely UNCONFIGURED (no key at all) + not strict -> pass through with a LOUD per-call warning,
   # so a copy-the-folder install before .env exists doesn't brick the agent. A key that IS set but
   # half-configured (no profile) is a real misconfig -> fall through to fail-closed on input.
@@ -492,15 +779,91 @@ if [ -n "$CFG_ERR" ]; then
   fi
 fi
 
+# ----------------------------------------------------------------------------
+# session id, portable (no macOS `md5`)
+# ----------------------------------------------------------------------------
+sha256_hex() { { command -v sha256sum >/dev/null 2>&1 && sha256sum || shasum -a 256; } 2>/dev/null | cut -c1-64; }
+SESSION="$(j '.session_id // .taskId // .trajectory_id // .conversation_id // .conversationId // empty')"
+if [ -z "$SESSION" ]; then
+  CWD="$(j '.cwd // empty')"; [ -z "$CWD" ] && CWD="$PWD"
+  SESSION="$(printf '%s' "$CWD" | sha256_hex | cut -c1-32)"
+fi
+[ "$DEFER_ON" = "1" ] && DEFER_SDIR="$DEFER_DIR/$(printf '%s' "$SESSION" | sha256_hex | cut -c1-32)"
+
+# deferred output findings for this session: a block stops this checkpoint, a warning rides on it
+if [ -n "$DEFER_SDIR" ] && [ "$IEVENT" != "PostToolUse" ] && [ -d "$DEFER_SDIR" ]; then
+  defer_collect
+  if [ -n "$DEFER_BLOCK" ]; then
+    LABEL="deferred findings"; log_record block "BLOCK $DEFER_BLOCK"; render block "$DEFER_BLOCK"
+  fi
+fi
+
 # nothing scannable -> allow silently
 if [ -z "$(printf '%s' "$TEXT" | tr -d '[:space:]')" ]; then
   dbg "no scannable content for $LABEL — allowing"; render allow ""
 fi
 
+# ----------------------------------------------------------------------------
+# transaction id (per-event)
+# ----------------------------------------------------------------------------
+TXN="$(j '.tool_use_id // .prompt_id // .turn_id // empty')"
+if [ -z "$TXN" ]; then
+  # per-event id: synthesize a UUID rather than reusing SESSION, so AIRS can distinguish
+  # turns even when the client (e.g. Cursor) gives no per-turn id.
+  TXN="$(uuidgen 2>/dev/null | tr '[:upper:]' '[:lower:]')"
+  [ -z "$TXN" ] && TXN="$(cat /proc/sys/kernel/random/uuid 2>/dev/null)"
+  [ -z "$TXN" ] && TXN="${IEVENT}-$$-$(date +%s 2>/dev/null)-${RANDOM}"
+fi
+if [ -n "$PROFILE_ID" ]; then PROFILE_KEY="profile_id=$PROFILE_ID"; else PROFILE_KEY="profile_name=$PROFILE_NAME"; fi
+
+# ----------------------------------------------------------------------------
+# Stop watermark — one file, "v1 <session> <bytes> <sha256>": how much of this session's answer AIRS
+# has cleared. An answer that starts with those bytes is scanned from WM_OVERLAP bytes before their
+# end (so text spanning the boundary is still seen whole); the same answer again is not scanned.
+# Byte offsets, so every engine reads the others' file. Only an ALLOW moves it.
+# ----------------------------------------------------------------------------
+wm_sum() { { printf 'airs-stop-watermark/v1\n%s\n' "$PROFILE_KEY"; cat; } | sha256_hex; }
+# wm_cut <byte> — drop TEXT's first <byte> bytes, backed off to a character boundary
+wm_cut() {
+  local LC_ALL=C from="$1"
+  while [ "$from" -gt 0 ]; do
+    case "${TEXT:$from:1}" in [$'\x80'-$'\xbf']) from=$(( from - 1 )) ;; *) break ;; esac
+  done
+  WM_SKIP="$from"; TEXT="${TEXT:$from}"
+}
+wm_put() {
+  local tmp="$WM_FILE.$$"
+  mkdir -p "$(dirname "$WM_FILE")" 2>/dev/null
+  if printf 'v1 %s %s %s\n' "$WM_TAG" "$(printf '%s' "$WM_TEXT" | wc -c | tr -d ' ')" \
+       "$(printf '%s' "$WM_TEXT" | wm_sum)" >"$tmp" 2>/dev/null; then
+    mv -f "$tmp" "$WM_FILE" 2>/dev/null || rm -f "$tmp" 2>/dev/null
+  fi
+  return 0
+}
+WM_TAG=""; WM_SKIP=""; WM_TEXT=""
+if [ "$IEVENT" = "Stop" ] && [ "$WM_ON" = "1" ]; then
+  WM_TAG="${SESSION//[[:space:]]/_}"; WM_TEXT="$TEXT"
+  if [ -f "$WM_FILE" ] && read -r wm_ver wm_tag wm_bytes wm_hash <"$WM_FILE" 2>/dev/null \
+     && [ "$wm_ver" = "v1" ] && [ "$wm_tag" = "$WM_TAG" ]; then
+    WM_LEN="$(printf '%s' "$TEXT" | wc -c | tr -d ' ')"
+    case "$wm_bytes" in ''|*[!0-9]*) wm_bytes=0 ;; esac
+    if [ "$wm_bytes" -gt 0 ] && [ "$wm_bytes" -le "$WM_LEN" ] \
+       && [ "$(printf '%s' "$TEXT" | head -c "$wm_bytes" | wm_sum)" = "$wm_hash" ]; then
+      if [ "$wm_bytes" = "$WM_LEN" ]; then
+        WM_SKIP="$wm_bytes"
+        log_record allow "allow [watermark] answer already scanned ($wm_bytes bytes)"
+        render allow ""
+      fi
+      wm_from=$(( wm_bytes - WM_OVERLAP )); [ "$wm_from" -lt 0 ] && wm_from=0
+      wm_cut "$wm_from"
+    fi
+  fi
+fi
+
 # oversized content -> bash can't chunk, so the tail is UNSCANNABLE. Treat as a coverage gap:
 # block on the input side (regardless of fail-mode), warn on output. Never silently allowed.
 if [ "${#TEXT}" -gt "$MAX_BUDGET" ]; then
-  log_line "$LABEL" "content_overflow (${#TEXT} chars > $MAX_BUDGET budget)"
+  log_record content_overflow "${#TEXT} chars > $MAX_BUDGET budget"
   if [ "$SIDE" = "input" ]; then
     render block "Content exceeds the AIRS scan budget (${#TEXT} chars) — blocking unscanned"
   else
@@ -508,27 +871,70 @@ if [ "${#TEXT}" -gt "$MAX_BUDGET" ]; then
   fi
 fi
 
+# ----------------------------------------------------------------------------
+# verdict cache — one file per key, "v1 allow <expires-epoch-s> <scan_id>". Only ALLOW verdicts are
+# ever written, so a hit can only skip a scan that AIRS already cleared. Writes go to a dot-temp file
+# and are renamed into place, so concurrent hooks never see a torn entry.
+# ----------------------------------------------------------------------------
+cache_get() {
+  local f="$CACHE_DIR/$CACHE_KEY" ver act exp sid
+  [ -f "$f" ] || return 1
+  read -r ver act exp sid <"$f" 2>/dev/null
+  case "$exp" in ''|*[!0-9]*) exp=0 ;; esac
+  if [ "$ver" = "v1" ] && [ "$act" = "allow" ] && [ "$exp" -gt "$(date +%s)" ]; then
+    CACHED_SCAN_ID="${sid:-unknown}"; return 0
+  fi
+  rm -f "$f" 2>/dev/null; return 1
+}
+cache_put() {
+  local tmp="$CACHE_DIR/.$CACHE_KEY.$$" n
+  mkdir -p "$CACHE_DIR" 2>/dev/null || return 0
+  if printf 'v1 allow %s %s\n' "$(( $(date +%s) + CACHE_TTL ))" "${1// /_}" >"$tmp" 2>/dev/null; then
+    mv -f "$tmp" "$CACHE_DIR/$CACHE_KEY" 2>/dev/null || rm -f "$tmp" 2>/dev/null
+  fi
+  # size cap: past CACHE_MAX entries, evict the oldest down to 90% (dot-temp files are not counted)
+  n="$(ls -1 "$CACHE_DIR" 2>/dev/null | wc -l | tr -d ' ')"
+  if [ "${n:-0}" -gt "$CACHE_MAX" ]; then
+    ( cd "$CACHE_DIR" 2>/dev/null && ls -1t | tail -n +$(( CACHE_MAX * 9 / 10 + 1 )) | xargs rm -f 2>/dev/null )
+  fi
+  return 0
+}
+mark_ms T_EXTRACT; T_SCAN="$T_EXTRACT"
+CACHE_KEY=""
+if [ "$CACHE_ON" = "1" ]; then
+  CACHE_KEY="$(printf 'airs-verdict-cache/v1\n%s\n%s\n%s\n%s\n%s\n%s\n%s' "$PROFILE_KEY" "$SIDE" "$KIND" "$SERVER" "$TOOL" \
+    "$(printf '%s' "$INTEXT" | sha256_hex)" "$(printf '%s' "$TEXT" | sha256_hex)" | sha256_hex)"
+  if [ ${#CACHE_KEY} -eq 64 ] && cache_get; then
+    log_record allow "allow [cache] [scan:$CACHED_SCAN_ID]" benign "$CACHED_SCAN_ID" "" 1
+    render allow ""
+  fi
+  [ ${#CACHE_KEY} -eq 64 ] || CACHE_KEY=""
+fi
+
+# ----------------------------------------------------------------------------
+# deferred output scan — hand the hook input to a detached worker (its own session where setsid
+# exists, so the agent reaping this hook does not take it along) and return at once
+# ----------------------------------------------------------------------------
+if [ -n "$DEFER_SDIR" ] && [ "$IEVENT" = "PostToolUse" ]; then
+  defer_sweep
+  DEFER_JOB="$DEFER_SDIR/$(date +%s)000-$$-$RANDOM"
+  if ( umask 077; mkdir -p "$DEFER_SDIR" && printf '%s' "$INPUT" >"$DEFER_JOB.job" ) 2>/dev/null; then
+    if command -v setsid >/dev/null 2>&1; then
+      AIRS_DEFERRED="$DEFER_JOB" setsid bash "$0" --vendor "$VENDOR" ${RAW_EVENT:+--event "$RAW_EVENT"} <"$DEFER_JOB.job" >/dev/null 2>&1 &
+    else
+      AIRS_DEFERRED="$DEFER_JOB" nohup bash "$0" --vendor "$VENDOR" ${RAW_EVENT:+--event "$RAW_EVENT"} <"$DEFER_JOB.job" >/dev/null 2>&1 &
+    fi
+    log_record deferred "deferred: scanning in the background"
+    render allow ""
+  fi
+fi
+
 # ----------------------------------------------------------------------------
 # build AIRS request body (content type depends on KIND)
 # ----------------------------------------------------------------------------
 if [ -n "$PROFILE_ID" ]; then AI_PROFILE="$(jq -nc --arg id "$PROFILE_ID" '{profile_id:$id}')"
 else AI_PROFILE="$(jq -nc --arg n "$PROFILE_NAME" '{profile_name:$n}')"; fi
 
-# transaction id (per-event) + session id, portable (no macOS `md5`)
-SESSION="$(j '.session_id // .taskId // .trajectory_id // .conversation_id // .conversationId // empty')"
-if [ -z "$SESSION" ]; then
-  CWD="$(j '.cwd // empty')"; [ -z "$CWD" ] && CWD="$PWD"
-  SESSION="$(printf '%s' "$CWD" | { command -v sha256sum >/dev/null 2>&1 && sha256sum || shasum -a 256; } 2>/dev/null | cut -c1-32)"
-fi
-TXN="$(j '.tool_use_id // .prompt_id // .turn_id // empty')"
-if [ -z "$TXN" ]; then
-  # per-event id: synthesize a UUID rather than reusing SESSION, so AIRS can distinguish
-  # turns even when the client (e.g. Cursor) gives no per-turn id.
-  TXN="$(uuidgen 2>/dev/null | tr '[:upper:]' '[:lower:]')"
-  [ -z "$TXN" ] && TXN="$(cat /proc/sys/kernel/random/uuid 2>/dev/null)"
-  [ -z "$TXN" ] && TXN="${IEVENT}-$$-$(date +%s 2>/dev/null)-${RANDOM}"
-fi
-
 build_content() {
   case "$KIND" in
     prompt)   jq -nc --arg t "$TEXT" --argjson ca "$CODE_AWARE" '{prompt:$t} + (if $ca==1 then {code_prompt:$t} else {} end)' ;;
@@ -558,35 +964,294 @@ BODY="$(jq -nc \
     contents:[$content]}')"
 
 # ----------------------------------------------------------------------------
-# call AIRS (bounded retries + hard timeout)
+# shared AIRS health — one line per AIRS URL, "v1 <srtt_ms> <rttvar_ms> <failures> <open_until>".
+# With ADAPTIVE_ON a first attempt's timeout is srtt + 4*rttvar (RFC 6298) between TIMEOUT_MIN_MS and
+# TIMEOUT_MS; retries always get TIMEOUT_MS. While the breaker is open every call fails fast; after
+# the cooldown one hook, holding "<file>.probe" (created exclusively, holding its expiry), tries AIRS
+# again. Writes go through a temp file and a rename.
+# ----------------------------------------------------------------------------
+HEALTH_FILE=""; BREAKER=""
+[ "$HEALTH_ON" = "1" ] && HEALTH_FILE="$HEALTH_DIR/$(printf '%s' "$API_URL" | sha256_hex | cut -c1-16)"
+health_read() {
+  local v a b c d
+  H_SRTT=0; H_VAR=0; H_FAILS=0; H_OPEN=0
+  read -r v a b c d 2>/dev/null <"$HEALTH_FILE" || return 0
+  [ "$v" = "v1" ] || return 0
+  for v in "$a" "$b" "$c" "$d"; do case "$v" in ''|*[!0-9]*) return 0 ;; esac; done
+  H_SRTT=$a; H_VAR=$b; H_FAILS=$c; H_OPEN=$d
+}
+# health_gate — before each attempt: ATTEMPT_MS, and HEALTH_OPEN (fail fast) or HEALTH_PROBE
+health_gate() {
+  local now exp
+  ATTEMPT_MS="$TIMEOUT_MS"; HEALTH_OPEN=""; HEALTH_PROBE=0
+  [ -n "$HEALTH_FILE" ] || return 0
+  health_read
+  if [ "$ADAPTIVE_ON" = "1" ] && [ "$attempt" -eq 0 ] && [ "$H_SRTT" -gt 0 ]; then
+    ATTEMPT_MS=$(( H_SRTT + 4 * H_VAR ))
+    [ "$ATTEMPT_MS" -lt "$TIMEOUT_MIN_MS" ] && ATTEMPT_MS="$TIMEOUT_MIN_MS"
+    [ "$ATTEMPT_MS" -gt "$TIMEOUT_MS" ] && ATTEMPT_MS="$TIMEOUT_MS"
+  fi
+  [ "$H_FAILS" -ge "$BREAKER_FAILURES" ] || return 0
+  now="$(date +%s)"
+  if [ "$now" -lt "$H_OPEN" ]; then
+    HEALTH_OPEN="circuit open after $H_FAILS AIRS failures in a row, next probe in $(( H_OPEN - now ))s"; return 0
+  fi
+  mkdir -p "$HEALTH_DIR" 2>/dev/null
+  for _ in 1 2; do
+    if ( set -o noclobber; printf '%s\n' "$(( now + BREAKER_COOLDOWN_S + TIMEOUT_S ))" >"$HEALTH_FILE.probe" ) 2>/dev/null; then
+      HEALTH_PROBE=1; return 0
+    fi
+    read -r exp 2>/dev/null <"$HEALTH_FILE.probe"
+    case "$exp" in ''|*[!0-9]*) exp=0 ;; esac
+    [ "$exp" -ge "$now" ] && break
+    rm -f "$HEALTH_FILE.probe" 2>/dev/null
+  done
+  HEALTH_OPEN="circuit open after $H_FAILS AIRS failures in a row, probe in progress"
+}
+# health_note <ok 0|1|-> <sample_ms, 0 = none> — fold one attempt into the shared state; "-" is a 429
+# or a timeout this hook set below TIMEOUT_MS, a latency sample that does not count toward the breaker.
+# The read-modify-write holds "<file>.lock" (created exclusively, holding its expiry, like the probe
+# claim); a hook that cannot take it within half a second drops its sample.
+# health_lock_stale <file> <now_s> — expiry passed (an empty lock may be mid-write: stale after a minute)
+health_lock_stale() {
+  local exp=""
+  read -r exp 2>/dev/null <"$1"
+  case "$exp" in
+    '') [ -n "$(find "$1" -mmin +1 2>/dev/null)" ] ;;
+    *[!0-9]*) return 0 ;;
+    *) [ "$exp" -lt "$2" ] ;;
+  esac
+}
+# health_lock_steal <now_s> — takeovers run one at a time under "<file>.steal" (created exclusively;
+# one older than a minute was left by a dead hook), and the lock is checked again once it is held. The
+# stale lock is moved aside before it is deleted; one that turns out to be fresh is linked back.
+health_lock_steal() {
+  local aside="$HEALTH_FILE.lock.$$"
+  health_lock_stale "$HEALTH_FILE.lock" "$1" || return 0
+  if ! ( set -o noclobber; : >"$HEALTH_FILE.steal" ) 2>/dev/null; then
+    [ -n "$(find "$HEALTH_FILE.steal" -mmin +1 2>/dev/null)" ] && rm -f "$HEALTH_FILE.steal" 2>/dev/null
+    return 0
+  fi
+  if health_lock_stale "$HEALTH_FILE.lock" "$1" && mv -f "$HEALTH_FILE.lock" "$aside" 2>/dev/null; then
+    health_lock_stale "$aside" "$1" || ln "$aside" "$HEALTH_FILE.lock" 2>/dev/null
+    rm -f "$aside" 2>/dev/null
+  fi
+  rm -f "$HEALTH_FILE.steal" 2>/dev/null
+}
+health_note() {
+  [ -n "$HEALTH_FILE" ] || return 0
+  local i=0 now
+  mkdir -p "$HEALTH_DIR" 2>/dev/null
+  while [ "$i" -lt 50 ]; do
+    now="$(date +%s)"
+    if ( set -o noclobber; printf '%s\n' "$(( now + 2 ))" >"$HEALTH_FILE.lock" ) 2>/dev/null; then
+      health_update "$@"; rm -f "$HEALTH_FILE.lock" 2>/dev/null; break
+    fi
+    [ -e "$HEALTH_FILE.lock" ] && health_lock_steal "$now"
+    sleep 0.01; i=$(( i + 1 ))
+  done
+  [ "$HEALTH_PROBE" = "1" ] && rm -f "$HEALTH_FILE.probe" 2>/dev/null
+  return 0
+}
+health_update() {
+  local d
+  health_read
+  if [ "$2" -gt 0 ]; then
+    if [ "$H_SRTT" -eq 0 ]; then H_SRTT=$2; H_VAR=$(( ($2 + 1) / 2 ))
+    else
+      d=$(( H_SRTT - $2 )); [ "$d" -lt 0 ] && d=$(( -d ))
+      H_VAR=$(( (3 * H_VAR + d + 2) / 4 )); H_SRTT=$(( (7 * H_SRTT + $2 + 4) / 8 ))
+    fi
+  fi
+  if [ "$1" = "1" ]; then H_FAILS=0; H_OPEN=0
+  elif [ "$1" = "0" ]; then
+    H_FAILS=$(( H_FAILS + 1 ))
+    [ "$H_FAILS" -ge "$BREAKER_FAILURES" ] && H_OPEN=$(( $(date +%s) + BREAKER_COOLDOWN_S ))
+  fi
+  if printf 'v1 %s %s %s %s\n' "$H_SRTT" "$H_VAR" "$H_FAILS" "$H_OPEN" >"$HEALTH_FILE.$$" 2>/dev/null; then
+    mv -f "$HEALTH_FILE.$$" "$HEALTH_FILE" 2>/dev/null || rm -f "$HEALTH_FILE.$$" 2>/dev/null
+  fi
+  return 0
+}
+
+# ----------------------------------------------------------------------------
+# admission control — per API key, in LIMIT_DIR/<first 16 hex of sha256(key)>: one "slot.<i>" file
+# (i < MAX_INFLIGHT) per AIRS call in flight, created exclusively and holding "<expiry> <pid>" (free
+# again once expired or that process is gone), and with RATE_PER_S a token bucket "bucket" =
+# "v1 <millitokens> <updated_ms>", changed under "bucket.lock". A hook waits up to QUEUE_MAX_MS
+# (never past TIMEOUT_MS) for a slot and a token; QUEUE_MS is the wait, LIMIT_ERR set on giving up.
+# ----------------------------------------------------------------------------
+SLOT=""; QUEUE_MS=""; LIMIT_ERR=""
+now_ms() { mark_ms _NOW; [ -n "$_NOW" ] || _NOW=$(( $(date +%s) * 1000 )); }
+# limit_held <file> <now_s> — is this slot/lock still taken? (unreadable = taken, for this sweep)
+limit_held() {
+  local exp="" pid=""
+  read -r exp pid 2>/dev/null <"$1"
+  case "$pid" in ''|*[!0-9]*|0) exp="" ;; esac
+  case "$exp" in
+    ''|*[!0-9]*) [ -z "$(find "$1" -mmin +1 2>/dev/null)" ] ;;   # being written, or left half-written
+    *) [ "$exp" -ge "$2" ] && kill -0 "$pid" 2>/dev/null ;;
+  esac
+}
+# limit_claim <file> <expiry_s> — 0 claimed, 1 taken, 2 cannot create files here (no limiting)
+limit_claim() {
+  for _ in 1 2; do
+    ( set -o noclobber; printf '%s %s\n' "$2" "$$" >"$1" ) 2>/dev/null && return 0
+    [ -e "$1" ] || return 2
+    limit_held "$1" $(( _NOW / 1000 )) && return 1
+    rm -f "$1" 2>/dev/null
+  done
+  return 1
+}
+# limit_token — take one token from the bucket: TOKEN_WAIT=0, or the ms until the next one is due
+limit_token() {
+  local v="" t="" at="" cap=$(( RATE_PER_S * 1000 )) rc
+  TOKEN_WAIT=20
+  limit_claim "$LIMIT_PATH/bucket.lock" $(( _NOW / 1000 + 2 )); rc=$?
+  [ "$rc" -eq 2 ] && TOKEN_WAIT=0
+  [ "$rc" -eq 0 ] || return 0
+  read -r v t at 2>/dev/null <"$LIMIT_PATH/bucket"
+  case "$t" in ''|*[!0-9]*) v="" ;; esac
+  case "$at" in ''|*[!0-9]*) v="" ;; esac
+  if [ "$v" = "v1" ]; then
+    [ "$_NOW" -gt "$at" ] && t=$(( t + (_NOW - at) * RATE_PER_S ))
+    [ "$t" -gt "$cap" ] && t=$cap
+  else t=$cap; fi
+  if [ "$t" -ge 1000 ]; then TOKEN_WAIT=0; t=$(( t - 1000 ))
+  else TOKEN_WAIT=$(( (1000 - t + RATE_PER_S - 1) / RATE_PER_S )); fi
+  if printf 'v1 %s %s\n' "$t" "$_NOW" >"$LIMIT_PATH/bucket.$$" 2>/dev/null; then
+    mv -f "$LIMIT_PATH/bucket.$$" "$LIMIT_PATH/bucket" 2>/dev/null || rm -f "$LIMIT_PATH/bucket.$$" 2>/dev/null
+  fi
+  rm -f "$LIMIT_PATH/bucket.lock" 2>/dev/null
+}
+limit_admit() {
+  local budget waited=0 slept="" first i rc wait t0
+  [ "$LIMIT_ON" = "1" ] && [ -n "$API_KEY" ] || return 0
+  LIMIT_PATH="$LIMIT_DIR/$(printf '%s' "$API_KEY" | sha256_hex | cut -c1-16)"
+  mkdir -p "$LIMIT_PATH" 2>/dev/null || return 0
+  budget="$QUEUE_MAX_MS"; [ "$budget" -gt "$TIMEOUT_MS" ] && budget="$TIMEOUT_MS"
+  mark_ms t0
+  while :; do
+    now_ms
+    if [ -z "$SLOT" ]; then
+      first=$(( RANDOM % MAX_INFLIGHT )); i=0
+      while [ "$i" -lt "$MAX_INFLIGHT" ]; do
+        limit_claim "$LIMIT_PATH/slot.$(( (first + i) % MAX_INFLIGHT ))" $(( _NOW / 1000 + TIMEOUT_S * (RETRIES + 2) + 5 )); rc=$?
+        [ "$rc" -eq 0 ] && { SLOT="$LIMIT_PATH/slot.$(( (first + i) % MAX_INFLIGHT ))"; break; }
+        [ "$rc" -eq 2 ] && return 0
+        i=$(( i + 1 ))
+      done
+    fi
+    if [ -z "$SLOT" ]; then wait=$(( 20 + RANDOM % 30 ))
+    elif [ "$RATE_PER_S" -gt 0 ]; then limit_token; wait="$TOKEN_WAIT"
+    else wait=0; fi
+    [ "$wait" -eq 0 ] && break
+    if [ -n "$t0" ]; then now_ms; waited=$(( _NOW - t0 )); fi
+    if [ "$waited" -ge "$budget" ] || { [ -n "$SLOT" ] && [ $(( waited + wait )) -gt "$budget" ]; }; then
+      if [ -z "$SLOT" ]; then LIMIT_ERR="no AIRS slot free after ${waited}ms ($MAX_INFLIGHT in flight per API key)"
+      else LIMIT_ERR="AIRS rate limit: no token within ${budget}ms ($RATE_PER_S/s per API key)"; rm -f "$SLOT" 2>/dev/null; SLOT=""; fi
+      break
+    fi
+    wait=$(( wait + RANDOM % 10 )); [ "$wait" -gt $(( budget - waited )) ] && wait=$(( budget - waited ))
+    sleep "$(printf '%d.%03d' $(( wait / 1000 )) $(( wait % 1000 )))"
+    [ -n "$t0" ] || waited=$(( waited + wait ))
+    slept=1
+  done
+  if [ -n "$slept" ]; then
+    if [ -n "$t0" ]; then now_ms; waited=$(( _NOW - t0 )); fi
+    QUEUE_MS="$waited"
+  fi
+  return 0
+}
+
+# retry_pause — before retrying a 429: wait out its Retry-After (delay-seconds) or, without one, a
+# jittered backoff (250 ms × 2^attempt, the upper half at random). All pauses of one scan stay within
+# TIMEOUT_MS / 2; returns 1 (stop retrying) when Retry-After asks for more than is left.
+PAUSED_MS=0
+retry_pause() {
+  local after="" wait base
+  [ -n "$HDR_FILE" ] && after="$(tr -d '\r' <"$HDR_FILE" 2>/dev/null \
+    | awk -F: 'tolower($1) == "retry-after" { v = $2; gsub(/[ \t]/, "", v) } END { print v }')"
+  case "$after" in ''|*[!0-9]*|???????*) after="" ;; esac
+  if [ -n "$after" ]; then
+    wait=$(( 10#$after * 1000 ))
+    if [ $(( PAUSED_MS + wait )) -gt $(( TIMEOUT_MS / 2 )) ]; then
+      SCAN_ERR="$SCAN_ERR (Retry-After ${after}s is past the retry budget)"; return 1
+    fi
+  else
+    base=$(( 250 << (attempt > 10 ? 10 : attempt) )); wait=$(( base / 2 + RANDOM % (base / 2 + 1) ))
+    [ "$wait" -gt $(( TIMEOUT_MS / 2 - PAUSED_MS )) ] && wait=$(( TIMEOUT_MS / 2 - PAUSED_MS ))
+  fi
+  [ "$wait" -gt 0 ] && sleep "$(printf '%d.%03d' $(( wait / 1000 )) $(( wait % 1000 )))"
+  PAUSED_MS=$(( PAUSED_MS + wait ))
+  return 0
+}
+
+# ----------------------------------------------------------------------------
+# call AIRS (admission control + bounded retries + adaptive timeout + circuit breaker)
 # ----------------------------------------------------------------------------
 SCAN=""; SCAN_ERR=""
 attempt=0
+limit_admit
+[ -n "$LIMIT_ERR" ] && attempt=$(( RETRIES + 1 ))
+# response headers (for Retry-After) only matter when there is a retry to pace
+HDR_FILE=""; [ "$attempt" -lt "$RETRIES" ] && HDR_FILE="$(mktemp 2>/dev/null)"
 while [ "$attempt" -le "$RETRIES" ]; do
+  health_gate
+  if [ -n "$HEALTH_OPEN" ]; then SCAN_ERR="${SCAN_ERR:+$SCAN_ERR; }$HEALTH_OPEN"; BREAKER=open; break; fi
+  # the queue wait comes out of this hook's timeout
+  [ -n "$QUEUE_MS" ] && [ "$ATTEMPT_MS" -gt $(( TIMEOUT_MS - QUEUE_MS )) ] && ATTEMPT_MS=$(( TIMEOUT_MS - QUEUE_MS ))
+  [ "$ATTEMPT_MS" -lt 1 ] && ATTEMPT_MS=1
+  ATTEMPT_S="$(printf '%d.%03d' $(( ATTEMPT_MS / 1000 )) $(( ATTEMPT_MS % 1000 )))"
   # Body on STDIN (--data-binary @-) so a large tool output never hits ARG_MAX; the API key
   # goes via a process-substitution fd (-H @<(...)) so it never appears in the process table
   # (ps) or on disk. curl >= 7.55 (2017) supports -H @file.
-  RESP="$(printf '%s' "$BODY" | curl -s -L --max-time "$TIMEOUT_S" \
+  RESP="$(printf '%s' "$BODY" | curl -s -L --max-time "$ATTEMPT_S" \
     -H "Content-Type: application/json" -H "Accept: application/json" \
     -H @<(printf 'x-pan-token: %s\n' "$API_KEY") \
-    -w $'\n%{http_code}' --data-binary @- "$API_URL" 2>/dev/null)"
+    -D "${HDR_FILE:-/dev/null}" -w $'\n%{time_total}\n%{http_code}' --data-binary @- "$API_URL" 2>/dev/null)"
   CURL_RC=$?
   HTTP_CODE="${RESP##*$'\n'}"; BODY_TEXT="${RESP%$'\n'*}"
-  if [ "$CURL_RC" -ne 0 ]; then SCAN_ERR="curl failed (rc=$CURL_RC, timeout ${TIMEOUT_S}s)";
+  SEND_S="${BODY_TEXT##*$'\n'}"; BODY_TEXT="${BODY_TEXT%$'\n'*}"
+  SEND_S="${SEND_S/,/.}"; SEND_MS="${SEND_S%%.*}"; SEND_F="${SEND_S#*.}000"
+  case "$SEND_MS${SEND_F:0:3}" in ''|*[!0-9]*) SEND_MS=0 ;; *) SEND_MS=$(( 10#$SEND_MS * 1000 + 10#${SEND_F:0:3} )) ;; esac
+  [ "$SEND_MS" -lt 1 ] && SEND_MS=1   # an answer is always a sample, however fast
+  if [ "$CURL_RC" -eq 28 ] && [ "$ATTEMPT_MS" -lt "$TIMEOUT_MS" ]; then health_note - "$ATTEMPT_MS"
+  elif [ "$CURL_RC" -eq 28 ]; then health_note 0 "$ATTEMPT_MS"
+  elif [ "$CURL_RC" -ne 0 ]; then health_note 0 0
+  else case "$HTTP_CODE" in 429) health_note - "$SEND_MS" ;; 5??) health_note 0 "$SEND_MS" ;; *) health_note 1 "$SEND_MS" ;; esac; fi
+  if [ "$CURL_RC" -ne 0 ]; then SCAN_ERR="curl failed (rc=$CURL_RC, timeout ${ATTEMPT_S}s)";
   elif [ "${HTTP_CODE:0:1}" != "2" ]; then
     SCAN_ERR="HTTP $HTTP_CODE: $(printf '%s' "$BODY_TEXT" | head -c 200)"
     # 4xx (except 429) won't change on retry — don't waste a round-trip on a bad key/profile.
     case "$HTTP_CODE" in 429|5??) : ;; 4??) break ;; esac
+    if [ "$HTTP_CODE" = "429" ] && [ "$attempt" -lt "$RETRIES" ]; then retry_pause || break; fi
   else SCAN="$BODY_TEXT"; SCAN_ERR=""; break; fi
   attempt=$((attempt+1))
 done
+[ -n "$SLOT" ] && rm -f "$SLOT" 2>/dev/null
+[ -n "$HDR_FILE" ] && rm -f "$HDR_FILE" 2>/dev/null
+
+# ----------------------------------------------------------------------------
+# no turn to call AIRS -> fail policy, reported as admission_timeout (AIRS was never asked)
+# ----------------------------------------------------------------------------
+if [ -n "$LIMIT_ERR" ]; then
+  log_record admission_timeout "error($LIMIT_ERR)" admission_timeout unknown "" 0
+  if [ "$IEVENT" = "Stop" ]; then
+    render warn "AIRS scan not sent at Stop (local admission: $LIMIT_ERR) — allowing"
+  elif [ "$FAIL_MODE" = "closed" ] && [ "$SIDE" = "input" ]; then
+    render block "Prisma AIRS scan not sent (local admission: $LIMIT_ERR) — blocking (fail-closed)"
+  else
+    render warn "AIRS scan not sent (local admission: $LIMIT_ERR) — allowing (fail-open)"
+  fi
+fi
 
 # ----------------------------------------------------------------------------
 # scan error -> fail policy
 # ----------------------------------------------------------------------------
 if [ -n "$SCAN_ERR" ] || [ -z "$SCAN" ]; then
   [ -z "$SCAN_ERR" ] && SCAN_ERR="empty response"
-  log_line "$LABEL" "error($SCAN_ERR)"
+  log_record error "error($SCAN_ERR)" scan_error unknown "" 0
   if [ "$IEVENT" = "Stop" ]; then
     render warn "AIRS scan error at Stop ($SCAN_ERR) — allowing"
   elif [ "$FAIL_MODE" = "closed" ] && [ "$SIDE" = "input" ]; then
@@ -610,16 +1275,18 @@ if [ "$ACTION" = "block" ]; then
   REASON="Blocked by Prisma AIRS: $CATEGORY"
   [ -n "$DETS" ] && REASON="$REASON [$DETS]"
   REASON="$REASON (scan_id: $SCAN_ID)"
-  log_line "$LABEL" "BLOCK $REASON"
+  log_record block "BLOCK $REASON" "$CATEGORY" "$SCAN_ID" "$DETS" 0
   render block "$REASON"
 elif [ "$ACTION" = "allow" ]; then
   TAG="allow"; [ -n "$DETS" ] && TAG="allow [$DETS]"; TAG="$TAG [scan:$SCAN_ID]"
-  log_line "$LABEL" "$TAG"
+  log_record allow "$TAG" "$CATEGORY" "$SCAN_ID" "$DETS" 0
+  [ -n "$CACHE_KEY" ] && cache_put "$SCAN_ID"
+  [ -n "$WM_TAG" ] && wm_put
   render allow ""
 else
   # Unrecognized action (partial response / API contract drift) is NOT clean -> fail-mode
   # instead of silently allowing.
-  log_line "$LABEL" "unexpected action '$ACTION' — fail-mode ($FAIL_MODE)"
+  log_record unexpected_action "unexpected action '$ACTION' — fail-mode ($FAIL_MODE)" "$CATEGORY" "$SCAN_ID" "$DETS" 0
   if [ "$FAIL_MODE" = "closed" ] && [ "$SIDE" = "input" ]; then
     render block "Prisma AIRS returned an unexpected action ('$ACTION') — blocking (fail-closed)"
   else
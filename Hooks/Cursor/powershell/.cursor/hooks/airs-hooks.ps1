@@ -20,6 +20,7 @@ param(
   [string]$EventName = ''
 )
 $ErrorActionPreference = 'Stop'
+$Clock = [System.Diagnostics.Stopwatch]::StartNew()   # audit-log latency_ms
 # Suppress the WARNING stream: ConvertTo-Json emits a depth-truncation warning that, on this host,
 # can surface on STDOUT and corrupt the deny-JSON decision channel (clients parse stdout as JSON).
 $WarningPreference = 'SilentlyContinue'
@@ -50,8 +51,27 @@ $ApiKey      = $env:PRISMA_AIRS_API_KEY
 $ProfileId   = $env:PRISMA_AIRS_PROFILE_ID
 $ProfileName = $env:PRISMA_AIRS_PROFILE_NAME
 $LogFile     = if ($env:SECURITY_LOG_PATH) { $env:SECURITY_LOG_PATH } else { '' }   # per-agent default set below
+$LogMaxBytes = IntEnv $env:AIRS_LOG_MAX_BYTES 5000000
+$LogKeep     = IntEnv $env:AIRS_LOG_KEEP 3; if ($LogKeep -lt 1) { $LogKeep = 3 }
 $TimeoutMs   = IntEnv $env:AIRS_TIMEOUT_MS 10000
 $Retries     = IntEnv $env:AIRS_RETRIES 1
+# shared AIRS health, one file per AIRS URL for every hook on the machine (format: Hooks/README.md):
+# a circuit breaker applies the fail mode at once after $BreakerFailures failures in a row, and with
+# AIRS_ADAPTIVE_TIMEOUT a first attempt's timeout follows a latency estimate ($TimeoutMs is the ceiling)
+$HealthOn    = ($null -eq $env:AIRS_HEALTH) -or ($env:AIRS_HEALTH -in @('1','true','yes'))
+$AdaptiveOn  = ($env:AIRS_ADAPTIVE_TIMEOUT -in @('1','true','yes'))
+$HealthDir   = if ($env:AIRS_HEALTH_DIR) { $env:AIRS_HEALTH_DIR } else { Join-Path ([Environment]::GetFolderPath('UserProfile')) '.prisma-airs/health' }
+$TimeoutMinMs = IntEnv $env:AIRS_TIMEOUT_MIN_MS 5000
+$BreakerFailures = IntEnv $env:AIRS_BREAKER_FAILURES 3; if ($BreakerFailures -lt 1) { $BreakerFailures = 3 }
+$BreakerCooldownS = IntEnv $env:AIRS_BREAKER_COOLDOWN_S 30
+# machine-local admission control per API key, shared by every hook (format: Hooks/README.md): at most
+# $MaxInflight AIRS calls at once and, when $RatePerS is set, that many a second; a hook queues up to
+# $QueueMaxMs for its turn and the wait comes out of its timeout
+$LimitOn     = ($null -eq $env:AIRS_LIMIT) -or ($env:AIRS_LIMIT -in @('1','true','yes'))
+$LimitDir    = if ($env:AIRS_LIMIT_DIR) { $env:AIRS_LIMIT_DIR } else { Join-Path ([Environment]::GetFolderPath('UserProfile')) '.prisma-airs/limits' }
+$MaxInflight = IntEnv $env:AIRS_MAX_INFLIGHT 8; if ($MaxInflight -lt 1) { $MaxInflight = 8 }
+$RatePerS    = IntEnv $env:AIRS_RATE_PER_S 0
+$QueueMaxMs  = IntEnv $env:AIRS_QUEUE_MAX_MS ([int][math]::Floor($TimeoutMs / 2))
 # normalize case/whitespace so "CLOSED" / "Closed" / " closed " all mean closed; only a clean "open" opts out.
 $FailMode    = if ($env:AIRS_FAIL_MODE) { $env:AIRS_FAIL_MODE.Trim().ToLower() } else { 'closed' }
 if ($FailMode -ne 'open') { $FailMode = 'closed' }
@@ -65,11 +85,34 @@ $RequireConfig = ($env:AIRS_REQUIRE_CONFIG -in @('1','true','yes'))
 $Suffix      = if ($env:AIRS_APP_SUFFIX) { $env:AIRS_APP_SUFFIX } elseif ($env:CLAUDE_CODE_APP_SUFFIX) { $env:CLAUDE_CODE_APP_SUFFIX } else { '' }
 $Debug       = ($env:AIRS_DEBUG -in @('1','true','yes'))
 $CodeAware   = ($null -eq $env:AIRS_CODE_AWARE) -or ($env:AIRS_CODE_AWARE -in @('1','true','yes'))
+# compact tool output (opt-in): each distinct object key once per result, every string value in
+# order - the same text the node and bash engines build (format: Hooks/README.md)
+$CompactOut  = $env:AIRS_COMPACT_OUTPUT -in @('1','true','yes')
 $TimeoutSec  = [int][math]::Ceiling($TimeoutMs / 1000.0); if ($TimeoutSec -lt 1) { $TimeoutSec = 1 }
 # PowerShell has no chunking: content past this budget can't be scanned -> fail-mode.
 $MaxChars    = IntEnv $env:AIRS_MAX_CONTENT_CHARS 20000; if ($MaxChars -lt 1) { $MaxChars = 20000 }
 $MaxChunks   = IntEnv $env:AIRS_MAX_CHUNKS 6; if ($MaxChunks -lt 1) { $MaxChunks = 6 }
 $MaxBudget   = $MaxChars * $MaxChunks
+# opt-in on-disk allow-verdict cache, shared with the node/bash engines (format: Hooks/README.md)
+$CacheOn     = ($env:AIRS_VERDICT_CACHE -in @('1','true','yes'))
+$CacheDir    = if ($env:AIRS_VERDICT_CACHE_DIR) { $env:AIRS_VERDICT_CACHE_DIR } else { '' }   # per-agent default set below
+$CacheTtl    = IntEnv $env:AIRS_VERDICT_CACHE_TTL_S 300; if ($CacheTtl -gt 86400) { $CacheTtl = 86400 }   # a cleared verdict lives a day at most
+$CacheMax    = IntEnv $env:AIRS_VERDICT_CACHE_MAX 1000; if ($CacheMax -lt 1) { $CacheMax = 1000 }
+# Stop watermark (default on): answer text already cleared in the session is not scanned again
+$WmOn        = ($null -eq $env:AIRS_STOP_WATERMARK) -or ($env:AIRS_STOP_WATERMARK -in @('1','true','yes'))
+$WmFile      = if ($env:AIRS_STOP_WATERMARK_PATH) { $env:AIRS_STOP_WATERMARK_PATH } else { '' }   # per-agent default set below
+$WmOverlap   = IntEnv $env:AIRS_STOP_WATERMARK_OVERLAP 1024
+# deferred output scanning (opt-in): PostToolUse returns at once and a detached worker - this script
+# again, with AIRS_DEFERRED=<job> - scans; the verdict reaches the agent at the next checkpoint
+$DeferOn     = ($env:AIRS_DEFER_OUTPUT -in @('1','true','yes'))
+$DeferDir    = if ($env:AIRS_DEFER_DIR) { $env:AIRS_DEFER_DIR } else { '' }   # per-agent default set below
+$Deferred    = if ($env:AIRS_DEFERRED) { $env:AIRS_DEFERRED } else { '' }     # set only in a deferred worker
+if ($Deferred) { $DeferOn = $false }
+# delta scan (opt-in): a Write / NotebookEdit over an existing file scans only the lines that differ
+# from the file on disk, plus $DeltaContext lines around the change
+$DeltaOn     = ($env:AIRS_DELTA_SCAN -in @('1','true','yes'))
+$DeltaMaxBytes = IntEnv $env:AIRS_DELTA_MAX_FILE_BYTES 1000000
+$DeltaContext  = IntEnv $env:AIRS_DELTA_CONTEXT_LINES 3
 
 $AppName = switch ($Vendor) {
   'claude'      { 'Claude Code' }
@@ -89,11 +132,18 @@ if ($Suffix) { $AppName = "$AppName-$Suffix" }
 # app_user now reflects the actual agent (was hardcoded 'claude-code-user'); env-overridable.
 $AppUser = if ($env:AIRS_APP_USER) { $env:AIRS_APP_USER } else { "$Vendor-user" }
 if (-not $LogFile) { $LogFile = "$CfgDir/hooks/prisma-airs.log" }
+if (-not $CacheDir) { $CacheDir = "$CfgDir/hooks/verdict-cache" }
+if (-not $WmFile) { $WmFile = "$CfgDir/hooks/stop-watermark" }
+if (-not $DeferDir) { $DeferDir = "$CfgDir/hooks/deferred" }
 
 function Dbg($m) { if ($Debug) { [Console]::Error.WriteLine("[airs-hooks] $m") } }
 
 # ---- read stdin once --------------------------------------------------------
-$Raw = ''; try { $Raw = [Console]::In.ReadToEnd() } catch { $Raw = '' }
+$Raw = ''
+if ($Deferred) {
+  # a deferred worker reads the hook input from its job file (stdin is not the agent's)
+  try { $Raw = [System.IO.File]::ReadAllText("$Deferred.job"); Remove-Item -LiteralPath "$Deferred.job" -Force -ErrorAction SilentlyContinue } catch { $Raw = '' }
+} else { try { $Raw = [Console]::In.ReadToEnd() } catch { $Raw = '' } }
 $In  = $null
 if ($Raw -and $Raw.Trim().Length -gt 0) { try { $In = $Raw | ConvertFrom-Json } catch { $In = $null } }
 function Field($obj, [string]$name) { if ($null -eq $obj) { return $null } $p = $obj.PSObject.Properties[$name]; if ($p) { $p.Value } else { $null } }
@@ -108,9 +158,59 @@ $IEvent = switch ($Vendor) {
 }
 $Side = if ($IEvent -in @('UserPromptSubmit','PreToolUse')) { 'input' } else { 'output' }
 
+# ---- deferred output verdicts -----------------------------------------------
+# A worker leaves "<job>.done", one JSON line {"v":1,"label","kind","text"}, in
+# <DeferDir>/<sha256(session):32>/ for a block or warn; the session's next checkpoint claims it (rename,
+# so two hooks never both deliver it) and renders it through the usual block/warn channel.
+$script:DeferBlock = ''; $script:DeferWarn = ''; $DeferSDir = ''
+function DeferFinish([string]$kind, [string]$text) {
+  try {
+    $line = [ordered]@{ v = 1; label = $Label; kind = $kind; text = $text } | ConvertTo-Json -Compress
+    [System.IO.File]::WriteAllText("$Deferred.tmp", "$line`n")
+    Move-Item -LiteralPath "$Deferred.tmp" -Destination "$Deferred.done" -Force
+  } catch { Remove-Item -LiteralPath "$Deferred.tmp" -Force -ErrorAction SilentlyContinue }
+}
+function DeferCollect {
+  foreach ($f in @(Get-ChildItem -LiteralPath $DeferSDir -Filter '*.done' -File -ErrorAction SilentlyContinue | Sort-Object Name)) {
+    $c = "$($f.FullName).$PID"
+    try { Move-Item -LiteralPath $f.FullName -Destination $c -ErrorAction Stop } catch { continue }
+    try {
+      $r = [System.IO.File]::ReadAllText($c) | ConvertFrom-Json
+      $t = "Prisma AIRS deferred scan of $($r.label): $($r.text)"
+      if ($r.v -eq 1 -and $r.kind -eq 'block') { $script:DeferBlock = $(if ($script:DeferBlock) { "$($script:DeferBlock); $t" } else { $t }) }
+      elseif ($r.v -eq 1 -and $r.kind -eq 'warn') { $script:DeferWarn = $(if ($script:DeferWarn) { "$($script:DeferWarn); $t" } else { $t }) }
+    } catch { }
+    Remove-Item -LiteralPath $c -Force -ErrorAction SilentlyContinue
+  }
+}
+# At most once an hour (mtime of <DeferDir>/.swept), drop files left for over a day (findings of ended
+# sessions, jobs whose worker never ran) and session dirs idle and empty for an hour.
+function DeferSweep {
+  $mark = Join-Path $DeferDir '.swept'
+  $now = [DateTime]::UtcNow
+  try { if (($now - [System.IO.File]::GetLastWriteTimeUtc($mark)).TotalMinutes -lt 60) { return } } catch { }   # 1601 when absent
+  if (-not (Test-Path -LiteralPath $DeferDir)) { return }
+  try { [System.IO.File]::WriteAllText($mark, '') } catch { return }
+  foreach ($d in @(Get-ChildItem -LiteralPath $DeferDir -Directory -ErrorAction SilentlyContinue)) {
+    foreach ($f in @(Get-ChildItem -LiteralPath $d.FullName -File -ErrorAction SilentlyContinue)) {
+      if (($now - $f.LastWriteTimeUtc).TotalMinutes -gt 1440) { Remove-Item -LiteralPath $f.FullName -Force -ErrorAction SilentlyContinue }
+    }
+    $d.Refresh()
+    if (($now - $d.LastWriteTimeUtc).TotalMinutes -gt 60 -and -not (Get-ChildItem -LiteralPath $d.FullName -Force -ErrorAction SilentlyContinue)) {
+      Remove-Item -LiteralPath $d.FullName -Force -ErrorAction SilentlyContinue
+    }
+  }
+}
+
 # ---- render (vendor wire format) then EXIT ----------------------------------
 function Render([string]$kind, [string]$text) {
   $out = ''; $code = 0
+  # a deferred worker hands its verdict to the next checkpoint instead of to the agent
+  if ($Deferred) { if ($kind -ne 'allow') { DeferFinish $kind $text }; if ($script:LogBuf) { FlushLog }; exit 0 }
+  # a claimed deferred warning rides on whatever this checkpoint decides (a clean one becomes a warn)
+  if ($script:DeferWarn) {
+    if ($kind -eq 'allow') { $kind = 'warn'; $text = $script:DeferWarn } else { $text = $(if ($text) { "$text; $($script:DeferWarn)" } else { $script:DeferWarn }) }
+  }
   switch ($Vendor) {
     'claude' {
       if ($kind -eq 'block') {
@@ -188,6 +288,7 @@ function Render([string]$kind, [string]$text) {
     elseif ($Vendor -in @('gemini','antigravity') -and $IEvent -eq 'Stop') { [Console]::Error.Write("`n[ALERT] Gemini response scanned; not hard-blocked (avoids retry loop) - $text`n`n") }
     else { [Console]::Error.Write("`n[BLOCKED] $text`n`n") }
   }
+  if ($script:LogBuf) { FlushLog }
   exit $code
 }
 
@@ -201,12 +302,47 @@ trap {
   Render 'allow' ''
 }
 
-function Log([string]$label, [string]$tag) {
+# One JSONL audit record per verdict, same schema as the node/bash engines (Hooks/README.md "Audit
+# log"). Records are buffered and written with one append just before Render exits; the log rolls to
+# <log>.1 ... <log>.$LogKeep once it would pass $LogMaxBytes.
+$script:LogBuf = $null
+$TExtract = $null; $TScan = $null
+function Log([string]$verdict, [string]$msg, $scan) {
+  try {
+    $rec = [ordered]@{ ts = [DateTime]::UtcNow.ToString("yyyy-MM-ddTHH:mm:ss.fffZ", [Globalization.CultureInfo]::InvariantCulture); runtime = 'powershell'; vendor = $Vendor; event = $IEvent; label = $(if ($Label) { $Label } else { 'input' }); verdict = $verdict }
+    if ($scan) {
+      $rec.category = $scan.category; $rec.scan_id = $scan.scan_id; $rec.detections = @($scan.detections)
+      $rec.chunks = $(if ($scan.cache) { 0 } else { 1 }); $rec.cache = [bool]$scan.cache
+    }
+    if ($null -ne $script:WmSkip) { $rec.watermark = $script:WmSkip }
+    if ($script:Breaker) { $rec.breaker = $script:Breaker }
+    if ($Deferred -or $script:DeferBlock) { $rec.deferred = $true }
+    if ($null -ne $script:DeltaSkip) { $rec.delta = $script:DeltaSkip }
+    $now = $Clock.ElapsedMilliseconds
+    $lat = [ordered]@{}
+    if ($null -ne $TExtract) { $lat.extract = $TExtract }
+    if ($null -ne $TScan) { $lat.scan = $now - $TScan }
+    if ($null -ne $script:QueueMs) { $lat.queue = $script:QueueMs }
+    $lat.total = $now
+    $rec.latency_ms = $lat; $rec.msg = $msg
+    if (-not $script:LogBuf) { $script:LogBuf = New-Object System.Text.StringBuilder }
+    [void]$script:LogBuf.Append(($rec | ConvertTo-Json -Compress -Depth 4)).Append("`n")
+  } catch { }
+}
+function FlushLog {
   try {
-    $ts = (Get-Date).ToUniversalTime().ToString("yyyy-MM-ddTHH:mm:ss.000Z")
-    $dir = Split-Path -Parent $LogFile
-    if ($dir -and -not (Test-Path $dir)) { New-Item -ItemType Directory -Force -Path $dir | Out-Null }
-    Add-Content -Path $LogFile -Value "[$ts] $IEvent $label`: $tag"
+    $text = $script:LogBuf.ToString(); $script:LogBuf = $null
+    $path = if ([System.IO.Path]::IsPathRooted($LogFile)) { $LogFile } else { Join-Path (Get-Location).Path $LogFile }
+    $dir = Split-Path -Parent $path
+    if ($dir -and -not (Test-Path -LiteralPath $dir)) { New-Item -ItemType Directory -Force -Path $dir | Out-Null }
+    $cur = Get-Item -LiteralPath $path -ErrorAction SilentlyContinue
+    if ($LogMaxBytes -gt 0 -and $cur -and $cur.Length -gt 0 -and $cur.Length + $text.Length -gt $LogMaxBytes) {
+      for ($i = $LogKeep - 1; $i -ge 1; $i--) {
+        if (Test-Path -LiteralPath "$path.$i") { Move-Item -LiteralPath "$path.$i" -Destination "$path.$($i + 1)" -Force -ErrorAction SilentlyContinue }
+      }
+      Move-Item -LiteralPath $path -Destination "$path.1" -Force -ErrorAction SilentlyContinue
+    }
+    [System.IO.File]::AppendAllText($path, $text)
   } catch { }
 }
 
@@ -215,14 +351,54 @@ function Log([string]$label, [string]$tag) {
 # allow so a malformed body with NO resolvable event fails CLOSED (as bash/node do). The leading-'['
 # check catches a single-element array [{...}] that `$Raw | ConvertFrom-Json` unwraps to an object.
 if ($Raw.Trim().Length -gt 0 -and ($Raw.Trim()[0] -eq '[' -or -not ($In -is [System.Management.Automation.PSCustomObject]))) {
-  Log 'input' "unscannable (hook input is not a JSON object)"
-  if (-not $IEvent) { [Console]::Error.Write("`n[BLOCKED] Prisma AIRS could not scan (hook input is not a JSON object) - fail-closed`n`n"); exit 2 }
+  Log 'unscannable' 'hook input is not a JSON object'
+  if (-not $IEvent) { FlushLog; [Console]::Error.Write("`n[BLOCKED] Prisma AIRS could not scan (hook input is not a JSON object) - fail-closed`n`n"); exit 2 }
   if ($Side -eq 'input') { Render 'block' "Prisma AIRS could not scan (hook input is not a JSON object) - blocking (fail-closed)" }
   else { Render 'warn' "Prisma AIRS could not scan (hook input is not a JSON object) - content NOT scanned" }
 }
 
 if (-not $IEvent) { Dbg "unhandled event '$RawEvent' for vendor '$Vendor'"; Render 'allow' '' }
 
+# ---- local scan sidecar (optional) --------------------------------------------
+# `node hooks.mjs --serve` holds warm AIRS connections and owns retries/timeouts/chunking. When its
+# unix socket exists, forward the raw event and render the returned decision; any failure falls through
+# to the direct path below. Needs PowerShell 7.4+ (Invoke-RestMethod -UnixSocket). The config tag
+# (sha256 of the profile, fail mode and require-config - never the key, format as in hooks-engine.mjs)
+# makes a sidecar started with other settings, or none, answer non-200.
+$SidecarSock = if ($env:AIRS_SIDECAR_SOCKET) { $env:AIRS_SIDECAR_SOCKET } else { Join-Path ([Environment]::GetFolderPath('UserProfile')) '.prisma-airs/sidecar.sock' }
+if ($env:AIRS_SIDECAR -in @('0','false','no') -or $Deferred) { $SidecarSock = '' }
+# trust only a socket this user owns (bash: -S/-O, node: isSocket + uid) — a planted file or another
+# user's socket would otherwise decide for this project
+function SidecarTrusted([string]$p) {
+  try {
+    $it = Get-Item -LiteralPath $p -Force -ErrorAction Stop
+    if ($IsWindows) {
+      # AF_UNIX sockets are reparse points on Windows
+      return ([bool]($it.Attributes -band [System.IO.FileAttributes]::ReparsePoint)) -and
+        ((Get-Acl -LiteralPath $p).Owner -eq [System.Security.Principal.WindowsIdentity]::GetCurrent().Name)
+    }
+    return ("$($it.UnixMode)".StartsWith('s')) -and ($it.User -eq [Environment]::UserName)
+  } catch { return $false }
+}
+if ($SidecarSock -and $PSVersionTable.PSVersion -ge [version]'7.4' -and (SidecarTrusted $SidecarSock)) {
+  $sc = $null
+  try {
+    # rewrite=0: this engine can't apply DLP masks, so the sidecar must return plain allow/warn/block
+    $tag = "airs-sidecar-config/v1`n$(if ($ProfileId) { "profile_id=$ProfileId" } else { "profile_name=$ProfileName" })`n$FailMode`n$(if ($RequireConfig) { '1' } else { '0' })"
+    $tag = (-join ([System.Security.Cryptography.SHA256]::Create().ComputeHash([System.Text.Encoding]::UTF8.GetBytes($tag)) | ForEach-Object { $_.ToString('x2') })).Substring(0, 16)
+    $q = "vendor=$Vendor&rewrite=0&config=$tag" + $(if ($RawEvent) { "&event=$([uri]::EscapeDataString($RawEvent))" } else { '' })
+    $sc = Invoke-RestMethod -Uri "http://localhost/v1/hook?$q" -Method Post -ContentType 'application/json' -Body $Raw `
+      -TimeoutSec ($TimeoutSec * ($Retries + 1) * 2 + 1) -UnixSocket ([System.Net.Sockets.UnixDomainSocketEndPoint]::new($SidecarSock))
+  } catch { $sc = $null }
+  $d = Field $sc 'decision'; $k = [string](Field $d 'kind')
+  if ($k -in @('allow','warn','block')) {
+    Dbg "decision from sidecar $SidecarSock"
+    $t = if ($k -eq 'block') { [string](Field $d 'reason') } else { [string](Field $d 'message') }
+    Render $k $t
+  }
+  Dbg 'sidecar unavailable - scanning directly'
+}
+
 # ---- helpers ----------------------------------------------------------------
 # For a non-string value, collect all strings/keys recursively (depth-gated via $script:OverDepth)
 # rather than ConvertTo-Json -Depth 10, which truncated a deep structured field value to a lossy
@@ -231,21 +407,42 @@ function JStr($v) { if ($v -is [string]) { $v } elseif ($null -eq $v) { '' } els
 function JoinF([object[]]$parts) { ($parts | ForEach-Object { if ($null -eq $_) { } elseif ($_ -is [string]) { if ($_ -ne '') { $_ } } else { (Get-AllStrings $_) -join "`n" } }) -join "`n" }
 function Flatten([string]$s) { if ($null -eq $s) { '' } else { $s -replace "[\r\n]", ' ' } }
 
-function Get-AllStrings($o) {
+function Get-AllStrings($o, [long]$budget = 0, [bool]$compact = $false) {
   # Collect every string VALUE and every object KEY, recursively. Depth cap is 64 (well beyond
   # any real MCP/tool payload) — content nested deeper is flagged via $script:OverDepth so the
   # caller can fail-closed on the input side instead of silently dropping an unscanned payload.
+  # With a $budget, the walk stops once the joined text would pass it: a huge tool result costs
+  # what is scanned, and the caller's over-budget check still fires on the (budget+) text.
+  # With $compact, a key is collected only the first time it is seen, and integer-like keys come
+  # first in ascending order as in a JavaScript object, so node, bash and PowerShell agree.
   $acc = New-Object System.Collections.Generic.List[string]
+  $size = [ref]0L
+  $keys = New-Object 'System.Collections.Generic.HashSet[string]' ([StringComparer]::Ordinal)
   function _walk($x, $d) {
     if ($null -eq $x) { return }
+    if ($budget -gt 0 -and $size.Value -gt $budget + 1) { return }   # joined length = size - 1
     if ($d -gt 199) { $script:OverDepth = $true; return }   # align with bash's <200 depth gate; avoid over-blocking realistic deep-but-benign input
-    if ($x -is [string]) { if ($x.Length -gt 0) { $acc.Add($x) } }
+    if ($x -is [string]) { if ($x.Length -gt 0) { $acc.Add($x); $size.Value += $x.Length + 1 } }
     elseif ($x -is [System.Collections.IEnumerable] -and -not ($x -is [string])) { foreach ($e in $x) { _walk $e ($d+1) } }
-    elseif ($x -is [System.Management.Automation.PSCustomObject]) { foreach ($p in $x.PSObject.Properties) { if ($p.Name) { $acc.Add([string]$p.Name) }; _walk $p.Value ($d+1) } }
+    elseif ($x -is [System.Management.Automation.PSCustomObject]) {
+      $props = @($x.PSObject.Properties)
+      if ($compact) { $props = JsKeyOrder $props }
+      foreach ($p in $props) {
+        if ($p.Name -and (-not $compact -or $keys.Add($p.Name))) { $acc.Add([string]$p.Name); $size.Value += $p.Name.Length + 1 }
+        _walk $p.Value ($d+1)
+      }
+    }
   }
   _walk $o 0
   $acc
 }
+function IsIndexKey([string]$k) { $k -cmatch '\A(0|[1-9][0-9]{0,9})\z' -and [long]$k -lt 4294967295 }
+function JsKeyOrder([object[]]$props) {
+  $idx = New-Object System.Collections.Generic.List[object]; $rest = New-Object System.Collections.Generic.List[object]
+  foreach ($p in $props) { if ($p.Name.Length -gt 0 -and $p.Name[0] -ge [char]'0' -and $p.Name[0] -le [char]'9' -and (IsIndexKey $p.Name)) { $idx.Add($p) } else { $rest.Add($p) } }
+  if ($idx.Count -eq 0) { return ,$props }
+  ,(@($idx | Sort-Object { [long]$_.Name }) + @($rest))
+}
 function Get-TrueKeys($o) {
   $acc = New-Object System.Collections.Generic.List[string]
   function _walk($x) {
@@ -299,6 +496,48 @@ function ToolInputText([string]$name, $ti) {
     default { if ($null -eq $ti) { '' } else { (Get-AllStrings $ti) -join "`n" } }  # recurse (no Depth-10 truncation); over-depth is flagged for fail-closed
   }
 }
+# DeltaText - with $DeltaOn, replace $Text for a Write / NotebookEdit (replace) over an existing file
+# (at most $DeltaMaxBytes, no NUL) with its path plus the new lines from the first to the last that
+# differ from the file on disk, $DeltaContext lines either side. A new file, or a change covering more
+# than half the content, keeps the full scan. node and bash take the same span.
+$script:DeltaSkip = $null
+function DeltaText([string]$name, $ti) {
+  if (-not ($ti -is [System.Management.Automation.PSCustomObject])) { return }
+  $id = $null
+  switch ($name) {
+    'Write'        { $path = Field $ti 'file_path'; $after = Field $ti 'content' }
+    'NotebookEdit' {
+      $path = Field $ti 'notebook_path'; $after = Field $ti 'new_source'; $id = Field $ti 'cell_id'; $mode = Field $ti 'edit_mode'
+      if (-not ($id -is [string]) -or -not $id -or ($mode -and $mode -ne 'replace')) { return }
+    }
+    default        { return }
+  }
+  if (-not ($path -is [string]) -or -not $path -or -not ($after -is [string]) -or -not $after) { return }
+  try {
+    $full = $path
+    if (-not [IO.Path]::IsPathRooted($path)) { $cwd = [string](Field $In 'cwd'); $full = Join-Path $(if ($cwd) { $cwd } else { (Get-Location).Path }) $path }
+    $fi = [IO.FileInfo]::new($full)
+    if (-not $fi.Exists -or $fi.Length -gt $DeltaMaxBytes) { return }
+    $before = [IO.File]::ReadAllText($full)
+    if ($before.Contains([string][char]0)) { return }
+    if ($id) {
+      $cell = @(Field (ConvertFrom-Json $before) 'cells') | Where-Object { $_ -and (Field $_ 'id') -eq $id } | Select-Object -First 1
+      $src = Field $cell 'source'
+      if ($src -is [array]) { $before = $src -join '' } elseif ($src -is [string]) { $before = $src } else { return }
+    }
+  } catch { return }
+  $a = $before -split "`n"; $b = $after -split "`n"
+  $pre = 0; while ($pre -lt $a.Length -and $pre -lt $b.Length -and $a[$pre] -ceq $b[$pre]) { $pre++ }
+  $suf = 0; while ($suf -lt $a.Length - $pre -and $suf -lt $b.Length - $pre -and $a[$a.Length - 1 - $suf] -ceq $b[$b.Length - 1 - $suf]) { $suf++ }
+  $region = ''
+  if ($pre -lt $a.Length -or $pre -lt $b.Length) {
+    $from = [Math]::Max(0, $pre - $DeltaContext); $to = [Math]::Min($b.Length, $b.Length - $suf + $DeltaContext)
+    if ($to -gt $from) { $region = $b[$from..($to - 1)] -join "`n" }
+  }
+  if (2 * $region.Length -gt $after.Length) { return }
+  $script:DeltaSkip = $after.Length - $region.Length
+  $script:Text = JoinF @($path, $region)
+}
 function NormToolName([string]$n) { if ($n -like 'MCP:*') { 'mcp__' + (($n.Substring(4)) -replace ':', '__') } else { $n } }
 
 # ---- normalize + ScanPlan ---------------------------------------------------
@@ -328,6 +567,7 @@ switch ($IEvent) {
     }
     $Label="$(if ($ToolName) { $ToolName } else { 'tool' }) input"
     $Text = ToolInputText $ToolName $ti
+    if ($DeltaOn) { DeltaText $ToolName $ti }
     ToolIdentity $ToolName $ti
   }
   'PostToolUse' {
@@ -339,8 +579,10 @@ switch ($IEvent) {
       default    { $ToolName=[string](Field $In 'tool_name'); $ti=Field $In 'tool_input'; $tr=Field $In 'tool_response'; if ($null -eq $tr) { $tr=Field $In 'tool_result' } }
     }
     $Label="$(if ($ToolName) { $ToolName } else { 'tool' }) output"
-    $Text = (Get-AllStrings $tr) -join "`n"
+    $Text = (Get-AllStrings $tr $MaxBudget $CompactOut) -join "`n"
     $InText = ToolInputText $ToolName $ti
+    # the tool input is context for the output scan: clipped to one chunk, as in node (and in the cache key)
+    if ($InText.Length -gt $MaxChars) { $InText = $InText.Substring(0, $MaxChars) }
     ToolIdentity $ToolName $ti
   }
   'Stop' {
@@ -364,7 +606,7 @@ $CfgErr = ''; $Unconfigured = $false
 if (-not $ApiKey) { $CfgErr = 'PRISMA_AIRS_API_KEY not set'; $Unconfigured = $true }
 elseif (-not $ProfileId -and -not $ProfileName) { $CfgErr = 'PRISMA_AIRS_PROFILE_NAME or PRISMA_AIRS_PROFILE_ID not set' }
 if ($CfgErr) {
-  Log $Label "config_error ($CfgErr)"
+  Log 'config_error' $CfgErr
   # Genuinely UNCONFIGURED (no key) + not strict -> pass through with a LOUD per-call warning so a
   # copy-the-folder install before .env exists doesn't brick the agent. A key set but half-configured
   # (no profile) is a real misconfig -> fall through to fail-closed on input.
@@ -380,22 +622,16 @@ if ($CfgErr) {
 # (e.g. a pure deep ARRAY with no collectable keys/strings) collects to empty $Text, which would
 # otherwise hit the empty-content allow and fail OPEN. Block on input, warn on output.
 if ($script:OverDepth) {
-  Log $Label "content_over_depth (nesting exceeds scan depth)"
+  Log 'content_over_depth' 'nesting exceeds scan depth'
   if ($Side -eq 'input') { Render 'block' "Content nesting exceeds the AIRS scan depth - blocking unscanned (fail-closed)" }
   else { Render 'warn' "Content nesting exceeds the AIRS scan depth - NOT fully scanned" }
 }
-if ([string]::IsNullOrWhiteSpace($Text)) { Dbg "no scannable content for $Label - allowing"; Render 'allow' '' }
 
-# oversized content -> PowerShell can't chunk, so the tail is UNSCANNABLE. Block on input
-# (regardless of fail-mode), warn on output. Never silently allowed.
-if ($Text.Length -gt $MaxBudget) {
-  Log $Label "content_overflow ($($Text.Length) chars > $MaxBudget budget)"
-  if ($Side -eq 'input') { Render 'block' "Content exceeds the AIRS scan budget ($($Text.Length) chars) - blocking unscanned" }
-  else { Render 'warn' "Content exceeds the AIRS scan budget ($($Text.Length) chars) - NOT fully scanned" }
+# ---- session id -------------------------------------------------------------
+function Sha256Hex([string]$s) {
+  $h = [System.Security.Cryptography.SHA256]::Create().ComputeHash([System.Text.Encoding]::UTF8.GetBytes($s))
+  -join ($h | ForEach-Object { $_.ToString('x2') })
 }
-
-# ---- build AIRS request -----------------------------------------------------
-$AiProfile = if ($ProfileId) { @{ profile_id = $ProfileId } } else { @{ profile_name = $ProfileName } }
 $Session = ''
 foreach ($k in @('session_id','taskId','trajectory_id','conversation_id','conversationId')) { if (-not $Session) { $v = Field $In $k; if ($v) { $Session = [string]$v } } }
 if (-not $Session) {
@@ -403,11 +639,127 @@ if (-not $Session) {
   $sha = [System.Security.Cryptography.SHA256]::Create().ComputeHash([System.Text.Encoding]::UTF8.GetBytes($cwd))
   $Session = -join ($sha | ForEach-Object { $_.ToString('x2') }); $Session = $Session.Substring(0, [math]::Min(32, $Session.Length))
 }
+if ($DeferOn) { $DeferSDir = Join-Path $DeferDir ((Sha256Hex $Session).Substring(0, 32)) }
+
+# deferred output findings for this session: a block stops this checkpoint, a warning rides on it
+if ($DeferSDir -and $IEvent -ne 'PostToolUse' -and (Test-Path -LiteralPath $DeferSDir)) {
+  DeferCollect
+  if ($script:DeferBlock) { $Label = 'deferred findings'; Log 'block' "BLOCK $($script:DeferBlock)"; Render 'block' $script:DeferBlock }
+}
+
+if ([string]::IsNullOrWhiteSpace($Text)) { Dbg "no scannable content for $Label - allowing"; Render 'allow' '' }
+
+# ---- transaction id ---------------------------------------------------------
 $Txn = ''
 foreach ($k in @('tool_use_id','prompt_id','turn_id')) { if (-not $Txn) { $v = Field $In $k; if ($v) { $Txn = [string]$v } } }
 # per-event id: synthesize a GUID rather than reusing the session id, so AIRS can distinguish
 # turns even when the client gives no per-turn id.
 if (-not $Txn) { $Txn = [guid]::NewGuid().ToString() }
+$ProfileKey = if ($ProfileId) { "profile_id=$ProfileId" } else { "profile_name=$ProfileName" }
+
+# ---- Stop watermark ---------------------------------------------------------
+# One file, "v1 <session> <bytes> <sha256>": how much of this session's answer AIRS has cleared. An
+# answer that starts with those bytes is scanned from $WmOverlap bytes before their end (so text
+# spanning the boundary is still seen whole); the same answer again is not scanned. Byte offsets, so
+# every engine reads the others' file. Only an ALLOW moves it.
+function WmSum([byte[]]$b, [int]$n) {
+  $head = [System.Text.Encoding]::UTF8.GetBytes("airs-stop-watermark/v1`n$ProfileKey`n")
+  $all = New-Object byte[] ($head.Length + $n)
+  [Array]::Copy($head, $all, $head.Length); [Array]::Copy($b, 0, $all, $head.Length, $n)
+  -join ([System.Security.Cryptography.SHA256]::Create().ComputeHash($all) | ForEach-Object { $_.ToString('x2') })
+}
+function WmPut {
+  try {
+    $dir = Split-Path -Parent $WmFile
+    if ($dir -and -not (Test-Path -LiteralPath $dir)) { New-Item -ItemType Directory -Force -Path $dir | Out-Null }
+    $tmp = "$WmFile.$PID"
+    [System.IO.File]::WriteAllText($tmp, "v1 $WmTag $($WmBytes.Length) $(WmSum $WmBytes $WmBytes.Length)`n")
+    Move-Item -LiteralPath $tmp -Destination $WmFile -Force
+  } catch { }
+}
+$WmTag = ''; $WmSkip = $null; $WmBytes = $null
+if ($IEvent -eq 'Stop' -and $WmOn) {
+  $WmTag = $Session -replace '\s', '_'
+  $WmBytes = [System.Text.Encoding]::UTF8.GetBytes($Text)
+  $parts = @()
+  try { if (Test-Path -LiteralPath $WmFile) { $parts = ([System.IO.File]::ReadAllText($WmFile)).Trim() -split '\s+' } } catch { }
+  $n = 0; [void][int]::TryParse($(if ($parts.Count -ge 3) { $parts[2] } else { '' }), [ref]$n)
+  if ($parts.Count -ge 4 -and $parts[0] -eq 'v1' -and $parts[1] -eq $WmTag -and $n -gt 0 -and $n -le $WmBytes.Length -and (WmSum $WmBytes $n) -eq $parts[3]) {
+    if ($n -eq $WmBytes.Length) { $WmSkip = $n; Log 'allow' "allow [watermark] answer already scanned ($n bytes)"; Render 'allow' '' }
+    $from = [math]::Max($n - $WmOverlap, 0)
+    while ($from -gt 0 -and ($WmBytes[$from] -band 0xC0) -eq 0x80) { $from-- }
+    $WmSkip = $from; $Text = [System.Text.Encoding]::UTF8.GetString($WmBytes, $from, $WmBytes.Length - $from)
+  }
+}
+
+# oversized content -> PowerShell can't chunk, so the tail is UNSCANNABLE. Block on input
+# (regardless of fail-mode), warn on output. Never silently allowed.
+if ($Text.Length -gt $MaxBudget) {
+  Log 'content_overflow' "$($Text.Length) chars > $MaxBudget budget"
+  if ($Side -eq 'input') { Render 'block' "Content exceeds the AIRS scan budget ($($Text.Length) chars) - blocking unscanned" }
+  else { Render 'warn' "Content exceeds the AIRS scan budget ($($Text.Length) chars) - NOT fully scanned" }
+}
+
+# ---- verdict cache ----------------------------------------------------------
+# One file per key, "v1 allow <expires-epoch-s> <scan_id>". Only ALLOW verdicts are ever written, so a
+# hit can only skip a scan AIRS already cleared. Writes go to a dot-temp file renamed into place.
+function NowS { [DateTimeOffset]::UtcNow.ToUnixTimeSeconds() }
+function CacheGet([string]$key) {
+  $f = Join-Path $CacheDir $key
+  try {
+    if (-not (Test-Path -LiteralPath $f)) { return $null }
+    $parts = ([System.IO.File]::ReadAllText($f)).Trim() -split '\s+'
+    $exp = 0L; [void][long]::TryParse($(if ($parts.Count -ge 3) { $parts[2] } else { '' }), [ref]$exp)
+    if ($parts[0] -eq 'v1' -and $parts[1] -eq 'allow' -and $exp -gt (NowS)) { return $(if ($parts.Count -ge 4) { $parts[3] } else { 'unknown' }) }
+    Remove-Item -LiteralPath $f -Force -ErrorAction SilentlyContinue
+  } catch { }
+  $null
+}
+function CachePut([string]$key, [string]$scanId) {
+  try {
+    if (-not (Test-Path -LiteralPath $CacheDir)) { New-Item -ItemType Directory -Force -Path $CacheDir | Out-Null }
+    $tmp = Join-Path $CacheDir ".$key.$PID"
+    [System.IO.File]::WriteAllText($tmp, "v1 allow $((NowS) + $CacheTtl) $($scanId -replace '\s', '_')`n")
+    Move-Item -LiteralPath $tmp -Destination (Join-Path $CacheDir $key) -Force
+    # size cap: past $CacheMax entries, evict the oldest down to 90% (dot-temp files are not counted)
+    $entries = @(Get-ChildItem -LiteralPath $CacheDir -File | Where-Object { -not $_.Name.StartsWith('.') })
+    if ($entries.Count -gt $CacheMax) {
+      $entries | Sort-Object LastWriteTimeUtc | Select-Object -First ($entries.Count - [math]::Floor($CacheMax * 0.9)) | Remove-Item -Force -ErrorAction SilentlyContinue
+    }
+  } catch { }
+}
+$TExtract = $Clock.ElapsedMilliseconds; $TScan = $TExtract
+$CacheKey = ''
+if ($CacheOn) {
+  $CacheKey = Sha256Hex ((@('airs-verdict-cache/v1', $ProfileKey, $Side, $Kind, $Server, $Tool, (Sha256Hex $InText), (Sha256Hex $Text))) -join "`n")
+  $cachedId = CacheGet $CacheKey
+  if ($cachedId) { Log 'allow' "allow [cache] [scan:$cachedId]" @{ category = 'benign'; scan_id = $cachedId; detections = @(); cache = $true }; Render 'allow' '' }
+}
+
+# ---- deferred output scan ---------------------------------------------------
+# Hand the hook input to a detached worker (this script again, no window, stdio not the agent's)
+# and return at once. Any failure to start it falls through to the synchronous scan below.
+if ($DeferSDir -and $IEvent -eq 'PostToolUse') {
+  try {
+    DeferSweep
+    if (-not (Test-Path -LiteralPath $DeferSDir)) { New-Item -ItemType Directory -Force -Path $DeferSDir | Out-Null }
+    $job = Join-Path $DeferSDir "$([DateTimeOffset]::UtcNow.ToUnixTimeMilliseconds())-$PID-$(Get-Random)"
+    [System.IO.File]::WriteAllText("$job.job", $Raw)
+    $psi = New-Object System.Diagnostics.ProcessStartInfo
+    $psi.FileName = (Get-Process -Id $PID).Path
+    $psi.Arguments = "-NoProfile -NonInteractive -ExecutionPolicy Bypass -File `"$PSCommandPath`" -Vendor $Vendor" + $(if ($RawEvent) { " -EventName $RawEvent" } else { '' })
+    $psi.WorkingDirectory = (Get-Location).Path
+    $psi.UseShellExecute = $false; $psi.CreateNoWindow = $true
+    $psi.RedirectStandardInput = $true; $psi.RedirectStandardOutput = $true; $psi.RedirectStandardError = $true
+    $psi.EnvironmentVariables['AIRS_DEFERRED'] = $job
+    $p = [System.Diagnostics.Process]::Start($psi); $p.StandardInput.Close()
+    Log 'deferred' 'deferred: scanning in the background'
+    Render 'allow' ''
+  } catch { Dbg "deferred worker did not start - scanning now ($($_.Exception.Message))" }
+}
+
+# ---- build AIRS request -----------------------------------------------------
+$AiProfile = if ($ProfileId) { @{ profile_id = $ProfileId } } else { @{ profile_name = $ProfileName } }
 
 $Content = switch ($Kind) {
   'prompt'   { $c = @{ prompt = $Text };   if ($CodeAware) { $c['code_prompt'] = $Text };   $c }
@@ -431,25 +783,263 @@ if ($ToolName) { $Meta['tool_name'] = $ToolName }
 $Body = @{ transaction_id=$Txn; session_id=$Session; ai_profile=$AiProfile; metadata=$Meta; contents=,$Content }
 $BodyJson = $Body | ConvertTo-Json -Depth 12 -Compress
 
+# ---- shared AIRS health -----------------------------------------------------
+# One line per AIRS URL, "v1 <srtt_ms> <rttvar_ms> <failures> <open_until>". With $AdaptiveOn a first
+# attempt's timeout is srtt + 4*rttvar (RFC 6298) between $TimeoutMinMs and $TimeoutMs; retries always
+# get $TimeoutMs. While the breaker is open every call fails fast; after the cooldown one hook, holding
+# "<file>.probe" (created exclusively, holding its expiry), tries AIRS again. Writes go through a temp
+# file and a rename.
+$HealthFile = if ($HealthOn) { Join-Path $HealthDir ((Sha256Hex $ApiUrl).Substring(0, 16)) } else { '' }
+$script:Breaker = ''
+function HealthRead {
+  $h = @{ srtt = 0; rttvar = 0; fails = 0; open = [long]0 }
+  try {
+    $f = ([System.IO.File]::ReadAllText($HealthFile).Trim() -split '\s+')
+    $n = @(0, 0, 0, 0); $ok = ($f.Count -ge 5 -and $f[0] -eq 'v1')
+    for ($i = 1; $ok -and $i -le 4; $i++) { $v = [long]0; if ([long]::TryParse($f[$i], [ref]$v) -and $v -ge 0) { $n[$i - 1] = $v } else { $ok = $false } }
+    if ($ok) { $h = @{ srtt = [long]$n[0]; rttvar = [long]$n[1]; fails = [long]$n[2]; open = [long]$n[3] } }
+  } catch { }
+  $h
+}
+# before each attempt: .ms (this attempt's timeout), and .open (fail fast) or .probe
+function HealthGate([int]$attempt) {
+  $g = @{ ms = $TimeoutMs; open = ''; probe = $false }
+  if (-not $HealthFile) { return $g }
+  $h = HealthRead
+  if ($AdaptiveOn -and $attempt -eq 0 -and $h.srtt -gt 0) { $g.ms = [math]::Min([long]$TimeoutMs, [math]::Max([long]$TimeoutMinMs, [long]($h.srtt + 4 * $h.rttvar))) }
+  if ($h.fails -lt $BreakerFailures) { return $g }
+  $now = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
+  if ($now -lt $h.open) { $g.open = "circuit open after $($h.fails) AIRS failures in a row, next probe in $($h.open - $now)s"; return $g }
+  for ($i = 0; $i -lt 2; $i++) {
+    try {
+      if (-not (Test-Path -LiteralPath $HealthDir)) { New-Item -ItemType Directory -Force -Path $HealthDir | Out-Null }
+      $fs = [System.IO.File]::Open("$HealthFile.probe", [System.IO.FileMode]::CreateNew, [System.IO.FileAccess]::Write)
+      $b = [System.Text.Encoding]::ASCII.GetBytes("$($now + $BreakerCooldownS + $TimeoutSec)`n"); $fs.Write($b, 0, $b.Length); $fs.Close()
+      $g.probe = $true; return $g
+    } catch {
+      $exp = [long]0
+      try { [void][long]::TryParse([System.IO.File]::ReadAllText("$HealthFile.probe").Trim(), [ref]$exp) } catch { break }
+      if ($exp -ge $now) { break }
+      Remove-Item -LiteralPath "$HealthFile.probe" -Force -ErrorAction SilentlyContinue
+    }
+  }
+  $g.open = "circuit open after $($h.fails) AIRS failures in a row, probe in progress"; $g
+}
+# fold one attempt into the shared state (sample 0 = no latency sample); $ok is $null for a 429 or a
+# timeout this hook set below $TimeoutMs, a latency sample that does not count toward the breaker. The
+# read-modify-write holds "<file>.lock" (created exclusively, holding its expiry, like the probe
+# claim); a hook that cannot take it within half a second drops its sample.
+# A lock is stale once its expiry has passed (an empty one may be mid-write: stale after a minute).
+function HealthLockStale([string]$f, [long]$now) {
+  $t = ([System.IO.File]::ReadAllText($f)).Trim(); $exp = [long]0
+  if (-not $t) { return ([System.IO.File]::GetLastWriteTimeUtc($f) -lt [DateTime]::UtcNow.AddMinutes(-1)) }
+  -not ([long]::TryParse($t, [ref]$exp) -and $exp -ge $now)
+}
+# Takeovers run one at a time under "<file>.steal" (created exclusively; one older than a minute was left
+# by a dead hook), and the lock is checked again once it is held. The stale lock is renamed aside before
+# it is deleted; one that turns out to be fresh is moved back unless a new lock is already there.
+function HealthLockSteal([long]$now) {
+  $lock = "$HealthFile.lock"; $steal = "$HealthFile.steal"; $aside = "$lock.$PID"
+  try {
+    if (-not (HealthLockStale $lock $now)) { return }
+    [System.IO.File]::Open($steal, [System.IO.FileMode]::CreateNew, [System.IO.FileAccess]::Write).Close()
+  } catch {
+    try { if ((Test-Path -LiteralPath $steal) -and [System.IO.File]::GetLastWriteTimeUtc($steal) -lt [DateTime]::UtcNow.AddMinutes(-1)) { Remove-Item -LiteralPath $steal -Force } } catch { }
+    return
+  }
+  try {
+    if (HealthLockStale $lock $now) {
+      try { [System.IO.File]::Move($lock, $aside, $true) } catch [System.Management.Automation.MethodException] { [System.IO.File]::Move($lock, $aside) }
+      if (-not (HealthLockStale $aside $now)) { [System.IO.File]::Move($aside, $lock) }
+    }
+  } catch { }
+  Remove-Item -LiteralPath $aside, $steal -Force -ErrorAction SilentlyContinue
+}
+function HealthNote($g, $ok, [long]$sample) {
+  if (-not $HealthFile) { return }
+  for ($i = 0; $i -lt 50; $i++) {
+    $now = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
+    try {
+      if (-not (Test-Path -LiteralPath $HealthDir)) { New-Item -ItemType Directory -Force -Path $HealthDir | Out-Null }
+      $fs = [System.IO.File]::Open("$HealthFile.lock", [System.IO.FileMode]::CreateNew, [System.IO.FileAccess]::Write)
+      $b = [System.Text.Encoding]::ASCII.GetBytes("$($now + 2)`n"); $fs.Write($b, 0, $b.Length); $fs.Close()
+    } catch {
+      HealthLockSteal $now
+      Start-Sleep -Milliseconds 10; continue
+    }
+    try { HealthUpdate $ok $sample } finally { Remove-Item -LiteralPath "$HealthFile.lock" -Force -ErrorAction SilentlyContinue }
+    break
+  }
+  if ($g.probe) { Remove-Item -LiteralPath "$HealthFile.probe" -Force -ErrorAction SilentlyContinue }
+}
+function HealthUpdate($ok, [long]$sample) {
+  $h = HealthRead
+  if ($sample -gt 0) {
+    if ($h.srtt -eq 0) { $h.srtt = $sample; $h.rttvar = [long][math]::Floor(($sample + 1) / 2) }
+    else {
+      $h.rttvar = [long][math]::Floor((3 * $h.rttvar + [math]::Abs($h.srtt - $sample) + 2) / 4)
+      $h.srtt = [long][math]::Floor((7 * $h.srtt + $sample + 4) / 8)
+    }
+  }
+  if ($ok) { $h.fails = 0; $h.open = 0 }
+  elseif ($null -ne $ok) { $h.fails++; if ($h.fails -ge $BreakerFailures) { $h.open = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds() + $BreakerCooldownS } }
+  try {
+    [System.IO.File]::WriteAllText("$HealthFile.$PID", "v1 $($h.srtt) $($h.rttvar) $($h.fails) $($h.open)`n")
+    Move-Item -LiteralPath "$HealthFile.$PID" -Destination $HealthFile -Force
+  } catch { Remove-Item -LiteralPath "$HealthFile.$PID" -Force -ErrorAction SilentlyContinue }
+}
+
+# ---- admission control ------------------------------------------------------
+# Per API key, in $LimitDir/<first 16 hex of sha256(key)>: one "slot.<i>" file (i < $MaxInflight) per
+# AIRS call in flight, created exclusively and holding "<expiry> <pid>" (free again once expired or that
+# process is gone), and with $RatePerS a token bucket "bucket" = "v1 <millitokens> <updated_ms>", changed
+# under "bucket.lock". A hook waits up to $QueueMaxMs (never past $TimeoutMs) for a slot and a token.
+$script:Slot = ''; $script:QueueMs = $null
+# is this slot/lock still taken? (unreadable = taken, for this sweep)
+function LimitHeld([string]$f, [long]$nowS) {
+  try {
+    $p = ([System.IO.File]::ReadAllText($f).Trim() -split '\s+')
+    $exp = [long]0; $id = 0
+    if ($p.Count -lt 2 -or -not [long]::TryParse($p[0], [ref]$exp) -or -not [int]::TryParse($p[1], [ref]$id) -or $id -le 0) {
+      return ([System.IO.File]::GetLastWriteTimeUtc($f) -gt [DateTime]::UtcNow.AddMinutes(-1))   # being written, or left half-written
+    }
+    if ($exp -lt $nowS) { return $false }
+    return ($null -ne (Get-Process -Id $id -ErrorAction SilentlyContinue))
+  } catch { return $true }
+}
+# 0 claimed, 1 taken, 2 cannot create files here (no limiting)
+function LimitClaim([string]$f, [long]$exp, [long]$nowS) {
+  for ($i = 0; $i -lt 2; $i++) {
+    try {
+      $fs = [System.IO.File]::Open($f, [System.IO.FileMode]::CreateNew, [System.IO.FileAccess]::Write)
+      $b = [System.Text.Encoding]::ASCII.GetBytes("$exp $PID`n"); $fs.Write($b, 0, $b.Length); $fs.Close()
+      return 0
+    } catch {
+      if (-not (Test-Path -LiteralPath $f)) { return 2 }
+      if (LimitHeld $f $nowS) { return 1 }
+      Remove-Item -LiteralPath $f -Force -ErrorAction SilentlyContinue
+    }
+  }
+  1
+}
+# take one token from the bucket: 0, or the ms until the next one is due
+function LimitToken([string]$dir, [long]$nowMs) {
+  $lock = Join-Path $dir 'bucket.lock'
+  $rc = LimitClaim $lock ([long][math]::Floor($nowMs / 1000) + 2) ([long][math]::Floor($nowMs / 1000))
+  if ($rc -eq 2) { return 0 }
+  if ($rc -ne 0) { return 20 }
+  $path = Join-Path $dir 'bucket'
+  $cap = [long]$RatePerS * 1000; $t = $cap
+  try {
+    $f = ([System.IO.File]::ReadAllText($path).Trim() -split '\s+')
+    $tn = [long]0; $at = [long]0
+    if ($f.Count -ge 3 -and $f[0] -eq 'v1' -and [long]::TryParse($f[1], [ref]$tn) -and [long]::TryParse($f[2], [ref]$at) -and $tn -ge 0) {
+      $t = [long][math]::Min($cap, $tn + [math]::Max([long]0, $nowMs - $at) * $RatePerS)
+    }
+  } catch { }
+  $wait = if ($t -ge 1000) { 0 } else { [long][math]::Ceiling((1000 - $t) / $RatePerS) }
+  if ($wait -eq 0) { $t -= 1000 }
+  try {
+    [System.IO.File]::WriteAllText("$path.$PID", "v1 $t $nowMs`n")
+    Move-Item -LiteralPath "$path.$PID" -Destination $path -Force
+  } catch { Remove-Item -LiteralPath "$path.$PID" -Force -ErrorAction SilentlyContinue }
+  Remove-Item -LiteralPath $lock -Force -ErrorAction SilentlyContinue
+  $wait
+}
+# wait for a slot (and a token): '' to go ahead, or why not; $script:QueueMs is the wait
+function LimitAdmit {
+  if (-not $LimitOn -or -not $ApiKey) { return '' }
+  $dir = Join-Path $LimitDir ((Sha256Hex $ApiKey).Substring(0, 16))
+  try { if (-not (Test-Path -LiteralPath $dir)) { New-Item -ItemType Directory -Force -Path $dir | Out-Null } } catch { return '' }
+  $budget = [math]::Min($QueueMaxMs, $TimeoutMs); $sw = [System.Diagnostics.Stopwatch]::StartNew(); $slept = $false
+  while ($true) {
+    $nowMs = [DateTimeOffset]::UtcNow.ToUnixTimeMilliseconds(); $nowS = [long][math]::Floor($nowMs / 1000)
+    if (-not $script:Slot) {
+      $first = Get-Random -Maximum $MaxInflight
+      for ($i = 0; $i -lt $MaxInflight; $i++) {
+        $f = Join-Path $dir "slot.$(($first + $i) % $MaxInflight)"
+        $rc = LimitClaim $f ($nowS + [long][math]::Ceiling($TimeoutMs * ($Retries + 2) / 1000.0) + 5) $nowS
+        if ($rc -eq 0) { $script:Slot = $f; break }
+        if ($rc -eq 2) { return '' }
+      }
+    }
+    $wait = if (-not $script:Slot) { 20 + (Get-Random -Maximum 30) } elseif ($RatePerS -gt 0) { LimitToken $dir $nowMs } else { 0 }
+    $waited = $sw.ElapsedMilliseconds
+    if ($wait -eq 0) { break }
+    if ($waited -ge $budget -or ($script:Slot -and $waited + $wait -gt $budget)) {
+      $why = if (-not $script:Slot) { "no AIRS slot free after $($waited)ms ($MaxInflight in flight per API key)" } else { "AIRS rate limit: no token within $($budget)ms ($RatePerS/s per API key)" }
+      LimitRelease
+      if ($slept) { $script:QueueMs = $waited }
+      return $why
+    }
+    Start-Sleep -Milliseconds ([math]::Min($wait + (Get-Random -Maximum 10), $budget - $waited))
+    $slept = $true
+  }
+  if ($slept) { $script:QueueMs = $sw.ElapsedMilliseconds }
+  ''
+}
+function LimitRelease { if ($script:Slot) { Remove-Item -LiteralPath $script:Slot -Force -ErrorAction SilentlyContinue; $script:Slot = '' } }
+
+# Retry-After of a 429 (delay-seconds) in ms, or $null: PS7 parses it, Windows PowerShell has the raw header
+function RetryAfterMs($resp) {
+  $v = $null
+  try { $ra = $resp.Headers.RetryAfter; if ($ra -and $null -ne $ra.Delta) { $v = [string][long]$ra.Delta.TotalSeconds } } catch { }
+  if ($null -eq $v) { try { $v = [string]$resp.Headers['Retry-After'] } catch { } }
+  if ("$v".Trim() -match '^\d{1,6}$') { [long]"$v".Trim() * 1000 } else { $null }
+}
+
 # ---- call AIRS --------------------------------------------------------------
-$Scan = $null; $ScanErr = ''
+# A 429 is retried after its Retry-After or, without one, a jittered backoff (250 ms x 2^attempt, the
+# upper half at random); all pauses of one scan stay within $TimeoutMs / 2, and a Retry-After past
+# that ends the retries.
+$Scan = $null; $ScanErr = ''; $paused = 0; $pauseBudget = [long][math]::Floor($TimeoutMs / 2)
 $headers = @{ 'x-pan-token' = $ApiKey; 'Accept' = 'application/json' }
-for ($attempt = 0; $attempt -le $Retries; $attempt++) {
+$LimitErr = LimitAdmit
+for ($attempt = $(if ($LimitErr) { $Retries + 1 } else { 0 }); $attempt -le $Retries; $attempt++) {
+  $gate = HealthGate $attempt
+  if ($gate.open) { $ScanErr = $(if ($ScanErr) { "$ScanErr; $($gate.open)" } else { $gate.open }); $Scan = $null; $script:Breaker = 'open'; break }
+  # the queue wait comes out of this hook's timeout
+  if ($null -ne $script:QueueMs) { $gate.ms = [math]::Max(1, [math]::Min([long]$gate.ms, $TimeoutMs - $script:QueueMs)) }
+  $sec = [int][math]::Max(1, [math]::Ceiling($gate.ms / 1000.0))
+  $sw = [System.Diagnostics.Stopwatch]::StartNew()
   try {
-    $Scan = Invoke-RestMethod -Uri $ApiUrl -Method Post -ContentType 'application/json' -Headers $headers -Body $BodyJson -TimeoutSec $TimeoutSec
+    $Scan = Invoke-RestMethod -Uri $ApiUrl -Method Post -ContentType 'application/json' -Headers $headers -Body $BodyJson -TimeoutSec $sec
+    HealthNote $gate $true ([math]::Max(1, $sw.ElapsedMilliseconds))
     $ScanErr = ''; break
   } catch {
     $ScanErr = $_.Exception.Message; $Scan = $null
     if ($_.ErrorDetails -and $_.ErrorDetails.Message) { $ScanErr += ": " + $_.ErrorDetails.Message }   # response body (PS7)
     $code = try { [int]$_.Exception.Response.StatusCode } catch { 0 }
+    $timedOut = ($_.Exception -is [System.Threading.Tasks.TaskCanceledException]) -or ($_.Exception.InnerException -is [System.TimeoutException]) -or ("$($_.Exception.Status)" -eq 'Timeout')
+    if ($code -eq 429) { HealthNote $gate $null ([math]::Max(1, $sw.ElapsedMilliseconds)) }
+    elseif ($code -gt 0) { HealthNote $gate ($code -lt 500) ([math]::Max(1, $sw.ElapsedMilliseconds)) }
+    elseif ($timedOut) { HealthNote $gate $(if ($gate.ms -lt $TimeoutMs) { $null } else { $false }) ([long]$gate.ms) }
+    else { HealthNote $gate $false 0 }
     # 4xx (except 429) won't change on retry — stop retrying a bad key/profile.
     if ($code -ge 400 -and $code -lt 500 -and $code -ne 429) { break }
+    if ($code -eq 429 -and $attempt -lt $Retries) {
+      $after = RetryAfterMs $_.Exception.Response
+      if ($null -ne $after -and $paused + $after -gt $pauseBudget) { $ScanErr += " (Retry-After $($after / 1000)s is past the retry budget)"; break }
+      if ($null -ne $after) { $wait = $after }
+      else { $base = [long](250 * [math]::Pow(2, [math]::Min($attempt, 10))); $wait = [math]::Min([long]($base / 2) + (Get-Random -Maximum ([long]($base / 2) + 1)), $pauseBudget - $paused) }
+      if ($wait -gt 0) { Start-Sleep -Milliseconds $wait }
+      $paused += $wait
+    }
   }
 }
+LimitRelease
+
+# no turn to call AIRS -> fail policy, reported as admission_timeout (AIRS was never asked)
+if ($LimitErr) {
+  Log 'admission_timeout' "error($LimitErr)" @{ category = 'admission_timeout'; scan_id = 'unknown'; detections = @() }
+  if ($IEvent -eq 'Stop') { Render 'warn' "AIRS scan not sent at Stop (local admission: $LimitErr) - allowing" }
+  elseif ($FailMode -eq 'closed' -and $Side -eq 'input') { Render 'block' "Prisma AIRS scan not sent (local admission: $LimitErr) - blocking (fail-closed)" }
+  else { Render 'warn' "AIRS scan not sent (local admission: $LimitErr) - allowing (fail-open)" }
+}
 
 if ($ScanErr -or $null -eq $Scan) {
   if (-not $ScanErr) { $ScanErr = 'empty response' }
-  Log $Label "error($ScanErr)"
+  Log 'error' "error($ScanErr)" @{ category = 'scan_error'; scan_id = 'unknown'; detections = @() }
   if ($IEvent -eq 'Stop') { Render 'warn' "AIRS scan error at Stop ($ScanErr) - allowing" }
   elseif ($FailMode -eq 'closed' -and $Side -eq 'input') { Render 'block' "Prisma AIRS scan failed ($ScanErr) - blocking (fail-closed)" }
   else { Render 'warn' "AIRS scan error ($ScanErr) - allowing (fail-open)" }
@@ -464,21 +1054,24 @@ $Dets += Get-TrueKeys (Field $Scan 'prompt_detected')
 $Dets += Get-TrueKeys (Field $Scan 'response_detected')
 $Dets += Get-TrueKeys (Field $Scan 'tool_detected')
 $DetStr = ($Dets | Select-Object -Unique | Sort-Object) -join ', '
+$ScanRec = @{ category = $Category; scan_id = $ScanId; detections = @($Dets | Select-Object -Unique | Sort-Object) }
 
 if ($Action -eq 'block') {
   $reason = "Blocked by Prisma AIRS: $Category"
   if ($DetStr) { $reason += " [$DetStr]" }
   $reason += " (scan_id: $ScanId)"
-  Log $Label "BLOCK $reason"
+  Log 'block' "BLOCK $reason" $ScanRec
   Render 'block' $reason
 } elseif ($Action -eq 'allow') {
   $tag = if ($DetStr) { "allow [$DetStr]" } else { 'allow' }
   $tag += " [scan:$ScanId]"
-  Log $Label $tag
+  Log 'allow' $tag $ScanRec
+  if ($CacheKey) { CachePut $CacheKey $ScanId }
+  if ($WmTag) { WmPut }
   Render 'allow' ''
 } else {
   # Unrecognized action (partial response / API contract drift) is NOT clean -> fail-mode.
-  Log $Label "unexpected action '$Action' - fail-mode ($FailMode)"
+  Log 'unexpected_action' "unexpected action '$Action' - fail-mode ($FailMode)" $ScanRec
   if ($FailMode -eq 'closed' -and $Side -eq 'input') { Render 'block' "Prisma AIRS returned an unexpected action ('$Action') - blocking (fail-closed)" }
   else { Render 'warn' "Prisma AIRS returned an unexpected action ('$Action') - allowing (fail-open)" }
 }
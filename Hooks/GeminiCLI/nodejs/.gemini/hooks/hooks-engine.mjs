@@ -0,0 +1,2209 @@
+// src/config.ts
+import { homedir } from "node:os";
+import { join as joinPath } from "node:path";
+var DEFAULT_BASE_URL = "https://service.api.aisecurity.paloaltonetworks.com";
+var SCAN_PATH = "/v1/scan/sync/request";
+// A cleared verdict outlives a profile change by at most this long, whatever AIRS_VERDICT_CACHE_TTL_S says.
+var CACHE_TTL_MAX_S = 86400;
+function loadConfig(env = process.env) {
+  const base = (env.PRISMA_AIRS_URL || DEFAULT_BASE_URL).replace(/\/+$/, "");
+  const profileId = str(env.PRISMA_AIRS_PROFILE_ID);
+  const profileName = str(env.PRISMA_AIRS_PROFILE_NAME);
+  const profile = profileId ? { profile_id: profileId } : profileName ? { profile_name: profileName } : null;
+  const suffix = str(env.AIRS_APP_SUFFIX) || str(env.CLAUDE_CODE_APP_SUFFIX);
+  return {
+    apiUrl: base + SCAN_PATH,
+    apiKey: str(env.PRISMA_AIRS_API_KEY),
+    profile,
+    // Default base; the entrypoint overrides with the active adapter's appName.
+    appName: suffix ? `Claude Code-${suffix}` : "Claude Code",
+    appSuffix: suffix,
+    logPath: str(env.SECURITY_LOG_PATH),
+    // per-agent default set in the entrypoint
+    appUser: str(env.AIRS_APP_USER),
+    // per-agent default (<vendor>-user) set in the entrypoint
+    timeoutMs: intEnv(env.AIRS_TIMEOUT_MS, 1e4),
+    retries: intEnv(env.AIRS_RETRIES, 1),
+    // Shared AIRS health, one file per AIRS URL for every hook on the machine (format: Hooks/README.md):
+    // a circuit breaker applies the fail mode at once after breakerFailures failures in a row, and with
+    // adaptiveTimeout a first attempt's timeout follows a latency estimate (timeoutMs is the ceiling).
+    health: env.AIRS_HEALTH === void 0 ? true : bool(env.AIRS_HEALTH),
+    healthDir: str(env.AIRS_HEALTH_DIR) || joinPath(homedir(), ".prisma-airs", "health"),
+    adaptiveTimeout: bool(env.AIRS_ADAPTIVE_TIMEOUT),
+    timeoutMinMs: intEnv(env.AIRS_TIMEOUT_MIN_MS, 5e3),
+    breakerFailures: Math.max(1, intEnv(env.AIRS_BREAKER_FAILURES, 3)),
+    breakerCooldownS: intEnv(env.AIRS_BREAKER_COOLDOWN_S, 30),
+    // Machine-local admission control per API key, shared by every hook (format: Hooks/README.md): at most
+    // maxInflight AIRS calls at once and, when ratePerS is set, that many a second; a hook queues up to
+    // queueMaxMs for its turn and the wait comes out of its timeout.
+    limit: env.AIRS_LIMIT === void 0 ? true : bool(env.AIRS_LIMIT),
+    limitDir: str(env.AIRS_LIMIT_DIR) || joinPath(homedir(), ".prisma-airs", "limits"),
+    maxInflight: Math.max(1, intEnv(env.AIRS_MAX_INFLIGHT, 8)),
+    ratePerS: intEnv(env.AIRS_RATE_PER_S, 0),
+    queueMaxMs: intEnv(env.AIRS_QUEUE_MAX_MS, Math.floor(intEnv(env.AIRS_TIMEOUT_MS, 1e4) / 2)),
+    // Normalize case/whitespace: only a clean "open" opts out; everything else stays fail-CLOSED.
+    failMode: str(env.AIRS_FAIL_MODE).toLowerCase() === "open" ? "open" : "closed",
+    requireConfig: bool(env.AIRS_REQUIRE_CONFIG),
+    maxContentChars: Math.max(1, intEnv(env.AIRS_MAX_CONTENT_CHARS, 2e4)),
+    maxChunks: Math.max(1, intEnv(env.AIRS_MAX_CHUNKS, 6)),
+    // Chunks of one oversized payload scanned in parallel (1 = the old one-at-a-time behaviour).
+    scanConcurrency: Math.max(1, intEnv(env.AIRS_SCAN_CONCURRENCY, 4)),
+    enableMasking: bool(env.AIRS_ENABLE_MASKING),
+    codeAware: env.AIRS_CODE_AWARE === void 0 ? true : bool(env.AIRS_CODE_AWARE),
+    // Compact tool output (opt-in): each distinct object key once per result, every string value in
+    // order (identical across runtimes, see Hooks/README.md); off = the extraction as before.
+    compactOutput: bool(env.AIRS_COMPACT_OUTPUT),
+    // Opt-in on-disk allow-verdict cache shared with the bash/PowerShell engines (format: Hooks/README.md).
+    verdictCache: bool(env.AIRS_VERDICT_CACHE),
+    verdictCacheDir: str(env.AIRS_VERDICT_CACHE_DIR),
+    // per-agent default (<cfgdir>/hooks/verdict-cache) set in the entrypoint
+    verdictCacheTtlS: Math.min(CACHE_TTL_MAX_S, intEnv(env.AIRS_VERDICT_CACHE_TTL_S, 300)),
+    verdictCacheMax: Math.max(1, intEnv(env.AIRS_VERDICT_CACHE_MAX, 1e3)),
+    // Stop watermark: answer text already cleared in the session is not scanned again (format: Hooks/README.md).
+    stopWatermark: env.AIRS_STOP_WATERMARK === void 0 ? true : bool(env.AIRS_STOP_WATERMARK),
+    stopWatermarkPath: str(env.AIRS_STOP_WATERMARK_PATH),
+    // per-agent default (<cfgdir>/hooks/stop-watermark) set in the entrypoint
+    stopWatermarkOverlap: intEnv(env.AIRS_STOP_WATERMARK_OVERLAP, 1024),
+    // Deferred output scanning: PostToolUse returns at once, a detached worker scans, and the verdict
+    // reaches the agent at the session's next checkpoint (format: Hooks/README.md).
+    deferOutput: bool(env.AIRS_DEFER_OUTPUT),
+    deferDir: str(env.AIRS_DEFER_DIR),
+    // per-agent default (<cfgdir>/hooks/deferred) set in the entrypoint
+    // Delta scan: a Write / NotebookEdit over an existing file scans only the lines that differ from
+    // the file on disk, plus deltaContextLines around each change (see Hooks/README.md).
+    deltaScan: bool(env.AIRS_DELTA_SCAN),
+    deltaMaxFileBytes: intEnv(env.AIRS_DELTA_MAX_FILE_BYTES, 1e6),
+    deltaContextLines: intEnv(env.AIRS_DELTA_CONTEXT_LINES, 3),
+    debug: bool(env.AIRS_DEBUG),
+    // Audit log rotation: roll <log> to <log>.1 … <log>.N once it would pass logMaxBytes (0 = never).
+    logMaxBytes: intEnv(env.AIRS_LOG_MAX_BYTES, 5e6),
+    logKeep: Math.max(1, intEnv(env.AIRS_LOG_KEEP, 3)),
+    // Local scan sidecar (`hooks.mjs --serve`): its unix socket, or "" when AIRS_SIDECAR=0.
+    sidecarSocket: env.AIRS_SIDECAR !== void 0 && !bool(env.AIRS_SIDECAR) ? "" : str(env.AIRS_SIDECAR_SOCKET) || defaultSidecarSocket()
+  };
+}
+function defaultSidecarSocket() {
+  return joinPath(homedir(), ".prisma-airs", "sidecar.sock");
+}
+function configError(cfg) {
+  if (!cfg.apiKey) return "PRISMA_AIRS_API_KEY not set";
+  if (!cfg.profile) return "PRISMA_AIRS_PROFILE_NAME or PRISMA_AIRS_PROFILE_ID not set";
+  return null;
+}
+function str(v) {
+  return (v ?? "").trim();
+}
+function bool(v) {
+  return v === "1" || v === "true" || v === "yes";
+}
+function intEnv(v, dflt) {
+  if (!v) return dflt;
+  const n = parseInt(v, 10);
+  return Number.isFinite(n) && n >= 0 ? n : dflt;
+}
+
+// src/log.ts
+import { appendFileSync, mkdirSync, renameSync as renameLogSync, statSync as statLogSync } from "node:fs";
+import { dirname, isAbsolute, resolve } from "node:path";
+var LOG_FLUSH_MS = 200;
+var pendingLogs = /* @__PURE__ */ new Map();
+var flushTimer = null;
+var exitHooked = false;
+function makeLogger(logPath, cwd, opts) {
+  const absPath = isAbsolute(logPath) ? logPath : resolve(cwd || process.cwd(), logPath);
+  const base = { runtime: "node", vendor: opts.vendor ?? "" };
+  const queue = (rec) => {
+    const line = JSON.stringify({ ts: (/* @__PURE__ */ new Date()).toISOString(), ...base, ...rec }) + "\n";
+    let q = pendingLogs.get(absPath);
+    if (!q) pendingLogs.set(absPath, q = { lines: [], maxBytes: opts.maxBytes, keep: opts.keep });
+    q.lines.push(line);
+    scheduleFlush();
+  };
+  return {
+    // One JSONL audit record per checkpoint verdict (schema: Hooks/README.md "Audit log").
+    record(rec) {
+      queue(rec);
+    },
+    debug(msg) {
+      if (!opts.debug) return;
+      queue({ level: "debug", msg });
+      try {
+        process.stderr.write(`[airs-hook] ${msg}
+`);
+      } catch {
+      }
+    }
+  };
+}
+function scheduleFlush() {
+  if (!exitHooked) {
+    process.on("exit", flushLogs);
+    exitHooked = true;
+  }
+  if (flushTimer) return;
+  flushTimer = setTimeout(flushLogs, LOG_FLUSH_MS);
+  flushTimer.unref?.();
+}
+function flushLogs() {
+  if (flushTimer) clearTimeout(flushTimer);
+  flushTimer = null;
+  for (const [path, q] of pendingLogs) {
+    const chunk = q.lines.join("");
+    try {
+      mkdirSync(dirname(path), { recursive: true });
+      rotateLog(path, Buffer.byteLength(chunk), q.maxBytes, q.keep);
+      appendFileSync(path, chunk);
+    } catch {
+    }
+  }
+  pendingLogs.clear();
+}
+function rotateLog(path, incoming, maxBytes, keep) {
+  if (!maxBytes) return;
+  let size;
+  try {
+    size = statLogSync(path).size;
+  } catch {
+    return;
+  }
+  if (size === 0 || size + incoming <= maxBytes) return;
+  for (let i = keep - 1; i >= 1; i--) {
+    try {
+      renameLogSync(`${path}.${i}`, `${path}.${i + 1}`);
+    } catch {
+    }
+  }
+  try {
+    renameLogSync(path, `${path}.1`);
+  } catch {
+  }
+}
+function msSince(t0) {
+  return Math.round(performance.now() - t0);
+}
+
+// src/cache.ts
+import { linkSync, readFileSync, readdirSync, renameSync, statSync, unlinkSync, writeFileSync } from "node:fs";
+var CACHE_FORMAT = "airs-verdict-cache/v1";
+function profileKey(cfg) {
+  return cfg.profile?.profile_id ? `profile_id=${cfg.profile.profile_id}` : `profile_name=${cfg.profile?.profile_name ?? ""}`;
+}
+function verdictCacheKey(cfg, side, plan) {
+  return sha256([CACHE_FORMAT, profileKey(cfg), side, plan.kind, plan.server ?? "", plan.tool ?? "", sha256(plan.inputText ?? ""), sha256(plan.text)].join("\n"));
+}
+function cacheGet(cfg, key) {
+  const file = joinPath(cfg.verdictCacheDir, key);
+  let line;
+  try {
+    line = readFileSync(file, "utf8");
+  } catch {
+    return null;
+  }
+  const [version, action, expires, scanId] = line.trim().split(/\s+/);
+  if (version !== "v1" || action !== "allow" || !(Number(expires) > nowS())) {
+    try {
+      unlinkSync(file);
+    } catch {
+    }
+    return null;
+  }
+  return { action: "allow", category: "benign", scanId: scanId || "unknown", detections: [], cached: true };
+}
+function cachePut(cfg, key, verdict) {
+  if (verdict.action !== "allow" || verdict.error) return;
+  const dir = cfg.verdictCacheDir;
+  const tmp = joinPath(dir, `.${key}.${process.pid}`);
+  try {
+    mkdirSync(dir, { recursive: true });
+    writeFileSync(tmp, `v1 allow ${nowS() + cfg.verdictCacheTtlS} ${verdict.scanId.replace(/\s+/g, "_")}
+`);
+    renameSync(tmp, joinPath(dir, key));
+  } catch {
+    try {
+      unlinkSync(tmp);
+    } catch {
+    }
+    return;
+  }
+  cacheEvict(dir, cfg.verdictCacheMax);
+}
+function cacheEvict(dir, max) {
+  let names;
+  try {
+    names = readdirSync(dir).filter((n) => !n.startsWith("."));
+  } catch {
+    return;
+  }
+  if (names.length <= max) return;
+  const aged = names.map((n) => {
+    try {
+      return { n, t: statSync(joinPath(dir, n)).mtimeMs };
+    } catch {
+      return { n, t: 0 };
+    }
+  }).sort((a, b) => a.t - b.t);
+  for (const { n } of aged.slice(0, names.length - Math.floor(max * 0.9))) {
+    try {
+      unlinkSync(joinPath(dir, n));
+    } catch {
+    }
+  }
+}
+function nowS() {
+  return Math.floor(Date.now() / 1e3);
+}
+
+// src/watermark.ts
+var WATERMARK_FORMAT = "airs-stop-watermark/v1";
+function watermarkSum(cfg, bytes) {
+  return createHash("sha256").update(`${WATERMARK_FORMAT}
+${profileKey(cfg)}
+`).update(bytes).digest("hex");
+}
+function watermarkTag(sessionId) {
+  return sessionId.replace(/\s+/g, "_");
+}
+function watermarkGet(cfg, sessionId, text) {
+  let line;
+  try {
+    line = readFileSync(cfg.stopWatermarkPath, "utf8");
+  } catch {
+    return null;
+  }
+  const [version, tag, size, sum] = line.trim().split(/\s+/);
+  const buf = Buffer.from(text, "utf8");
+  const n = Number(size);
+  if (version !== "v1" || tag !== watermarkTag(sessionId) || !(n > 0 && n <= buf.length)) return null;
+  if (watermarkSum(cfg, buf.subarray(0, n)) !== sum) return null;
+  if (n === buf.length) return { bytes: n, seen: true, rest: "" };
+  let from = Math.max(n - cfg.stopWatermarkOverlap, 0);
+  while (from > 0 && (buf[from] & 192) === 128) from--;
+  return { bytes: from, seen: false, rest: buf.subarray(from).toString("utf8") };
+}
+function watermarkPut(cfg, sessionId, text) {
+  const buf = Buffer.from(text, "utf8");
+  const tmp = `${cfg.stopWatermarkPath}.${process.pid}`;
+  try {
+    mkdirSync(dirname(cfg.stopWatermarkPath), { recursive: true });
+    writeFileSync(tmp, `v1 ${watermarkTag(sessionId)} ${buf.length} ${watermarkSum(cfg, buf)}
+`);
+    renameSync(tmp, cfg.stopWatermarkPath);
+  } catch {
+    try {
+      unlinkSync(tmp);
+    } catch {
+    }
+  }
+}
+// src/defer.ts
+import { closeSync, openSync, rmdirSync } from "node:fs";
+import { fileURLToPath } from "node:url";
+var DEFER_ENTRY = fileURLToPath(new URL("./hooks.mjs", import.meta.url));
+function deferDirFor(cfg, sessionId) {
+  return joinPath(cfg.deferDir, createHash("sha256").update(sessionId).digest("hex").slice(0, 32));
+}
+var DEFER_MAX_AGE_MS = 864e5;
+var DEFER_SWEEP_EVERY_MS = 36e5;
+function deferSweep(cfg, now = Date.now()) {
+  const mark = joinPath(cfg.deferDir, ".swept");
+  try {
+    if (now - statSync(mark).mtimeMs < DEFER_SWEEP_EVERY_MS) return;
+  } catch {
+  }
+  let dirs;
+  try {
+    dirs = readdirSync(cfg.deferDir);
+    writeFileSync(mark, "", { mode: 384 });
+  } catch {
+    return;
+  }
+  for (const d of dirs) {
+    if (d === ".swept") continue;
+    const dir = joinPath(cfg.deferDir, d);
+    let names;
+    try {
+      names = readdirSync(dir);
+    } catch {
+      continue;
+    }
+    for (const name of names) {
+      try {
+        if (now - statSync(joinPath(dir, name)).mtimeMs > DEFER_MAX_AGE_MS) unlinkSync(joinPath(dir, name));
+      } catch {
+      }
+    }
+    try {
+      if (now - statSync(dir).mtimeMs > DEFER_SWEEP_EVERY_MS) rmdirSync(dir);
+    } catch {
+    }
+  }
+}
+async function deferSpawn(cfg, sessionId, hook) {
+  const dir = deferDirFor(cfg, sessionId);
+  const base = joinPath(dir, `${Date.now()}-${process.pid}-${randomUUID().slice(0, 8)}`);
+  let fd;
+  try {
+    const { spawn } = await import("node:child_process");
+    deferSweep(cfg);
+    mkdirSync(dir, { recursive: true, mode: 448 });
+    writeFileSync(`${base}.job`, hook.raw, { mode: 384 });
+    fd = openSync(`${base}.job`, "r");
+    const args = [DEFER_ENTRY, "--vendor", cfg.vendor, ...hook.event ? ["--event", hook.event] : []];
+    const child = spawn(process.execPath, args, { cwd: hook.cwd, detached: true, stdio: [fd, "ignore", "ignore"], env: { ...process.env, AIRS_DEFERRED: base }, windowsHide: true });
+    child.on("error", () => {
+    });
+    child.unref();
+    return true;
+  } catch {
+    try {
+      unlinkSync(`${base}.job`);
+    } catch {
+    }
+    return false;
+  } finally {
+    if (fd !== void 0) closeSync(fd);
+  }
+}
+function deferFinish(base, label, decision) {
+  if (decision.kind !== "block" && decision.kind !== "warn") return;
+  const tmp = `${base}.tmp`;
+  try {
+    writeFileSync(tmp, JSON.stringify({ v: 1, label, kind: decision.kind, text: decision.reason ?? decision.message ?? "" }) + "\n", { mode: 384 });
+    renameSync(tmp, `${base}.done`);
+  } catch {
+    try {
+      unlinkSync(tmp);
+    } catch {
+    }
+  }
+}
+function deferCollect(cfg, sessionId) {
+  const dir = deferDirFor(cfg, sessionId);
+  let names;
+  try {
+    names = readdirSync(dir);
+  } catch {
+    return [];
+  }
+  const found = [];
+  for (const name of names.filter((n) => n.endsWith(".done")).sort()) {
+    const claimed = joinPath(dir, `${name}.${process.pid}`);
+    try {
+      renameSync(joinPath(dir, name), claimed);
+    } catch {
+      continue;
+    }
+    try {
+      const r = JSON.parse(readFileSync(claimed, "utf8"));
+      if (r?.v === 1 && (r.kind === "block" || r.kind === "warn")) found.push(r);
+    } catch {
+    }
+    try {
+      unlinkSync(claimed);
+    } catch {
+    }
+  }
+  return found;
+}
+function deferText(r) {
+  return `Prisma AIRS deferred scan of ${r.label}: ${r.text}`;
+}
+
+// src/health.ts
+var NO_HEALTH = { srtt: 0, rttvar: 0, fails: 0, openUntil: 0 };
+function healthPath(cfg) {
+  return joinPath(cfg.healthDir, createHash("sha256").update(cfg.apiUrl).digest("hex").slice(0, 16));
+}
+function healthRead(path) {
+  try {
+    const [version, ...fields] = readFileSync(path, "utf8").trim().split(/\s+/);
+    const [srtt, rttvar, fails, openUntil] = fields.map((f) => Number(f));
+    if (version === "v1" && [srtt, rttvar, fails, openUntil].every((n) => Number.isInteger(n) && n >= 0)) return { srtt, rttvar, fails, openUntil };
+  } catch {
+  }
+  return NO_HEALTH;
+}
+function healthGate(cfg) {
+  if (!cfg.health) return { path: "", h: NO_HEALTH, probe: false, open: null };
+  const path = healthPath(cfg);
+  const h = healthRead(path);
+  if (h.fails < cfg.breakerFailures) return { path, h, probe: false, open: null };
+  const now = Math.floor(Date.now() / 1e3);
+  if (now < h.openUntil) return { path, h, probe: false, open: `circuit open after ${h.fails} AIRS failures in a row, next probe in ${h.openUntil - now}s` };
+  if (claimProbe(cfg, path)) return { path, h, probe: true, open: null };
+  return { path, h, probe: false, open: `circuit open after ${h.fails} AIRS failures in a row, probe in progress` };
+}
+function claimProbe(cfg, path) {
+  const probe = `${path}.probe`;
+  const now = Math.floor(Date.now() / 1e3);
+  for (let i = 0; i < 2; i++) {
+    try {
+      mkdirSync(dirname(path), { recursive: true, mode: 448 });
+      writeFileSync(probe, `${now + cfg.breakerCooldownS + Math.ceil(cfg.timeoutMs / 1e3)}
+`, { flag: "wx", mode: 384 });
+      return true;
+    } catch (err) {
+      if (err?.code !== "EEXIST") return false;
+      try {
+        if (Number(readFileSync(probe, "utf8").trim()) >= now) return false;
+        unlinkSync(probe);
+      } catch {
+      }
+    }
+  }
+  return false;
+}
+function healthTimeoutMs(cfg, h, attempt) {
+  if (!cfg.health || !cfg.adaptiveTimeout || attempt > 0 || !h.srtt) return cfg.timeoutMs;
+  return Math.min(cfg.timeoutMs, Math.max(cfg.timeoutMinMs, h.srtt + 4 * h.rttvar));
+}
+// Run fn (a read-modify-write of the health file) holding "<file>.lock", created exclusively and holding
+// its expiry like the probe claim; a hook that cannot take it within half a second drops its sample.
+// A stale lock is renamed aside before it is deleted, so only one hook takes it over; one that turns
+// out to be fresh (another hook got there first) is linked back.
+var HEALTH_LOCK_WAIT = new Int32Array(new SharedArrayBuffer(4));
+function healthLockStale(lock, now) {
+  const exp = readFileSync(lock, "utf8").trim();
+  if (!exp) return statSync(lock).mtimeMs < Date.now() - 6e4;
+  return !(Number(exp) >= now);
+}
+// Takeovers run one at a time under "<file>.steal" (created exclusively; one older than a minute was
+// left by a dead hook), and the lock is checked again once it is held: a hook that saw the stale lock
+// must not move aside the fresh one another hook took in the meantime.
+function healthLockSteal(path, now) {
+  const lock = `${path}.lock`;
+  const steal = `${path}.steal`;
+  const aside = `${lock}.${process.pid}`;
+  try {
+    if (!healthLockStale(lock, now)) return;
+    writeFileSync(steal, "", { flag: "wx", mode: 384 });
+  } catch (err) {
+    try {
+      if (err?.code === "EEXIST" && statSync(steal).mtimeMs < Date.now() - 6e4) unlinkSync(steal);
+    } catch {
+    }
+    return;
+  }
+  try {
+    if (healthLockStale(lock, now)) {
+      renameSync(lock, aside);
+      if (!healthLockStale(aside, now)) linkSync(aside, lock);
+    }
+  } catch {
+  }
+  for (const f of [aside, steal]) {
+    try {
+      unlinkSync(f);
+    } catch {
+    }
+  }
+}
+function healthLocked(path, fn) {
+  const lock = `${path}.lock`;
+  for (let i = 0; i < 50; i++) {
+    const now = Math.floor(Date.now() / 1e3);
+    try {
+      mkdirSync(dirname(path), { recursive: true, mode: 448 });
+      writeFileSync(lock, `${now + 2}
+`, { flag: "wx", mode: 384 });
+    } catch (err) {
+      if (err?.code !== "EEXIST") return;
+      healthLockSteal(path, now);
+      Atomics.wait(HEALTH_LOCK_WAIT, 0, 0, 10);
+      continue;
+    }
+    try {
+      fn();
+    } finally {
+      try {
+        unlinkSync(lock);
+      } catch {
+      }
+    }
+    return;
+  }
+}
+// ok: true for an answer, false for a failure, null for a 429 or a timeout this hook set below timeoutMs
+// (a latency sample only: throttling, or AIRS was not given the full timeout, so it does not count
+// toward the breaker)
+function healthNote(cfg, gate, ok, sampleMs) {
+  if (!gate.path) return;
+  healthLocked(gate.path, () => healthUpdate(cfg, gate.path, ok, sampleMs));
+  if (gate.probe) {
+    try {
+      unlinkSync(`${gate.path}.probe`);
+    } catch {
+    }
+  }
+}
+function healthUpdate(cfg, path, ok, sampleMs) {
+  const h = { ...healthRead(path) };
+  if (sampleMs > 0) {
+    const s = Math.round(sampleMs);
+    if (!h.srtt) {
+      h.srtt = s;
+      h.rttvar = Math.round(s / 2);
+    } else {
+      h.rttvar = Math.round((3 * h.rttvar + Math.abs(h.srtt - s)) / 4);
+      h.srtt = Math.round((7 * h.srtt + s) / 8);
+    }
+  }
+  if (ok) {
+    h.fails = 0;
+    h.openUntil = 0;
+  } else if (ok === false) {
+    h.fails++;
+    if (h.fails >= cfg.breakerFailures) h.openUntil = Math.floor(Date.now() / 1e3) + cfg.breakerCooldownS;
+  }
+  const tmp = `${path}.${process.pid}`;
+  try {
+    writeFileSync(tmp, `v1 ${h.srtt} ${h.rttvar} ${h.fails} ${h.openUntil}
+`);
+    renameSync(tmp, path);
+  } catch {
+    try {
+      unlinkSync(tmp);
+    } catch {
+    }
+  }
+}
+
+// src/limit.ts
+var LIMIT_POLL_MS = 20;
+var NO_ADMISSION = { slot: "", waitMs: 0, error: null };
+function limitDir(cfg) {
+  return joinPath(cfg.limitDir, createHash("sha256").update(cfg.apiKey).digest("hex").slice(0, 16));
+}
+function heldBy(path, nowMs) {
+  try {
+    const [expires, pid] = readFileSync(path, "utf8").trim().split(/\s+/).map((f) => Number(f));
+    if (!Number.isInteger(expires) || !Number.isInteger(pid) || pid <= 0) return statSync(path).mtimeMs > nowMs - 6e4;
+    if (expires * 1e3 < nowMs) return false;
+    try {
+      process.kill(pid, 0);
+      return true;
+    } catch (err) {
+      return err?.code === "EPERM";
+    }
+  } catch {
+    return true;
+  }
+}
+function claimFile(path, expires, nowMs) {
+  for (let i = 0; i < 2; i++) {
+    try {
+      writeFileSync(path, `${expires} ${process.pid}
+`, { flag: "wx", mode: 384 });
+      return true;
+    } catch (err) {
+      if (err?.code !== "EEXIST") throw err;
+      if (heldBy(path, nowMs)) return false;
+      try {
+        unlinkSync(path);
+      } catch {
+      }
+    }
+  }
+  return false;
+}
+function claimSlot(cfg, dir) {
+  const nowMs = Date.now();
+  const expires = Math.floor(nowMs / 1e3) + Math.ceil(cfg.timeoutMs * (cfg.retries + 2) / 1e3) + 5;
+  const first = Math.floor(Math.random() * cfg.maxInflight);
+  for (let i = 0; i < cfg.maxInflight; i++) {
+    const path = joinPath(dir, `slot.${(first + i) % cfg.maxInflight}`);
+    if (claimFile(path, expires, nowMs)) return path;
+  }
+  return null;
+}
+function takeToken(cfg, dir) {
+  const nowMs = Date.now();
+  const lock = joinPath(dir, "bucket.lock");
+  if (!claimFile(lock, Math.floor(nowMs / 1e3) + 2, nowMs)) return LIMIT_POLL_MS;
+  const path = joinPath(dir, "bucket");
+  const cap = Math.max(1, cfg.ratePerS) * 1e3;
+  let tokens = cap;
+  try {
+    const [version, t, at] = readFileSync(path, "utf8").trim().split(/\s+/);
+    const [tn, an] = [Number(t), Number(at)];
+    if (version === "v1" && Number.isInteger(tn) && Number.isInteger(an) && tn >= 0) tokens = Math.min(cap, tn + Math.max(0, nowMs - an) * cfg.ratePerS);
+  } catch {
+  }
+  const wait = tokens >= 1e3 ? 0 : Math.ceil((1e3 - tokens) / cfg.ratePerS);
+  if (!wait) tokens -= 1e3;
+  const tmp = `${path}.${process.pid}`;
+  try {
+    writeFileSync(tmp, `v1 ${tokens} ${nowMs}
+`);
+    renameSync(tmp, path);
+  } catch {
+    try {
+      unlinkSync(tmp);
+    } catch {
+    }
+  }
+  try {
+    unlinkSync(lock);
+  } catch {
+  }
+  return wait;
+}
+async function admit(cfg, signal) {
+  if (!cfg.limit || !cfg.apiKey) return NO_ADMISSION;
+  const dir = limitDir(cfg);
+  const budget = Math.min(cfg.queueMaxMs, cfg.timeoutMs);
+  const t0 = performance.now();
+  let slot = null;
+  let slept = false;
+  try {
+    mkdirSync(dir, { recursive: true, mode: 448 });
+    for (; ; ) {
+      slot ??= claimSlot(cfg, dir);
+      const wait = slot === null ? LIMIT_POLL_MS + Math.random() * 30 : cfg.ratePerS ? takeToken(cfg, dir) : 0;
+      const waitMs = Math.round(performance.now() - t0);
+      if (!wait) return { slot, waitMs: slept ? waitMs : 0, error: null };
+      if (waitMs >= budget || slot !== null && waitMs + wait > budget || signal?.aborted) {
+        releaseSlot(slot);
+        return {
+          slot: "",
+          waitMs: slept ? waitMs : 0,
+          error: slot === null ? `no AIRS slot free after ${waitMs}ms (${cfg.maxInflight} in flight per API key)` : `AIRS rate limit: no token within ${budget}ms (${cfg.ratePerS}/s per API key)`
+        };
+      }
+      await new Promise((r) => setTimeout(r, Math.min(wait + Math.random() * 10, budget - waitMs)));
+      slept = true;
+    }
+  } catch {
+    releaseSlot(slot);
+    return { ...NO_ADMISSION, waitMs: slept ? Math.round(performance.now() - t0) : 0 };
+  }
+}
+function releaseSlot(slot) {
+  if (!slot) return;
+  try {
+    unlinkSync(slot);
+  } catch {
+  }
+}
+
+// src/router.ts
+import { createHash, randomUUID } from "node:crypto";
+
+// src/airs.ts
+var CHUNK_OVERLAP = 256;
+async function scanPlan(cfg, plan, meta) {
+  const { pieces, overflow } = splitChunks(plan.text, cfg.maxContentChars, cfg.maxChunks, CHUNK_OVERLAP);
+  const verdicts = new Array(pieces.length);
+  const inFlight = /* @__PURE__ */ new Set();
+  let blocked = null;
+  let next = 0;
+  const worker = async () => {
+    while (!blocked && next < pieces.length) {
+      const i = next++;
+      const content = buildContent(plan, pieces[i], cfg.codeAware);
+      const partMeta = pieces.length > 1 ? { ...meta, transactionId: `${meta.transactionId}#${i + 1}`, extra: { ...meta.extra ?? {}, chunk: `${i + 1}/${pieces.length}` } } : meta;
+      const controller = new AbortController();
+      inFlight.add(controller);
+      const verdict = await scan(cfg, content, partMeta, controller.signal);
+      inFlight.delete(controller);
+      verdicts[i] = verdict;
+      if (verdict.action === "block" && !blocked) {
+        blocked = verdict;
+        for (const c of inFlight) c.abort();
+      }
+    }
+  };
+  const lanes = Math.min(cfg.scanConcurrency ?? 1, pieces.length);
+  await Promise.all(Array.from({ length: lanes }, worker));
+  const chunks = verdicts.filter(Boolean).length;
+  const queueMs = verdicts.reduce((sum, v) => sum + (v?.queueMs ?? 0), 0);
+  if (blocked) return { ...blocked, chunks, queueMs };
+  const firstError = verdicts.find((v) => v?.error) ?? null;
+  if (overflow) {
+    return { ...firstError ?? {
+      action: "unknown",
+      category: "content_overflow",
+      scanId: "unknown",
+      detections: [],
+      error: `content exceeded scan budget (${cfg.maxChunks} x ${cfg.maxContentChars} chars) \u2014 tail unscanned`
+    }, chunks, queueMs };
+  }
+  if (firstError) return { ...firstError, chunks, queueMs };
+  return { ...verdicts[verdicts.length - 1] ?? { action: "allow", category: "benign", scanId: "unknown", detections: [] }, chunks, queueMs };
+}
+function splitChunks(text, maxChars, maxChunks, overlap) {
+  if (text.length <= maxChars) return { pieces: [text], overflow: false };
+  const eff = Math.min(overlap, Math.floor(maxChars / 4));
+  const step = Math.max(1, maxChars - eff);
+  const pieces = [];
+  let start = 0;
+  let end = 0;
+  while (start < text.length && pieces.length < maxChunks) {
+    end = Math.min(start + maxChars, text.length);
+    pieces.push(text.slice(start, end));
+    if (end >= text.length) break;
+    start += step;
+  }
+  return { pieces, overflow: end < text.length };
+}
+function buildContent(plan, chunkText, codeAware) {
+  switch (plan.kind) {
+    case "prompt": {
+      const c = { prompt: chunkText };
+      if (codeAware) c.code_prompt = chunkText;
+      return c;
+    }
+    case "response": {
+      const c = { response: chunkText };
+      if (codeAware) c.code_response = chunkText;
+      return c;
+    }
+    case "toolInput": {
+      const c = { tool_event: toolEvent(plan.server, plan.tool, chunkText, void 0) };
+      if (codeAware) c.code_prompt = chunkText;
+      return c;
+    }
+    case "toolOutput": {
+      const c = { tool_event: toolEvent(plan.server, plan.tool, plan.inputText || void 0, chunkText) };
+      if (codeAware) {
+        c.code_response = chunkText;
+        if (plan.inputText) c.code_prompt = plan.inputText;
+      }
+      return c;
+    }
+  }
+}
+function toolEvent(serverName, toolInvoked, input, output) {
+  const te = {
+    metadata: { ecosystem: "mcp", method: "tools/call", server_name: serverName, tool_invoked: toolInvoked }
+  };
+  if (input !== void 0 && input.length > 0) te.input = input;
+  if (output !== void 0 && output.length > 0) te.output = output;
+  return te;
+}
+async function scan(cfg, content, meta, signal) {
+  const adm = await admit(cfg, signal);
+  if (adm.error) {
+    if (signal?.aborted) return cancelledVerdict();
+    return { action: "unknown", category: "admission_timeout", scanId: "unknown", detections: [], error: adm.error, queueMs: adm.waitMs };
+  }
+  try {
+    const verdict = await scanAttempts(cfg, content, meta, signal, Math.max(1, cfg.timeoutMs - adm.waitMs));
+    return adm.waitMs ? { ...verdict, queueMs: adm.waitMs } : verdict;
+  } finally {
+    releaseSlot(adm.slot);
+  }
+}
+// A 429 is retried after its Retry-After (delay-seconds) or, without one, a jittered backoff
+// (RETRY_BASE_MS x 2^attempt, the upper half at random); all pauses of one scan stay within half
+// the timeout, and a Retry-After past that ends the retries.
+var RETRY_BASE_MS = 250;
+function retryAfterMs(header) {
+  const v = String(header ?? "").trim();
+  return /^\d{1,6}$/.test(v) ? Number(v) * 1e3 : null;
+}
+function backoffMs(attempt) {
+  const base = RETRY_BASE_MS * 2 ** attempt;
+  return Math.round(base / 2 + Math.random() * base / 2);
+}
+function pause(ms, signal) {
+  return new Promise((r) => {
+    const timer = setTimeout(r, ms);
+    signal?.addEventListener("abort", () => {
+      clearTimeout(timer);
+      r();
+    }, { once: true });
+  });
+}
+async function scanAttempts(cfg, content, meta, signal, budgetMs) {
+  const body = {
+    transaction_id: meta.transactionId,
+    session_id: meta.sessionId,
+    ai_profile: cfg.profile,
+    metadata: {
+      app_user: cfg.appUser || "claude-code-user",
+      app_name: cfg.appName,
+      ...meta.extra ?? {}
+    },
+    contents: [content]
+  };
+  let lastError = "";
+  let pausedMs = 0;
+  const pauseBudgetMs = Math.floor(cfg.timeoutMs / 2);
+  for (let attempt = 0; attempt <= cfg.retries; attempt++) {
+    if (signal?.aborted) return cancelledVerdict();
+    const gate = healthGate(cfg);
+    if (gate.open) {
+      return { action: "unknown", category: "scan_error", scanId: "unknown", detections: [], error: lastError ? `${lastError}; ${gate.open}` : gate.open, breaker: "open" };
+    }
+    const timeoutMs = Math.min(healthTimeoutMs(cfg, gate.h, attempt), budgetMs);
+    const tSend = performance.now();
+    const controller = new AbortController();
+    const timer = setTimeout(() => controller.abort(), timeoutMs);
+    const cancel = () => controller.abort();
+    signal?.addEventListener("abort", cancel, { once: true });
+    try {
+      const res = await fetch(cfg.apiUrl, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Accept: "application/json",
+          "x-pan-token": cfg.apiKey
+        },
+        body: JSON.stringify(body),
+        signal: controller.signal
+      });
+      const text = await res.text();
+      healthNote(cfg, gate, res.status === 429 ? null : res.status < 500, Math.max(1, performance.now() - tSend));
+      if (!res.ok) {
+        lastError = `HTTP ${res.status}: ${text.slice(0, 200)}`;
+        if (res.status < 500 && res.status !== 429) break;
+        if (res.status === 429 && attempt < cfg.retries) {
+          const after = retryAfterMs(res.headers.get("retry-after"));
+          if (after !== null && pausedMs + after > pauseBudgetMs) {
+            lastError += ` (Retry-After ${after / 1e3}s is past the retry budget)`;
+            break;
+          }
+          const wait = after ?? Math.min(backoffMs(attempt), pauseBudgetMs - pausedMs);
+          await pause(wait, signal);
+          pausedMs += wait;
+        }
+        continue;
+      }
+      return parseVerdict(text);
+    } catch (err) {
+      if (signal?.aborted) return cancelledVerdict();
+      const e = err;
+      const timedOut = e?.name === "AbortError";
+      healthNote(cfg, gate, timedOut && timeoutMs < cfg.timeoutMs ? null : false, timedOut ? timeoutMs : 0);
+      lastError = timedOut ? `timeout after ${timeoutMs}ms` : String(e?.message ?? err);
+    } finally {
+      clearTimeout(timer);
+      signal?.removeEventListener("abort", cancel);
+    }
+  }
+  return { action: "unknown", category: "scan_error", scanId: "unknown", detections: [], error: lastError };
+}
+function cancelledVerdict() {
+  return { action: "unknown", category: "cancelled", scanId: "unknown", detections: [], error: "cancelled (another chunk already blocked)" };
+}
+function parseVerdict(text) {
+  let json;
+  try {
+    json = JSON.parse(text);
+  } catch {
+    return { action: "unknown", category: "parse_error", scanId: "unknown", detections: [], error: "non-JSON response" };
+  }
+  const action = normalizeAction(json.action);
+  return {
+    action,
+    category: asString(json.category, "unknown"),
+    scanId: asString(json.scan_id, "unknown"),
+    detections: collectDetections(json),
+    // An unrecognized action (partial response / API contract drift) is NOT clean — surface
+    // it as an error so the fail policy applies instead of falling through to allow.
+    error: action === "unknown" ? `unexpected AIRS action: ${JSON.stringify(json.action)}` : void 0,
+    maskedPrompt: extractMasked(json.prompt_masked_data),
+    maskedResponse: extractMasked(json.response_masked_data),
+    raw: json
+  };
+}
+function extractMasked(v) {
+  if (!v || typeof v !== "object") return void 0;
+  const data = v.data;
+  return typeof data === "string" && data.length > 0 ? data : void 0;
+}
+function normalizeAction(v) {
+  if (v === "block") return "block";
+  if (v === "allow") return "allow";
+  return "unknown";
+}
+function collectDetections(json) {
+  const found = /* @__PURE__ */ new Set();
+  const harvest = (obj2) => {
+    if (!obj2 || typeof obj2 !== "object") return;
+    for (const [key, val] of Object.entries(obj2)) {
+      if (val === true) found.add(key);
+    }
+  };
+  harvest(json.prompt_detected);
+  harvest(json.response_detected);
+  const tool = json.tool_detected;
+  if (tool && typeof tool === "object") {
+    harvest(tool.summary?.detections);
+    for (const side of ["input_detected", "output_detected"]) {
+      const entries = tool[side]?.detection_entries;
+      if (Array.isArray(entries)) {
+        for (const entry of entries) {
+          harvest(entry?.detections);
+        }
+      }
+    }
+  }
+  return [...found].sort();
+}
+function asString(v, dflt) {
+  return typeof v === "string" && v.length > 0 ? v : dflt;
+}
+
+// src/delta.ts
+function deltaPlan(toolName, ti, cwd, cfg) {
+  const d = deltaSource(toolName, ti, cwd, cfg.deltaMaxFileBytes);
+  if (!d) return null;
+  const after = d.after.split("\n");
+  const regions = deltaRegions(changedLines(d.before.split("\n"), after), after, cfg.deltaContextLines);
+  const scanned = regions.reduce((n, r) => n + r.end - r.start, 0);
+  if (scanned * 2 > d.after.length) return null;
+  return {
+    text: join([d.path, ...regions.map((r) => d.after.slice(r.start, r.end))]),
+    delta: { field: d.field, regions, skipped: d.after.length - scanned }
+  };
+}
+function deltaSource(toolName, ti, cwd, maxBytes) {
+  switch (toolName) {
+    case "Write": {
+      const path = str2(ti.file_path);
+      const after = str2(ti.content);
+      const before = path && after ? readExisting(path, cwd, maxBytes) : null;
+      return before == null ? null : { field: "content", path, before, after };
+    }
+    case "NotebookEdit": {
+      const path = str2(ti.notebook_path);
+      const after = str2(ti.new_source);
+      const id = str2(ti.cell_id);
+      if (!path || !after || !id || ti.edit_mode && ti.edit_mode !== "replace") return null;
+      const raw = readExisting(path, cwd, maxBytes);
+      if (raw == null) return null;
+      try {
+        const cell = JSON.parse(raw)?.cells?.find((c) => c?.id === id);
+        const before = Array.isArray(cell?.source) ? cell.source.join("") : cell?.source;
+        return typeof before === "string" ? { field: "new_source", path, before, after } : null;
+      } catch {
+        return null;
+      }
+    }
+    default:
+      return null;
+  }
+}
+function readExisting(path, cwd, maxBytes) {
+  try {
+    const full = isAbsolute(path) ? path : resolve(cwd || process.cwd(), path);
+    const st = statSync(full);
+    if (!st.isFile() || st.size > maxBytes) return null;
+    const text = readFileSync(full, "utf8");
+    return text.includes("\0") ? null : text;
+  } catch {
+    return null;
+  }
+}
+function changedLines(a, b) {
+  let pre = 0;
+  while (pre < a.length && pre < b.length && a[pre] === b[pre]) pre++;
+  let suf = 0;
+  while (suf < a.length - pre && suf < b.length - pre && a[a.length - 1 - suf] === b[b.length - 1 - suf]) suf++;
+  if (pre === a.length && pre === b.length) return [];
+  return [{ from: pre, to: b.length - suf }];
+}
+function deltaRegions(edits, lines, context) {
+  const starts = new Array(lines.length + 1);
+  starts[0] = 0;
+  for (let i = 0; i < lines.length; i++) starts[i + 1] = starts[i] + lines[i].length + 1;
+  const merged = [];
+  for (const e of edits) {
+    const from = Math.max(0, e.from - context);
+    const to = Math.min(lines.length, e.to + context);
+    if (to <= from) continue;
+    const last = merged[merged.length - 1];
+    if (last && from <= last.to) last.to = Math.max(last.to, to);
+    else merged.push({ from, to });
+  }
+  return merged.map((r) => ({ start: starts[r.from], end: starts[r.to] - 1 }));
+}
+
+// src/content.ts
+function promptContent(input) {
+  const text = s(input.prompt);
+  return text.trim().length > 0 ? { kind: "prompt", text } : null;
+}
+function answerContent(input) {
+  const text = s(input.last_assistant_message);
+  return text.trim().length > 0 ? { kind: "response", text } : null;
+}
+function preToolContent(input, cfg) {
+  const toolName = str2(input.tool_name);
+  const rawTi = input.tool_input;
+  const ti = asObject(rawTi);
+  const isPlainObject = rawTi != null && typeof rawTi === "object" && !Array.isArray(rawTi);
+  const delta = cfg?.deltaScan && isPlainObject ? deltaPlan(toolName, ti, str2(input.cwd), cfg) : null;
+  const text = delta ? delta.text : isPlainObject ? toolInputText(toolName, ti) : s(rawTi);
+  if (text.trim().length === 0) return null;
+  const { server, tool } = toolIdentity(toolName, ti);
+  return delta ? { kind: "toolInput", server, tool, text, delta: delta.delta } : { kind: "toolInput", server, tool, text };
+}
+function postToolContent(input, maxInputChars, budget = Infinity, compact = false) {
+  const toolName = str2(input.tool_name);
+  const ti = asObject(input.tool_input);
+  const text = toolOutputText(input.tool_response ?? input.tool_result, budget + 1, compact);
+  if (text.trim().length === 0) return null;
+  const { server, tool } = toolIdentity(toolName, ti);
+  const inputText = clip(toolInputText(toolName, ti), maxInputChars);
+  return { kind: "toolOutput", server, tool, inputText, text };
+}
+function toolInputText(toolName, ti) {
+  switch (toolName) {
+    case "Bash":
+      return join([s(ti.command), s(ti.description)]);
+    case "WebFetch":
+      return join([s(ti.url), s(ti.prompt)]);
+    case "WebSearch":
+      return s(ti.query);
+    case "Write":
+      return join([s(ti.file_path), s(ti.content)]);
+    case "Edit":
+      return join([s(ti.file_path), s(ti.old_string), s(ti.new_string)]);
+    case "Read":
+      return s(ti.file_path);
+    case "Glob":
+      return join([s(ti.pattern), s(ti.path)]);
+    case "Grep":
+      return join([s(ti.pattern), s(ti.path)]);
+    case "Task":
+      return join([s(ti.description), s(ti.subagent_type), s(ti.prompt)]);
+    case "NotebookEdit":
+      return join([s(ti.notebook_path), s(ti.new_source)]);
+    case "TodoWrite":
+      return s(ti.todos);
+    case "ExitPlanMode":
+      return s(ti.plan);
+    case "ReadMcpResourceTool":
+    case "ReadMcpResourceDirTool":
+      return join([s(ti.server), s(ti.uri), s(ti.path)]);
+    case "ListMcpResourcesTool":
+      return s(ti.server);
+    default:
+      return safeJson(ti);
+  }
+}
+var MCP_RESOURCE_TOOLS = /* @__PURE__ */ new Set(["ReadMcpResourceTool", "ReadMcpResourceDirTool", "ListMcpResourcesTool"]);
+function toolIdentity(toolName, ti) {
+  if (toolName.startsWith("mcp__")) {
+    return names(toolName);
+  }
+  if (MCP_RESOURCE_TOOLS.has(toolName)) {
+    const server = str2(ti.server) || "unknown";
+    const tool = str2(ti.uri) || str2(ti.path) || toolName;
+    return { server, tool };
+  }
+  return names(toolName);
+}
+function primaryInputField(toolName, ti) {
+  const pick = (field) => {
+    const v = ti[field];
+    return typeof v === "string" && v.length > 0 ? { field, value: v } : null;
+  };
+  switch (toolName) {
+    case "Bash":
+      return pick("command");
+    case "Write":
+      return pick("content");
+    case "Edit":
+      return pick("new_string");
+    case "WebSearch":
+      return pick("query");
+    case "Task":
+      return pick("prompt");
+    case "NotebookEdit":
+      return pick("new_source");
+    case "ExitPlanMode":
+      return pick("plan");
+    default:
+      return null;
+  }
+}
+function toolOutputText(resp, limit = Infinity, compact = false) {
+  if (resp == null) return "";
+  if (typeof resp === "string") return clip(resp, limit);
+  if (typeof resp !== "object") return String(resp);
+  const sink = { seen: /* @__PURE__ */ new Set(), parts: [], size: 0, limit };
+  if (compact) collectCompact(resp, sink);
+  else collectStrings(resp, sink);
+  if (sink.parts.length === 0) return clip(safeJson(resp), limit);
+  return sink.parts.join("\n");
+}
+function names(toolName) {
+  if (toolName.startsWith("mcp__")) {
+    const parts = toolName.split("__");
+    return { server: parts[1] || "unknown", tool: parts.slice(2).join("__") || parts[1] || toolName };
+  }
+  return { server: `claude-code/${toolName || "unknown"}`, tool: toolName || "unknown" };
+}
+function collectStrings(value, sink, depth = 0) {
+  if (depth > 64 || sink.size >= sink.limit) return;
+  if (typeof value === "string") {
+    collectOne(value, sink);
+  } else if (Array.isArray(value)) {
+    for (const v of value) {
+      if (sink.size >= sink.limit) return;
+      collectStrings(v, sink, depth + 1);
+    }
+  } else if (value && typeof value === "object") {
+    for (const k in value) {
+      if (sink.size >= sink.limit) return;
+      if (!Object.hasOwn(value, k)) continue;
+      collectOne(k, sink);
+      collectStrings(value[k], sink, depth + 1);
+    }
+  }
+}
+function collectCompact(value, sink, depth = 0) {
+  if (depth > 64 || sink.size >= sink.limit) return;
+  if (typeof value === "string") {
+    if (value.length > 0) appendPart(value, sink);
+  } else if (Array.isArray(value)) {
+    for (const v of value) {
+      if (sink.size >= sink.limit) return;
+      collectCompact(v, sink, depth + 1);
+    }
+  } else if (value && typeof value === "object") {
+    for (const k in value) {
+      if (sink.size >= sink.limit) return;
+      if (!Object.hasOwn(value, k)) continue;
+      if (k.length > 0 && !sink.seen.has(k)) {
+        sink.seen.add(k);
+        appendPart(k, sink);
+      }
+      collectCompact(value[k], sink, depth + 1);
+    }
+  }
+}
+function collectOne(v, sink) {
+  if (v.length === 0 || sink.seen.has(v)) return;
+  sink.seen.add(v);
+  appendPart(v, sink);
+}
+function appendPart(v, sink) {
+  const sep = sink.parts.length > 0 ? 1 : 0;
+  const room = sink.limit - sink.size - sep;
+  if (room <= 0) {
+    sink.size = sink.limit;
+    return;
+  }
+  const piece = v.length > room ? v.slice(0, room) : v;
+  sink.parts.push(piece);
+  sink.size += sep + piece.length;
+}
+function clip(s2, maxChars) {
+  return s2.length > maxChars ? s2.slice(0, maxChars) : s2;
+}
+function asObject(v) {
+  return v && typeof v === "object" ? v : {};
+}
+function s(v) {
+  return typeof v === "string" ? v : v == null ? "" : safeJson(v);
+}
+function join(parts) {
+  return parts.filter((p) => p && p.length > 0).join("\n");
+}
+function str2(v) {
+  return typeof v === "string" ? v : "";
+}
+function safeJson(v) {
+  try {
+    return JSON.stringify(v) ?? "";
+  } catch {
+    return String(v);
+  }
+}
+
+// src/decide.ts
+function decide(verdict, ctx) {
+  if (ctx.configError) {
+    if (ctx.unconfigured && !ctx.cfg.requireConfig) {
+      return {
+        kind: "warn",
+        message: "\u26A0\uFE0F Prisma AIRS NOT CONFIGURED \u2014 traffic passing UNSCANNED. Set PRISMA_AIRS_API_KEY (+ profile) to enable protection; set AIRS_REQUIRE_CONFIG=1 to block instead."
+      };
+    }
+    if (ctx.side === "input") {
+      return { kind: "block", reason: `Prisma AIRS not configured (${ctx.configError}) \u2014 set PRISMA_AIRS_API_KEY (+ profile), then reload \u2014 blocking (fail-closed)` };
+    }
+    return { kind: "warn", message: `Prisma AIRS not configured (${ctx.configError}) \u2014 content NOT scanned` };
+  }
+  if (verdict.category === "content_overflow" && ctx.side === "input" && ctx.event !== "Stop") {
+    return { kind: "block", reason: "Content exceeds the AIRS scan budget \u2014 unscanned tail blocked" };
+  }
+  if (verdict.category === "admission_timeout") {
+    if (ctx.event === "Stop") return { kind: "warn", message: `AIRS scan not sent at Stop (local admission: ${verdict.error}) \u2014 allowing` };
+    if (ctx.cfg.failMode === "closed" && ctx.side === "input") {
+      return { kind: "block", reason: `Prisma AIRS scan not sent (local admission: ${verdict.error}) \u2014 blocking (fail-closed)` };
+    }
+    return { kind: "warn", message: `AIRS scan not sent (local admission: ${verdict.error}) \u2014 allowing (fail-open)` };
+  }
+  if (verdict.error) {
+    if (ctx.event === "Stop") return { kind: "warn", message: `AIRS scan error at Stop (${verdict.error}) \u2014 allowing` };
+    if (ctx.cfg.failMode === "closed" && ctx.side === "input") {
+      return { kind: "block", reason: `Prisma AIRS scan failed (${verdict.error}) \u2014 blocking (fail-closed)` };
+    }
+    return { kind: "warn", message: `AIRS scan error (${verdict.error}) \u2014 allowing (fail-open)` };
+  }
+  if (verdict.action === "block") return { kind: "block", reason: reasonText(verdict) };
+  return { kind: "allow" };
+}
+function reasonText(v) {
+  const det = v.detections.length > 0 ? ` [${v.detections.join(", ")}]` : "";
+  return `Blocked by Prisma AIRS: ${v.category}${det} (scan_id: ${v.scanId})`;
+}
+
+// src/router.ts
+var ALLOW = { kind: "allow" };
+var ROUTED_EVENTS = /* @__PURE__ */ new Set(["UserPromptSubmit", "PreToolUse", "PostToolUse", "Stop"]);
+function shortCircuit(input) {
+  const event = String(input.hook_event_name ?? "").trim();
+  if (event === "Stop" && input.stop_hook_active) return { event: "Stop", note: "Stop: stop_hook_active set \u2014 allowing (loop guard)" };
+  if (!ROUTED_EVENTS.has(event)) return { event: "PostToolUse", note: `unhandled event: ${event || "(none)"}` };
+  return null;
+}
+async function route(input, cfg, log, caps, hook = {}) {
+  const t0 = performance.now();
+  const event = String(input.hook_event_name ?? "").trim();
+  const quick = shortCircuit(input);
+  if (quick) {
+    log.debug(quick.note);
+    return { event: quick.event, decision: ALLOW };
+  }
+  const found = cfg.deferOutput && event !== "PostToolUse" ? deferCollect(cfg, sessionIdOf(input)) : [];
+  const blocked = found.filter((r) => r.kind === "block");
+  if (blocked.length) {
+    const reason = [...blocked, ...found.filter((r) => r.kind !== "block")].map(deferText).join("; ");
+    log.record({ event, label: "deferred findings", verdict: "block", deferred: true, latency_ms: { total: msSince(t0) }, msg: `BLOCK ${reason}` });
+    return { event, decision: { kind: "block", reason } };
+  }
+  const out = await dispatch(input, cfg, log, caps, hook, event, t0);
+  if (!found.length) return out;
+  // The findings are claimed (gone from disk), so they ride on whatever this checkpoint decided.
+  const notes = found.map(deferText).join("; ");
+  const d = out.decision;
+  switch (d.kind) {
+    case "allow":
+      return { event, decision: { kind: "warn", message: notes } };
+    case "warn":
+      return { ...out, decision: { ...d, message: `${d.message}; ${notes}` } };
+    case "block":
+      return { ...out, decision: { ...d, reason: `${d.reason}; ${notes}` } };
+    case "maskInput":
+      return { ...out, decision: { ...d, note: `${d.note}; ${notes}` } };
+    default:
+      return out;
+  }
+}
+async function dispatch(input, cfg, log, caps, hook, event, t0) {
+  const cfgErr = configError(cfg);
+  switch (event) {
+    case "UserPromptSubmit":
+      return { event, decision: await handle(input, cfg, log, caps, "UserPromptSubmit", "input", cfgErr, promptContent(input), "user prompt", t0, hook) };
+    case "PreToolUse":
+      return { event, decision: await handle(input, cfg, log, caps, "PreToolUse", "input", cfgErr, preToolContent(input, cfg), `${input.tool_name ?? "tool"} input`, t0, hook) };
+    case "PostToolUse":
+      return {
+        event,
+        decision: await handle(input, cfg, log, caps, "PostToolUse", "output", cfgErr, postToolContent(input, cfg.maxContentChars, cfg.maxContentChars * cfg.maxChunks, cfg.compactOutput), `${input.tool_name ?? "tool"} output`, t0, hook)
+      };
+    default:
+      // "Stop" — shortCircuit() has already let every other event through.
+      return { event: "Stop", decision: await handle(input, cfg, log, caps, "Stop", "output", cfgErr, answerContent(input), "model answer", t0, hook) };
+  }
+}
+async function handle(input, cfg, log, caps, event, side, cfgErr, plan, label, t0, hook) {
+  const ctx = { event, side, cfg, configError: cfgErr, unconfigured: !cfg.apiKey };
+  const extractMs = msSince(t0);
+  if (cfgErr) {
+    log.record({ event, label, verdict: "config_error", msg: cfgErr, latency_ms: { extract: extractMs, total: msSince(t0) } });
+    return decide({ action: "unknown", category: "config_error", scanId: "unknown", detections: [] }, ctx);
+  }
+  if (!plan) {
+    log.debug(`${event}: no scannable content for ${label} \u2014 allowing`);
+    return ALLOW;
+  }
+  const meta = buildMeta(input);
+  const scanMeta = { ...meta, extra: { tool_name: String(input.tool_name ?? ""), source: event } };
+  const tScan = performance.now();
+  const answer = plan.text;
+  const mark = event === "Stop" && cfg.stopWatermark ? watermarkGet(cfg, meta.sessionId, answer) : null;
+  if (mark?.seen) {
+    log.record({ event, label, verdict: "allow", watermark: mark.bytes, latency_ms: { extract: extractMs, total: msSince(t0) }, msg: `allow [watermark] answer already scanned (${mark.bytes} bytes)` });
+    return ALLOW;
+  }
+  if (mark) plan = { ...plan, text: mark.rest };
+  const cacheKey = cfg.verdictCache ? verdictCacheKey(cfg, side, plan) : null;
+  const cached = cacheKey ? cacheGet(cfg, cacheKey) : null;
+  if (event === "PostToolUse" && cfg.deferOutput && !cached && hook.raw !== void 0 && await deferSpawn(cfg, meta.sessionId, hook)) {
+    log.record({ event, label, verdict: "deferred", latency_ms: { extract: extractMs, total: msSince(t0) }, msg: "deferred: scanning in the background" });
+    return ALLOW;
+  }
+  const verdict = cached ?? await scanPlan(cfg, plan, scanMeta);
+  if (cacheKey && !cached) cachePut(cfg, cacheKey, verdict);
+  if (event === "Stop" && cfg.stopWatermark && verdict.action === "allow" && !verdict.error) watermarkPut(cfg, meta.sessionId, answer);
+  const latency = { extract: extractMs, scan: msSince(tScan), ...verdict.queueMs ? { queue: verdict.queueMs } : {} };
+  const tag = verdict.error ? `error(${verdict.error})` : verdict.action === "block" ? `BLOCK ${reasonText(verdict)}` : `allow${verdict.detections.length ? " [" + verdict.detections.join(",") + "]" : ""}${verdict.cached ? " [cache]" : ""} [scan:${verdict.scanId}]`;
+  const rec = {
+    event,
+    label,
+    verdict: verdict.error ? verdict.category === "content_overflow" || verdict.category === "admission_timeout" ? verdict.category : "error" : verdict.action === "block" ? "block" : "allow",
+    category: verdict.category,
+    scan_id: verdict.scanId,
+    detections: verdict.detections,
+    chunks: verdict.cached ? 0 : verdict.chunks ?? 1,
+    cache: Boolean(verdict.cached),
+    ...mark ? { watermark: mark.bytes } : {},
+    ...plan.delta ? { delta: plan.delta.skipped } : {},
+    ...verdict.breaker ? { breaker: verdict.breaker } : {},
+    ...cfg.deferredWorker ? { deferred: true } : {},
+    latency_ms: latency,
+    msg: tag
+  };
+  const canRewrite = event === "PreToolUse" && caps.rewriteInput || event === "PostToolUse" && caps.rewriteOutput;
+  if (cfg.enableMasking && canRewrite && verdict.action === "allow" && plan.text.length <= cfg.maxContentChars) {
+    const tMask = performance.now();
+    const masked = await tryMask(input, plan, cfg, scanMeta, event);
+    latency.mask = msSince(tMask);
+    if (masked) {
+      log.record({ ...rec, verdict: masked.kind === "block" ? "block" : "masked", msg: masked.kind === "block" ? `BLOCK ${masked.reason}` : "MASKED (DLP redacted in place)", latency_ms: { ...latency, total: msSince(t0) } });
+      return masked;
+    }
+  }
+  log.record({ ...rec, latency_ms: { ...latency, total: msSince(t0) } });
+  return decide(verdict, ctx);
+}
+async function tryMask(input, plan, cfg, scanMeta, event) {
+  if (event === "PreToolUse" && plan.kind === "toolInput") {
+    const field = primaryInputField(String(input.tool_name ?? ""), input.tool_input ?? {});
+    if (field && plan.delta?.field === field.field) return maskDelta(input, plan.delta, field, cfg, scanMeta);
+    if (!field || field.value.length > cfg.maxContentChars) return null;
+    const v = await scan(cfg, { prompt: field.value }, scanMeta);
+    const masked = v.maskedPrompt;
+    if (isPureDlpMask(v, masked, field.value)) {
+      const updatedInput = { ...input.tool_input, [field.field]: masked };
+      return { kind: "maskInput", updatedInput, note: `Prisma AIRS masked sensitive data in ${input.tool_name} ${field.field} (scan_id: ${v.scanId})` };
+    }
+    if (v.action === "block") return { kind: "block", reason: reasonText(v) };
+    return null;
+  }
+  if (event === "PostToolUse" && plan.kind === "toolOutput") {
+    const v = await scan(cfg, { response: plan.text }, scanMeta);
+    const masked = v.maskedResponse;
+    if (isPureDlpMask(v, masked, plan.text)) {
+      return { kind: "maskOutput", updatedOutput: masked, note: `Prisma AIRS masked sensitive data in ${input.tool_name} output (scan_id: ${v.scanId})` };
+    }
+    if (v.action === "block") return { kind: "block", reason: reasonText(v) };
+    return null;
+  }
+  return null;
+}
+async function maskDelta(input, delta, field, cfg, scanMeta) {
+  let value = field.value;
+  const scanIds = [];
+  for (const r of [...delta.regions].reverse()) {
+    const span = field.value.slice(r.start, r.end);
+    if (span.trim().length === 0) continue;
+    const v = await scan(cfg, { prompt: span }, scanMeta);
+    if (isPureDlpMask(v, v.maskedPrompt, span)) {
+      value = value.slice(0, r.start) + v.maskedPrompt + value.slice(r.end);
+      scanIds.push(v.scanId);
+    } else if (v.action === "block") {
+      return { kind: "block", reason: reasonText(v) };
+    }
+  }
+  if (scanIds.length === 0) return null;
+  const updatedInput = { ...input.tool_input, [field.field]: value };
+  return { kind: "maskInput", updatedInput, note: `Prisma AIRS masked sensitive data in ${input.tool_name} ${field.field} (${scanIds.length} changed region(s); scan_id: ${scanIds.reverse().join(", ")})` };
+}
+function isPureDlpMask(v, masked, original) {
+  return v.action === "block" && typeof masked === "string" && masked.length > 0 && masked !== original && v.detections.length > 0 && v.detections.every((d) => d === "dlp");
+}
+function sessionIdOf(input) {
+  return typeof input.session_id === "string" && input.session_id || sha256(String(input.cwd ?? process.cwd())).slice(0, 32);
+}
+function buildMeta(input) {
+  const sessionId = sessionIdOf(input);
+  const perEvent = typeof input.tool_use_id === "string" && input.tool_use_id || typeof input.prompt_id === "string" && input.prompt_id || randomUUID();
+  return { sessionId, transactionId: perEvent };
+}
+function sha256(s2) {
+  return createHash("sha256").update(s2).digest("hex");
+}
+
+// src/adapters/claude.ts
+function mapEvent(name) {
+  switch (name) {
+    case "UserPromptSubmit":
+    case "PreToolUse":
+    case "PostToolUse":
+      return name;
+    case "Stop":
+    case "SubagentStop":
+      return "Stop";
+    default:
+      return "";
+  }
+}
+var claudeAdapter = {
+  name: "claude",
+  appName: "Claude Code",
+  capabilities: { rewriteInput: true, rewriteOutput: true, postCanBlock: true },
+  normalize(raw, eventName) {
+    const input = { ...raw };
+    input.hook_event_name = mapEvent(eventName ?? raw.hook_event_name);
+    return input;
+  },
+  render(event, decision) {
+    switch (decision.kind) {
+      case "allow":
+        return { exitCode: 0 };
+      case "warn":
+        return { exitCode: 0, stderr: `[Prisma AIRS] ${decision.message}
+` };
+      case "block":
+        return blockOutcome(event, decision.reason);
+      case "maskInput":
+        return {
+          exitCode: 0,
+          stdout: JSON.stringify({
+            hookSpecificOutput: { hookEventName: "PreToolUse", updatedInput: decision.updatedInput, additionalContext: decision.note }
+          }),
+          stderr: `
+\u{1F6E1}\uFE0F  ${decision.note}
+
+`
+        };
+      case "maskOutput":
+        return {
+          exitCode: 0,
+          stdout: JSON.stringify({
+            hookSpecificOutput: { hookEventName: "PostToolUse", updatedToolOutput: decision.updatedOutput, additionalContext: decision.note }
+          }),
+          stderr: `
+\u{1F6E1}\uFE0F  ${decision.note}
+
+`
+        };
+    }
+  }
+};
+function blockOutcome(event, reason) {
+  const stderr = `
+\u{1F6AB} ${reason}
+
+`;
+  let obj2;
+  switch (event) {
+    case "PreToolUse":
+      obj2 = { hookSpecificOutput: { hookEventName: "PreToolUse", permissionDecision: "deny", permissionDecisionReason: reason } };
+      break;
+    case "UserPromptSubmit":
+      obj2 = { decision: "block", reason, hookSpecificOutput: { hookEventName: "UserPromptSubmit" } };
+      break;
+    case "PostToolUse":
+      obj2 = { decision: "block", reason, hookSpecificOutput: { hookEventName: "PostToolUse" } };
+      break;
+    case "Stop":
+      obj2 = { decision: "block", reason };
+      break;
+  }
+  return { exitCode: 0, stdout: JSON.stringify(obj2), stderr };
+}
+
+// src/adapters/codex.ts
+function mapEvent2(name) {
+  switch (name) {
+    case "UserPromptSubmit":
+    case "PreToolUse":
+    case "PostToolUse":
+      return name;
+    case "Stop":
+    case "SubagentStop":
+      return "Stop";
+    default:
+      return "";
+  }
+}
+var codexAdapter = {
+  name: "codex",
+  appName: "Codex CLI",
+  capabilities: { rewriteInput: false, rewriteOutput: false, postCanBlock: true },
+  normalize(raw, eventName) {
+    const input = { ...raw };
+    input.hook_event_name = mapEvent2(eventName ?? raw.hook_event_name);
+    if (typeof raw.turn_id === "string" && !input.prompt_id) input.prompt_id = raw.turn_id;
+    return input;
+  },
+  render(event, decision) {
+    switch (decision.kind) {
+      case "allow":
+        return event === "Stop" ? { exitCode: 0, stdout: '{"continue": true}' } : { exitCode: 0 };
+      case "warn":
+        return event === "Stop" ? { exitCode: 0, stdout: '{"continue": true}', stderr: `[Prisma AIRS] ${decision.message}
+` } : { exitCode: 0, stderr: `[Prisma AIRS] ${decision.message}
+` };
+      case "block": {
+        const stderr = `
+\u{1F6AB} ${decision.reason}
+
+`;
+        if (event === "UserPromptSubmit" || event === "PreToolUse") {
+          return { exitCode: 2, stderr };
+        }
+        if (event === "PostToolUse") {
+          return { exitCode: 0, stdout: JSON.stringify({ decision: "block", reason: decision.reason, hookSpecificOutput: { hookEventName: "PostToolUse" } }), stderr };
+        }
+        return { exitCode: 0, stdout: JSON.stringify({ continue: false, stopReason: decision.reason }), stderr };
+      }
+      // Codex can't rewrite; masking is gated off for it, so these are unreachable.
+      // Defensive: the content was a primary-allowed pure-DLP surface — allow.
+      case "maskInput":
+      case "maskOutput":
+        return event === "Stop" ? { exitCode: 0, stdout: '{"continue": true}' } : { exitCode: 0 };
+    }
+  }
+};
+
+// src/adapters/cursor.ts
+function mapEvent3(name) {
+  switch (name) {
+    case "beforeSubmitPrompt":
+      return "UserPromptSubmit";
+    case "beforeShellExecution":
+      return "PreToolUse";
+    case "beforeMCPExecution":
+      return "PreToolUse";
+    case "postToolUse":
+      return "PostToolUse";
+    case "afterAgentResponse":
+      return "Stop";
+    default:
+      return "";
+  }
+}
+function normalizeToolName(name) {
+  if (typeof name !== "string") return "";
+  if (name.startsWith("MCP:")) return "mcp__" + name.slice(4).split(":").join("__");
+  return name;
+}
+var cursorAdapter = {
+  name: "cursor",
+  appName: "Cursor",
+  // Pre-tool is the hard block. postToolUse can redact MCP output / inject context (no hard block).
+  capabilities: { rewriteInput: false, rewriteOutput: false, postCanBlock: true },
+  normalize(raw, eventName) {
+    const input = { ...raw };
+    input.hook_event_name = mapEvent3(eventName);
+    if (eventName === "beforeShellExecution") {
+      input.tool_name = "Shell";
+      input.tool_input = { command: raw.command };
+    } else if (raw.tool_name !== void 0) {
+      input.tool_name = normalizeToolName(raw.tool_name);
+    }
+    if (input.tool_response === void 0 && raw.tool_output !== void 0) input.tool_response = raw.tool_output;
+    if (input.last_assistant_message === void 0) {
+      const t = raw.text ?? raw.response ?? raw.message ?? raw.content ?? raw.output;
+      if (typeof t === "string") input.last_assistant_message = t;
+    }
+    if (typeof raw.conversation_id === "string" && !input.session_id) input.session_id = raw.conversation_id;
+    return input;
+  },
+  render(event, decision) {
+    switch (decision.kind) {
+      case "allow":
+        return allowOutcome(event);
+      case "warn":
+        return { ...allowOutcome(event), stderr: `[Prisma AIRS] ${decision.message}
+` };
+      case "block": {
+        const stderr = `
+\u{1F6AB} ${decision.reason}
+
+`;
+        switch (event) {
+          case "UserPromptSubmit":
+            return { exitCode: 0, stdout: JSON.stringify({ continue: false, user_message: decision.reason }), stderr };
+          case "PreToolUse":
+            return { exitCode: 0, stdout: JSON.stringify({ permission: "deny", user_message: decision.reason, agent_message: decision.reason }), stderr };
+          case "PostToolUse":
+            return { exitCode: 0, stdout: JSON.stringify({ updated_mcp_tool_output: `[Prisma AIRS blocked this tool output: ${decision.reason}]`, additional_context: `\u26A0\uFE0F Prisma AIRS flagged this tool output: ${decision.reason}` }), stderr };
+          case "Stop":
+          default:
+            return { exitCode: 0, stderr: `
+\u26A0\uFE0F  ALERT (Cursor cannot block at ${event}) \u2014 ${decision.reason}
+
+` };
+        }
+      }
+      // No input/output masking on Cursor.
+      case "maskInput":
+      case "maskOutput":
+        return allowOutcome(event);
+    }
+  }
+};
+function allowOutcome(event) {
+  switch (event) {
+    case "UserPromptSubmit":
+      return { exitCode: 0, stdout: JSON.stringify({ continue: true }) };
+    case "PreToolUse":
+      return { exitCode: 0, stdout: JSON.stringify({ permission: "allow" }) };
+    default:
+      return { exitCode: 0 };
+  }
+}
+
+// src/adapters/cline.ts
+function obj(v) {
+  return v && typeof v === "object" ? v : {};
+}
+function str3(v) {
+  return typeof v === "string" ? v : void 0;
+}
+var clineAdapter = {
+  name: "cline",
+  appName: "Cline",
+  capabilities: { rewriteInput: false, rewriteOutput: false, postCanBlock: true },
+  normalize(raw, eventName) {
+    const input = {};
+    if (typeof raw.taskId === "string") input.session_id = raw.taskId;
+    switch (eventName) {
+      case "UserPromptSubmit": {
+        input.hook_event_name = "UserPromptSubmit";
+        input.prompt = obj(raw.userPromptSubmit).prompt;
+        break;
+      }
+      case "PreToolUse": {
+        input.hook_event_name = "PreToolUse";
+        const p = obj(raw.preToolUse);
+        input.tool_name = str3(p.toolName);
+        input.tool_input = p.parameters ?? {};
+        break;
+      }
+      case "PostToolUse": {
+        input.hook_event_name = "PostToolUse";
+        const p = obj(raw.postToolUse);
+        input.tool_name = str3(p.toolName);
+        input.tool_input = p.parameters ?? {};
+        input.tool_response = p.result;
+        break;
+      }
+      case "TaskComplete": {
+        input.hook_event_name = "Stop";
+        input.last_assistant_message = str3(obj(raw.taskComplete).task);
+        break;
+      }
+      default:
+        input.hook_event_name = "";
+    }
+    return input;
+  },
+  render(event, decision) {
+    const emit = (o, stderr) => ({ exitCode: 0, stdout: JSON.stringify(o), stderr });
+    switch (decision.kind) {
+      case "allow":
+        return emit({ cancel: false });
+      case "warn":
+        return emit({ cancel: false, contextModification: `Prisma AIRS: ${decision.message}` }, `[Prisma AIRS] ${decision.message}
+`);
+      case "block":
+        if (event === "Stop") return emit({ cancel: false, contextModification: decision.reason }, `
+\u{1F6AB} ${decision.reason}
+
+`);
+        return emit({ cancel: true, errorMessage: decision.reason }, `
+\u{1F6AB} ${decision.reason}
+
+`);
+      // Cline can't rewrite; masking is gated off for it.
+      case "maskInput":
+      case "maskOutput":
+        return emit({ cancel: false });
+    }
+  }
+};
+
+// src/adapters/devin.ts
+var devinAdapter = {
+  name: "devin",
+  appName: "Devin CLI",
+  capabilities: { rewriteInput: false, rewriteOutput: false, postCanBlock: false },
+  normalize(raw, eventName) {
+    const input = { ...raw };
+    input.hook_event_name = eventName ?? (typeof raw.hook_event_name === "string" ? raw.hook_event_name : "");
+    if (input.hook_event_name === "Stop") input.last_assistant_message = void 0;
+    return input;
+  },
+  render(event, decision) {
+    switch (decision.kind) {
+      case "allow":
+        return { exitCode: 0 };
+      case "warn":
+        return { exitCode: 0, stderr: `[Prisma AIRS] ${decision.message}
+` };
+      case "block":
+        switch (event) {
+          case "PreToolUse":
+            return { exitCode: 2, stderr: `
+\u{1F6AB} ${decision.reason}
+
+` };
+          case "UserPromptSubmit":
+            return {
+              exitCode: 0,
+              stdout: JSON.stringify({
+                hookSpecificOutput: {
+                  hookEventName: "UserPromptSubmit",
+                  additionalContext: `\u26A0\uFE0F Prisma AIRS flagged this prompt: ${decision.reason}`
+                }
+              }),
+              stderr: `
+\u26A0\uFE0F  ALERT (Devin UserPromptSubmit cannot block; enforcement is at the tool gate) \u2014 ${decision.reason}
+
+`
+            };
+          default:
+            return { exitCode: 0, stderr: `
+\u26A0\uFE0F  ALERT (Devin ${event} is advisory) \u2014 ${decision.reason}
+
+` };
+        }
+      // Devin doesn't rewrite output here; masking stays gated off.
+      case "maskInput":
+      case "maskOutput":
+        return { exitCode: 0 };
+    }
+  }
+};
+
+// src/adapters/gemini.ts
+function mapEvent4(name) {
+  switch (name) {
+    case "BeforeAgent":
+    case "UserPromptSubmit":
+      return "UserPromptSubmit";
+    case "BeforeTool":
+    case "PreToolUse":
+      return "PreToolUse";
+    case "AfterTool":
+    case "PostToolUse":
+      return "PostToolUse";
+    case "AfterAgent":
+    case "Stop":
+    case "SubagentStop":
+    case "PostInvocation":
+      return "Stop";
+    // Antigravity IDE turn-start event (provisional). Maps to prompt-in.
+    case "PreInvocation":
+      return "UserPromptSubmit";
+    default:
+      return "";
+  }
+}
+function makeGeminiAdapter(name, appName) {
+  return {
+    name,
+    appName,
+    // Gemini CLI can block a prompt, block a pre-tool call, block/withhold a tool
+    // result, and REWRITE tool input (hookSpecificOutput.tool_input). No documented
+    // clean tool-OUTPUT rewrite, so output masking stays off.
+    capabilities: { rewriteInput: true, rewriteOutput: false, postCanBlock: true },
+    normalize(raw, eventName) {
+      const input = { ...raw };
+      input.hook_event_name = mapEvent4(eventName ?? raw.hook_event_name);
+      if (input.last_assistant_message === void 0) {
+        const ans = raw.prompt_response ?? raw.response ?? raw.agent_response;
+        if (typeof ans === "string") input.last_assistant_message = ans;
+      }
+      if (input.tool_name === void 0 && raw.toolCall && typeof raw.toolCall === "object") {
+        const tc = raw.toolCall;
+        if (typeof tc.name === "string") input.tool_name = tc.name;
+        if (tc.args !== void 0) input.tool_input = tc.args;
+      }
+      if (input.session_id === void 0 && typeof raw.conversationId === "string") input.session_id = raw.conversationId;
+      return input;
+    },
+    render(event, decision) {
+      switch (decision.kind) {
+        case "allow":
+          return { exitCode: 0 };
+        case "warn":
+          return { exitCode: 0, stderr: `[Prisma AIRS] ${decision.message}
+` };
+        case "block":
+          return blockOutcome2(event, decision.reason);
+        case "maskInput":
+          return {
+            exitCode: 0,
+            stdout: JSON.stringify({
+              hookSpecificOutput: { hookEventName: "BeforeTool", tool_input: decision.updatedInput, additionalContext: decision.note }
+            }),
+            stderr: `
+\u{1F6E1}\uFE0F  ${decision.note}
+
+`
+          };
+        case "maskOutput":
+          return { exitCode: 0 };
+      }
+    }
+  };
+}
+function blockOutcome2(event, reason) {
+  const stderr = `
+\u{1F6AB} ${reason}
+
+`;
+  switch (event) {
+    case "UserPromptSubmit":
+    case "PreToolUse":
+      return { exitCode: 2, stderr };
+    case "PostToolUse":
+      return { exitCode: 2, stderr };
+    case "Stop":
+    default:
+      return { exitCode: 0, stderr: `
+\u26A0\uFE0F  ALERT (Gemini response scanned; not hard-blocked to avoid retry loop) \u2014 ${reason}
+
+` };
+  }
+}
+var antigravityAdapter = makeGeminiAdapter("antigravity", "Antigravity");
+var geminiAdapter = makeGeminiAdapter("gemini", "Gemini CLI");
+
+// src/adapters/registry.ts
+var ADAPTERS = {
+  claude: claudeAdapter,
+  codex: codexAdapter,
+  cursor: cursorAdapter,
+  cline: clineAdapter,
+  devin: devinAdapter,
+  // Antigravity reuses Gemini CLI's verified hook contract; `gemini` is the same
+  // adapter with Gemini-CLI attribution.
+  antigravity: antigravityAdapter,
+  gemini: geminiAdapter
+};
+function getAdapter(name) {
+  return ADAPTERS[(name || "claude").toLowerCase()] ?? claudeAdapter;
+}
+var adapterNames = Object.keys(ADAPTERS);
+
+// src/sidecar.ts
+import { chmodSync } from "node:fs";
+var SIDECAR_PATH = "/v1/hook";
+// A hook sends a tag of the settings that decide its verdicts (profile, fail mode, require-config;
+// never the key) and the sidecar answers only when its own match, so it never decides for a project
+// configured differently from the environment it was started in.
+var SIDECAR_CONFIG_FORMAT = "airs-sidecar-config/v1";
+function sidecarConfigTag(cfg) {
+  return sha256([SIDECAR_CONFIG_FORMAT, profileKey(cfg), cfg.failMode, cfg.requireConfig ? "1" : "0"].join("\n")).slice(0, 16);
+}
+function sidecarUsable(socketPath) {
+  if (!socketPath) return false;
+  try {
+    const st = statSync(socketPath);
+    return st.isSocket() && (typeof process.getuid !== "function" || st.uid === process.getuid());
+  } catch {
+    return false;
+  }
+}
+function sidecarBudgetMs(cfg) {
+  return cfg.timeoutMs * (cfg.retries + 1) * 2 + 1e3;
+}
+async function askSidecar(cfg, vendorKey, eventName, rawBody) {
+  if (!sidecarUsable(cfg.sidecarSocket)) return null;
+  const { request: httpRequest } = await import("node:http");
+  const qs = new URLSearchParams({ vendor: vendorKey, rewrite: "1", config: sidecarConfigTag(cfg) });
+  if (eventName) qs.set("event", eventName);
+  return new Promise((done) => {
+    const req = httpRequest(
+      { socketPath: cfg.sidecarSocket, path: `${SIDECAR_PATH}?${qs}`, method: "POST", headers: { "Content-Type": "application/json" }, timeout: sidecarBudgetMs(cfg) },
+      (res) => {
+        let text = "";
+        res.setEncoding("utf8");
+        res.on("data", (c) => text += c);
+        res.on("end", () => {
+          try {
+            const out = JSON.parse(text);
+            done(res.statusCode === 200 && out && typeof out.event === "string" && out.decision && typeof out.decision.kind === "string" ? out : null);
+          } catch {
+            done(null);
+          }
+        });
+        res.on("error", () => done(null));
+      }
+    );
+    req.on("timeout", () => req.destroy());
+    req.on("error", () => done(null));
+    req.end(rawBody);
+  });
+}
+async function serveSidecar(socketPath) {
+  const { createServer } = await import("node:http");
+  const base = loadConfig();
+  const baseError = configError(base);
+  const baseTag = sidecarConfigTag(base);
+  if (baseError) process.stderr.write(`[airs-hook] sidecar not configured (${baseError}) \u2014 hooks will scan directly
+`);
+  mkdirSync(dirname(socketPath), { recursive: true, mode: 448 });
+  try {
+    chmodSync(dirname(socketPath), 448);
+  } catch {
+  }
+  try {
+    unlinkSync(socketPath);
+  } catch {
+  }
+  const server = createServer((req, res) => {
+    const reply = (status, obj2) => {
+      const body = JSON.stringify(obj2);
+      res.writeHead(status, { "Content-Type": "application/json", "Content-Length": Buffer.byteLength(body) });
+      res.end(body);
+    };
+    const url = new URL(req.url ?? "/", "http://sidecar");
+    if (req.method === "GET" && url.pathname === "/v1/health") return reply(200, { ok: true, pid: process.pid });
+    if (req.method !== "POST" || url.pathname !== SIDECAR_PATH) return reply(404, { error: "not found" });
+    const vendorKey = (url.searchParams.get("vendor") ?? "").toLowerCase();
+    if (!adapterNames.includes(vendorKey)) return reply(400, { error: `unknown vendor '${vendorKey}'` });
+    if (baseError) return reply(503, { error: `sidecar not configured: ${baseError}` });
+    if (url.searchParams.get("config") !== baseTag) return reply(409, { error: "hook settings (profile / fail mode / require-config) differ from the sidecar's" });
+    let raw = "";
+    req.setEncoding("utf8");
+    req.on("data", (c) => raw += c);
+    req.on("end", async () => {
+      let parsed;
+      try {
+        parsed = raw.trim() ? JSON.parse(raw) : {};
+      } catch {
+        return reply(400, { error: "hook input is not valid JSON" });
+      }
+      if (parsed === null || typeof parsed !== "object" || Array.isArray(parsed)) return reply(400, { error: "hook input is not a JSON object" });
+      try {
+        const adapter = getAdapter(vendorKey);
+        const cfg = applyVendor({ ...base }, vendorKey, adapter);
+        const caps = url.searchParams.get("rewrite") === "0" ? { ...adapter.capabilities, rewriteInput: false, rewriteOutput: false } : adapter.capabilities;
+        const input = adapter.normalize(parsed, url.searchParams.get("event") || void 0);
+        reply(200, await evaluate(input, parsed, cfg, caps, { raw, event: url.searchParams.get("event") || void 0 }));
+      } catch (err) {
+        reply(500, { error: String(err?.message ?? err) });
+      }
+    });
+  });
+  server.listen(socketPath, () => {
+    try {
+      chmodSync(socketPath, 384);
+    } catch {
+    }
+    process.stderr.write(`[airs-hook] sidecar listening on ${socketPath}
+`);
+  });
+  const stop = () => {
+    server.close();
+    try {
+      unlinkSync(socketPath);
+    } catch {
+    }
+    process.exit(0);
+  };
+  process.on("SIGINT", stop);
+  process.on("SIGTERM", stop);
+}
+
+// src/index.ts
+function parseArgs(argv) {
+  const out = {};
+  for (let i = 0; i < argv.length; i++) {
+    const a = argv[i];
+    if (a === "--vendor") out.vendor = argv[++i];
+    else if (a.startsWith("--vendor=")) out.vendor = a.slice("--vendor=".length);
+    else if (a === "--event") out.event = argv[++i];
+    else if (a.startsWith("--event=")) out.event = a.slice("--event=".length);
+    else if (a === "--serve") out.serve = true;
+    else if (a === "--socket") out.socket = argv[++i];
+    else if (a.startsWith("--socket=")) out.socket = a.slice("--socket=".length);
+  }
+  return out;
+}
+var CONFIG_DIRS = {
+  claude: ".claude",
+  codex: ".codex",
+  cursor: ".cursor",
+  cline: ".clinerules",
+  devin: ".devin",
+  antigravity: ".agents",
+  gemini: ".gemini"
+};
+var INPUT_EVENTS = /* @__PURE__ */ new Set([
+  "UserPromptSubmit",
+  "PreToolUse",
+  "beforeSubmitPrompt",
+  "beforeShellExecution",
+  "beforeMCPExecution",
+  "BeforeAgent",
+  "BeforeTool",
+  // Antigravity/Gemini turn-start alias — the adapter maps it to UserPromptSubmit (input),
+  // so an unparseable payload on this event must fail CLOSED like the others.
+  "PreInvocation"
+]);
+function applyVendor(cfg, vendorKey, adapter) {
+  cfg.vendor = vendorKey;
+  cfg.appName = cfg.appSuffix ? `${adapter.appName}-${cfg.appSuffix}` : adapter.appName;
+  cfg.appUser = cfg.appUser || `${vendorKey}-user`;
+  cfg.logPath = cfg.logPath || `${CONFIG_DIRS[vendorKey] ?? ".claude"}/hooks/prisma-airs.log`;
+  cfg.verdictCacheDir = cfg.verdictCacheDir || `${CONFIG_DIRS[vendorKey] ?? ".claude"}/hooks/verdict-cache`;
+  cfg.stopWatermarkPath = cfg.stopWatermarkPath || `${CONFIG_DIRS[vendorKey] ?? ".claude"}/hooks/stop-watermark`;
+  cfg.deferDir = cfg.deferDir || `${CONFIG_DIRS[vendorKey] ?? ".claude"}/hooks/deferred`;
+  return cfg;
+}
+async function evaluate(input, parsedObj, cfg, caps, hook = {}) {
+  const cwd = String(input.cwd ?? parsedObj.cwd ?? process.cwd());
+  const log = makeLogger(cfg.logPath, cwd, { debug: cfg.debug, vendor: cfg.vendor, maxBytes: cfg.logMaxBytes, keep: cfg.logKeep });
+  if (!isAbsolute(cfg.verdictCacheDir)) cfg.verdictCacheDir = resolve(cwd, cfg.verdictCacheDir);
+  if (!isAbsolute(cfg.stopWatermarkPath)) cfg.stopWatermarkPath = resolve(cwd, cfg.stopWatermarkPath);
+  if (!isAbsolute(cfg.deferDir)) cfg.deferDir = resolve(cwd, cfg.deferDir);
+  return route(input, cfg, log, caps, { ...hook, cwd });
+}
+function debugStartup(cfg, cwd, boot, tMain, path) {
+  if (!cfg.debug || boot.loadMs === void 0) return;
+  makeLogger(cfg.logPath, cwd, { debug: true, vendor: cfg.vendor, maxBytes: cfg.logMaxBytes, keep: cfg.logKeep }).debug(
+    `cold start: node ${Math.round(boot.nodeMs)}ms, engine load ${Math.round(boot.loadMs)}ms (compile cache: ${boot.cache}), hook ${msSince(tMain)}ms [${path}]`
+  );
+}
+async function main(boot = {}) {
+  const tMain = performance.now();
+  const args = parseArgs(process.argv.slice(2));
+  if (args.serve) {
+    await serveSidecar(args.socket || loadConfig().sidecarSocket || defaultSidecarSocket());
+    return;
+  }
+  const rawVendor = args.vendor;
+  if (rawVendor === void 0 || rawVendor === "") {
+    process.stderr.write("[airs-hook] no --vendor given; defaulting to claude\n");
+  } else if (!adapterNames.includes(rawVendor.toLowerCase())) {
+    process.stderr.write(
+      `
+\u{1F6AB} Prisma AIRS: unknown --vendor '${rawVendor}' \u2014 blocking (fail-closed). Known: ${adapterNames.join(", ")}.
+
+`
+    );
+    process.exitCode = 2;
+    return;
+  }
+  const cfg = loadConfig();
+  const vendorKey = (args.vendor || "claude").toLowerCase();
+  const adapter = getAdapter(args.vendor);
+  applyVendor(cfg, vendorKey, adapter);
+  const failClosed = (why) => {
+    process.stderr.write(`[airs-hook] ${why}
+`);
+    const ev = args.event ? String(args.event) : "";
+    if (cfg.failMode !== "closed" || ev !== "" && !INPUT_EVENTS.has(ev)) {
+      process.exitCode = 0;
+      return;
+    }
+    let internal;
+    try {
+      internal = adapter.normalize({}, args.event).hook_event_name;
+    } catch {
+      internal = void 0;
+    }
+    if (internal) {
+      try {
+        const outcome = adapter.render(internal, { kind: "block", reason: `Prisma AIRS: ${why} \u2014 blocking (fail-closed)` });
+        if (outcome.stderr) process.stderr.write(outcome.stderr);
+        if (outcome.stdout) {
+          process.stdout.write(outcome.stdout);
+          process.exitCode = outcome.exitCode ?? 0;
+          return;
+        }
+        if (outcome.exitCode) {
+          process.exitCode = outcome.exitCode;
+          return;
+        }
+      } catch {
+      }
+    }
+    process.exitCode = 2;
+  };
+  const raw = await readStdin();
+  const deferredBase = str(process.env.AIRS_DEFERRED);
+  if (deferredBase) {
+    try {
+      unlinkSync(`${deferredBase}.job`);
+    } catch {
+    }
+    cfg.deferOutput = false;
+    cfg.deferredWorker = true;
+  }
+  let parsed = {};
+  try {
+    parsed = raw.trim() ? JSON.parse(raw) : {};
+  } catch {
+    failClosed("hook input is not valid JSON");
+    return;
+  }
+  if (parsed === null || typeof parsed !== "object" || Array.isArray(parsed)) {
+    failClosed("hook input is not a JSON object");
+    return;
+  }
+  const parsedObj = parsed;
+  let input;
+  try {
+    input = adapter.normalize(parsedObj, args.event);
+    const cwd = String(input.cwd ?? parsedObj.cwd ?? process.cwd());
+    const quick = shortCircuit(input);
+    if (quick) {
+      if (cfg.debug) makeLogger(cfg.logPath, cwd, { debug: true, vendor: cfg.vendor, maxBytes: cfg.logMaxBytes, keep: cfg.logKeep }).debug(quick.note);
+      const outcome2 = adapter.render(quick.event, ALLOW);
+      if (outcome2.stderr) process.stderr.write(outcome2.stderr);
+      process.exitCode = outcome2.exitCode ?? 0;
+      if (outcome2.stdout) process.stdout.write(outcome2.stdout);
+      debugStartup(cfg, cwd, boot, tMain, "fast exit");
+      return;
+    }
+    if (deferredBase) {
+      const { decision: decision2 } = await evaluate(input, parsedObj, cfg, adapter.capabilities);
+      deferFinish(deferredBase, `${input.tool_name ?? "tool"} output`, decision2);
+      return;
+    }
+    const remote = await askSidecar(cfg, vendorKey, args.event, raw);
+    if (remote && cfg.debug) process.stderr.write(`[airs-hook] decision from sidecar ${cfg.sidecarSocket}
+`);
+    const { event, decision } = remote ?? await evaluate(input, parsedObj, cfg, adapter.capabilities, { raw, event: args.event });
+    const outcome = adapter.render(event, decision);
+    if (outcome.stderr) process.stderr.write(outcome.stderr);
+    process.exitCode = outcome.exitCode ?? 0;
+    if (outcome.stdout) process.stdout.write(outcome.stdout);
+    debugStartup(cfg, cwd, boot, tMain, remote ? "sidecar" : "scan");
+  } catch (err) {
+    const evName = String(input?.hook_event_name ?? args.event ?? "");
+    process.stderr.write(`[airs-hook] internal error (${evName || "?"}): ${String(err?.stack ?? err)}
+`);
+    if (cfg.failMode === "closed" && INPUT_EVENTS.has(String(args.event))) {
+      process.stderr.write("[airs-hook] internal error \u2014 blocking (fail-closed)\n");
+      process.exitCode = 2;
+    } else {
+      process.stderr.write("[airs-hook] internal error \u2014 allowing (fail-open)\n");
+      process.exitCode = 0;
+    }
+  }
+}
+function readStdin() {
+  return new Promise((resolve2) => {
+    if (process.stdin.isTTY) {
+      resolve2("");
+      return;
+    }
+    let data = "";
+    process.stdin.setEncoding("utf8");
+    process.stdin.on("data", (chunk) => data += chunk);
+    process.stdin.on("end", () => resolve2(data));
+    process.stdin.on("error", () => resolve2(data));
+  });
+}
+export {
+  main
+};
@@ -1,6 +1,6 @@
 -- kong/plugins/prisma-airs-intercept/handler.lua
 -- Patched version: Bedrock Converse format + MCP tool_event support
---                  + buffered SSE (text/event-stream) response scanning
+--                  + buffered or streaming SSE (text/event-stream) response scanning
 
 local http = require("resty.http")
 local cjson = require("cjson")
@@ -191,60 +191,50 @@ local function parse_sse(raw)
     return payloads
 end
 
--- Pure extractors. Each takes the FULL decoded item list ({ raw, decoded }) and
--- walks it once, appending text + tool-call args in stream order.
-
-local function extract_openai_chat(items)
-    local out = {}
-    for _, it in ipairs(items) do
-        local d = it.decoded
-        if type(d) == "table" and type(d.choices) == "table" then
-            for _, ch in ipairs(d.choices) do
-                local delta = ch.delta
-                if type(delta) == "table" then
-                    if type(delta.content) == "string" then
-                        out[#out + 1] = delta.content
-                    end
-                    if type(delta.tool_calls) == "table" then
-                        for _, tc in ipairs(delta.tool_calls) do
-                            local fn = tc["function"]
-                            if type(fn) == "table" then
-                                if type(fn.name) == "string" then out[#out + 1] = fn.name end
-                                if type(fn.arguments) == "string" then out[#out + 1] = fn.arguments end
-                            end
+-- Pure per-item extractors. Each takes ONE decoded SSE payload and appends its text +
+-- tool-call args to `out`; the buffered extractors below walk the full item list with
+-- them, and the streaming scanner feeds them one frame at a time.
+
+local function openai_chat_item(d, out)
+    if type(d) == "table" and type(d.choices) == "table" then
+        for _, ch in ipairs(d.choices) do
+            local delta = ch.delta
+            if type(delta) == "table" then
+                if type(delta.content) == "string" then
+                    out[#out + 1] = delta.content
+                end
+                if type(delta.tool_calls) == "table" then
+                    for _, tc in ipairs(delta.tool_calls) do
+                        local fn = tc["function"]
+                        if type(fn) == "table" then
+                            if type(fn.name) == "string" then out[#out + 1] = fn.name end
+                            if type(fn.arguments) == "string" then out[#out + 1] = fn.arguments end
                         end
                     end
                 end
             end
         end
     end
-    return table.concat(out)
 end
 
-local function extract_anthropic_messages(items)
-    local out = {}
-    for _, it in ipairs(items) do
-        local d = it.decoded
-        if type(d) == "table" and d.type == "content_block_delta" and type(d.delta) == "table" then
-            local dt = d.delta
-            if dt.type == "text_delta" and type(dt.text) == "string" then
-                out[#out + 1] = dt.text
-            elseif dt.type == "input_json_delta" and type(dt.partial_json) == "string" then
-                out[#out + 1] = dt.partial_json
-            end
+local function anthropic_messages_item(d, out)
+    if type(d) == "table" and d.type == "content_block_delta" and type(d.delta) == "table" then
+        local dt = d.delta
+        if dt.type == "text_delta" and type(dt.text) == "string" then
+            out[#out + 1] = dt.text
+        elseif dt.type == "input_json_delta" and type(dt.partial_json) == "string" then
+            out[#out + 1] = dt.partial_json
         end
     end
-    return table.concat(out)
 end
 
-local function extract_openai_responses(items)
-    local out = {}
-    local saw_delta = {}
-
+-- `saw_delta` persists across calls for one response: it records which content blocks
+-- streamed deltas, so their trailing .done event is not folded in a second time.
+local function openai_responses_item(d, out, saw_delta)
     local function family_of(t)
         return (t:gsub("%.delta$", ""):gsub("%.done$", ""))
     end
-    local function key_of(d, fam)
+    local function key_of(fam)
         -- Compose ALL present identifiers so distinct content blocks under the same
         -- output item (which may share output_index but differ in content_index, or
         -- vice versa) never collide on the .done-fallback key.
@@ -256,29 +246,46 @@ local function extract_openai_responses(items)
         }, "|")
     end
 
-    for _, it in ipairs(items) do
-        local d = it.decoded
-        if type(d) == "table" and type(d.type) == "string" then
-            local t = d.type
-            if t:match("^response%.") and t:match("%.delta$") then
-                if type(d.delta) == "string" then
-                    saw_delta[key_of(d, family_of(t))] = true
-                    out[#out + 1] = d.delta
-                end
-            elseif t:match("^response%.") and t:match("%.done$") then
-                -- .done is a fallback: fold its full value only if that key saw no delta
-                -- (.done follows its deltas in real streams, so saw_delta is already set)
-                if not saw_delta[key_of(d, family_of(t))] then
-                    for _, f in ipairs({ "text", "arguments", "input", "code", "refusal" }) do
-                        if type(d[f]) == "string" then
-                            out[#out + 1] = d[f]
-                            break
-                        end
+    if type(d) == "table" and type(d.type) == "string" then
+        local t = d.type
+        if t:match("^response%.") and t:match("%.delta$") then
+            if type(d.delta) == "string" then
+                saw_delta[key_of(family_of(t))] = true
+                out[#out + 1] = d.delta
+            end
+        elseif t:match("^response%.") and t:match("%.done$") then
+            -- .done is a fallback: fold its full value only if that key saw no delta
+            -- (.done follows its deltas in real streams, so saw_delta is already set)
+            if not saw_delta[key_of(family_of(t))] then
+                for _, f in ipairs({ "text", "arguments", "input", "code", "refusal" }) do
+                    if type(d[f]) == "string" then
+                        out[#out + 1] = d[f]
+                        break
                     end
                 end
             end
         end
     end
+end
+
+-- Pure buffered extractors: take the FULL decoded item list ({ raw, decoded }) and walk it
+-- once, appending text + tool-call args in stream order.
+
+local function extract_openai_chat(items)
+    local out = {}
+    for _, it in ipairs(items) do openai_chat_item(it.decoded, out) end
+    return table.concat(out)
+end
+
+local function extract_anthropic_messages(items)
+    local out = {}
+    for _, it in ipairs(items) do anthropic_messages_item(it.decoded, out) end
+    return table.concat(out)
+end
+
+local function extract_openai_responses(items)
+    local out, saw_delta = {}, {}
+    for _, it in ipairs(items) do openai_responses_item(it.decoded, out, saw_delta) end
     return table.concat(out)
 end
 
@@ -348,6 +355,96 @@ local function reconstruct_sse_text(raw, provider)
     return text or ""
 end
 
+-- ============================================================================
+-- Streaming SSE scanning (sse_scan_mode = "streaming")
+--   The same reconstruction, done incrementally: complete SSE frames are held, their
+--   text is appended to a window, and once the window reaches sse_stream_window_chars
+--   it is scanned (prefixed with the last sse_stream_overlap_chars of the previous
+--   window, so a phrase split across the boundary is still seen). Held frames are
+--   released only after the window covering them is allowed. Memory per stream is one
+--   window plus the frames it covers. Pure state machine here; the Kong-coupled loop
+--   that drives it lives with the access phase.
+-- ============================================================================
+
+local function sse_stream_new(provider, window, overlap)
+    return {
+        provider = provider or "auto",
+        window = window or 1000,
+        overlap = overlap or 200,
+        buf = "",          -- bytes not yet forming a complete frame
+        held = {},         -- complete frames awaiting a verdict
+        pending = {},      -- text reconstructed from held frames, not yet scanned
+        pending_len = 0,
+        tail = "",         -- overlap carried from the last scanned window
+        saw_delta = {},    -- openai_responses .done de-duplication (whole stream)
+    }
+end
+
+-- Pure: fold one complete frame into the stream state.
+local function sse_stream_frame(st, frame)
+    st.held[#st.held + 1] = frame
+    for _, p in ipairs(parse_sse(frame)) do
+        local before = #st.pending
+        if st.provider == "raw" then
+            st.pending[#st.pending + 1] = p
+        else
+            local ok, d = pcall(cjson.decode, p)
+            if not ok or d == nil then
+                -- undecodable payload: scan it as plain text (the buffered fallback)
+                st.pending[#st.pending + 1] = p
+            else
+                if st.provider == "auto" then
+                    st.provider = detect_provider({ { decoded = d } }) or "auto"
+                end
+                if st.provider == "openai_chat" then openai_chat_item(d, st.pending)
+                elseif st.provider == "anthropic_messages" then anthropic_messages_item(d, st.pending)
+                elseif st.provider == "openai_responses" then openai_responses_item(d, st.pending, st.saw_delta)
+                end
+            end
+        end
+        for i = before + 1, #st.pending do st.pending_len = st.pending_len + #st.pending[i] end
+    end
+end
+
+-- Pure: append a raw chunk from upstream. Returns true once the unscanned text has
+-- reached the window size (the caller should scan, then release).
+local function sse_stream_feed(st, chunk)
+    st.buf = st.buf .. (chunk or "")
+    while true do
+        local _, e = st.buf:find("\r?\n\r?\n")
+        if not e then break end
+        sse_stream_frame(st, st.buf:sub(1, e))
+        st.buf = st.buf:sub(e + 1)
+    end
+    return st.pending_len >= st.window
+end
+
+-- Pure: end of upstream body -- a trailing frame without its blank line still counts.
+local function sse_stream_finish(st)
+    if st.buf ~= "" then
+        sse_stream_frame(st, st.buf)
+        st.buf = ""
+    end
+end
+
+-- Pure: take the text to scan now (overlap + unscanned text) and advance the window.
+-- Returns "" when the held frames carry no text (role/metadata/ping frames).
+local function sse_stream_window(st)
+    if st.pending_len == 0 then return "" end
+    local text = table.concat(st.pending)
+    st.pending, st.pending_len = {}, 0
+    local scan = st.tail .. text
+    st.tail = st.overlap > 0 and scan:sub(-st.overlap) or ""
+    return scan
+end
+
+-- Pure: the held frames, verbatim, now cleared for the client.
+local function sse_stream_release(st)
+    local out = table.concat(st.held)
+    st.held = {}
+    return out
+end
+
 -- ============================================================================
 
 local function extract_prompt(request_body)
@@ -408,6 +505,129 @@ local function extract_prompt(request_body)
     return nil
 end
 
+-- ============================================================================
+-- Incremental multi-turn scanning (opt-in, history_scan = "incremental")
+--   Every turn of a chat resends the whole history. Instead of scanning it again, a
+--   per-session ledger in an nginx shared dict records hashes of the input messages
+--   (user / tool) already scanned and allowed; only new or changed messages, plus
+--   history_context_messages cleared ones just before them, go to AIRS. A missing or
+--   evicted ledger means a full scan of every input message. Pure helpers are
+--   exposed on `._history` for tests.
+-- ============================================================================
+
+local HISTORY_ROLES = { user = true, tool = true }
+
+-- Pure: plain text of one message's content (string, or an array of parts).
+local function message_text(content)
+    if type(content) == "string" then return content end
+    if type(content) ~= "table" then return nil end
+    local parts = {}
+    for _, part in ipairs(content) do
+        if type(part) == "string" then
+            parts[#parts + 1] = part
+        elseif type(part) == "table" and type(part.text) == "string" then
+            parts[#parts + 1] = part.text
+        end
+    end
+    if #parts > 0 then return table.concat(parts, "\n") end
+    local ok, serialized = pcall(cjson.encode, content)
+    return ok and serialized or nil
+end
+
+-- Pure: the conversation's input messages in order, as { role, text }.
+-- Reads chat `messages` (OpenAI / Anthropic / Bedrock) or a Responses `input` array.
+local function conversation_messages(request_body)
+    local out = {}
+    if type(request_body) ~= "table" then return out end
+    local list = type(request_body.messages) == "table" and request_body.messages
+        or type(request_body.input) == "table" and request_body.input
+    if not list then return out end
+    for _, m in ipairs(list) do
+        if type(m) == "string" then
+            out[#out + 1] = { role = "user", text = m }
+        elseif type(m) == "table" then
+            local role = m.role or (m.type == "function_call_output" and "tool") or "user"
+            local text = HISTORY_ROLES[role] and message_text(m.content or m.output)
+            if text and text ~= "" then out[#out + 1] = { role = role, text = text } end
+        end
+    end
+    return out
+end
+
+-- Pure: which message indices to scan, in order. `cleared` is the session ledger as a
+-- set of message hashes, or nil when there is none (=> every index). Otherwise each
+-- message whose hash is not cleared, together with the `context` messages before it;
+-- with nothing new (a retry), the last message alone.
+local function select_unscanned(hashes, cleared, context)
+    local picked = {}
+    if not cleared then
+        for i = 1, #hashes do picked[i] = i end
+        return picked
+    end
+    local take = {}
+    for i = 1, #hashes do
+        if not cleared[hashes[i]] then
+            for k = math.max(1, i - (context or 0)), i do take[k] = true end
+        end
+    end
+    for i = 1, #hashes do
+        if take[i] then picked[#picked + 1] = i end
+    end
+    if #picked == 0 and #hashes > 0 then picked[1] = #hashes end
+    return picked
+end
+
+-- Kong-coupled: the prompt text to scan for this turn, and a function that records the
+-- turn as cleared (call it only after an allow verdict). nil when the request carries
+-- no message history or the ledger dict is not declared (=> legacy prompt scan).
+local warned_missing_ledger = false
+
+local function incremental_prompt(config, request_body, profile)
+    local name = config.history_ledger_dict or "prisma_airs_history"
+    local dict = ngx.shared and ngx.shared[name]
+    if not dict then
+        if not warned_missing_ledger then
+            warned_missing_ledger = true
+            kong.log.warn("SecurePrismaAIRSHandler: history_scan is incremental but lua_shared_dict '" ..
+                name .. "' is not declared; using the first_user prompt scan.")
+        end
+        return nil
+    end
+    local msgs = conversation_messages(request_body)
+    if #msgs == 0 then return nil end
+
+    local hashes = {}
+    for i, m in ipairs(msgs) do
+        hashes[i] = ngx.encode_base64(ngx.sha1_bin(m.role .. "\0" .. m.text))
+    end
+    -- A session is named by the caller (history_session_header) or, failing that, by
+    -- its opening message -- the one part of the history every later turn repeats.
+    local sid = config.history_session_header and kong.request.get_header(config.history_session_header)
+    local session = "s:" .. ngx.encode_base64(ngx.sha1_bin(tostring(profile) .. "\0" ..
+        (sid and ("h:" .. sid) or ("m:" .. hashes[1]))))
+
+    local ledger = dict:get(session)
+    local cleared
+    if ledger then
+        cleared = {}
+        for h in ledger:gmatch("[^,]+") do cleared[h] = true end
+    end
+    local picked = select_unscanned(hashes, cleared, config.history_context_messages or 1)
+
+    local parts = {}
+    for _, i in ipairs(picked) do parts[#parts + 1] = msgs[i].text end
+    log_debug(config, "Incremental history scan: " .. #picked .. " of " .. #msgs .. " message(s) (" ..
+        (ledger and "ledger hit" or "no ledger; full scan") .. ")")
+
+    local function commit()
+        local ok, err = dict:set(session, table.concat(hashes, ","), config.history_ledger_ttl_s or 3600)
+        if not ok then
+            kong.log.warn("SecurePrismaAIRSHandler: history ledger store failed: " .. tostring(err))
+        end
+    end
+    return table.concat(parts, "\n\n"), commit
+end
+
 local function is_mcp_request(request_body)
     if not request_body then return false, nil end
 
@@ -558,7 +778,384 @@ local function build_prompt_payload(config, scan_type, request_body, response_bo
     return payload, nil
 end
 
-local function send_scan(config, payload)
+-- ============================================================================
+-- Worker-shared verdict cache (opt-in, verdict_cache = true)
+--   An `allow` verdict is remembered in an nginx shared dict (lua_shared_dict, shared by
+--   every worker) for verdict_cache_ttl_s seconds, keyed by a hash of the resolved
+--   profile, the scan type and the scanned content -- never tr_id / metadata -- so a
+--   repeated prompt or answer skips the AIRS round-trip. The dict's size is the memory
+--   cap: when it is full, nginx evicts the least-recently-used entries. Block and error
+--   verdicts are never cached. Pure helpers are exposed on `._cache` for tests.
+-- ============================================================================
+
+-- Pure: deterministic serialization (sorted keys) so equal content always keys equal,
+-- whatever order cjson would have walked the table in.
+local function canonical(v)
+    local t = type(v)
+    if t == "table" then
+        local keys = {}
+        for k in pairs(v) do keys[#keys + 1] = k end
+        table.sort(keys, function(a, b) return tostring(a) < tostring(b) end)
+        local parts = {}
+        for _, k in ipairs(keys) do
+            parts[#parts + 1] = #tostring(k) .. ":" .. tostring(k) .. "=" .. canonical(v[k])
+        end
+        return "{" .. table.concat(parts, ",") .. "}"
+    elseif t == "string" then
+        return #v .. ":" .. v
+    end
+    return tostring(v)
+end
+
+-- Pure: which checkpoint a payload scans ("prompt", "response", "tool_event").
+local function scan_type_of(payload)
+    local c = payload and payload.contents and payload.contents[1] or {}
+    if c.tool_event then return "tool_event" end
+    if c.response ~= nil then return "response" end
+    return "prompt"
+end
+
+-- Pure: the material hashed into a cache key (everything that decides the verdict).
+local function verdict_cache_material(payload)
+    local profile = payload and payload.ai_profile and payload.ai_profile.profile_name or ""
+    return table.concat({
+        "v1", tostring(profile), scan_type_of(payload), canonical(payload and payload.contents or {}),
+    }, "\0")
+end
+
+local warned_missing_dict = false
+
+-- Kong-coupled: the configured shared dict, or nil (with one warning per worker).
+local function verdict_cache_dict(config)
+    if not config.verdict_cache then return nil end
+    local name = config.verdict_cache_dict or "prisma_airs_verdicts"
+    local dict = ngx.shared and ngx.shared[name]
+    if not dict and not warned_missing_dict then
+        warned_missing_dict = true
+        kong.log.warn("SecurePrismaAIRSHandler: verdict_cache is on but lua_shared_dict '" .. name ..
+            "' is not declared; scanning without the cache.")
+    end
+    return dict
+end
+
+-- Kong-coupled: count a hit/miss, then report it in the debug log and on the response.
+local function verdict_cache_note(config, dict, scan_type, outcome)
+    dict:incr("stat:" .. outcome, 1, 0)
+    local hits, misses = dict:get("stat:hit") or 0, dict:get("stat:miss") or 0
+    log_debug(config, "Verdict cache " .. outcome .. " (" .. scan_type .. "); totals hits=" ..
+        tostring(hits) .. " misses=" .. tostring(misses))
+
+    local seen = kong.ctx.shared.airs_verdict_cache or {}
+    seen[#seen + 1] = scan_type .. "=" .. outcome
+    kong.ctx.shared.airs_verdict_cache = seen
+    pcall(kong.response.set_header, "x-prisma-airs-verdict-cache", table.concat(seen, ", "))
+    pcall(kong.response.set_header, "x-prisma-airs-verdict-cache-stats",
+        "hits=" .. tostring(hits) .. ", misses=" .. tostring(misses))
+end
+
+-- ============================================================================
+-- Scan latency and verdict metrics (opt-in, metrics = true)
+--   Per-phase timings and counters are added up in an nginx shared dict (lua_shared_dict,
+--   one copy for every worker) and served in the Prometheus text format on metrics_path.
+--   Every series carries the service, route, resolved AIRS profile and request provider;
+--   each dict key is the series as rendered (`name{labels}`), so a scrape is one walk of
+--   the dict. Timings use ngx.now() after ngx.update_time() (millisecond resolution).
+--   Pure helpers are exposed on `._metrics` for tests.
+-- ============================================================================
+
+-- Seconds; Prometheus' default buckets plus two for slow upstream answers.
+local METRIC_BUCKETS = { 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60 }
+
+local METRIC_FAMILIES = {
+    prisma_airs_phase_seconds = { "histogram",
+        "Time spent per plugin phase (body_read, extract, scan = send_scan round-trip, verdict)." },
+    prisma_airs_request_seconds = { "histogram",
+        "Per request: total AIRS scan time (part=airs) and upstream LLM time (part=upstream)." },
+    prisma_airs_verdicts_total = { "counter", "send_scan verdicts by scan type." },
+    prisma_airs_fail_events_total = { "counter",
+        "Fail-closed (mode=closed) and fail-open (mode=open) decisions by reason." },
+    prisma_airs_scan_limit_total = { "counter",
+        "Responses over sse_max_scan_chars: blocked (fail closed) or truncated (fail open)." },
+    prisma_airs_sse_buffered_bytes_total = { "counter", "SSE response bytes held at the gateway for scanning." },
+}
+
+local METRIC_BASE_LABELS = { "service", "route", "profile", "provider" }
+
+-- Pure: a Prometheus label value (backslash, double quote and newline escaped).
+local function metric_label_value(v)
+    return (tostring(v == nil and "" or v):gsub("[\\\"\n]", { ["\\"] = "\\\\", ['"'] = '\\"', ["\n"] = "\\n" }))
+end
+
+-- Pure: the series key `name{service=..,route=..,profile=..,provider=..,<extra sorted>}`.
+-- `le`, when given, always comes last so the renderer can order histogram buckets.
+local function metric_series(name, labels, extra, le)
+    local parts = {}
+    for _, k in ipairs(METRIC_BASE_LABELS) do
+        parts[#parts + 1] = k .. '="' .. metric_label_value(labels and labels[k]) .. '"'
+    end
+    local keys = {}
+    for k in pairs(extra or {}) do keys[#keys + 1] = k end
+    table.sort(keys)
+    for _, k in ipairs(keys) do
+        parts[#parts + 1] = k .. '="' .. metric_label_value(extra[k]) .. '"'
+    end
+    if le then parts[#parts + 1] = 'le="' .. le .. '"' end
+    return name .. "{" .. table.concat(parts, ",") .. "}"
+end
+
+-- Pure: the dict increments one histogram observation makes, as { key, amount } pairs
+-- (every bucket the value falls in, +Inf, _sum and _count).
+local function metric_observation(name, labels, extra, value)
+    local out = {}
+    for _, le in ipairs(METRIC_BUCKETS) do
+        if value <= le then
+            out[#out + 1] = { metric_series(name .. "_bucket", labels, extra, tostring(le)), 1 }
+        end
+    end
+    out[#out + 1] = { metric_series(name .. "_bucket", labels, extra, "+Inf"), 1 }
+    out[#out + 1] = { metric_series(name .. "_sum", labels, extra), value }
+    out[#out + 1] = { metric_series(name .. "_count", labels, extra), 1 }
+    return out
+end
+
+local METRIC_SUFFIX_RANK = { [""] = 1, _bucket = 1, _sum = 2, _count = 3 }
+
+-- Pure: Prometheus text exposition (format 0.0.4) of a { series key = value } map.
+-- Families get their # HELP / # TYPE lines; buckets are ordered by numeric `le`.
+local function render_metrics(samples)
+    local rows = {}
+    for key, value in pairs(samples) do
+        local name, labels = key:match("^([%a_:][%w_:]*)(.*)$")
+        if name then
+            local family, suffix = name, ""
+            for _, s in ipairs({ "_bucket", "_sum", "_count" }) do
+                local base = name:sub(1, #name - #s)
+                if name:sub(-#s) == s and METRIC_FAMILIES[base] and METRIC_FAMILIES[base][1] == "histogram" then
+                    family, suffix = base, s
+                    break
+                end
+            end
+            local le = labels:match(',le="([^"]*)"}$')
+            rows[#rows + 1] = {
+                family = family,
+                series = le and labels:gsub(',le="[^"]*"}$', "}") or labels,
+                rank = METRIC_SUFFIX_RANK[suffix],
+                le = le and (tonumber(le) or math.huge) or 0,
+                line = key .. " " .. tostring(value),
+            }
+        end
+    end
+    table.sort(rows, function(a, b)
+        if a.family ~= b.family then return a.family < b.family end
+        if a.series ~= b.series then return a.series < b.series end
+        if a.rank ~= b.rank then return a.rank < b.rank end
+        return a.le < b.le
+    end)
+
+    local out, current = {}, nil
+    for _, row in ipairs(rows) do
+        if row.family ~= current then
+            current = row.family
+            local meta = METRIC_FAMILIES[current]
+            if meta then
+                out[#out + 1] = "# HELP " .. current .. " " .. meta[2]
+                out[#out + 1] = "# TYPE " .. current .. " " .. meta[1]
+            end
+        end
+        out[#out + 1] = row.line
+    end
+    return #out > 0 and table.concat(out, "\n") .. "\n" or ""
+end
+
+-- Pure: seconds in nginx's $upstream_response_time ("0.012", or "0.010, 0.020 : 0.003"
+-- when Kong retried or was redirected internally -- every attempt counts). nil if none.
+local function upstream_seconds(var)
+    local total, seen = 0, false
+    for n in tostring(var or ""):gmatch("[%d%.]+") do
+        local v = tonumber(n)
+        if v then total, seen = total + v, true end
+    end
+    return seen and total or nil
+end
+
+-- Pure: the provider label -- the request's wire format, named like sse_provider.
+local function request_provider(request_body, is_mcp)
+    if is_mcp then return "mcp" end
+    if type(request_body) ~= "table" then return "unknown" end
+    local messages = request_body.messages
+    if type(messages) == "table" then
+        if request_body.anthropic_version or request_body.system ~= nil then
+            return "anthropic_messages"
+        end
+        local first = messages[1] and messages[1].content
+        if request_body.inferenceConfig or (type(first) == "table" and type(first[1]) == "table"
+            and first[1].text ~= nil and first[1].type == nil) then
+            return "bedrock_converse"
+        end
+        return "openai_chat"
+    end
+    if request_body.input ~= nil then return "openai_responses" end
+    return "unknown"
+end
+
+local warned_missing_metrics_dict = false
+
+-- Kong-coupled: the configured metrics dict, or nil (with one warning per worker).
+local function metrics_dict(config)
+    if not config.metrics then return nil end
+    local name = config.metrics_dict or "prisma_airs_metrics"
+    local dict = ngx.shared and ngx.shared[name]
+    if not dict and not warned_missing_metrics_dict then
+        warned_missing_metrics_dict = true
+        kong.log.warn("SecurePrismaAIRSHandler: metrics is on but lua_shared_dict '" .. name ..
+            "' is not declared; no metrics are recorded.")
+    end
+    return dict
+end
+
+-- Kong-coupled: a start time for metrics_observe, or nil when metrics are off.
+local function metrics_clock(config)
+    if not config.metrics then return nil end
+    ngx.update_time()
+    return ngx.now()
+end
+
+-- Kong-coupled: this request's base labels, resolved once and kept in kong.ctx.shared.
+local function metric_labels(config)
+    local labels = kong.ctx.shared.airs_metric_labels
+    if labels then return labels end
+    local service, route = "", ""
+    pcall(function()
+        local s = kong.router.get_service()
+        service = s and (s.name or s.id) or ""
+    end)
+    pcall(function()
+        local r = kong.router.get_route()
+        route = r and (r.name or r.id) or ""
+    end)
+    labels = {
+        service = service,
+        route = route,
+        profile = resolve_profile_name(config),
+        provider = kong.ctx.shared.airs_provider or "unknown",
+    }
+    kong.ctx.shared.airs_metric_labels = labels
+    return labels
+end
+
+-- Kong-coupled: add `n` (default 1) to a counter.
+local function metrics_add(config, name, extra, n)
+    local dict = metrics_dict(config)
+    if not dict or (n or 1) == 0 then return end
+    local ok, err = dict:incr(metric_series(name, metric_labels(config), extra), n or 1, 0)
+    if not ok then log_debug(config, "Metrics update failed: " .. tostring(err)) end
+end
+
+-- Kong-coupled: seconds since `started` (from metrics_clock), or nil when metrics are off.
+local function metrics_elapsed(started)
+    if not started then return nil end
+    ngx.update_time()
+    return ngx.now() - started
+end
+
+-- Kong-coupled: record one value (seconds) in a histogram.
+local function metrics_record(config, name, extra, seconds)
+    local dict = metrics_dict(config)
+    if not dict or not seconds then return end
+    for _, inc in ipairs(metric_observation(name, metric_labels(config), extra, seconds)) do
+        dict:incr(inc[1], inc[2], 0)
+    end
+end
+
+-- Kong-coupled: record the seconds since `started` in a histogram; returns them.
+local function metrics_observe(config, name, extra, started)
+    local elapsed = metrics_elapsed(started)
+    metrics_record(config, name, extra, elapsed)
+    return elapsed
+end
+
+-- Scrapes are answered only for clients in metrics_allow (loopback unless configured).
+local METRICS_ALLOW_DEFAULT = { "127.0.0.1", "::1" }
+
+-- Pure: an address as 16-bit groups (2 for IPv4, 8 for IPv6), or nil if it is not one.
+local function ip_groups(s)
+    if type(s) ~= "string" then return nil end
+    local a, b, c, d = s:match("^(%d+)%.(%d+)%.(%d+)%.(%d+)$")
+    if a then
+        a, b, c, d = tonumber(a), tonumber(b), tonumber(c), tonumber(d)
+        if a > 255 or b > 255 or c > 255 or d > 255 then return nil end
+        return { a * 256 + b, c * 256 + d }
+    end
+    if not s:find(":", 1, true) then return nil end
+    local head, tail = s, nil
+    local gap = s:find("::", 1, true)
+    if gap then head, tail = s:sub(1, gap - 1), s:sub(gap + 2) end
+    local function split(part)
+        local out = {}
+        if part == "" then return out end
+        for g in (part .. ":"):gmatch("([^:]*):") do
+            if not g:match("^%x%x?%x?%x?$") then return nil end
+            out[#out + 1] = tonumber(g, 16)
+        end
+        return out
+    end
+    local groups, rest = split(head), split(tail or "")
+    if not groups or not rest then return nil end
+    local fill = 8 - #groups - #rest
+    if (tail and fill < 1) or (not tail and fill ~= 0) then return nil end
+    for _ = 1, fill do groups[#groups + 1] = 0 end
+    for _, g in ipairs(rest) do groups[#groups + 1] = g end
+    return groups
+end
+
+-- Pure: whether `ip` is one of the addresses / CIDR blocks in `allow` (same family only).
+local function metrics_client_allowed(ip, allow)
+    local groups = ip_groups(ip)
+    if not groups or type(allow) ~= "table" then return false end
+    for _, entry in ipairs(allow) do
+        local addr, bits = tostring(entry):match("^([^/]+)/(%d+)$")
+        local net = ip_groups(addr or entry)
+        if net and #net == #groups then
+            bits = tonumber(bits) or #net * 16
+            local match = true
+            for i = 1, #net do
+                local take = math.min(math.max(bits - (i - 1) * 16, 0), 16)
+                if take == 0 then break end
+                local unit = 2 ^ (16 - take)
+                if math.floor(groups[i] / unit) ~= math.floor(net[i] / unit) then
+                    match = false
+                    break
+                end
+            end
+            if match then return true end
+        end
+    end
+    return false
+end
+
+-- Kong-coupled: answer a scrape of metrics_path with the whole dict, for allowed clients only.
+local function serve_metrics(config)
+    local ip = kong.client.get_forwarded_ip()
+    local allow = config.metrics_allow
+    if type(allow) ~= "table" then allow = METRICS_ALLOW_DEFAULT end
+    if not metrics_client_allowed(ip, allow) then
+        kong.log.warn("SecurePrismaAIRSHandler: metrics scrape from ", tostring(ip), " refused (not in metrics_allow).")
+        return kong.response.exit(403, { message = "Forbidden" })
+    end
+    local dict = metrics_dict(config)
+    if not dict then
+        return kong.response.exit(503, { message = "Metrics shared dict is not declared." })
+    end
+    local samples = {}
+    for _, key in ipairs(dict:get_keys(0)) do
+        local v = dict:get(key)
+        if v then samples[key] = v end
+    end
+    return kong.response.exit(200, render_metrics(samples),
+        { ["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8" })
+end
+
+local function scan_airs(config, payload)
     local ok_enc, request_payload_json = pcall(cjson.encode, payload)
     if not ok_enc then
         return "error", "Internal plugin error: Could not encode payload."
@@ -616,6 +1213,48 @@ local function send_scan(config, payload)
     return action, "Verdict received from security scan."
 end
 
+-- Scan `payload`, answering from the worker-shared verdict cache when it is enabled.
+local function cached_scan(config, payload)
+    local dict = verdict_cache_dict(config)
+    if not dict then return scan_airs(config, payload) end
+
+    local key = "v:" .. ngx.encode_base64(ngx.sha1_bin(verdict_cache_material(payload)))
+    local scan_type = scan_type_of(payload)
+    if dict:get(key) == "allow" then
+        verdict_cache_note(config, dict, scan_type, "hit")
+        return "allow", "Verdict served from the shared verdict cache."
+    end
+    verdict_cache_note(config, dict, scan_type, "miss")
+
+    local verdict, reason = scan_airs(config, payload)
+    if verdict == "allow" then
+        -- set() evicts least-recently-used entries when the dict is full
+        local ok, err = dict:set(key, "allow", config.verdict_cache_ttl_s or 300)
+        if not ok then
+            kong.log.warn("SecurePrismaAIRSHandler: verdict cache store failed: " .. tostring(err))
+        end
+    end
+    return verdict, reason
+end
+
+-- Scan `payload`; with metrics on, also record the round-trip, the verdict and the
+-- errors that fail closed (every "error" verdict is a 503 or a terminated stream).
+local function send_scan(config, payload)
+    local started = metrics_clock(config)
+    local verdict, reason = cached_scan(config, payload)
+    if started then
+        local scan_type = scan_type_of(payload)
+        local elapsed = metrics_observe(config, "prisma_airs_phase_seconds",
+            { phase = "scan", scan_type = scan_type }, started)
+        kong.ctx.shared.airs_scan_s = (kong.ctx.shared.airs_scan_s or 0) + elapsed
+        metrics_add(config, "prisma_airs_verdicts_total", { scan_type = scan_type, verdict = tostring(verdict) })
+        if verdict == "error" then
+            metrics_add(config, "prisma_airs_fail_events_total", { mode = "closed", reason = "scan_error" })
+        end
+    end
+    return verdict, reason
+end
+
 -- Pure: HTTP status a non-allow send_scan verdict maps to (nil if allowed).
 --   "allow" -> nil (proceed)
 --   "error" -> 503 (could not get a verdict: AIRS unreachable / non-200 / undecodable;
@@ -627,6 +1266,30 @@ local function verdict_status(verdict)
     return 403
 end
 
+-- Pure (unit-testable) decision for over-cap reconstructed SSE text.
+-- Returns { exceeded, blocked, text }. blocked=true (fail-closed, the secure
+-- default) => caller emits 403; fail-open => caller scans text[1..max].
+local function apply_scan_limit(text, max, fail_closed)
+    max = max or 20000
+    if not text or #text <= max then
+        return { exceeded = false, blocked = false, text = text }
+    end
+    if fail_closed then
+        return { exceeded = true, blocked = true, text = nil }
+    end
+    return { exceeded = true, blocked = false, text = string.sub(text, 1, max) }
+end
+
+-- Pure: the SSE event that terminates a stream whose window was not allowed.
+local function sse_block_event(verdict)
+    local msg = verdict_status(verdict) == 503
+        and "Security scanning temporarily unavailable." or "Response blocked by security policy."
+    return "event: error\ndata: " .. cjson.encode({
+        type = "error",
+        error = { type = "prisma_airs_blocked", message = msg },
+    }) .. "\n\n"
+end
+
 -- Kong-coupled: deny a request/response based on a non-allow verdict and halt.
 -- Detailed reason is logged server-side only; the client gets a generic body.
 local function deny(verdict, reason, block_message)
@@ -637,12 +1300,335 @@ local function deny(verdict, reason, block_message)
     return kong.response.exit(403, { message = block_message })
 end
 
+-- Kong-coupled: scan a complete LLM response body (buffered SSE reconstructed first).
+-- Returns verdict, reason; content that cannot be scanned (no text / no payload) is
+-- logged and passes as "allow", as it always has in the response phase.
+local function scan_llm_response(config, request_body, response_body_str, sse)
+    local started = metrics_clock(config)
+    -- Buffered SSE (text/event-stream) response scanning (LLM path only; MCP responses are
+    -- scanned as tool_event by the caller).
+    -- Reconstruct the assistant text from the buffered SSE frames, then feed it through the
+    -- existing build_prompt_payload via the OpenAI envelope shape so the scan path is reused.
+    if config.scan_sse_responses and sse then
+        local provider = config.sse_provider or "auto"
+
+        if config.sse_set_observability_headers then
+            pcall(kong.response.set_header, "x-prisma-airs-sse-detected", "true")
+            pcall(kong.response.set_header, "x-prisma-airs-sse-scan-mode", "buffered")
+            pcall(kong.response.set_header, "x-prisma-airs-sse-provider", provider)
+        end
+
+        metrics_add(config, "prisma_airs_sse_buffered_bytes_total", { mode = "buffered" },
+            response_body_str and #response_body_str or 0)
+        local text = reconstruct_sse_text(response_body_str, provider)
+
+        if not text or text == "" then
+            kong.log.warn("SecurePrismaAIRSHandler: SSE detected but no scannable text reconstructed; " ..
+                "skipping response scan. provider=" .. provider ..
+                " raw_body_len=" .. tostring(response_body_str and #response_body_str or 0))
+            metrics_add(config, "prisma_airs_fail_events_total", { mode = "open", reason = "unscannable" })
+            return "allow", "No scannable SSE text."
+        end
+
+        local lim = apply_scan_limit(text, config.sse_max_scan_chars, config.sse_truncation_fail_closed)
+        if lim.exceeded then
+            kong.log.warn("SecurePrismaAIRSHandler: SSE reconstructed text exceeds sse_max_scan_chars (" ..
+                #text .. " > " .. (config.sse_max_scan_chars or 20000) .. ")")
+            if config.sse_set_observability_headers then
+                pcall(kong.response.set_header, "x-prisma-airs-sse-truncated", "true")
+            end
+            metrics_add(config, "prisma_airs_scan_limit_total", { outcome = lim.blocked and "blocked" or "truncated" })
+            metrics_add(config, "prisma_airs_fail_events_total",
+                { mode = lim.blocked and "closed" or "open", reason = "scan_limit" })
+        end
+        if lim.blocked then
+            -- Secure default: response too large to scan in full -> do not return it.
+            return "blocked", "SSE response exceeds scannable size"
+        end
+        text = lim.text
+
+        log_debug(config, "SSE reconstructed " .. #text .. " chars for AIRS scan (provider=" .. provider .. ")")
+
+        -- Wrap into the OpenAI envelope build_prompt_payload already understands, so the
+        -- shared builder is reused UNCHANGED and the text lands in contents[0].response.
+        local ok_enc, wrapped = pcall(cjson.encode, { choices = { { message = { content = text } } } })
+        if not ok_enc then
+            kong.log.warn("SecurePrismaAIRSHandler: failed to encode reconstructed SSE text; skipping response scan.")
+            metrics_add(config, "prisma_airs_fail_events_total", { mode = "open", reason = "unscannable" })
+            return "allow", "SSE text not encodable."
+        end
+        response_body_str = wrapped
+    end
+
+    -- Standard LLM response scanning
+    local payload, payload_err = build_prompt_payload(config, "response", request_body, response_body_str)
+
+    if not payload then
+        kong.log.warn("SecurePrismaAIRSHandler: " .. tostring(payload_err) .. " Skipping response scan.")
+        metrics_add(config, "prisma_airs_fail_events_total", { mode = "open", reason = "unscannable" })
+        return "allow", "No response payload to scan."
+    end
+    metrics_observe(config, "prisma_airs_phase_seconds", { phase = "extract", scan_type = "response" }, started)
+
+    return send_scan(config, payload)
+end
+
+-- ============================================================================
+-- Gateway-side upstream call (streaming SSE scan, speculative forwarding)
+--   Header/body filters cannot yield, so they cannot wait for an AIRS verdict. In
+--   streaming mode the access phase therefore makes the upstream call itself (after
+--   the prompt is allowed), relays the SSE frames window by window as they clear,
+--   and finishes the request -- Kong's proxy step is skipped for that request.
+--   Speculative forwarding uses the same call, started while the prompt scan is
+--   still in flight; the answer is held here until the prompt verdict is known.
+-- ============================================================================
+
+-- Request/response headers that describe the hop, not the message.
+local HOP_BY_HOP = {
+    ["connection"] = true, ["keep-alive"] = true, ["proxy-connection"] = true,
+    ["te"] = true, ["trailer"] = true, ["transfer-encoding"] = true,
+    ["upgrade"] = true, ["content-length"] = true, ["host"] = true,
+}
+
+-- Kong-coupled: open the routed Service and send the client's request to it, as Kong's
+-- proxy would (same upstream URI, headers minus hop-by-hop, original body bytes).
+-- Returns httpc, res on success; nil, err otherwise.
+local function request_upstream()
+    local svc = kong.router.get_service()
+    if not svc or not svc.host then return nil, "no routed service" end
+
+    local httpc = http.new()
+    httpc:set_timeouts(svc.connect_timeout or 60000, svc.write_timeout or 60000, svc.read_timeout or 60000)
+    local scheme = svc.protocol == "https" and "https" or "http"
+    local ok, err = httpc:connect({
+        scheme = scheme,
+        host = svc.host,
+        port = svc.port or (scheme == "https" and 443 or 80),
+        ssl_server_name = svc.host,
+        ssl_verify = svc.tls_verify ~= false and scheme == "https",
+    })
+    if not ok then return nil, "connect failed: " .. tostring(err) end
+
+    local headers = {}
+    for k, v in pairs(kong.request.get_headers()) do
+        if not HOP_BY_HOP[string.lower(k)] then headers[k] = v end
+    end
+    headers["Host"] = ngx.var.upstream_host or svc.host
+    if kong.ctx.shared.airs_profile_name then
+        headers["X-AIRS-Profile-Used"] = kong.ctx.shared.airs_profile_name
+    end
+
+    local path = ngx.var.upstream_uri or kong.request.get_path()
+    local args = ngx.var.args
+    if args and args ~= "" and not path:find("?", 1, true) then path = path .. "?" .. args end
+
+    local res, rerr = httpc:request({
+        method = kong.request.get_method(),
+        path = path,
+        headers = headers,
+        body = kong.request.get_raw_body(),
+    })
+    if not res then
+        pcall(function() httpc:close() end)
+        return nil, "request failed: " .. tostring(rerr)
+    end
+    return httpc, res
+end
+
+-- Kong-coupled: send the upstream status + headers to the client.
+local function relay_headers(res)
+    ngx.status = res.status
+    for k, v in pairs(res.headers) do
+        if not HOP_BY_HOP[string.lower(k)] then ngx.header[k] = v end
+    end
+end
+
+-- Kong-coupled: scan one window of reconstructed response text. true = allowed.
+local function scan_response_text(config, request_body, text)
+    local ok_enc, wrapped = pcall(cjson.encode, { choices = { { message = { content = text } } } })
+    if not ok_enc then return "error", "Could not encode streamed SSE text." end
+    local payload, payload_err = build_prompt_payload(config, "response", request_body, wrapped)
+    if not payload then return "error", payload_err end
+    return send_scan(config, payload)
+end
+
+-- Kong-coupled: relay a streamed upstream response through the windowed scanner.
+local function stream_sse_response(config, request_body, httpc, res)
+    local provider = config.sse_provider or "auto"
+    local st = sse_stream_new(provider, config.sse_stream_window_chars, config.sse_stream_overlap_chars)
+    local windows = 0
+
+    relay_headers(res)
+    if config.sse_set_observability_headers then
+        ngx.header["x-prisma-airs-sse-detected"] = "true"
+        ngx.header["x-prisma-airs-sse-scan-mode"] = "streaming"
+        ngx.header["x-prisma-airs-sse-provider"] = provider
+    end
+    ngx.send_headers()
+
+    -- scan whatever text is held, then release the frames it covers (or end the stream)
+    local function clear()
+        local text = sse_stream_window(st)
+        if text ~= "" then
+            windows = windows + 1
+            local verdict, reason = scan_response_text(config, request_body, text)
+            if verdict ~= "allow" then
+                log_error(reason, verdict)
+                ngx.print(sse_block_event(verdict))
+                ngx.flush(true)
+                return false
+            end
+        end
+        local out = sse_stream_release(st)
+        if out ~= "" then
+            ngx.print(out)
+            ngx.flush(true)
+        end
+        return true
+    end
+
+    local reader = res.body_reader
+    local allowed, bytes = true, 0
+    while allowed do
+        local chunk, err = reader(8192)
+        if err then
+            kong.log.warn("SecurePrismaAIRSHandler: upstream SSE read failed: " .. tostring(err))
+            break
+        end
+        if not chunk then break end
+        bytes = bytes + #chunk
+        -- frames with no text yet (role / metadata / keep-alive) carry nothing to scan
+        if sse_stream_feed(st, chunk) or st.pending_len == 0 then
+            allowed = clear()
+        end
+    end
+    if allowed then
+        sse_stream_finish(st)
+        allowed = clear()
+    end
+    metrics_add(config, "prisma_airs_sse_buffered_bytes_total", { mode = "streaming" }, bytes)
+
+    if allowed then
+        pcall(function() httpc:set_keepalive() end)
+        log_debug(config, "SSE stream relayed; " .. windows .. " window(s) scanned (provider=" .. st.provider .. ")")
+    else
+        pcall(function() httpc:close() end)
+    end
+    return ngx.exit(ngx.HTTP_OK)
+end
+
+-- Kong-coupled: scan a fully read upstream answer and return it to the client (or deny).
+local function relay_scanned(config, request_body, res, body)
+    local verdict, reason = scan_llm_response(config, request_body, body or "",
+        is_sse_content_type(res.headers["Content-Type"]))
+    if verdict ~= "allow" then
+        return deny(verdict, reason, "Response blocked by security policy.")
+    end
+    log_debug(config, "Response scan allowed.")
+    local headers = {}
+    for k, v in pairs(res.headers) do
+        if not HOP_BY_HOP[string.lower(k)] then headers[k] = v end
+    end
+    return kong.response.exit(res.status, body or "", headers)
+end
+
+local function upstream_failed(err)
+    kong.log.err("SecurePrismaAIRSHandler: upstream call failed: " .. tostring(err))
+    return kong.response.exit(502, { message = "An invalid response was received from the upstream server" })
+end
+
+-- Is this request relayed window by window (streaming SSE scan)?
+local function wants_stream_relay(config, request_body)
+    return config.scan_sse_responses and config.sse_scan_mode == "streaming" and request_body.stream == true
+end
+
+-- Kong-coupled: streaming-mode replacement for Kong's proxy step (prompt already allowed).
+local function proxy_streaming(config, request_body)
+    local started = metrics_clock(config)
+    local httpc, res = request_upstream()
+    if not httpc then return upstream_failed(res) end
+
+    if is_sse_content_type(res.headers["Content-Type"]) then
+        kong.ctx.shared.airs_upstream_s = metrics_elapsed(started)
+        return stream_sse_response(config, request_body, httpc, res)
+    end
+
+    -- The upstream answered without streaming (e.g. an error JSON): scan it whole, as the
+    -- response phase would, then relay it.
+    local body, err = res:read_body()
+    kong.ctx.shared.airs_upstream_s = metrics_elapsed(started)
+    if not body then return upstream_failed(err) end
+    pcall(function() httpc:set_keepalive() end)
+    return relay_scanned(config, request_body, res, body)
+end
+
+-- Returned by the speculative upstream reader, to tell its result from the scan verdict.
+local UPSTREAM_READ = {}
+
+-- Kong-coupled: speculative forwarding. The prompt scan and the upstream call (answer
+-- read included) run in two light threads; nothing is sent to the client until the
+-- prompt verdict is in. A blocked prompt is denied as soon as its verdict arrives: the
+-- reader is killed and the upstream connection closed with the answer unread.
+local function proxy_speculative(config, request_body, payload, on_allow)
+    local scan = ngx.thread.spawn(send_scan, config, payload)
+
+    local up = {}
+    local reader = ngx.thread.spawn(function()
+        local started = metrics_clock(config)
+        local ok, err = pcall(function()
+            local httpc, res = request_upstream()
+            if not httpc then up.err = res; return end
+            up.httpc, up.res = httpc, res
+            up.relay_stream = wants_stream_relay(config, request_body)
+                and is_sse_content_type(res.headers["Content-Type"])
+            if not up.relay_stream then
+                up.body, up.err = res:read_body()
+            end
+        end)
+        if not ok then up.body, up.err = nil, err end
+        kong.ctx.shared.airs_upstream_s = metrics_elapsed(started)
+        return UPSTREAM_READ
+    end)
+
+    local ok, verdict, reason = ngx.thread.wait(scan, reader)
+    local read_done = ok and verdict == UPSTREAM_READ
+    if read_done then
+        ok, verdict, reason = ngx.thread.wait(scan)
+    end
+    if not ok then
+        verdict, reason = "error", "Prompt scan thread failed: " .. tostring(verdict)
+    end
+    if verdict ~= "allow" then
+        if not read_done then ngx.thread.kill(reader) end
+        -- a connection still being set up when the reader is killed closes with the request
+        if up.httpc then pcall(function() up.httpc:close() end) end
+        return deny(verdict, reason, "Request blocked by security policy.")
+    end
+    log_debug(config, "Prompt scan allowed (speculative upstream call already in flight).")
+    if on_allow then on_allow() end
+
+    if not read_done then ngx.thread.wait(reader) end
+    if not up.httpc then return upstream_failed(up.err) end
+    if up.relay_stream then
+        return stream_sse_response(config, request_body, up.httpc, up.res)
+    end
+    if not up.body then return upstream_failed(up.err) end
+    pcall(function() up.httpc:set_keepalive() end)
+    return relay_scanned(config, request_body, up.res, up.body)
+end
 
 -- ACCESS PHASE
 function SecurePrismaAIRSHandler:access(config)
     log_debug(config, "Access phase triggered.")
+
+    -- Metrics scrape: answered by the plugin, never proxied or scanned.
+    if config.metrics and kong.request.get_method() == "GET" and kong.request.get_path() == config.metrics_path then
+        return serve_metrics(config)
+    end
+
     kong.service.request.enable_buffering()
 
+    local started = metrics_clock(config)
     local request_body, err = kong.request.get_body()
     if err or not request_body then
         log_error("Could not get request body: " .. tostring(err), "blocked")
@@ -651,6 +1637,9 @@ function SecurePrismaAIRSHandler:access(config)
 
     -- Check if this is an MCP request
     local is_mcp, mcp_method = is_mcp_request(request_body)
+    kong.ctx.shared.airs_provider = request_provider(request_body, is_mcp)
+    metrics_observe(config, "prisma_airs_phase_seconds",
+        { phase = "body_read", scan_type = is_mcp and "tool_event" or "prompt" }, started)
 
     if is_mcp then
         log_debug(config, "MCP request detected, method: " .. tostring(mcp_method))
@@ -665,20 +1654,26 @@ function SecurePrismaAIRSHandler:access(config)
         end
 
         -- MCP tools/call - scan using tool_event format
+        started = metrics_clock(config)
         local payload = build_mcp_tool_event_payload(config, request_body, nil)
+        metrics_observe(config, "prisma_airs_phase_seconds", { phase = "extract", scan_type = "tool_event" }, started)
         local verdict, reason = send_scan(config, payload)
 
+        started = metrics_clock(config)
         if verdict ~= "allow" then
+            metrics_observe(config, "prisma_airs_phase_seconds", { phase = "verdict", scan_type = "tool_event" }, started)
             return deny(verdict, reason, "MCP request blocked by security policy.")
         end
 
         log_debug(config, "MCP scan allowed for method: " .. mcp_method)
         kong.ctx.shared.request_body = request_body
         kong.ctx.shared.is_mcp = true
+        metrics_observe(config, "prisma_airs_phase_seconds", { phase = "verdict", scan_type = "tool_event" }, started)
         return
     end
 
     -- Standard LLM prompt scanning
+    started = metrics_clock(config)
     local payload, payload_err = build_prompt_payload(config, "prompt", request_body, nil)
 
     if not payload then
@@ -686,28 +1681,42 @@ function SecurePrismaAIRSHandler:access(config)
         return kong.response.exit(403, { message = "Request blocked by security policy." })
     end
 
+    kong.ctx.shared.request_body = request_body
+
+    -- Incremental multi-turn scan: only the turns the session ledger has not cleared.
+    local commit_history
+    if config.history_scan == "incremental" then
+        local text, commit = incremental_prompt(config, request_body, payload.ai_profile.profile_name)
+        if text then
+            payload.contents[1].prompt = text
+            commit_history = commit
+        end
+    end
+    metrics_observe(config, "prisma_airs_phase_seconds", { phase = "extract", scan_type = "prompt" }, started)
+
+    -- Speculative forwarding: call the upstream while the prompt scan runs, hold the
+    -- answer until the verdict (LLM path only -- MCP tool calls have side effects).
+    if config.speculative_forwarding then
+        return proxy_speculative(config, request_body, payload, commit_history)
+    end
+
     local verdict, reason = send_scan(config, payload)
 
+    started = metrics_clock(config)
     if verdict ~= "allow" then
+        metrics_observe(config, "prisma_airs_phase_seconds", { phase = "verdict", scan_type = "prompt" }, started)
         return deny(verdict, reason, "Request blocked by security policy.")
     end
 
     log_debug(config, "Prompt scan allowed.")
-    kong.ctx.shared.request_body = request_body
-end
+    if commit_history then commit_history() end
+    metrics_observe(config, "prisma_airs_phase_seconds", { phase = "verdict", scan_type = "prompt" }, started)
 
--- Pure (unit-testable) decision for over-cap reconstructed SSE text.
--- Returns { exceeded, blocked, text }. blocked=true (fail-closed, the secure
--- default) => caller emits 403; fail-open => caller scans text[1..max].
-local function apply_scan_limit(text, max, fail_closed)
-    max = max or 20000
-    if not text or #text <= max then
-        return { exceeded = false, blocked = false, text = text }
+    -- Streaming SSE scan: relay the streamed answer window by window instead of
+    -- letting Kong buffer it for the response phase.
+    if wants_stream_relay(config, request_body) then
+        return proxy_streaming(config, request_body)
     end
-    if fail_closed then
-        return { exceeded = true, blocked = true, text = nil }
-    end
-    return { exceeded = true, blocked = false, text = string.sub(text, 1, max) }
 end
 
 -- RESPONSE PHASE
@@ -724,7 +1733,10 @@ function SecurePrismaAIRSHandler:response(config)
 
     -- Read the full buffered response body via the shared helper (documented
     -- response-phase PDK call first, upstream's call as fallback).
+    local started = metrics_clock(config)
     local response_body_str = get_buffered_body()
+    metrics_observe(config, "prisma_airs_phase_seconds",
+        { phase = "body_read", scan_type = kong.ctx.shared.is_mcp and "tool_event" or "response" }, started)
 
     if not response_body_str or response_body_str == "" then
         kong.log.warn("SecurePrismaAIRSHandler: No response body found in response phase.")
@@ -738,82 +1750,43 @@ function SecurePrismaAIRSHandler:response(config)
 
     -- MCP response scanning
     if kong.ctx.shared.is_mcp then
+        started = metrics_clock(config)
         local payload = build_mcp_tool_event_payload(config, original_request_body, response_body_str)
+        metrics_observe(config, "prisma_airs_phase_seconds", { phase = "extract", scan_type = "tool_event" }, started)
         local verdict, reason = send_scan(config, payload)
 
+        started = metrics_clock(config)
         if verdict ~= "allow" then
+            metrics_observe(config, "prisma_airs_phase_seconds", { phase = "verdict", scan_type = "tool_event" }, started)
             return deny(verdict, reason, "MCP response blocked by security policy.")
         end
 
         log_debug(config, "MCP response scan allowed.")
+        metrics_observe(config, "prisma_airs_phase_seconds", { phase = "verdict", scan_type = "tool_event" }, started)
         return
     end
 
-    -- Buffered SSE (text/event-stream) response scanning (LLM path only; MCP handled above).
-    -- Reconstruct the assistant text from the buffered SSE frames, then feed it through the
-    -- existing build_prompt_payload via the OpenAI envelope shape so the scan path is reused.
-    if config.scan_sse_responses and is_sse_response() then
-        local provider = config.sse_provider or "auto"
-
-        if config.sse_set_observability_headers then
-            pcall(kong.response.set_header, "x-prisma-airs-sse-detected", "true")
-            pcall(kong.response.set_header, "x-prisma-airs-sse-scan-mode", "buffered")
-            pcall(kong.response.set_header, "x-prisma-airs-sse-provider", provider)
-        end
-
-        local text = reconstruct_sse_text(response_body_str, provider)
-
-        if not text or text == "" then
-            kong.log.warn("SecurePrismaAIRSHandler: SSE detected but no scannable text reconstructed; " ..
-                "skipping response scan. provider=" .. provider ..
-                " raw_body_len=" .. tostring(response_body_str and #response_body_str or 0))
-            return
-        end
-
-        local lim = apply_scan_limit(text, config.sse_max_scan_chars, config.sse_truncation_fail_closed)
-        if lim.exceeded then
-            kong.log.warn("SecurePrismaAIRSHandler: SSE reconstructed text exceeds sse_max_scan_chars (" ..
-                #text .. " > " .. (config.sse_max_scan_chars or 20000) .. ")")
-            if config.sse_set_observability_headers then
-                pcall(kong.response.set_header, "x-prisma-airs-sse-truncated", "true")
-            end
-        end
-        if lim.blocked then
-            -- Secure default: response too large to scan in full -> do not return it.
-            log_error("SSE response exceeds scannable size", "blocked")
-            return kong.response.exit(403, {
-                message = "Response blocked by security policy."
-            })
-        end
-        text = lim.text
-
-        log_debug(config, "SSE reconstructed " .. #text .. " chars for AIRS scan (provider=" .. provider .. ")")
-
-        -- Wrap into the OpenAI envelope build_prompt_payload already understands, so the
-        -- shared builder is reused UNCHANGED and the text lands in contents[0].response.
-        local ok_enc, wrapped = pcall(cjson.encode, { choices = { { message = { content = text } } } })
-        if not ok_enc then
-            kong.log.warn("SecurePrismaAIRSHandler: failed to encode reconstructed SSE text; skipping response scan.")
-            return
-        end
-        response_body_str = wrapped
-    end
-
-    -- Standard LLM response scanning
-    local payload, payload_err = build_prompt_payload(config, "response", original_request_body, response_body_str)
-
-    if not payload then
-        kong.log.warn("SecurePrismaAIRSHandler: " .. tostring(payload_err) .. " Skipping response scan.")
-        return
-    end
-
-    local verdict, reason = send_scan(config, payload)
+    local verdict, reason = scan_llm_response(config, original_request_body, response_body_str, is_sse_response())
 
+    started = metrics_clock(config)
     if verdict ~= "allow" then
+        metrics_observe(config, "prisma_airs_phase_seconds", { phase = "verdict", scan_type = "response" }, started)
         return deny(verdict, reason, "Response blocked by security policy.")
     end
 
     log_debug(config, "Response scan allowed.")
+    metrics_observe(config, "prisma_airs_phase_seconds", { phase = "verdict", scan_type = "response" }, started)
+end
+
+-- LOG PHASE
+-- Per-request totals for the metrics: AIRS time (every scan of the request) and upstream
+-- time (nginx's $upstream_response_time, or the gateway-side call in streaming /
+-- speculative mode). Only requests that recorded a metric already are counted.
+function SecurePrismaAIRSHandler:log(config)
+    if not config.metrics or not kong.ctx.shared.airs_metric_labels then return end
+    metrics_record(config, "prisma_airs_request_seconds", { part = "airs" }, kong.ctx.shared.airs_scan_s)
+    metrics_record(config, "prisma_airs_request_seconds", { part = "upstream" },
+        kong.ctx.shared.airs_upstream_s or upstream_seconds(ngx.var.upstream_response_time))
 end
 
 -- Pure helpers exposed for the unit test harness (no Kong/ngx dependency).
@@ -828,6 +1801,12 @@ SecurePrismaAIRSHandler._sse = {
     extract_prompt = extract_prompt,
     verdict_status = verdict_status,
     apply_scan_limit = apply_scan_limit,
+    stream_new = sse_stream_new,
+    stream_feed = sse_stream_feed,
+    stream_finish = sse_stream_finish,
+    stream_window = sse_stream_window,
+    stream_release = sse_stream_release,
+    block_event = sse_block_event,
 }
 
 -- Pure (unit-testable) claim-based profile selection helpers.
@@ -836,4 +1815,32 @@ SecurePrismaAIRSHandler._profile = {
     resolve = resolve_profile,
 }
 
+-- Incremental multi-turn scanning helpers (pure message selection; planner over a stub dict).
+SecurePrismaAIRSHandler._history = {
+    messages = conversation_messages,
+    select = select_unscanned,
+    plan = incremental_prompt,
+}
+
+-- Verdict cache helpers (pure key derivation; send_scan for tests over a stub dict).
+SecurePrismaAIRSHandler._cache = {
+    canonical = canonical,
+    scan_type_of = scan_type_of,
+    material = verdict_cache_material,
+    send_scan = send_scan,
+}
+
+-- Metrics helpers (pure series keys, histogram increments, Prometheus rendering).
+SecurePrismaAIRSHandler._metrics = {
+    buckets = METRIC_BUCKETS,
+    label_value = metric_label_value,
+    series = metric_series,
+    observation = metric_observation,
+    render = render_metrics,
+    provider = request_provider,
+    upstream_seconds = upstream_seconds,
+    client_allowed = metrics_client_allowed,
+    serve = serve_metrics,
+}
+
 return SecurePrismaAIRSHandler
@@ -45,7 +45,47 @@ local schema = {
           { timeout_ms = { type = "number", required = false, default = 5000 }, },
           { debug = { type = "boolean", required = false, default = false }, },
 
-          -- Buffered SSE (text/event-stream) response scanning
+          -- Multi-turn history: "first_user" = scan the first user message (legacy);
+          -- "incremental" = scan only input messages the per-session ledger (lua_shared_dict
+          -- <history_ledger_dict>) has not cleared, plus trailing context. See README.
+          { history_scan = {
+              type = "string",
+              required = false,
+              default = "first_user",
+              one_of = { "first_user", "incremental" },
+            },
+          },
+          { history_ledger_dict = { type = "string", required = false, default = "prisma_airs_history" }, },
+          { history_ledger_ttl_s = { type = "number", required = false, default = 3600, between = { 60, 86400 } }, },
+          { history_context_messages = { type = "number", required = false, default = 1, between = { 0, 20 } }, },
+          { history_session_header = { type = "string", required = false }, },
+
+          -- Speculative forwarding (LLM path only): call the upstream while the prompt scan
+          -- runs; the answer is held at the gateway until the prompt verdict. See README.
+          { speculative_forwarding = { type = "boolean", required = false, default = false }, },
+
+          -- Worker-shared verdict cache: requires `lua_shared_dict <verdict_cache_dict> <size>`
+          -- (e.g. KONG_NGINX_HTTP_LUA_SHARED_DICT="prisma_airs_verdicts 10m"). See README.
+          { verdict_cache = { type = "boolean", required = false, default = false }, },
+          { verdict_cache_dict = { type = "string", required = false, default = "prisma_airs_verdicts" }, },
+          { verdict_cache_ttl_s = { type = "number", required = false, default = 300, between = { 1, 86400 } }, },
+
+          -- Scan latency / verdict metrics in Prometheus text format: requires
+          -- `lua_shared_dict <metrics_dict> <size>` (e.g. "prisma_airs_metrics 5m"); a GET of
+          -- metrics_path on a route running this plugin returns them to clients in
+          -- metrics_allow (loopback by default; an empty list refuses every scrape). See README.
+          { metrics = { type = "boolean", required = false, default = false }, },
+          { metrics_dict = { type = "string", required = false, default = "prisma_airs_metrics" }, },
+          { metrics_path = { type = "string", required = false, default = "/prisma-airs/metrics" }, },
+          { metrics_allow = {
+              type = "array",
+              elements = typedefs.ip_or_cidr,
+              required = false,
+              default = { "127.0.0.1", "::1" },
+            },
+          },
+
+          -- SSE (text/event-stream) response scanning
           { scan_sse_responses = { type = "boolean", required = false, default = true }, },
           { sse_provider = {
               type = "string",
@@ -62,6 +102,17 @@ local schema = {
           -- Secure default: an over-cap response can't be fully scanned, so block (403)
           -- rather than return it. false = opt into fail-open (scan first N, return all). See README.
           { sse_truncation_fail_closed = { type = "boolean", required = false, default = true }, },
+          -- buffered = Kong buffers the whole stream, scans once, then returns it (default).
+          -- streaming = relay the stream window by window as each window is allowed (see README).
+          { sse_scan_mode = {
+              type = "string",
+              required = false,
+              default = "buffered",
+              one_of = { "buffered", "streaming" },
+            },
+          },
+          { sse_stream_window_chars = { type = "number", required = false, default = 1000, between = { 50, 20000 } }, },
+          { sse_stream_overlap_chars = { type = "number", required = false, default = 200, between = { 0, 5000 } }, },
         },
       },
     },
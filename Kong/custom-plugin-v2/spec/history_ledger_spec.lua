@@ -0,0 +1,153 @@
+-- Unit test for incremental multi-turn scanning in handler.lua (._history helpers).
+-- Loads the REAL handler with the Kong deps and ngx.shared stubbed and plays a growing
+-- conversation through the ledger planner. Runnable with plain Lua:
+--   cd Kong/custom-plugin-v2 && lua spec/history_ledger_spec.lua
+
+-- ---- minimal JSON decoder for the cjson stub ----
+local function json_decode(s)
+  if type(s) ~= "string" then return nil end
+  local i, pv = 1, nil
+  local function sk() while i <= #s and s:sub(i, i):match("%s") do i = i + 1 end end
+  local function ps()
+    i = i + 1; local b = {}
+    while i <= #s do
+      local c = s:sub(i, i)
+      if c == '"' then i = i + 1; return table.concat(b) end
+      if c == '\\' then b[#b + 1] = s:sub(i + 1, i + 1); i = i + 2
+      else b[#b + 1] = c; i = i + 1 end
+    end
+    error("unterminated")
+  end
+  local function po()
+    local o = {}; i = i + 1; sk()
+    if s:sub(i, i) == '}' then i = i + 1; return o end
+    while true do
+      sk(); local k = ps(); sk(); assert(s:sub(i, i) == ':'); i = i + 1
+      o[k] = pv(); sk(); local c = s:sub(i, i); i = i + 1
+      if c == '}' then return o end; assert(c == ',')
+    end
+  end
+  local function pa()
+    local a = {}; i = i + 1; sk()
+    if s:sub(i, i) == ']' then i = i + 1; return a end
+    while true do
+      sk(); a[#a + 1] = pv(); sk(); local c = s:sub(i, i); i = i + 1
+      if c == ']' then return a end; assert(c == ',')
+    end
+  end
+  pv = function()
+    sk(); local c = s:sub(i, i)
+    if c == '"' then return ps()
+    elseif c == '{' then return po()
+    elseif c == '[' then return pa()
+    elseif c == 't' then i = i + 4; return true
+    elseif c == 'f' then i = i + 5; return false
+    elseif c == 'n' then i = i + 4; return nil
+    else
+      local n = s:match("^%-?%d+%.?%d*", i); assert(n and #n > 0); i = i + #n; return tonumber(n)
+    end
+  end
+  local ok, r = pcall(pv); if not ok then return nil end; return r
+end
+
+local function new_dict()
+  local d = { data = {} }
+  function d:get(k) return self.data[k] end
+  function d:set(k, v) self.data[k] = v; return true end
+  return d
+end
+local dict = new_dict()
+local req_headers = {}
+
+package.loaded["resty.http"] = {}
+package.loaded["cjson"] = { decode = json_decode, encode = function() return "{}" end }
+_G.ngx = {
+  shared = { prisma_airs_history = dict },
+  sha1_bin = function(s) return s end,
+  encode_base64 = function(s) return s end,
+}
+_G.kong = {
+  ctx = { shared = {} },
+  log = { info = function() end, warn = function() end },
+  request = { get_header = function(h) return req_headers[h] end },
+}
+
+local handler = dofile("handler.lua")
+local hist = handler._history
+assert(type(hist.plan) == "function", "handler._history.plan missing")
+
+local pass, fail = 0, 0
+local function check(name, ok, detail)
+  print(string.format("[%s] %-52s %s", ok and "PASS" or "FAIL", name, detail or ""))
+  if ok then pass = pass + 1 else fail = fail + 1 end
+end
+local function join(t) return table.concat(t, ",") end
+
+print("=========== handler._history (real handler.lua) ===========")
+
+-- message extraction: input roles only, array content flattened
+local msgs = hist.messages({ messages = {
+  { role = "system", content = "be nice" },
+  { role = "user", content = "q1" },
+  { role = "assistant", content = "a1" },
+  { role = "tool", content = { { type = "text", text = "tool out" } } },
+  { role = "user", content = { { text = "q2" } } },
+} })
+check("only user/tool messages, in order", #msgs == 3 and msgs[1].text == "q1" and msgs[2].text == "tool out"
+  and msgs[3].text == "q2")
+local rmsgs = hist.messages({ input = { "hi", { role = "user", content = "there" },
+  { type = "function_call_output", output = "42" }, { role = "assistant", content = "x" } } })
+check("Responses input array", #rmsgs == 3 and rmsgs[3].role == "tool" and rmsgs[3].text == "42")
+
+-- selection
+local S = hist.select
+check("no ledger -> every message", join(S({ "a", "b", "c" }, nil, 1)) == "1,2,3")
+check("new tail + 1 context", join(S({ "a", "b", "c", "d" }, { a = true, b = true, c = true }, 1)) == "3,4")
+check("changed middle message rescanned", join(S({ "a", "B", "c" }, { a = true, c = true }, 0)) == "2")
+check("context clipped at the start", join(S({ "a", "b" }, { b = true }, 3)) == "1")
+check("nothing new -> last message", join(S({ "a", "b" }, { a = true, b = true }, 1)) == "2")
+
+-- a growing conversation: scan cost per turn stays flat once the ledger exists
+local conf = { history_scan = "incremental", history_context_messages = 1 }
+local convo = {}
+local sizes = {}
+for turn = 1, 6 do
+  convo[#convo + 1] = { role = "user", content = "question " .. turn }
+  local text, commit = hist.plan(conf, { messages = convo }, "profile")
+  sizes[#sizes + 1] = select(2, text:gsub("question", ""))
+  commit()
+  convo[#convo + 1] = { role = "assistant", content = "answer " .. turn }
+end
+check("turn 1 scans 1 message", sizes[1] == 1)
+check("later turns scan new + 1 context (constant)", join(sizes) == "1,2,2,2,2,2", join(sizes))
+
+local text = hist.plan(conf, { messages = convo }, "other-profile")
+check("other profile has its own ledger (full scan)", select(2, text:gsub("question", "")) == 6)
+
+-- evicted ledger falls back to a full scan
+dict.data = {}
+text = hist.plan(conf, { messages = convo }, "profile")
+check("evicted ledger -> full scan", select(2, text:gsub("question", "")) == 6)
+
+-- an uncommitted (blocked) turn is not cleared
+local _, commit = hist.plan(conf, { messages = convo }, "profile")
+commit()
+convo[#convo + 1] = { role = "user", content = "question bad" }
+hist.plan(conf, { messages = convo }, "profile")         -- blocked: commit not called
+text = hist.plan(conf, { messages = convo }, "profile")
+check("blocked turn is scanned again next time", text:find("question bad", 1, true) ~= nil, text)
+
+-- session header names the ledger when configured
+req_headers["x-session"] = "abc"
+local hconf = { history_scan = "incremental", history_session_header = "x-session" }
+local _, c2 = hist.plan(hconf, { messages = { { role = "user", content = "x" } } }, "p")
+c2()
+text = hist.plan(hconf, { messages = { { role = "user", content = "y" }, { role = "user", content = "z" } } }, "p")
+check("header session: ledger keyed by header, not opener", text == "y\n\nz", text)
+
+-- no dict declared -> nil (caller keeps the legacy prompt)
+check("undeclared dict -> nil", hist.plan({ history_ledger_dict = "nope" }, { messages = convo }, "p") == nil)
+
+print("-------------------------------------------------------------------")
+print(string.format("RESULTS: %d passed, %d failed", pass, fail))
+os.exit(fail == 0 and 0 or 1)
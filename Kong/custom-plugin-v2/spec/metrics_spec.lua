@@ -0,0 +1,178 @@
+-- Unit test for the scan metrics in handler.lua (._metrics helpers).
+-- Loads the REAL handler with resty.http, cjson, ngx.shared and the Kong PDK stubbed,
+-- checks the series keys / histogram increments / Prometheus rendering, then drives
+-- send_scan against a fake AIRS and a stub dict. Runnable with plain Lua:
+--   cd Kong/custom-plugin-v2 && lua spec/metrics_spec.lua
+
+-- ---- fake AIRS: answers with `airs_action`, or fails the call when it is nil ----
+local airs_action = "allow"
+package.loaded["resty.http"] = {
+  new = function()
+    return {
+      set_timeout = function() end,
+      set_keepalive = function() end,
+      request_uri = function()
+        if not airs_action then return nil, "connection refused" end
+        return { status = 200, body = airs_action }
+      end,
+    }
+  end,
+}
+-- the fake AIRS body is the bare action; decode it into the verdict shape
+package.loaded["cjson"] = {
+  decode = function(s) return { action = s, category = "x" } end,
+  encode = function() return "{}" end,
+}
+
+-- ---- ngx.shared stub (get/incr/get_keys) and a clock that advances 20ms per read ----
+local function new_dict()
+  local d = { data = {} }
+  function d:get(k) return self.data[k] end
+  function d:incr(k, n, init) self.data[k] = (self.data[k] or init) + n; return self.data[k] end
+  function d:get_keys()
+    local keys = {}
+    for k in pairs(self.data) do keys[#keys + 1] = k end
+    return keys
+  end
+  return d
+end
+local dict = new_dict()
+local clock = 100
+_G.ngx = {
+  shared = { prisma_airs_metrics = dict },
+  update_time = function() end,
+  now = function() clock = clock + 0.02; return clock end,
+}
+_G.kong = {
+  ctx = { shared = {} },
+  log = { info = function() end, warn = function() end },
+  request = { get_header = function() return nil end },
+  service = { request = { set_header = function() end } },
+  router = {
+    get_service = function() return { name = "llm" } end,
+    get_route = function() return { id = "r-1" } end,
+  },
+}
+
+local handler = dofile("handler.lua")
+local metrics = handler._metrics
+assert(type(metrics.render) == "function", "handler._metrics.render missing")
+
+local pass, fail = 0, 0
+local function check(name, ok, detail)
+  print(string.format("[%s] %-48s %s", ok and "PASS" or "FAIL", name, detail or ""))
+  if ok then pass = pass + 1 else fail = fail + 1 end
+end
+
+print("=========== handler._metrics (real handler.lua) ===========")
+
+local labels = { service = "svc", route = "rt", profile = "p", provider = "openai_chat" }
+
+-- series keys: base labels in fixed order, extras sorted, le last, values escaped
+check("series key layout",
+  metrics.series("m", labels, { verdict = "allow", scan_type = "prompt" }) ==
+    'm{service="svc",route="rt",profile="p",provider="openai_chat",scan_type="prompt",verdict="allow"}')
+check("le comes last", metrics.series("m", labels, { phase = "scan" }, "0.5"):sub(-10) == ',le="0.5"}')
+check("label values escaped", metrics.label_value('a"b\\c\nd') == 'a\\"b\\\\c\\nd')
+check("missing label renders empty", metrics.series("m", {}, nil):find('service=""', 1, true) ~= nil)
+
+-- one histogram observation: the buckets it falls in, +Inf, _sum, _count
+local obs = metrics.observation("h", labels, nil, 0.3)
+local buckets = 0
+for _, inc in ipairs(obs) do
+  if inc[1]:find("h_bucket", 1, true) then buckets = buckets + 1 end
+end
+local above = 0
+for _, le in ipairs(metrics.buckets) do if 0.3 <= le then above = above + 1 end end
+check("observation buckets (+Inf included)", buckets == above + 1, buckets .. " vs " .. (above + 1))
+check("observation _sum carries the value", obs[#obs - 1][2] == 0.3 and obs[#obs - 1][1]:find("h_sum", 1, true) == 1)
+check("observation _count", obs[#obs][2] == 1 and obs[#obs][1]:find("h_count", 1, true) == 1)
+
+-- rendering: HELP/TYPE once per family, buckets in numeric le order, _sum/_count after
+local samples = {}
+for _, inc in ipairs(metrics.observation("prisma_airs_phase_seconds", labels, { phase = "scan", scan_type = "prompt" }, 0.2)) do
+  samples[inc[1]] = inc[2]
+end
+samples[metrics.series("prisma_airs_verdicts_total", labels, { scan_type = "prompt", verdict = "allow" })] = 3
+local text = metrics.render(samples)
+local _, types = text:gsub("# TYPE ", "")
+check("one TYPE line per family", types == 2, tostring(types))
+check("histogram typed", text:find("# TYPE prisma_airs_phase_seconds histogram", 1, true) ~= nil)
+check("counter typed", text:find("# TYPE prisma_airs_verdicts_total counter", 1, true) ~= nil)
+local p25, p10, pinf = text:find('le="0.25"', 1, true), text:find('le="10"', 1, true), text:find('le="+Inf"', 1, true)
+check("buckets ordered by numeric le", p25 and p10 and pinf and p25 < p10 and p10 < pinf)
+check("_count after the buckets", text:find("prisma_airs_phase_seconds_count", 1, true) > pinf)
+check("counter value rendered", text:find('verdict="allow"} 3\n', 1, true) ~= nil)
+check("empty dict renders empty", metrics.render({}) == "")
+
+-- provider label from the request shape
+check("provider openai_chat", metrics.provider({ messages = { { role = "user", content = "hi" } } }) == "openai_chat")
+check("provider bedrock_converse",
+  metrics.provider({ messages = { { role = "user", content = { { text = "hi" } } } } }) == "bedrock_converse")
+check("provider anthropic_messages",
+  metrics.provider({ system = "s", messages = { { role = "user", content = "hi" } } }) == "anthropic_messages")
+check("provider openai_responses", metrics.provider({ input = "hi" }) == "openai_responses")
+check("provider mcp", metrics.provider({ method = "tools/call" }, true) == "mcp")
+
+-- $upstream_response_time: retries add up, "-" means none
+check("upstream single", metrics.upstream_seconds("0.012") == 0.012)
+check("upstream retries summed", math.abs(metrics.upstream_seconds("0.010, 0.020 : 0.003") - 0.033) < 1e-9)
+check("upstream none", metrics.upstream_seconds("-") == nil and metrics.upstream_seconds(nil) == nil)
+
+-- send_scan records the round-trip, the verdict and fail-closed errors
+local conf = { metrics = true, profile_name = "default" }
+local send_scan = handler._cache.send_scan
+local function payload(content)
+  return { ai_profile = { profile_name = "default" }, contents = { content } }
+end
+send_scan(conf, payload({ prompt = "hello" }))
+airs_action = nil
+local v = send_scan(conf, payload({ prompt = "hello" }))
+local function series(name, extra)
+  return metrics.series(name, { service = "llm", route = "r-1", profile = "default", provider = "unknown" }, extra)
+end
+check("error verdict returned", v == "error")
+check("allow verdict counted",
+  dict:get(series("prisma_airs_verdicts_total", { scan_type = "prompt", verdict = "allow" })) == 1)
+check("error verdict counted",
+  dict:get(series("prisma_airs_verdicts_total", { scan_type = "prompt", verdict = "error" })) == 1)
+check("error counted as fail closed",
+  dict:get(series("prisma_airs_fail_events_total", { mode = "closed", reason = "scan_error" })) == 1)
+check("scan round-trips observed",
+  dict:get(series("prisma_airs_phase_seconds_count", { phase = "scan", scan_type = "prompt" })) == 2)
+check("request AIRS time accumulated",
+  math.abs((kong.ctx.shared.airs_scan_s or 0) - 0.04) < 1e-9, tostring(kong.ctx.shared.airs_scan_s))
+
+-- metrics off: nothing is recorded and the clock is never read
+local before, reads = #dict:get_keys(), clock
+airs_action = "allow"
+send_scan({ metrics = false }, payload({ prompt = "hello" }))
+check("metrics off -> no series, no clock", #dict:get_keys() == before and clock == reads)
+
+-- scrape ACL: only clients in metrics_allow (loopback by default) get the dict
+check("allow exact IPv4", metrics.client_allowed("127.0.0.1", { "127.0.0.1", "::1" }))
+check("allow IPv4 CIDR", metrics.client_allowed("10.1.2.3", { "10.0.0.0/8" }))
+check("refuse outside IPv4 CIDR", not metrics.client_allowed("10.1.2.3", { "10.1.3.0/24" }))
+check("allow IPv4 odd prefix", metrics.client_allowed("192.168.7.200", { "192.168.6.0/23" }))
+check("allow IPv6 loopback", metrics.client_allowed("::1", { "127.0.0.1", "::1" }))
+check("allow IPv6 CIDR", metrics.client_allowed("fd00:12::7", { "fd00::/16" }))
+check("refuse IPv6 outside CIDR", not metrics.client_allowed("fe80::1", { "fd00::/8" }))
+check("families never cross", not metrics.client_allowed("0.0.0.1", { "::1" }))
+check("empty list refuses", not metrics.client_allowed("127.0.0.1", {}))
+check("garbage address refused", not metrics.client_allowed("1.2.3.999", { "0.0.0.0/0" }))
+
+local client_ip
+kong.client = { get_forwarded_ip = function() return client_ip end }
+kong.response = { exit = function(status, body) return status, body end }
+client_ip = "203.0.113.9"
+check("scrape refused from outside", (metrics.serve({ metrics = true })) == 403)
+check("scrape refused outside metrics_allow",
+  (metrics.serve({ metrics = true, metrics_allow = { "10.0.0.0/8" } })) == 403)
+local status, body = metrics.serve({ metrics = true, metrics_allow = { "203.0.113.0/24" } })
+check("scrape served inside metrics_allow", status == 200 and body:find("prisma_airs_verdicts_total", 1, true) ~= nil)
+client_ip = "127.0.0.1"
+check("scrape served to loopback by default", (metrics.serve({ metrics = true })) == 200)
+
+print("-------------------------------------------------------------------")
+print(string.format("RESULTS: %d passed, %d failed", pass, fail))
+os.exit(fail == 0 and 0 or 1)
@@ -0,0 +1,204 @@
+-- Unit test for speculative forwarding in handler.lua (access phase, LLM path).
+-- Loads the REAL handler with resty.http, cjson, ngx and the Kong PDK stubbed and runs
+-- :access() against a fake upstream and a fake AIRS, recording the order of events.
+-- Light threads are coroutines and every network call yields for a set number of
+-- scheduler ticks, so the tests choose whether the prompt verdict or the upstream
+-- answer arrives first.
+-- Runnable with plain Lua:
+--   cd Kong/custom-plugin-v2 && lua spec/speculative_spec.lua
+
+-- ---- minimal JSON decoder for the cjson stub ----
+local function json_decode(s)
+  if type(s) ~= "string" then return nil end
+  local i, pv = 1, nil
+  local function sk() while i <= #s and s:sub(i, i):match("%s") do i = i + 1 end end
+  local function ps()
+    i = i + 1; local b = {}
+    while i <= #s do
+      local c = s:sub(i, i)
+      if c == '"' then i = i + 1; return table.concat(b) end
+      if c == '\\' then b[#b + 1] = s:sub(i + 1, i + 1); i = i + 2
+      else b[#b + 1] = c; i = i + 1 end
+    end
+    error("unterminated")
+  end
+  local function po()
+    local o = {}; i = i + 1; sk()
+    if s:sub(i, i) == '}' then i = i + 1; return o end
+    while true do
+      sk(); local k = ps(); sk(); assert(s:sub(i, i) == ':'); i = i + 1
+      o[k] = pv(); sk(); local c = s:sub(i, i); i = i + 1
+      if c == '}' then return o end; assert(c == ',')
+    end
+  end
+  local function pa()
+    local a = {}; i = i + 1; sk()
+    if s:sub(i, i) == ']' then i = i + 1; return a end
+    while true do
+      sk(); a[#a + 1] = pv(); sk(); local c = s:sub(i, i); i = i + 1
+      if c == ']' then return a end; assert(c == ',')
+    end
+  end
+  pv = function()
+    sk(); local c = s:sub(i, i)
+    if c == '"' then return ps()
+    elseif c == '{' then return po()
+    elseif c == '[' then return pa()
+    elseif c == 't' then i = i + 4; return true
+    elseif c == 'f' then i = i + 5; return false
+    elseif c == 'n' then i = i + 4; return nil
+    else
+      local n = s:match("^%-?%d+%.?%d*", i); assert(n and #n > 0); i = i + #n; return tonumber(n)
+    end
+  end
+  local ok, r = pcall(pv); if not ok then return nil end; return r
+end
+
+local events, airs_action, exited = {}, "allow", nil
+-- scheduler ticks each fake network call takes inside a light thread
+local delay = {}
+local DELAY = { scan = 3, request = 1, read = 1 }
+
+-- Wait out a fake network call: yield once per tick when running in a light thread
+-- (the main request thread, as in OpenResty, just blocks).
+local function io(kind, event)
+  local co, main = coroutine.running()
+  if co and not main then
+    for _ = 1, delay[kind] do coroutine.yield() end
+  end
+  events[#events + 1] = event
+end
+local UPSTREAM_BODY = '{"choices":[{"message":{"content":"model answer"}}]}'
+
+package.loaded["resty.http"] = {
+  new = function()
+    return {
+      set_timeout = function() end,
+      set_timeouts = function() end,
+      set_keepalive = function() end,
+      close = function() events[#events + 1] = "upstream-discarded" end,
+      connect = function() return true end,
+      request = function(_, req)
+        io("request", "upstream-request")
+        return {
+          status = 200,
+          headers = { ["Content-Type"] = "application/json", ["Connection"] = "keep-alive" },
+          read_body = function() io("read", "upstream-read"); return UPSTREAM_BODY end,
+        }
+      end,
+      request_uri = function()
+        io("scan", "airs-scan")
+        return { status = 200, body = '{"action":"' .. airs_action .. '"}' }
+      end,
+    }
+  end,
+}
+package.loaded["cjson"] = { decode = json_decode, encode = function() return "{}" end }
+
+-- ngx.thread stub: spawn runs the thread up to its first yield; wait steps every live
+-- thread one tick at a time until one of those waited on has finished, and returns its
+-- results; kill drops a thread.
+local threads = {}
+local unpack_ = table.unpack or unpack
+local function step(t)
+  local r = { coroutine.resume(t.co) }
+  if coroutine.status(t.co) == "dead" then t.results = r end
+end
+_G.ngx = {
+  var = { upstream_uri = "/v1/chat/completions", request_id = "rid" },
+  thread = {
+    spawn = function(fn, ...)
+      local args = { ... }
+      local t = { co = coroutine.create(function() return fn(unpack_(args)) end) }
+      threads[#threads + 1] = t
+      step(t)
+      return t
+    end,
+    wait = function(...)
+      local waited = { ... }
+      while true do
+        for _, t in ipairs(waited) do
+          if t.results then return unpack_(t.results) end
+        end
+        for _, t in ipairs(threads) do
+          if not t.results and not t.killed then step(t) end
+        end
+      end
+    end,
+    kill = function(t)
+      t.killed = true
+      events[#events + 1] = "upstream-killed"
+      return true
+    end,
+  },
+}
+local request_body = { model = "m", messages = { { role = "user", content = "hello" } } }
+_G.kong = {
+  ctx = { shared = {} },
+  log = { info = function() end, warn = function() end, err = function() end, error = function() end },
+  request = {
+    get_body = function() return request_body end,
+    get_header = function() return nil end,
+    get_headers = function() return { ["Content-Type"] = "application/json", ["Host"] = "gw" } end,
+    get_raw_body = function() return "{}" end,
+    get_method = function() return "POST" end,
+    get_path = function() return "/v1/chat/completions" end,
+  },
+  router = { get_service = function() return { host = "llm.internal", port = 443, protocol = "https", name = "llm" } end },
+  service = { request = { enable_buffering = function() end, set_header = function() end } },
+  response = {
+    set_header = function() end,
+    exit = function(status, body, headers) exited = { status = status, body = body, headers = headers } end,
+  },
+}
+
+local handler = dofile("handler.lua")
+local conf = { profile_name = "p", speculative_forwarding = true, scan_sse_responses = true }
+
+local pass, fail = 0, 0
+local function check(name, ok, detail)
+  print(string.format("[%s] %-50s %s", ok and "PASS" or "FAIL", name, detail or ""))
+  if ok then pass = pass + 1 else fail = fail + 1 end
+end
+local function run(action, delays)
+  events, exited, airs_action, threads = {}, nil, action, {}
+  delay = {}
+  for k, v in pairs(DELAY) do delay[k] = (delays and delays[k]) or v end
+  kong.ctx.shared = {}
+  handler:access(conf)
+  return table.concat(events, ",")
+end
+
+print("=========== speculative forwarding (real handler.lua) ===========")
+
+local seq = run("allow")
+check("upstream called before the prompt verdict", seq:find("^upstream%-request,upstream%-read,airs%-scan") ~= nil, seq)
+check("allowed prompt: answer is response-scanned too", select(2, seq:gsub("airs%-scan", "")) == 2, seq)
+check("allowed answer relayed", exited and exited.status == 200 and exited.body == UPSTREAM_BODY)
+check("hop-by-hop headers dropped", exited and exited.headers and exited.headers["Connection"] == nil
+  and exited.headers["Content-Type"] == "application/json")
+
+seq = run("block")
+check("blocked prompt: answer discarded", seq:find("upstream%-discarded") ~= nil, seq)
+check("blocked prompt: client gets the deny 403", exited and exited.status == 403, exited and tostring(exited.status))
+check("blocked prompt: no upstream bytes returned", exited and exited.body ~= UPSTREAM_BODY)
+check("blocked prompt: no response scan", select(2, seq:gsub("airs%-scan", "")) == 1, seq)
+
+seq = run("allow", { read = 6 })
+check("slow answer: verdict first, then the read", seq:find("^upstream%-request,airs%-scan,upstream%-read,airs%-scan") ~= nil, seq)
+check("slow answer: relayed once read", exited and exited.status == 200 and exited.body == UPSTREAM_BODY)
+
+seq = run("block", { read = 6 })
+check("slow answer, blocked prompt: denied before the read", seq == "upstream-request,airs-scan,upstream-killed,upstream-discarded", seq)
+check("slow answer, blocked prompt: client gets the 403", exited and exited.status == 403, exited and tostring(exited.status))
+
+conf.speculative_forwarding = false
+events, exited, airs_action, threads = {}, nil, "allow", {}
+kong.ctx.shared = {}
+handler:access(conf)
+seq = table.concat(events, ",")
+check("off: scan only, Kong proxies afterwards", seq == "airs-scan" and exited == nil, seq)
+
+print("-------------------------------------------------------------------")
+print(string.format("RESULTS: %d passed, %d failed", pass, fail))
+os.exit(fail == 0 and 0 or 1)
@@ -0,0 +1,181 @@
+-- Unit test for streaming SSE scanning in handler.lua (._sse.stream_* helpers).
+-- Loads the REAL handler with the Kong deps stubbed and checks that the windowed,
+-- frame-at-a-time reconstruction matches the buffered one and releases frames only
+-- after their window is handed out. Runnable with plain Lua:
+--   cd Kong/custom-plugin-v2 && lua spec/sse_stream_spec.lua
+
+-- ---- minimal JSON decoder for the cjson stub ----
+local function json_decode(s)
+  if type(s) ~= "string" then return nil end
+  local i, pv = 1, nil
+  local function sk() while i <= #s and s:sub(i, i):match("%s") do i = i + 1 end end
+  local function ps()
+    i = i + 1; local b = {}
+    while i <= #s do
+      local c = s:sub(i, i)
+      if c == '"' then i = i + 1; return table.concat(b) end
+      if c == '\\' then b[#b + 1] = s:sub(i + 1, i + 1); i = i + 2
+      else b[#b + 1] = c; i = i + 1 end
+    end
+    error("unterminated")
+  end
+  local function po()
+    local o = {}; i = i + 1; sk()
+    if s:sub(i, i) == '}' then i = i + 1; return o end
+    while true do
+      sk(); local k = ps(); sk(); assert(s:sub(i, i) == ':'); i = i + 1
+      o[k] = pv(); sk(); local c = s:sub(i, i); i = i + 1
+      if c == '}' then return o end; assert(c == ',')
+    end
+  end
+  local function pa()
+    local a = {}; i = i + 1; sk()
+    if s:sub(i, i) == ']' then i = i + 1; return a end
+    while true do
+      sk(); a[#a + 1] = pv(); sk(); local c = s:sub(i, i); i = i + 1
+      if c == ']' then return a end; assert(c == ',')
+    end
+  end
+  pv = function()
+    sk(); local c = s:sub(i, i)
+    if c == '"' then return ps()
+    elseif c == '{' then return po()
+    elseif c == '[' then return pa()
+    elseif c == 't' then i = i + 4; return true
+    elseif c == 'f' then i = i + 5; return false
+    elseif c == 'n' then i = i + 4; return nil
+    else
+      local n = s:match("^%-?%d+%.?%d*", i); assert(n and #n > 0); i = i + #n; return tonumber(n)
+    end
+  end
+  local ok, r = pcall(pv); if not ok then return nil end; return r
+end
+
+-- ---- minimal JSON encoder (flat string tables are all the handler encodes here) ----
+local function json_encode(v)
+  if type(v) == "string" then return '"' .. v:gsub('[%c"\\]', function(c) return string.format("\\u%04x", c:byte()) end) .. '"' end
+  if type(v) ~= "table" then return tostring(v) end
+  local keys = {}
+  for k in pairs(v) do keys[#keys + 1] = k end
+  table.sort(keys)
+  local parts = {}
+  for _, k in ipairs(keys) do parts[#parts + 1] = json_encode(k) .. ":" .. json_encode(v[k]) end
+  return "{" .. table.concat(parts, ",") .. "}"
+end
+
+-- ---- stub the handler's require()d deps, then load the REAL handler ----
+package.loaded["resty.http"] = {}
+package.loaded["cjson"] = { decode = json_decode, encode = json_encode }
+_G.ngx = {}
+_G.kong = { ctx = { shared = {} }, request = {}, service = { request = {} } }
+
+local handler = dofile("handler.lua")
+local sse = handler._sse
+assert(type(sse.stream_new) == "function", "handler._sse.stream_new missing")
+
+local function frames(list)
+  local out = {}
+  for _, d in ipairs(list) do out[#out + 1] = "data: " .. d .. "\n\n" end
+  return table.concat(out)
+end
+
+local OPENAI = frames({
+  '{"choices":[{"delta":{"role":"assistant"}}]}',
+  '{"choices":[{"delta":{"content":"Hello "}}]}',
+  '{"choices":[{"delta":{"content":"streaming "}}]}',
+  '{"choices":[{"delta":{"tool_calls":[{"function":{"name":"lookup","arguments":"{}"}}]}}]}',
+  '{"choices":[{"delta":{"content":"world."}}]}',
+  "[DONE]",
+})
+local ANTHROPIC = "event: message_start\n" .. frames({ '{"type":"message_start","message":{}}' })
+  .. "event: content_block_delta\n" .. frames({ '{"type":"content_block_delta","delta":{"type":"text_delta","text":"Bonjour "}}' })
+  .. "event: content_block_delta\n" .. frames({ '{"type":"content_block_delta","delta":{"type":"text_delta","text":"le monde"}}' })
+  .. "event: message_stop\n" .. frames({ '{"type":"message_stop"}' })
+local RESPONSES = frames({
+  '{"type":"response.output_text.delta","item_id":"m1","content_index":0,"delta":"Part one, "}',
+  '{"type":"response.output_text.delta","item_id":"m1","content_index":0,"delta":"part two."}',
+  '{"type":"response.output_text.done","item_id":"m1","content_index":0,"text":"Part one, part two."}',
+  '{"type":"response.function_call_arguments.done","item_id":"f1","arguments":"{\\"q\\":1}"}',
+})
+
+-- Drive a whole body through the stream in `size`-byte chunks, collecting every window
+-- (minus its overlap prefix) and every released byte, as the access-phase loop does.
+local function drive(raw, provider, size, window, overlap)
+  local st = sse.stream_new(provider, window, overlap)
+  local text, released, windows = {}, {}, 0
+  local function clear()
+    local prev_tail = st.tail
+    local w = sse.stream_window(st)
+    if w ~= "" then
+      windows = windows + 1
+      text[#text + 1] = w:sub(#prev_tail + 1)
+    end
+    released[#released + 1] = sse.stream_release(st)
+  end
+  for i = 1, #raw, size do
+    if sse.stream_feed(st, raw:sub(i, i + size - 1)) or st.pending_len == 0 then clear() end
+  end
+  sse.stream_finish(st)
+  clear()
+  return table.concat(text), table.concat(released), windows, st
+end
+
+local pass, fail = 0, 0
+local function check(name, ok, detail)
+  print(string.format("[%s] %-46s %s", ok and "PASS" or "FAIL", name, detail or ""))
+  if ok then pass = pass + 1 else fail = fail + 1 end
+end
+
+print("=========== handler._sse.stream_* (real handler.lua) ===========")
+for _, c in ipairs({
+  { "openai_chat", OPENAI }, { "anthropic_messages", ANTHROPIC }, { "openai_responses", RESPONSES },
+}) do
+  local want = sse.reconstruct_sse_text(c[2], "auto")
+  for _, size in ipairs({ 1, 7, 64, #c[2] }) do
+    local got, out, _, st = drive(c[2], "auto", size, 8, 4)
+    check(c[1] .. " chunk=" .. size .. " text == buffered", got == want,
+      string.format("want=%q got=%q", want, got))
+    check(c[1] .. " chunk=" .. size .. " bytes relayed verbatim", out == c[2])
+    check(c[1] .. " chunk=" .. size .. " provider detected", st.provider == c[1], st.provider)
+  end
+end
+
+-- windowing: nothing is released until the window covering it is taken
+do
+  local st = sse.stream_new("openai_chat", 10, 3)
+  local due = sse.stream_feed(st, frames({ '{"choices":[{"delta":{"content":"abcdef"}}]}' }))
+  check("below window: not due, frame held", not due and #st.held == 1)
+  due = sse.stream_feed(st, frames({ '{"choices":[{"delta":{"content":"ghijkl"}}]}' }))
+  check("window reached: due", due, "pending_len=" .. st.pending_len)
+  local w1 = sse.stream_window(st)
+  check("first window = text so far", w1 == "abcdefghijkl", w1)
+  check("held frames released together", #sse.stream_release(st) > 0 and #st.held == 0)
+  sse.stream_feed(st, frames({ '{"choices":[{"delta":{"content":"mnop"}}]}' }))
+  local w2 = sse.stream_window(st)
+  check("next window carries the overlap", w2 == "jklmnop", w2)
+  check("empty window when no new text", sse.stream_window(st) == "")
+end
+
+-- a partial frame is held until its blank line (or the end of the stream)
+do
+  local st = sse.stream_new("raw", 1000, 0)
+  sse.stream_feed(st, "data: split ")
+  check("partial frame not parsed yet", st.pending_len == 0 and #st.held == 0)
+  sse.stream_feed(st, "payload")
+  sse.stream_finish(st)
+  local w = sse.stream_window(st)
+  check("trailing frame flushed at finish", w == "split payload", w)
+end
+
+-- block event terminates the stream with a well-formed SSE error frame
+do
+  local ev = sse.block_event("block")
+  check("block event is a single SSE frame", ev:match("^event: error\ndata: {.*}\n\n$") ~= nil, ev)
+  check("block event says policy", ev:find("Response blocked by security policy.", 1, true) ~= nil)
+  check("error verdict says unavailable",
+    sse.block_event("error"):find("temporarily unavailable", 1, true) ~= nil)
+end
+
+print("-------------------------------------------------------------------")
+print(string.format("RESULTS: %d passed, %d failed", pass, fail))
+os.exit(fail == 0 and 0 or 1)
@@ -0,0 +1,133 @@
+#!/usr/bin/env bash
+# Decision-parity harness for the per-event hook scripts and airs-dispatch.sh.
+#
+# Every case in parity-cases.tsv pipes a hook input into one of the per-event scripts with a
+# fake `curl` first on PATH. The fake records the AIRS request body and answers with a canned
+# verdict, so no network or tenant is needed. What a hook *decides* is compared against
+# parity-expected.jsonl:
+#   - the exit code,
+#   - stdout, byte for byte,
+#   - stderr (jq's own diagnostics from unguarded jq calls are dropped), and
+#   - every AIRS request payload, canonicalised with `jq -S -c`.
+# The expectations were recorded from the scripts as they stood before they became
+# airs-dispatch.sh shims. A mismatch therefore means the dispatcher decides differently from
+# the original script. Log lines carry timestamps and are not compared.
+#
+#   ./run-parity.sh            compare against parity-expected.jsonl (exit 1 on any mismatch)
+#   ./run-parity.sh --record   rewrite parity-expected.jsonl from the current scripts
+#
+# Case columns (tab-separated): script  stub-mode  config  hook-input-json
+#   stub-mode: allow | block | block-bare | alert | empty | garbage | down
+#   config:    full (key + profile name) | id (key + profile id) | nokey | noprofile |
+#              wm (full, with the Stop watermark on)
+# Only wm cases keep a Stop watermark, and they all share one file, in case order, so
+# consecutive wm rows can check what a later answer in the same session is scanned for.
+set -u
+HERE="$(cd "$(dirname "$0")" && pwd)"
+ROOT="$(cd "$HERE/.." && pwd)"
+CASES="$HERE/parity-cases.tsv"
+EXPECTED="$HERE/parity-expected.jsonl"
+RECORD=0; [ "${1:-}" = "--record" ] && RECORD=1
+
+command -v jq >/dev/null || { echo "jq is required"; exit 2; }
+
+HOOKS_REL=""
+for rel in hooks .claude/hooks .codex/hooks .cursor/hooks .windsurf/hooks; do
+  [ -d "$ROOT/$rel" ] && { HOOKS_REL="$rel"; break; }
+done
+[ -n "$HOOKS_REL" ] || { echo "no hooks directory under $ROOT"; exit 2; }
+
+# Work on a copy so that hooks that log next to themselves, or load <project>/.env, never
+# touch the checkout.
+WORK="$(mktemp -d 2>/dev/null || mktemp -d -t airs-parity)"
+trap 'rm -rf "${WORK:?}"' EXIT
+mkdir -p "$WORK/proj/$HOOKS_REL" "$WORK/bin"
+cp -R "$ROOT/$HOOKS_REL/." "$WORK/proj/$HOOKS_REL/"
+
+cat > "$WORK/bin/curl" <<'FAKE'
+#!/usr/bin/env bash
+# Fake curl: keep the request body, answer with the verdict for $PARITY_STUB_MODE.
+body=""
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -d|--data|--data-raw|--data-binary)
+      body="$2"; shift
+      case "$body" in @-) body="$(cat)" ;; @*) body="$(cat "${body#@}")" ;; esac ;;
+  esac
+  shift
+done
+n=$(ls "$PARITY_CAPTURE" | wc -l | tr -d ' ')
+printf '%s' "$body" > "$PARITY_CAPTURE/$((n + 1))"
+case "$PARITY_STUB_MODE" in
+  allow) printf '%s' '{"action":"allow","category":"benign","scan_id":"scan-allow","report_id":"R-allow","prompt_detected":{"injection":false},"response_detected":{"dlp":false}}' ;;
+  block) printf '%s' '{"action":"block","category":"malicious","scan_id":"scan-block","report_id":"R-block","prompt_detected":{"injection":true,"url_cats":false},"response_detected":{"dlp":true},"prompt_masked_data":{"pattern_detections":[{"pattern":"ssn"}]},"response_masked_data":{"pattern_detections":[{"pattern":"credit-card"}]},"tool_detected":{"verdict":"malicious","summary":{"detections":{"agent":true}},"input_detected":{"detection_entries":[{"detections":{"injection":true}}]}}}' ;;
+  block-bare) printf '%s' '{"action":"block","category":"malicious","scan_id":"scan-bare"}' ;;
+  alert) printf '%s' '{"action":"alert","category":"suspicious","scan_id":"scan-alert","prompt_detected":{"toxic_content":true}}' ;;
+  garbage) printf '%s' '<html><body>502 Bad Gateway</body></html>' ;;
+  down) exit 7 ;;
+esac
+exit 0
+FAKE
+chmod +x "$WORK/bin/curl"
+
+run_case() { # id script mode config input -> one JSON result line
+  local id="$1" script="$2" mode="$3" config="$4" input="$5" rc
+  rm -rf "${WORK:?}/cap"; mkdir -p "$WORK/cap"
+  (
+    unset PRISMA_AIRS_API_KEY PRISMA_AIRS_PROFILE_NAME PRISMA_AIRS_PROFILE_ID PRISMA_AIRS_URL \
+          PRISMA_AIRS_API_URL CLAUDE_CODE_APP_SUFFIX CODEX_APP_SUFFIX
+    export STOP_WATERMARK_PATH=""
+    case "$config" in
+      full)      export PRISMA_AIRS_API_KEY=parity-key PRISMA_AIRS_PROFILE_NAME=parity-profile ;;
+      id)        export PRISMA_AIRS_API_KEY=parity-key PRISMA_AIRS_PROFILE_ID=parity-profile-id ;;
+      noprofile) export PRISMA_AIRS_API_KEY=parity-key ;;
+      wm)        export PRISMA_AIRS_API_KEY=parity-key PRISMA_AIRS_PROFILE_NAME=parity-profile \
+                        STOP_WATERMARK_PATH="$WORK/stop-watermark" ;;
+    esac
+    export PATH="$WORK/bin:$PATH" PARITY_STUB_MODE="$mode" PARITY_CAPTURE="$WORK/cap" \
+           SECURITY_LOG_PATH="$WORK/hook.log"
+    cd "$WORK/proj" && printf '%s' "$input" | bash "$HOOKS_REL/$script" >"$WORK/out" 2>"$WORK/err"
+  )
+  rc=$?
+  local f
+  for f in $(ls "$WORK/cap" | sort -n); do
+    if [ -s "$WORK/cap/$f" ] && jq . "$WORK/cap/$f" >/dev/null 2>&1; then
+      jq -cS . "$WORK/cap/$f"
+    else
+      jq -Rs '"RAW:" + .' "$WORK/cap/$f"
+    fi
+  done > "$WORK/reqs"
+  jq -cnS --arg id "$id" --argjson exit "$rc" --rawfile out "$WORK/out" \
+    --arg err "$(grep -vE '^(jq: |parse error)' "$WORK/err")" --slurpfile requests "$WORK/reqs" \
+    '{id: $id, exit: $exit, stdout: $out, stderr: $err, requests: $requests}'
+}
+
+RESULTS="$WORK/results.jsonl"; : > "$RESULTS"
+n=0
+while IFS=$'\t' read -r script mode config input; do
+  case "$script" in ''|\#*) continue ;; esac
+  n=$((n + 1))
+  run_case "$n $script $mode $config" "$script" "$mode" "$config" "$input" >> "$RESULTS"
+done < "$CASES"
+
+if [ "$RECORD" = 1 ]; then
+  cp "$RESULTS" "$EXPECTED"
+  echo "recorded $n case(s) -> $EXPECTED"
+  exit 0
+fi
+
+[ -f "$EXPECTED" ] || { echo "missing $EXPECTED (run with --record first)"; exit 2; }
+FAILED=0
+while IFS= read -r got; do
+  id=$(jq -r .id <<< "$got")
+  want=$(jq -c --arg id "$id" 'select(.id == $id)' "$EXPECTED")
+  if [ "$got" = "$want" ]; then
+    printf '  ok   %s\n' "$id"
+  else
+    printf '  FAIL %s\n' "$id"; FAILED=1
+    diff <(jq -S . <<< "${want:-null}") <(jq -S . <<< "$got") | sed 's/^/         /'
+  fi
+done < "$RESULTS"
+[ "$(wc -l < "$EXPECTED" | tr -d ' ')" = "$n" ] || { echo "  FAIL case count differs from $EXPECTED"; FAILED=1; }
+[ "$FAILED" = 0 ] && echo "PASS ($n cases)" || echo "FAILED"
+exit "$FAILED"
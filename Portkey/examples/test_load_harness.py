@@ -0,0 +1,75 @@
+"""
+Unit tests for load_harness.py: the open-loop schedule, latency measured from the
+scheduled send time, and the percentile math. Standard library only.
+
+    python -m unittest test_load_harness.py
+"""
+
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import load_harness as lh
+
+
+class _Ok(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        body = b'{"choices":[{"message":{"content":"hi"}}]}'
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *a):
+        pass
+
+
+class SendTimes(unittest.TestCase):
+    def test_evenly_spaced_from_start(self):
+        self.assertEqual(lh.send_times(10.0, 4, 2.0), [10.0, 10.5, 11.0, 11.5])
+
+    def test_empty(self):
+        self.assertEqual(lh.send_times(0.0, 0, 5.0), [])
+
+
+class OneRequest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.srv = ThreadingHTTPServer(("127.0.0.1", 0), _Ok)
+        threading.Thread(target=cls.srv.serve_forever, daemon=True).start()
+        cls.opts = SimpleNamespace(gateway="direct", model="m", timeout=5,
+                                   url=f"http://127.0.0.1:{cls.srv.server_address[1]}")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.srv.shutdown()
+
+    def test_latency_counts_from_scheduled_time(self):
+        r = lh.one_request(self.opts, "off", False, "hello", time.perf_counter() - 0.5)
+        self.assertEqual(r["outcome"], "ok")
+        self.assertGreaterEqual(r["ms"], 500.0)
+
+    def test_closed_loop_counts_from_call(self):
+        r = lh.one_request(self.opts, "off", False, "hello")
+        self.assertEqual(r["outcome"], "ok")
+        self.assertLess(r["ms"], 500.0)
+
+
+class Percentiles(unittest.TestCase):
+    def test_linear_interpolation(self):
+        self.assertEqual(lh.pct([4, 1, 3, 2], 50), 2.5)
+        self.assertAlmostEqual(lh.pct(list(range(1, 101)), 99), 99.01)
+        self.assertEqual(lh.pct([1, 2, 3], 0), 1)
+        self.assertEqual(lh.pct([1, 2, 3], 100), 3)
+
+    def test_edges(self):
+        self.assertIsNone(lh.pct([], 50))
+        self.assertEqual(lh.pct([7.5], 99), 7.5)
+
+
+if __name__ == "__main__":
+    unittest.main()